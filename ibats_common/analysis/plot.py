@@ -33,7 +33,7 @@ from scipy import stats
 from ibats_utils.mess import date_2_str, is_windows_os, open_file_with_system_app
 
 from ibats_common.backend.mess import get_cache_folder_path
-from ibats_common.backend.label import calc_label2, calc_label3
+from ibats_common.backend.label import calc_label2, calc_label3, calc_label_batch, build_sparse_table
 
 logger = logging.getLogger(__name__)
 logger.debug("matplotlib.backend => %s", matplotlib.get_backend())
@@ -452,6 +452,46 @@ def _test_wave_hist():
                                       enable_save_plot=True, enable_show_plot=True, name="test_use", stg_run_id=1)
 
 
+def calc_future_max_min_rr(data_df: pd.DataFrame, n_days) -> dict:
+    """
+    计算各列未来 N 日（含当日）的最大、最小收益率，即
+    rolling(n_day).apply(lambda x: max(x / x[0]) - 1, raw=True).shift(-(n_day - 1)) 及相应的 min
+    所有 n_day 共用同一个 sparse table，每个 n_day 的区间最大、最小值由两个 2^k 区间合并得到，无需逐窗口回调 python 函数
+    基数 x[0] > 0 时 max(x / x[0]) == max(x) / x[0]，基数 < 0 时为 min(x) / x[0]，结果与逐窗口计算一致
+    :param data_df:
+    :param n_days: 计算未来 N 日的收益率最高值，最低值，N 为正整数
+    :return: {n_day: (max_df, min_df)}，列名称分别增加 ' max rr', ' min rr' 后缀
+    """
+    value_arr = data_df.to_numpy(dtype=float)
+    row_count, n_days = value_arr.shape[0], list(n_days)
+    for n_day in n_days:
+        if int(n_day) != n_day or n_day < 1:
+            raise ValueError(f'n_day={n_day} 必须为正整数')
+    min_table, max_table = build_sparse_table(value_arr, max_length=max(n_days) if len(n_days) > 0 else 1)
+    ret_dic = {}
+    for n_day in n_days:
+        max_arr = np.full(value_arr.shape, np.nan)
+        min_arr = np.full(value_arr.shape, np.nan)
+        count = row_count - int(n_day) + 1
+        if count > 0:
+            # 长度为 n_day 的区间由 [p, p + 2^k)、[p + n_day - 2^k, p + n_day) 两个区间覆盖
+            level = int(n_day).bit_length() - 1
+            offset = int(n_day) - (1 << level)
+            window_max = np.maximum(max_table[level][:count], max_table[level][offset:offset + count])
+            window_min = np.minimum(min_table[level][:count], min_table[level][offset:offset + count])
+            base_arr = value_arr[:count]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                max_arr[:count] = np.where(base_arr < 0, window_min, window_max) / base_arr - 1
+                min_arr[:count] = np.where(base_arr < 0, window_max, window_min) / base_arr - 1
+
+        ret_dic[n_day] = (
+            pd.DataFrame(max_arr, index=data_df.index, columns=[_ + ' max rr' for _ in data_df.columns]),
+            pd.DataFrame(min_arr, index=data_df.index, columns=[_ + ' min rr' for _ in data_df.columns]),
+        )
+
+    return ret_dic
+
+
 def hist_n_rr(df: pd.DataFrame, n_days, columns=None, bins=50,
               enable_show_plot=True, enable_save_plot=False, name=None, stg_run_id=None):
     """
@@ -471,16 +511,10 @@ def hist_n_rr(df: pd.DataFrame, n_days, columns=None, bins=50,
         data_df = df.dropna().copy()
 
     column_name_list, df_dic, quantile_dic, n_bins_dic, file_path_dic = list(data_df.columns), {}, {}, {}, {}
+    future_max_min_rr_dic = calc_future_max_min_rr(data_df, n_days)
     for n_day in n_days:
         # 计算各个列未来N日收益率波动
-        max_df = data_df.rename(
-            columns={_: _ + ' max rr' for _ in column_name_list}
-        ).rolling(n_day).apply(
-            lambda x: max(x / x[0]) - 1, raw=True).shift(-(n_day - 1))
-        min_df = data_df.rename(
-            columns={_: _ + ' min rr' for _ in column_name_list}
-        ).rolling(n_day).apply(
-            lambda x: min(x / x[0]) - 1, raw=True).shift(-(n_day - 1))
+        max_df, min_df = future_max_min_rr_dic[n_day]
         # 合并数据
         merged_df = max_df.join(min_df).dropna()
         for col_name in column_name_list:
@@ -539,7 +573,7 @@ def _test_hist_n_rr():
 
 
 def label_distribution(close_df: pd.DataFrame, min_rr: float, max_rr: float, max_future: int,
-                       name=None, **enable_kwargs):
+                       name=None, target_arr=None, **enable_kwargs):
     """
     输出分类标签在行情图中的分布情况
     :param close_df:
@@ -548,11 +582,15 @@ def label_distribution(close_df: pd.DataFrame, min_rr: float, max_rr: float, max
     :param max_future:为空则进行2分类，不为空则3分类
     :param enable_kwargs:
     :param name:
+    :param target_arr: 已计算好的标签（例如 calc_label_batch 的结果），为空则根据 min_rr、max_rr 计算
     :return:
     """
-    logger.debug('%s [%f ~ %f] max_future=%d, name="%s"', close_df.shape, min_rr, max_rr, max_future, name)
-    value_arr = close_df.to_numpy()
-    if max_future is None:
+    logger.debug('%s [%f ~ %f] max_future=%s, name="%s"', close_df.shape, min_rr, max_rr, max_future, name)
+    # calc_label2、calc_label3 会将 nan 替换为 0，需要可写的副本
+    value_arr = close_df.to_numpy(copy=True)
+    if target_arr is not None:
+        pass
+    elif max_future is None:
         target_arr = calc_label2(value_arr, min_rr, max_rr, one_hot=False, dtype='int')
     else:
         target_arr = calc_label3(value_arr, min_rr, max_rr, max_future=max_future, one_hot=False, dtype='int')
@@ -818,12 +856,14 @@ def _test_n_days_rr_distribution():
         path_dic = file_path_dic['label_distribution'][(n_day, col_name)]
         distribution_dic = ret_dic['label_distribution'][(n_day, col_name)]
         col_count = quantile_df.shape[1]
-        for n in range(col_count):
-            max_rr = quantile_df.iloc[0, n]
-            min_rr = quantile_df.iloc[1, col_count - n - 1]
+        rr_pair_list = [(quantile_df.iloc[1, col_count - n - 1], quantile_df.iloc[0, n]) for n in range(col_count)]
+        # 一次计算全部分位数组合的标签
+        target_arr_dic = calc_label_batch(df['close'].to_numpy(), rr_pair_list, max_future=n_day, dtype='int')
+        for min_rr, max_rr in rr_pair_list:
             distribution_rate_df, file_path = label_distribution(
                 df['close'], min_rr=min_rr, max_rr=max_rr, max_future=n_day,
-                name=f"{col_name}[{min_rr * 100:.2f}%-{max_rr * 100:.2f}%]", **enable_kwargs)
+                name=f"{col_name}[{min_rr * 100:.2f}%-{max_rr * 100:.2f}%]",
+                target_arr=target_arr_dic[(min_rr, max_rr)], **enable_kwargs)
             path_dic[(min_rr, max_rr)] = file_path
             distribution_dic[(min_rr, max_rr)] = distribution_rate_df
 
@@ -31,6 +31,7 @@ from scipy.stats import anderson, normaltest
 from ibats_common.analysis.plot import drawdown_plot, plot_rr_df, wave_hist, plot_scatter_matrix, plot_corr, \
     clean_cache, hist_n_rr, label_distribution, show_dl_accuracy
 from ibats_common.analysis.plot_db import get_rr_with_md, show_trade, show_cash_and_margin
+from ibats_common.backend.label import calc_label_batch
 from ibats_common.backend.mess import get_report_folder_path
 from ibats_common.backend.mess import get_stg_run_info
 from ibats_common.common import RunMode, CalcMode
@@ -149,12 +150,14 @@ def summary_md(md_df: pd.DataFrame, percentiles=[0.2, 1 / 3, 0.5, 2 / 3, 0.8],
         tmp_path_dic = file_path_dic['label_distribution'][(n_day, col_name)]
         distribution_dic = ret_dic['label_distribution'][(n_day, col_name)]
         col_count = quantile_df.shape[1]
-        for n in range(col_count):
-            max_rr = quantile_df.iloc[0, n]
-            min_rr = quantile_df.iloc[1, col_count - n - 1]
+        rr_pair_list = [(quantile_df.iloc[1, col_count - n - 1], quantile_df.iloc[0, n]) for n in range(col_count)]
+        # 一次计算全部分位数组合的标签
+        target_arr_dic = calc_label_batch(md_df[close_key].to_numpy(), rr_pair_list, max_future=n_day, dtype='int')
+        for min_rr, max_rr in rr_pair_list:
             distribution_rate_df, file_path = label_distribution(
                 md_df[close_key], min_rr=min_rr, max_rr=max_rr, max_future=n_day,
-                name=f"{col_name}[{min_rr * 100:.2f}%~{max_rr * 100:.2f}%]", **noname_enable_kwargs)
+                name=f"{col_name}[{min_rr * 100:.2f}%~{max_rr * 100:.2f}%]",
+                target_arr=target_arr_dic[(min_rr, max_rr)], **noname_enable_kwargs)
             tmp_path_dic[(min_rr, max_rr)] = file_path
             distribution_dic[(min_rr, max_rr)] = distribution_rate_df
 
@@ -0,0 +1,132 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 20:40
+@File    : bulk_insert.py
+@contact : mmmaaaggg@163.com
+@desc    : 回测结果批量保存，使用 Core insert executemany 分块写入，单块失败时逐条写入，避免整表数据丢失
+"""
+import logging
+import time
+
+from ibats_utils.db import with_db_session
+from ibats_utils.mess import split_chunk
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+from ibats_common.backend.orm import engine_ibats
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+
+
+def _is_persistent(detail):
+    """ORM 对象是否已经保存到数据库（ORM_UPDATE_OR_INSERT_PER_ACTION 模式下各状态在创建时已经保存）"""
+    if isinstance(detail, dict) or hasattr(detail, 'to_dict'):
+        return False
+    return inspect(detail).has_identity
+
+
+def _get_record(detail, col_name_set) -> dict:
+    """将 dict、轻量级状态对象（to_dict）或 ORM 对象转换为 dict，ORM 对象仅保留已赋值的字段"""
+    if isinstance(detail, dict):
+        return detail
+    if hasattr(detail, 'to_dict'):
+        return detail.to_dict()
+    return {key: value for key, value in detail.__dict__.items() if key in col_name_set}
+
+
+def get_record_list(model, detail_list) -> list:
+    """
+    将 detail_list 转换为 insert executemany 使用的 dict 列表
+    executemany 要求各条记录字段一致，部分记录缺少的字段使用字段默认值补齐，全部记录均缺少的字段由数据库默认值处理
+    :param model:
+    :param detail_list: dict、轻量级状态对象 或 ORM 对象
+    :return:
+    """
+    table = model.__table__
+    col_name_set = set(table.columns.keys())
+    record_list = [_get_record(detail, col_name_set) for detail in detail_list]
+    key_set = set()
+    for record in record_list:
+        key_set.update(record.keys())
+
+    missing_key_set = {key for key in key_set if any(key not in record for record in record_list)}
+    if len(missing_key_set) > 0:
+        default_dic = {}
+        for key in missing_key_set:
+            default = table.columns[key].default
+            default_dic[key] = default.arg if default is not None and default.is_scalar else None
+        record_list = [{**default_dic, **record} for record in record_list]
+
+    return record_list
+
+
+def _insert_one_by_one(engine, table, record_list) -> int:
+    """逐条插入，返回成功保存的记录数"""
+    saved_count = 0
+    for record in record_list:
+        try:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), record)
+            saved_count += 1
+        except SQLAlchemyError:
+            logger.exception("%s 记录保存失败：%s", table.name, record)
+    return saved_count
+
+
+def bulk_insert(model, detail_list, chunk_size=None, engine=None) -> int:
+    """
+    按块批量保存 detail_list 到 model 对应的表
+    已保存到数据库的 ORM 对象通过 session.add_all 保存（与此前 release 的处理方式一致），其余记录使用 Core insert executemany 写入
+    每一块单独提交，某块写入失败时该块回滚并逐条写入，仅丢弃出错的记录
+    :param model: ORM 类
+    :param detail_list: dict、轻量级状态对象 或 ORM 对象
+    :param chunk_size: 每块记录数，None 代表使用 config.BULK_INSERT_CHUNK_SIZE
+    :param engine: None 代表使用 engine_ibats
+    :return: 成功保存的记录数
+    """
+    if chunk_size is None:
+        chunk_size = config.BULK_INSERT_CHUNK_SIZE
+    if engine is None:
+        engine = engine_ibats
+    table = model.__table__
+    detail_list = list(detail_list)
+    if len(detail_list) == 0:
+        return 0
+
+    datetime_start = time.time()
+    persistent_list, transient_list = [], []
+    for detail in detail_list:
+        if _is_persistent(detail):
+            persistent_list.append(detail)
+        else:
+            transient_list.append(detail)
+
+    saved_count = 0
+    if len(persistent_list) > 0:
+        with with_db_session(engine) as session:
+            try:
+                session.add_all(persistent_list)
+                session.commit()
+                saved_count += len(persistent_list)
+            except SQLAlchemyError:
+                logger.exception("%d 条 %s 被保存时发生异常", len(persistent_list), table.name)
+                session.rollback()
+
+    record_list = get_record_list(model, transient_list)
+    for num, sub_list in enumerate(split_chunk(record_list, chunk_size)):
+        try:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), sub_list)
+            saved_count += len(sub_list)
+        except SQLAlchemyError:
+            logger.warning("%s 第 %d 块 %d 条记录批量保存失败，改为逐条保存", table.name, num, len(sub_list),
+                           exc_info=True)
+            saved_count += _insert_one_by_one(engine, table, sub_list)
+
+    estimate = time.time() - datetime_start
+    logger.info("%d/%d 条 %s 被保存，耗时 %.3f 秒，%.0f 条/秒", saved_count, len(detail_list), table.name, estimate,
+                saved_count / estimate if estimate > 0 else 0)
+    return saved_count
@@ -9,7 +9,6 @@
 """
 import datetime
 import logging
-import bisect
 import ffn  # NOQA
 import numpy as np
 import pandas as pd
@@ -18,6 +17,8 @@ from ibats_utils.mess import date_2_str
 
 logger = logging.getLogger(__name__)
 DEFAULT_OHLCV_COL_NAME_LIST = ["open", "high", "low", "close", "amount", "volume"]
+# get_factor(do_multiple_factors=True) 的价格倍数，1 代表原始数据
+ADJ_FACTOR_LIST = [1, 0.5, 0.75, 1.25, 1.5, 1.75, 2]
 
 
 def add_factor_of_trade_date(df: pd.DataFrame, trade_date_series):
@@ -111,8 +112,104 @@ def add_factor_of_delivery_date(df, delivery_date_series):
     return df
 
 
+def _count_less_before(value_arr: np.ndarray, is_point_arr=None, block_size=32) -> np.ndarray:
+    """
+    统计每个元素之前（不含自身）的 point 元素中数值严格小于该元素的数量
+    以数值排名代替数值，自底向上归并：每一层中右半段元素在左半段中小于自身的数量由 searchsorted 一次得到，
+    最底层 block_size 长度的块直接比较，整体复杂度 O(N log N)，全部为 numpy 向量化计算
+    :param value_arr: 一维数组，不能包含 nan
+    :param is_point_arr: 哪些元素参与计数，None 代表全部
+    :param block_size: 最底层直接比较的块长度
+    :return: int64 数组
+    """
+    count = value_arr.shape[0]
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    # 排名各不相同，数值相同时时间靠后的排名靠前，从而相同数值不会被计入“严格小于”
+    order_arr = count - 1 - np.argsort(value_arr[::-1], kind='stable')
+    rank_arr = np.empty(count, dtype=np.int64)
+    rank_arr[order_arr] = np.arange(count)
+    # 排名对应的元素是否参与计数，最后一项对应末尾补齐的元素
+    is_point_rank_arr = np.ones(count + 1, dtype=bool) if is_point_arr is None else np.append(
+        np.asarray(is_point_arr, dtype=bool)[order_arr], False)
+    is_point_rank_arr[-1] = False
+
+    # 最底层：块内直接比较
+    pad = (-count) % block_size
+    block_rank_arr = np.append(rank_arr, np.full(pad, count, dtype=np.int64)).reshape(-1, block_size)
+    block_result_arr = np.empty(block_rank_arr.shape, dtype=np.int64)
+    is_before_mat = np.tri(block_size, block_size, -1, dtype=bool)
+    chunk_size = max(1, (1 << 22) // (block_size * block_size))
+    for num in range(0, block_rank_arr.shape[0], chunk_size):
+        block_arr = block_rank_arr[num:num + chunk_size]
+        is_less_arr = (block_arr[:, None, :] < block_arr[:, :, None]) & is_before_mat
+        is_less_arr &= is_point_rank_arr[block_arr][:, None, :]
+        block_result_arr[num:num + chunk_size] = is_less_arr.sum(axis=2)
+
+    result_arr = np.zeros(count + 1, dtype=np.int64)
+    result_arr[block_rank_arr.ravel()] = block_result_arr.ravel()
+    # sorted_arr 中每 width 长度的段内排名有序
+    sorted_arr = np.sort(block_rank_arr, axis=1).ravel()[:count]
+    pos_arr = np.arange(count)
+    width = block_size
+    while width < count:
+        group_arr = pos_arr // (width * 2)
+        is_right_arr = (pos_arr % (width * 2)) >= width
+        # 加上分组编号后，全部左半段组成的数组整体有序
+        key_arr = group_arr * count + sorted_arr
+        is_left_arr = ~is_right_arr & is_point_rank_arr[sorted_arr]
+        left_count_arr = np.bincount(group_arr[is_left_arr], minlength=group_arr[-1] + 1)
+        right_group_arr = group_arr[is_right_arr]
+        result_arr[sorted_arr[is_right_arr]] += np.searchsorted(
+            key_arr[is_left_arr], key_arr[is_right_arr]) - (np.cumsum(left_count_arr) - left_count_arr)[right_group_arr]
+        # 每个分组由两个有序段组成，stable（timsort）排序可以利用已有的有序段
+        key_arr.sort(kind='stable')
+        sorted_arr = key_arr - group_arr * count
+        width *= 2
+
+    return result_arr[rank_arr]
+
+
+def calc_index_pct(value_arr, window=None) -> np.ndarray:
+    """
+    价格分位数水平：历史数据（含当前值）中严格小于当前值的数量占比
+    与逐个 bisect.insort 插入有序列表后计算 bisect_left / 数量 的结果一致，nan 不参与计算，返回 nan
+    :param value_arr: 一维数组或 Series
+    :param window: None 代表全部历史数据，否则为最近 window 个数据（不足 window 个时为全部数据）
+    :return: float64 数组
+    """
+    value_arr = np.asarray(value_arr, dtype=np.float64)
+    result_arr = np.full(value_arr.shape[0], np.nan)
+    is_valid_arr = ~np.isnan(value_arr)
+    valid_arr = value_arr[is_valid_arr]
+    count = valid_arr.shape[0]
+    if count == 0:
+        return result_arr
+    num_arr = np.arange(1, count + 1)
+    if window is None or window >= count:
+        result_arr[is_valid_arr] = _count_less_before(valid_arr) / num_arr
+        return result_arr
+    if window < 1:
+        raise ValueError(f'window={window} 必须大于 0')
+
+    # 在第 i - window 个数据之后插入第 i 个数据的查询，查询结果为窗口之前小于当前值的数量
+    query_count = count - window
+    event_arr = np.empty(count + query_count)
+    is_point_arr = np.ones(count + query_count, dtype=bool)
+    point_pos_arr = np.arange(count) + np.minimum(np.arange(count), query_count)
+    query_pos_arr = np.arange(query_count) * 2 + 1
+    event_arr[point_pos_arr] = valid_arr
+    event_arr[query_pos_arr] = valid_arr[window:]
+    is_point_arr[query_pos_arr] = False
+    less_arr = _count_less_before(event_arr, is_point_arr)
+    less_count_arr = less_arr[point_pos_arr]
+    less_count_arr[window:] -= less_arr[query_pos_arr]
+    result_arr[is_valid_arr] = less_count_arr / np.minimum(num_arr, window)
+    return result_arr
+
+
 def add_factor_of_price(df: pd.DataFrame, ohlcav_col_name_list=DEFAULT_OHLCV_COL_NAME_LIST,
-                        drop=False, log_av=True, add_pct_change_columns=True, with_diff_n=True):
+                        drop=False, log_av=True, add_pct_change_columns=True, with_diff_n=True, index_pct_window=None):
     """
     计算数据的因子
     :param df:
@@ -123,6 +220,7 @@ def add_factor_of_price(df: pd.DataFrame, ohlcav_col_name_list=DEFAULT_OHLCV_COL
     :param with_diff_n: 增加N阶 diff，增加N阶Diff，
         可能导致 factor_analysis 抛出 LinAlgError，
         因此在进行 factor analysis 时，可以关掉次因子
+    :param index_pct_window: 价格分位数水平 index_pct 的计算窗口，None 为全部历史数据
     :return:
     """
     pct_change_columns = [_ for _ in ohlcav_col_name_list if _ is not None]
@@ -326,16 +424,7 @@ def add_factor_of_price(df: pd.DataFrame, ohlcav_col_name_list=DEFAULT_OHLCV_COL
     df['WILLR'] = talib.WILLR(high_s, low_s, close_s, timeperiod=14)
 
     # 价格分位数水平
-    data_list, data_count = [], [0]
-
-    def get_index_pct(x):
-        """获取当前价格在历史价格数组中的位置的百分比"""
-        bisect.insort(data_list, x)
-        data_count[0] += 1
-        idx = bisect.bisect_left(data_list, x)
-        return idx / data_count[0]
-
-    df['index_pct'] = close_s.apply(get_index_pct)
+    df['index_pct'] = calc_index_pct(close_s, window=index_pct_window)
     pct_change_columns.append('index_pct')
 
     # 对 volume amount 取 log
@@ -367,7 +456,7 @@ def add_factor_of_price(df: pd.DataFrame, ohlcav_col_name_list=DEFAULT_OHLCV_COL
 
 def get_factor(df: pd.DataFrame, trade_date_series=None, delivery_date_series=None,
                dropna=True, ohlcav_col_name_list=["open", "high", "low", "close", "amount", "volume"],
-               do_multiple_factors=False, price_factor_kwargs=None) -> (pd.DataFrame, dict):
+               do_multiple_factors=False, price_factor_kwargs=None, processes=1) -> (pd.DataFrame, dict):
     """
     在当期时间序列数据基础上增加相关因子
     目前已经支持的因子包括量价因子、时间序列因子、交割日期因子
@@ -378,8 +467,17 @@ def get_factor(df: pd.DataFrame, trade_date_series=None, delivery_date_series=No
     :param ohlcav_col_name_list: 量价因子相关列名称，默认["open", "high", "low", "close", "amount", "volume"]
     :param do_multiple_factors: 对数据进行倍增处理，将指定列乘以因子，如果 ！= None 则，返回dict{adj_factor: DataFrame}
     :param price_factor_kwargs: 计算价格因子时的可选参数
+    :param processes: 进程数，1 代表当前进程中顺序计算，None 代表 CPU 核数。
+        多进程时各 adj_factor 的量价因子在进程池中并行计算，结果与顺序计算一致
     :return:
     """
+    if processes != 1 and ohlcav_col_name_list is not None and do_multiple_factors:
+        from ibats_common.backend.factor_parallel import get_factor_parallel
+        return get_factor_parallel(
+            df, trade_date_series=trade_date_series, delivery_date_series=delivery_date_series, dropna=dropna,
+            ohlcav_col_name_list=ohlcav_col_name_list, do_multiple_factors=do_multiple_factors,
+            price_factor_kwargs=price_factor_kwargs, processes=processes)
+
     price_factor_kwargs = {} if price_factor_kwargs is None else price_factor_kwargs
     ret_df = df.copy()
 
@@ -400,7 +498,9 @@ def get_factor(df: pd.DataFrame, trade_date_series=None, delivery_date_series=No
             if dropna:
                 ret_df.dropna(inplace=True)
             train_df_dic[1] = ret_df
-            for adj_factor in [0.5, 0.75, 1.25, 1.5, 1.75, 2]:
+            for adj_factor in ADJ_FACTOR_LIST:
+                if adj_factor == 1:
+                    continue
                 train_df_tmp = ret_df_tmp.copy()
                 # 将 O,H,L,C,A 前五项进行因子扩充
                 train_df_tmp.loc[:, ohlcav_col_name_list[:5]] *= adj_factor
@@ -459,12 +559,65 @@ def _test_get_factor(do_multiple_factors=False):
         pass
 
 
+def get_sliding_window(data_arr: np.ndarray, n_step, dtype=np.float32) -> np.ndarray:
+    """
+    [num, factor_count] -> [num - n_step + 1, n_step, factor_count]
+    通过 sliding_window_view（numpy < 1.20 使用 as_strided）返回只读视图，不复制数据
+    :param data_arr:
+    :param n_step:
+    :param dtype: data_arr 类型不一致时先转换（仅复制一次 data_arr，不会复制 n_step 倍）
+    :return:
+    """
+    data_arr = np.ascontiguousarray(data_arr, dtype=dtype)
+    if data_arr.shape[0] < n_step:
+        return np.zeros((0, n_step) + data_arr.shape[1:], dtype=data_arr.dtype)
+    try:
+        from numpy.lib.stride_tricks import sliding_window_view
+        # sliding_window_view 将窗口维度放在最后，调整为 [num, n_step, factor_count]
+        window_arr = np.moveaxis(sliding_window_view(data_arr, n_step, axis=0), -1, 1)
+    except ImportError:
+        from numpy.lib.stride_tricks import as_strided
+        window_arr = as_strided(
+            data_arr, shape=(data_arr.shape[0] - n_step + 1, n_step) + data_arr.shape[1:],
+            strides=(data_arr.strides[0],) + data_arr.strides, writeable=False)
+    return window_arr
+
+
+def iter_batch(data_arr: np.ndarray, n_step, batch_size, labels=None, shuffle=False, random_state=None,
+               dtype=np.float32):
+    """
+    按 batch_size 生成训练数据，每次仅复制当前 batch 的数据，不会生成完整的 [num - n_step + 1, n_step, factor_count] 数组
+    :param data_arr: [num, factor_count]
+    :param n_step:
+    :param batch_size:
+    :param labels: 不为 None 时，长度必须与 data_arr.shape[0] 一致，与每个窗口最后一条数据对应
+    :param shuffle: 是否打乱顺序
+    :param random_state:
+    :param dtype:
+    :return: 生成 batch_xs，或者 (batch_xs, batch_ys)
+    """
+    if labels is not None and len(labels) != data_arr.shape[0]:
+        raise ValueError(f"labels 长度 {len(labels)} 必须与 data_arr 长度 {data_arr.shape[0]} 保持一致")
+    window_arr = get_sliding_window(data_arr, n_step, dtype=dtype)
+    new_ys = None if labels is None else np.asarray(labels)[(n_step - 1):]
+    idx_arr = np.arange(window_arr.shape[0])
+    if shuffle:
+        np.random.RandomState(random_state).shuffle(idx_arr)
+    for idx_from in range(0, idx_arr.shape[0], batch_size):
+        batch_idx = idx_arr[idx_from:idx_from + batch_size]
+        batch_xs = window_arr[batch_idx]
+        if new_ys is None:
+            yield batch_xs
+        else:
+            yield batch_xs, new_ys[batch_idx]
+
+
 def transfer_2_batch(df: pd.DataFrame, n_step, labels=None, date_from=None, date_to=None):
     """
     [num, factor_count] -> [num - n_step + 1, n_step, factor_count]
-    将 df 转化成 n_step 长度的一段一段的数据
+    将 df 转化成 n_step 长度的一段一段的数据，返回 float32 只读视图（见 get_sliding_window）
     labels 为与 df对应的数据，处理方式与index相同，如果labels不为空，则返回数据最后增加以下 new_ys
-    :param df:
+    :param df: index 需按日期升序排列
     :param n_step:
     :param labels:如果不为 None，则长度必须与 df.shape[0] 一致
     :param date_from:
@@ -474,18 +627,17 @@ def transfer_2_batch(df: pd.DataFrame, n_step, labels=None, date_from=None, date
     df_len = df.shape[0]
     if labels is not None and df_len != len(labels):
         raise ValueError("ys 长度 %d 必须与 df 长度 %d 保持一致", len(labels), df_len)
-    # TODO: date_from, date_to 的逻辑可以进一步优化，延期为了省时间先保持这样
-    # 根据 date_from 对factor进行截取
+    # 根据 date_from 对factor进行截取，保留 date_from 之前 n_step 条数据
     if date_from is not None:
         date_from = pd.to_datetime(date_from)
-        is_fit = df.index >= date_from
-        if np.any(is_fit):
-            start_idx = np.argmax(is_fit) - n_step
+        from_idx = df.index.searchsorted(date_from, side='left')
+        if from_idx < df_len:
+            start_idx = from_idx - n_step
 
             if start_idx < 0:
                 start_idx = 0
                 logger.warning("%s 为起始日期的数据，前向历史数据不足 %d 条，因此，起始日期向后推移至 %s",
-                               date_2_str(date_from), n_step, date_2_str(df.index[60]))
+                               date_2_str(date_from), n_step, date_2_str(df.index[min(n_step, df_len - 1)]))
 
             df = df.iloc[start_idx:]
             df_len = df.shape[0]
@@ -500,12 +652,11 @@ def transfer_2_batch(df: pd.DataFrame, n_step, labels=None, date_from=None, date
             else:
                 return None, None, None
 
-    # 根据 date_from 对factor进行截取
+    # 根据 date_to 对factor进行截取
     if date_to is not None:
         date_to = pd.to_datetime(date_to)
-        is_fit = df.index <= date_to
-        if np.any(is_fit):
-            to_idx = np.argmin(is_fit)
+        to_idx = df.index.searchsorted(date_to, side='right')
+        if to_idx > 0:
             df = df.iloc[:to_idx]
             df_len = df.shape[0]
             if labels is not None:
@@ -519,13 +670,8 @@ def transfer_2_batch(df: pd.DataFrame, n_step, labels=None, date_from=None, date
             else:
                 return None, None, None
 
-    new_shape = [df_len - n_step + 1, n_step]
-    new_shape.extend(df.shape[1:])
     df_index, df_columns = df.index[(n_step - 1):], df.columns
-    data_arr_batch, factor_arr = np.zeros(new_shape), df.to_numpy(dtype=np.float32)
-
-    for idx_from, idx_to in enumerate(range(n_step, factor_arr.shape[0] + 1)):
-        data_arr_batch[idx_from] = factor_arr[idx_from: idx_to]
+    data_arr_batch = get_sliding_window(df.to_numpy(dtype=np.float32), n_step)
 
     if labels is not None:
         new_ys = labels[(n_step - 1):]
@@ -85,11 +85,11 @@ def factor_analysis(factor_df, max_feature_count=None, plot=True):
 
 def _test_factor_analysis():
     from ibats_common.example.data import load_data
-    from ibats_common.backend.factor import get_factor
+    from ibats_common.backend.factor_cache import get_factor_cache
     df = load_data(
         "RB.csv", index_col='trade_date', parse_index_to_datetime=True
     ).drop(['instrument_type'], axis=1)
-    factor_df = get_factor(df, price_factor_kwargs={'with_diff_n': False}).dropna()
+    factor_df = get_factor_cache().get_factor(df, price_factor_kwargs={'with_diff_n': False}).dropna()
     ana_dic = factor_analysis(factor_df)
 
 
@@ -0,0 +1,447 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 2:20
+@File    : factor_cache.py
+@contact : mmmaaaggg@163.com
+@desc    : 因子计算缓存，以输入数据的指纹及 get_factor 参数作为 key
+内存中保存最近使用的结果（LRU），同时保存到 get_cache_folder_path() 下的缓存目录（parquet 或 npz），二者均限制总大小。
+输入数据仅在尾部追加了新的行时，复用已缓存的前缀部分，仅对新增的行增量计算因子。
+注意：每次调用仍需对全部输入数据计算逐行 hash，并拼接、复制完整的结果，耗时与数据总行数 O(N) 相关，
+增量计算节省的是因子（TA-Lib 等）计算部分。
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ibats_common.backend.factor import get_factor, DEFAULT_OHLCV_COL_NAME_LIST, ADJ_FACTOR_LIST
+from ibats_common.backend.factor_stream import PriceFactorStream
+from ibats_common.backend.md_store import is_pyarrow_available
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+META_FILE_NAME = 'meta.json'
+FILE_FORMAT_SET = {'parquet', 'npz'}
+# PriceFactorStream 支持的 price_factor_kwargs 参数
+STREAM_KWARGS_SET = {'log_av', 'add_pct_change_columns', 'with_diff_n', 'index_pct_window'}
+
+
+def _get_series_hash(data_s):
+    if data_s is None:
+        return None
+    return hashlib.md5(pd.util.hash_pandas_object(data_s, index=True).to_numpy().tobytes()).hexdigest()
+
+
+def _iter_df(result):
+    """:return: [(adj_factor, factor_df)]"""
+    return list(result.items()) if isinstance(result, dict) else [(None, result)]
+
+
+def _concat(prefix_df: pd.DataFrame, new_df: pd.DataFrame):
+    """新增的行按前缀数据的类型转换后合并，保持与全部重新计算的类型一致"""
+    dtypes = prefix_df.dtypes
+    is_diff_s = dtypes != new_df.dtypes.reindex(dtypes.index)
+    if is_diff_s.any():
+        try:
+            new_df = new_df.astype(dtypes[is_diff_s].to_dict())
+        except (ValueError, TypeError):
+            pass
+    return pd.concat([prefix_df, new_df])
+
+
+def _copy_result(result):
+    if isinstance(result, dict):
+        return {adj_factor: factor_df.copy() for adj_factor, factor_df in result.items()}
+    else:
+        return result.copy()
+
+
+class _CacheEntry:
+    __slots__ = ('key', 'group_key', 'length', 'result', 'stream_dic', 'size')
+
+    def __init__(self, key, group_key, length, result, stream_dic=None):
+        self.key = key
+        self.group_key = group_key
+        self.length = length
+        self.result = result
+        # 用于尾部追加数据时增量计算 key: adj_factor value: PriceFactorStream
+        self.stream_dic = stream_dic
+        self.size = 0
+        self.update_size()
+
+    def update_size(self):
+        # 按每个数据 8 字节估算，避免 memory_usage 逐列统计
+        size = sum(factor_df.shape[0] * (factor_df.shape[1] + 1) * 8 for _, factor_df in _iter_df(self.result))
+        if self.stream_dic is not None:
+            # index_pct 的有序列表等状态，按每行 32 字节估算
+            size += self.length * 32 * len(self.stream_dic)
+        self.size = int(size)
+
+
+class FactorCache:
+    """
+    get_factor 计算结果缓存
+    key 为输入数据（含索引）的逐行 hash 与 get_factor 参数共同生成的指纹
+    内存缓存：按最近使用顺序淘汰，总大小不超过 max_memory_size
+    磁盘缓存：cache_folder_path/<key>/ 目录下保存各个 DataFrame，总大小不超过 max_disk_size，按最近使用顺序淘汰
+    尾部追加：输入数据的前 N 行与某个缓存完全一致时，复用该缓存，新增的行通过 PriceFactorStream 增量计算，
+    增量结果在 pct_change 方式或 inf 替代值发生变化时（参见 PctChange.is_consistent）重新全部计算。
+    前缀缓存优先在内存中查找，内存中没有时才扫描磁盘缓存；逐行 hash、结果拼接及复制仍为 O(N)
+    返回的结果为缓存的副本，调用方可以修改
+    """
+
+    def __init__(self, cache_folder_path=None, max_memory_size=None, max_disk_size=None, file_format=None):
+        """
+        :param cache_folder_path: 缓存目录，None 代表 config.FACTOR_CACHE_FOLDER_PATH，
+        仍为 None 则使用 get_cache_folder_path() 下的 factor_cache 目录
+        :param max_memory_size: 内存缓存最大字节数，None 代表 config.FACTOR_CACHE_MAX_MEMORY_SIZE
+        :param max_disk_size: 磁盘缓存最大字节数，None 代表 config.FACTOR_CACHE_MAX_DISK_SIZE，0 代表不使用磁盘缓存
+        :param file_format: parquet 或 npz，None 代表安装了 pyarrow 时使用 parquet，否则使用 npz
+        """
+        if cache_folder_path is None:
+            cache_folder_path = config.FACTOR_CACHE_FOLDER_PATH
+        if cache_folder_path is None:
+            from ibats_common.backend.mess import get_cache_folder_path
+            cache_folder_path = os.path.join(get_cache_folder_path(), 'factor_cache')
+        if file_format is None:
+            file_format = 'parquet' if is_pyarrow_available() else 'npz'
+        if file_format not in FILE_FORMAT_SET:
+            raise ValueError(f"file_format={file_format} 不被支持，仅支持 {FILE_FORMAT_SET}")
+        self.cache_folder_path = cache_folder_path
+        self.max_memory_size = config.FACTOR_CACHE_MAX_MEMORY_SIZE if max_memory_size is None else max_memory_size
+        self.max_disk_size = config.FACTOR_CACHE_MAX_DISK_SIZE if max_disk_size is None else max_disk_size
+        self.file_format = file_format
+        self._entry_dic = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.RLock()
+        # 统计信息
+        self.memory_hit_count = 0
+        self.disk_hit_count = 0
+        self.append_hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def _get_group_key(df: pd.DataFrame, trade_date_series, delivery_date_series, dropna, ohlcav_col_name_list,
+                       do_multiple_factors, price_factor_kwargs) -> str:
+        """数据结构及 get_factor 参数相同的数据属于同一组，组内可以复用前缀"""
+        key_str = json.dumps([
+            [str(_) for _ in df.columns], [str(_) for _ in df.dtypes], str(df.index.name), str(df.index.dtype),
+            _get_series_hash(trade_date_series), _get_series_hash(delivery_date_series),
+            dropna, ohlcav_col_name_list, do_multiple_factors, sorted(price_factor_kwargs.items()),
+        ], default=str)
+        return hashlib.md5(key_str.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_key(group_key, row_hash_arr: np.ndarray, length) -> str:
+        hash_obj = hashlib.md5(group_key.encode('utf-8'))
+        hash_obj.update(row_hash_arr[:length].tobytes())
+        return hash_obj.hexdigest()
+
+    # 内存缓存
+    def _put(self, entry: _CacheEntry):
+        if entry.key in self._entry_dic:
+            self._memory_size -= self._entry_dic.pop(entry.key).size
+        self._entry_dic[entry.key] = entry
+        self._memory_size += entry.size
+        while self._memory_size > self.max_memory_size and len(self._entry_dic) > 1:
+            _, entry_old = self._entry_dic.popitem(last=False)
+            self._memory_size -= entry_old.size
+
+    # 磁盘缓存
+    def _save(self, entry: _CacheEntry):
+        """保存缓存，先写入临时目录，完成后重命名，避免其他进程读取到不完整的数据"""
+        if self.max_disk_size <= 0:
+            return
+        folder_path = os.path.join(self.cache_folder_path, entry.key)
+        folder_path_tmp = f'{folder_path}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(folder_path_tmp)
+        df_meta_list = []
+        for num, (adj_factor, factor_df) in enumerate(_iter_df(entry.result)):
+            if self.file_format == 'parquet':
+                factor_df.to_parquet(os.path.join(folder_path_tmp, f'{num}.parquet'))
+                df_meta_list.append({'adj_factor': adj_factor})
+                continue
+            index_values = factor_df.index.to_numpy()
+            data_dic = {'index': index_values}
+            is_object = index_values.dtype.kind == 'O'
+            for col_num, col_name in enumerate(factor_df.columns):
+                data_dic[f'c{col_num}'] = values = factor_df[col_name].to_numpy()
+                is_object |= values.dtype.kind == 'O'
+            np.savez(os.path.join(folder_path_tmp, f'{num}.npz'), **data_dic)
+            df_meta_list.append({'adj_factor': adj_factor, 'columns': list(factor_df.columns),
+                                 'index_name': factor_df.index.name, 'is_object': bool(is_object)})
+
+        meta = {'key': entry.key, 'group_key': entry.group_key, 'length': entry.length,
+                'is_dict': isinstance(entry.result, dict), 'file_format': self.file_format,
+                'df_meta_list': df_meta_list}
+        with open(os.path.join(folder_path_tmp, META_FILE_NAME), 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+
+        if os.path.exists(folder_path):
+            shutil.rmtree(folder_path, ignore_errors=True)
+        try:
+            os.rename(folder_path_tmp, folder_path)
+        except OSError:
+            # 其他进程已经生成缓存
+            shutil.rmtree(folder_path_tmp, ignore_errors=True)
+        self._shrink_disk()
+
+    def _iter_disk_meta(self):
+        """:return: [(folder_path, meta)]"""
+        if not os.path.isdir(self.cache_folder_path):
+            return []
+        meta_list = []
+        for key in os.listdir(self.cache_folder_path):
+            meta_file_path = os.path.join(self.cache_folder_path, key, META_FILE_NAME)
+            if key.endswith('.tmp') or not os.path.exists(meta_file_path):
+                continue
+            try:
+                with open(meta_file_path, 'r', encoding='utf-8') as file:
+                    meta_list.append((os.path.join(self.cache_folder_path, key), json.load(file)))
+            except (OSError, ValueError):
+                # 其他进程正在删除
+                continue
+        return meta_list
+
+    def _load(self, folder_path, meta=None):
+        """加载磁盘缓存，不存在返回 None"""
+        meta_file_path = os.path.join(folder_path, META_FILE_NAME)
+        try:
+            if meta is None:
+                with open(meta_file_path, 'r', encoding='utf-8') as file:
+                    meta = json.load(file)
+            result = {}
+            for num, df_meta in enumerate(meta['df_meta_list']):
+                if meta['file_format'] == 'parquet':
+                    factor_df = pd.read_parquet(os.path.join(folder_path, f'{num}.parquet'))
+                else:
+                    with np.load(os.path.join(folder_path, f'{num}.npz'), allow_pickle=df_meta['is_object']) as data:
+                        columns = df_meta['columns']
+                        factor_df = pd.DataFrame(
+                            {col_name: data[f'c{col_num}'] for col_num, col_name in enumerate(columns)},
+                            index=pd.Index(data['index'], name=df_meta['index_name']), columns=columns)
+                result[df_meta['adj_factor']] = factor_df
+            # 记录最近使用时间
+            os.utime(meta_file_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if not meta['is_dict']:
+            result = result[None]
+        return _CacheEntry(meta['key'], meta['group_key'], meta['length'], result)
+
+    def _shrink_disk(self):
+        """按最近使用时间淘汰磁盘缓存，与内存缓存一致，至少保留最近的一个"""
+        folder_info_list = []
+        total_size = 0
+        for folder_path, _ in self._iter_disk_meta():
+            try:
+                size = sum(os.path.getsize(os.path.join(folder_path, _)) for _ in os.listdir(folder_path))
+                mtime = os.path.getmtime(os.path.join(folder_path, META_FILE_NAME))
+            except OSError:
+                continue
+            folder_info_list.append((mtime, size, folder_path))
+            total_size += size
+        folder_info_list.sort()
+        for _, size, folder_path in folder_info_list[:-1]:
+            if total_size <= self.max_disk_size:
+                break
+            shutil.rmtree(folder_path, ignore_errors=True)
+            total_size -= size
+
+    def _get_entry(self, key):
+        entry = self._entry_dic.get(key, None)
+        if entry is not None:
+            self._entry_dic.move_to_end(key)
+            self.memory_hit_count += 1
+            return entry
+        if self.max_disk_size > 0:
+            entry = self._load(os.path.join(self.cache_folder_path, key))
+            if entry is not None:
+                self.disk_hit_count += 1
+                self._put(entry)
+        return entry
+
+    def _find_prefix_entry(self, group_key, row_hash_arr, length):
+        """
+        查找与输入数据前 N 行一致的缓存，N 越大越优先
+        先查找内存缓存，没有匹配的缓存时才扫描磁盘缓存（需要读取全部 meta.json）
+        """
+        candidate_list = [(entry.length, entry.key, entry) for entry in self._entry_dic.values()
+                          if entry.group_key == group_key and entry.length < length]
+        entry = self._match_prefix(candidate_list, group_key, row_hash_arr)
+        if entry is not None or self.max_disk_size <= 0:
+            return entry
+
+        candidate_list = [(meta['length'], meta['key'], folder_path)
+                          for folder_path, meta in self._iter_disk_meta()
+                          if meta['group_key'] == group_key and meta['length'] < length
+                          and meta['key'] not in self._entry_dic]
+        return self._match_prefix(candidate_list, group_key, row_hash_arr)
+
+    def _match_prefix(self, candidate_list, group_key, row_hash_arr):
+        """
+        按长度从大到小返回第一个与输入数据前缀一致的缓存
+        :param candidate_list: [(length, key, _CacheEntry 或磁盘缓存目录)]
+        """
+        candidate_list.sort(key=lambda x: x[0], reverse=True)
+        for prefix_length, key, entry in candidate_list:
+            if prefix_length == 0 or key != self._get_key(group_key, row_hash_arr, prefix_length):
+                continue
+            if isinstance(entry, str):
+                entry = self._load(entry)
+            if entry is not None:
+                return entry
+        return None
+
+    def _extend(self, entry: _CacheEntry, df: pd.DataFrame, key, trade_date_series, delivery_date_series,
+                dropna, ohlcav_col_name_list, do_multiple_factors, price_factor_kwargs):
+        """在前缀缓存的基础上计算新增的行，无法保证结果一致时返回 None"""
+        prefix_length = entry.length
+        date_df = get_factor(df.iloc[prefix_length:], trade_date_series=trade_date_series,
+                             delivery_date_series=delivery_date_series, dropna=False, ohlcav_col_name_list=None)
+        if ohlcav_col_name_list is None:
+            new_df = date_df.dropna() if dropna else date_df
+            result = _concat(entry.result, new_df)
+            return _CacheEntry(key, entry.group_key, df.shape[0], result)
+
+        if not set(price_factor_kwargs.keys()).issubset(STREAM_KWARGS_SET):
+            return None
+        adj_factor_list = ADJ_FACTOR_LIST if do_multiple_factors else [1]
+        stream_dic, entry.stream_dic = entry.stream_dic, None
+        if stream_dic is None:
+            # 第一次追加数据，以前缀数据初始化 PriceFactorStream
+            date_prefix_df = get_factor(df.iloc[:prefix_length], trade_date_series=trade_date_series,
+                                        delivery_date_series=delivery_date_series, dropna=False,
+                                        ohlcav_col_name_list=None)
+            stream_dic = {}
+            for adj_factor in adj_factor_list:
+                stream_dic[adj_factor] = factor_stream = PriceFactorStream(ohlcav_col_name_list, **price_factor_kwargs)
+                train_df_tmp = date_prefix_df.copy()
+                if adj_factor != 1:
+                    train_df_tmp.loc[:, ohlcav_col_name_list[:5]] *= adj_factor
+                factor_stream.warm_up(train_df_tmp)
+
+        prefix_dic = entry.result if do_multiple_factors else {1: entry.result}
+        result = {}
+        for adj_factor in adj_factor_list:
+            factor_stream = stream_dic[adj_factor]
+            train_df_tmp = date_df.copy()
+            if adj_factor != 1:
+                train_df_tmp.loc[:, ohlcav_col_name_list[:5]] *= adj_factor
+            new_df = factor_stream.update_df(train_df_tmp)
+            if not factor_stream.is_consistent():
+                return None
+            if dropna:
+                new_df.dropna(inplace=True)
+            result[adj_factor] = _concat(prefix_dic[adj_factor], new_df)
+
+        return _CacheEntry(key, entry.group_key, df.shape[0], result if do_multiple_factors else result[1],
+                           stream_dic=stream_dic)
+
+    def get_factor(self, df: pd.DataFrame, trade_date_series=None, delivery_date_series=None,
+                   dropna=True, ohlcav_col_name_list=DEFAULT_OHLCV_COL_NAME_LIST,
+                   do_multiple_factors=False, price_factor_kwargs=None, processes=1) -> (pd.DataFrame, dict):
+        """
+        与 factor.get_factor 参数及返回值相同，processes 仅在缓存未命中时用于计算因子，不影响缓存
+        """
+        price_factor_kwargs = {} if price_factor_kwargs is None else price_factor_kwargs
+        group_key = self._get_group_key(df, trade_date_series, delivery_date_series, dropna, ohlcav_col_name_list,
+                                        do_multiple_factors, price_factor_kwargs)
+        row_hash_arr = pd.util.hash_pandas_object(df, index=True).to_numpy()
+        length = df.shape[0]
+        key = self._get_key(group_key, row_hash_arr, length)
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                return _copy_result(entry.result)
+
+            entry_prefix = self._find_prefix_entry(group_key, row_hash_arr, length)
+            if entry_prefix is not None:
+                entry = self._extend(entry_prefix, df, key, trade_date_series, delivery_date_series,
+                                     dropna, ohlcav_col_name_list, do_multiple_factors, price_factor_kwargs)
+                # 前缀缓存的 PriceFactorStream 已转移给新的缓存
+                size = entry_prefix.size
+                entry_prefix.update_size()
+                if entry_prefix.key in self._entry_dic:
+                    self._memory_size += entry_prefix.size - size
+                if entry is not None:
+                    self.append_hit_count += 1
+                    logger.debug("复用 %d 行缓存，增量计算 %d 行因子", entry_prefix.length, length - entry_prefix.length)
+                    self._put(entry)
+                    return _copy_result(entry.result)
+
+            self.miss_count += 1
+            result = get_factor(df, trade_date_series=trade_date_series, delivery_date_series=delivery_date_series,
+                                dropna=dropna, ohlcav_col_name_list=ohlcav_col_name_list,
+                                do_multiple_factors=do_multiple_factors, price_factor_kwargs=price_factor_kwargs,
+                                processes=processes)
+            entry = _CacheEntry(key, group_key, length, result)
+            self._put(entry)
+            self._save(entry)
+            return _copy_result(result)
+
+    def get_stats(self) -> dict:
+        return {
+            'memory_hit_count': self.memory_hit_count,
+            'disk_hit_count': self.disk_hit_count,
+            'append_hit_count': self.append_hit_count,
+            'miss_count': self.miss_count,
+            'memory_size': self._memory_size,
+        }
+
+    def clear(self):
+        """清空内存缓存以及缓存目录"""
+        with self._lock:
+            self._entry_dic.clear()
+            self._memory_size = 0
+            shutil.rmtree(self.cache_folder_path, ignore_errors=True)
+
+
+_factor_cache = None
+
+
+def get_factor_cache() -> FactorCache:
+    global _factor_cache
+    if _factor_cache is None:
+        _factor_cache = FactorCache()
+    return _factor_cache
+
+
+def _test_factor_cache_benchmark(count=5):
+    """对比 get_factor 与 FactorCache.get_factor 的耗时"""
+    import time
+    import tempfile
+    from ibats_common.example.data import load_data
+    md_df = load_data('RB.csv').set_index('trade_date').drop('instrument_type', axis=1)
+    md_df.index = pd.DatetimeIndex(md_df.index)
+    datetime_start = time.time()
+    for _ in range(count):
+        get_factor(md_df, do_multiple_factors=True)
+    logger.info("get_factor %d 次，耗时 %.4f 秒", count, time.time() - datetime_start)
+    factor_cache = FactorCache(os.path.join(tempfile.mkdtemp(), 'factor_cache'))
+    datetime_start = time.time()
+    for _ in range(count):
+        factor_cache.get_factor(md_df, do_multiple_factors=True)
+    logger.info("FactorCache.get_factor %d 次，耗时 %.4f 秒，%s", count, time.time() - datetime_start,
+                factor_cache.get_stats())
+    # 模拟逐个 bar 追加数据
+    datetime_start = time.time()
+    for num in range(md_df.shape[0] - count * 4, md_df.shape[0]):
+        factor_cache.get_factor(md_df.iloc[:num + 1])
+    logger.info("FactorCache.get_factor 逐 bar 追加 %d 次，耗时 %.4f 秒，%s", count * 4, time.time() - datetime_start,
+                factor_cache.get_stats())
+    factor_cache.clear()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    _test_factor_cache_benchmark()
@@ -0,0 +1,192 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 3:00
+@File    : factor_parallel.py
+@contact : mmmaaaggg@163.com
+@desc    : 多进程计算因子，按 (品种, adj_factor) 拆分任务在进程池中并行执行 add_factor_of_price
+输入、输出数据均通过共享内存中的 numpy 数组传递，不在进程间 pickle DataFrame，结果与 get_factor 顺序计算完全一致
+"""
+import logging
+import time
+from multiprocessing import Pool
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python 3.8 以前的版本没有 shared_memory，仅支持顺序计算
+    shared_memory = None
+
+import numpy as np
+import pandas as pd
+
+from ibats_common.backend.factor import get_factor, add_factor_of_price, DEFAULT_OHLCV_COL_NAME_LIST, \
+    ADJ_FACTOR_LIST
+
+logger = logging.getLogger(__name__)
+
+
+def _attach_block(name, shape):
+    """连接共享内存，按列连续（Fortran order）存储，每一列为连续的 float64 数组"""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order='F')
+
+
+def _create_block(shape, shm_list):
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    shm_list.append(shm)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order='F')
+
+
+def _calc_price_factor(args):
+    """
+    子进程中计算 add_factor_of_price，结果写入共享内存
+    :return: 输出列名称，输出列类型
+    """
+    (input_name, input_shape, col_name_list, dtype_list, output_name, output_shape,
+     adj_factor, ohlcav_col_name_list, price_factor_kwargs) = args
+    shm_input, input_arr = _attach_block(input_name, input_shape)
+    shm_output, output_arr = _attach_block(output_name, output_shape)
+    try:
+        df = pd.DataFrame({col_name: input_arr[:, num].astype(dtype_list[num], copy=True)
+                           for num, col_name in enumerate(col_name_list)}, columns=col_name_list)
+        if adj_factor != 1:
+            # 将 O,H,L,C,A 前五项进行因子扩充
+            df.loc[:, ohlcav_col_name_list[:5]] *= adj_factor
+        factor_df = add_factor_of_price(df, ohlcav_col_name_list=ohlcav_col_name_list, **price_factor_kwargs)
+        if factor_df.shape != output_shape:
+            raise ValueError(f'因子数据 shape={factor_df.shape} 与预期 {output_shape} 不一致')
+        for num, col_name in enumerate(factor_df.columns):
+            output_arr[:, num] = factor_df[col_name].to_numpy(dtype=np.float64)
+        return list(factor_df.columns), [str(_) for _ in factor_df.dtypes]
+    finally:
+        del input_arr, output_arr
+        shm_input.close()
+        shm_output.close()
+
+
+def _get_result_df(date_df: pd.DataFrame, numeric_col_name_list, output_arr, col_name_list, dtype_list, dropna):
+    """由共享内存中的输出数据构造与 get_factor 一致的 DataFrame"""
+    data_dic = {}
+    for num, col_name in enumerate(col_name_list):
+        data_dic[col_name] = output_arr[:, num].astype(dtype_list[num], copy=True)
+    # 非数值列未参与计算，按原顺序放回
+    numeric_col_name_set = set(numeric_col_name_list)
+    for col_name in date_df.columns:
+        if col_name not in numeric_col_name_set:
+            data_dic[col_name] = date_df[col_name].to_numpy()
+    columns = list(date_df.columns) + col_name_list[len(numeric_col_name_list):]
+    factor_df = pd.DataFrame(data_dic, index=date_df.index, columns=columns)
+    if dropna:
+        factor_df.dropna(inplace=True)
+    return factor_df
+
+
+def get_factor_parallel(df_dic, trade_date_series=None, delivery_date_series=None, dropna=True,
+                        ohlcav_col_name_list=DEFAULT_OHLCV_COL_NAME_LIST, do_multiple_factors=False,
+                        price_factor_kwargs=None, processes=None):
+    """
+    多进程计算因子，各品种、各 adj_factor 的 add_factor_of_price 作为独立任务在进程池中执行
+    交易日、交割日因子在当前进程中计算，数值列写入共享内存后由子进程直接读取，因子结果写入预分配的共享内存
+    :param df_dic: {instrument: 时间序列数据}，也可以是一个 DataFrame
+    :param trade_date_series: 交易日序列
+    :param delivery_date_series: 交割日序列，或者 {instrument: 交割日序列}
+    :param dropna: 是否 dropna
+    :param ohlcav_col_name_list: 量价因子相关列名称
+    :param do_multiple_factors: 对数据进行倍增处理，与 get_factor 一致
+    :param price_factor_kwargs: 计算价格因子时的可选参数
+    :param processes: 进程数，None 代表 CPU 核数，1 代表在当前进程中顺序执行（python 3.8 以前的版本总是顺序执行）
+    :return: df_dic 为 DataFrame 时返回值与 get_factor 相同，否则返回 {instrument: get_factor 的返回值}
+    """
+    price_factor_kwargs = {} if price_factor_kwargs is None else price_factor_kwargs
+    is_single = isinstance(df_dic, pd.DataFrame)
+    if is_single:
+        df_dic = {None: df_dic}
+    if not isinstance(delivery_date_series, dict):
+        delivery_date_series = {key: delivery_date_series for key in df_dic.keys()}
+
+    if shared_memory is None and processes != 1:
+        logger.warning("当前 python 版本不支持 multiprocessing.shared_memory，改为顺序计算")
+        processes = 1
+    if processes == 1 or ohlcav_col_name_list is None:
+        result_dic = {key: get_factor(
+            df, trade_date_series=trade_date_series, delivery_date_series=delivery_date_series.get(key, None),
+            dropna=dropna, ohlcav_col_name_list=ohlcav_col_name_list, do_multiple_factors=do_multiple_factors,
+            price_factor_kwargs=price_factor_kwargs) for key, df in df_dic.items()}
+        return result_dic[None] if is_single else result_dic
+
+    # 输出数据的行数需要预先确定，因此 drop 在子进程中关闭，合并结果时再 dropna，二者结果一致
+    price_factor_kwargs = price_factor_kwargs.copy()
+    drop = price_factor_kwargs.pop('drop', False)
+    datetime_start = time.time()
+    adj_factor_list = ADJ_FACTOR_LIST if do_multiple_factors else [1]
+    shm_list, task_list, task_info_list = [], [], []
+    try:
+        for key, df in df_dic.items():
+            # 交易日、交割日相关因子
+            date_df = get_factor(df, trade_date_series=trade_date_series,
+                                 delivery_date_series=delivery_date_series.get(key, None),
+                                 dropna=False, ohlcav_col_name_list=None)
+            numeric_col_name_list = [col_name for col_name, dtype in date_df.dtypes.items() if dtype.kind in 'biuf']
+            dtype_list = [str(date_df[col_name].dtype) for col_name in numeric_col_name_list]
+            input_shape = (date_df.shape[0], len(numeric_col_name_list))
+            shm_input, input_arr = _create_block(input_shape, shm_list)
+            for num, col_name in enumerate(numeric_col_name_list):
+                input_arr[:, num] = date_df[col_name].to_numpy(dtype=np.float64)
+            # 因子列的数量与数据长度无关，以前几行数据计算得到输出列数
+            col_count = add_factor_of_price(
+                date_df[numeric_col_name_list].head(3).copy(), ohlcav_col_name_list=ohlcav_col_name_list,
+                **price_factor_kwargs).shape[1]
+            output_shape = (date_df.shape[0], col_count)
+            for adj_factor in adj_factor_list:
+                shm_output, output_arr = _create_block(output_shape, shm_list)
+                task_list.append((shm_input.name, input_shape, numeric_col_name_list, dtype_list,
+                                  shm_output.name, output_shape, adj_factor, ohlcav_col_name_list,
+                                  price_factor_kwargs))
+                task_info_list.append((key, adj_factor, date_df, numeric_col_name_list, output_arr))
+
+        with Pool(processes=processes) as pool:
+            ret_list = pool.map(_calc_price_factor, task_list, chunksize=1)
+
+        result_dic = {}
+        for (key, adj_factor, date_df, numeric_col_name_list, output_arr), (col_name_list, dtype_list) in zip(
+                task_info_list, ret_list):
+            factor_df = _get_result_df(date_df, numeric_col_name_list, output_arr, col_name_list, dtype_list,
+                                       dropna or drop)
+            if do_multiple_factors:
+                result_dic.setdefault(key, {})[adj_factor] = factor_df
+            else:
+                result_dic[key] = factor_df
+    finally:
+        # 释放共享内存上的 ndarray 后才能 close
+        input_arr = output_arr = task_info_list = None
+        for shm in shm_list:
+            shm.close()
+            shm.unlink()
+
+    logger.debug("%d 个品种 %d 个任务因子计算完成，耗时 %.2f 秒",
+                 len(df_dic), len(task_list), time.time() - datetime_start)
+    return result_dic[None] if is_single else result_dic
+
+
+def _test_get_factor_parallel(processes=None):
+    """对比顺序计算与多进程计算的耗时"""
+    from ibats_common.example.data import load_data
+    df_dic = {}
+    for instrument_type in ['RB', 'RU']:
+        md_df = load_data(f'{instrument_type}.csv').set_index('trade_date').drop('instrument_type', axis=1)
+        md_df.index = pd.DatetimeIndex(md_df.index)
+        df_dic[instrument_type] = md_df
+    datetime_start = time.time()
+    get_factor_parallel(df_dic, do_multiple_factors=True, processes=1)
+    logger.info("顺序计算耗时 %.2f 秒", time.time() - datetime_start)
+    datetime_start = time.time()
+    get_factor_parallel(df_dic, do_multiple_factors=True, processes=processes)
+    logger.info("多进程计算耗时 %.2f 秒", time.time() - datetime_start)
+
+
+if __name__ == "__main__":
+    from ibats_common.config import config
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    _test_get_factor_parallel()
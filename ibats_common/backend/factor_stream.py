@@ -0,0 +1,923 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 1:40
+@File    : factor_stream.py
+@contact : mmmaaaggg@163.com
+@desc    : 增量（流式）计算量价因子
+与 factor.add_factor_of_price 输出相同的列，每个指标保存自身的递推状态，
+每新增一根 bar 只需要 O(因子数量) 的计算量，无需对全部历史数据重新计算。
+各指标的初始化（种子）方式与 talib 保持一致。
+"""
+import bisect
+import logging
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from ibats_common.backend.factor import add_factor_of_price, DEFAULT_OHLCV_COL_NAME_LIST
+
+logger = logging.getLogger(__name__)
+NAN = math.nan
+
+
+def _is_zero(value):
+    """与 talib 的 TA_IS_ZERO 一致"""
+    return -0.00000001 < value < 0.00000001
+
+
+def _true_range(high, low, prev_close):
+    """与 talib 的 TRUE_RANGE 一致"""
+    greatest = high - low
+    val = abs(prev_close - high)
+    if val > greatest:
+        greatest = val
+    val = abs(prev_close - low)
+    if val > greatest:
+        greatest = val
+    return greatest
+
+
+class RollingSum:
+    """固定窗口的滑动求和（同时维护平方和），每 bar O(1)"""
+
+    def __init__(self, period):
+        self.period = period
+        self.buffer = deque(maxlen=period)
+        self.total = 0.0
+        self.total2 = 0.0
+        self.count = 0
+
+    @property
+    def is_ready(self):
+        return len(self.buffer) == self.period
+
+    def update(self, value):
+        if len(self.buffer) == self.period:
+            old = self.buffer[0]
+            self.total -= old
+            self.total2 -= old * old
+        self.buffer.append(value)
+        self.total += value
+        self.total2 += value * value
+        self.count += 1
+        if self.count % (self.period * 64) == 0:
+            # 定期重新求和，防止浮点累计误差
+            self.total = math.fsum(self.buffer)
+            self.total2 = math.fsum(_ * _ for _ in self.buffer)
+
+    def mean(self):
+        return self.total / self.period if self.is_ready else NAN
+
+    def std(self, ddof=1):
+        if not self.is_ready:
+            return NAN
+        n = self.period
+        var = (self.total2 - self.total * self.total / n) / (n - ddof)
+        return math.sqrt(var) if var > 0 else 0.0
+
+
+class RollingMean:
+    """与 pd.Series.rolling(n).mean() 一致，存在 nan 时返回 nan"""
+
+    def __init__(self, period):
+        self.rolling_sum = RollingSum(period)
+        self.nan_buffer = deque(maxlen=period)
+
+    def update(self, value):
+        is_nan = value != value
+        self.nan_buffer.append(is_nan)
+        self.rolling_sum.update(0.0 if is_nan else value)
+        return self.value
+
+    @property
+    def value(self):
+        return NAN if any(self.nan_buffer) else self.rolling_sum.mean()
+
+    def std(self):
+        return NAN if any(self.nan_buffer) else self.rolling_sum.std()
+
+
+class ExpandingMeanStd:
+    """Welford 算法计算 expanding(min_periods).mean()/std()"""
+
+    def __init__(self, min_periods):
+        self.min_periods = min_periods
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.count < self.min_periods:
+            return NAN, NAN
+        return self.mean, math.sqrt(self.m2 / (self.count - 1))
+
+
+class EMA:
+    """
+    talib.EMA：以前 period 个值的简单均值作为种子
+    :param skip: 忽略最开始的 skip 个值（talib.MACD 中快线的种子与慢线对齐）
+    """
+
+    def __init__(self, period, k=None, skip=0):
+        self.period = period
+        self.k = 2.0 / (period + 1) if k is None else k
+        self.skip = skip
+        self.seed_sum = 0.0
+        self.count = 0
+        self.value = NAN
+
+    def update(self, value):
+        self.count += 1
+        if self.count <= self.skip:
+            return NAN
+        if self.count < self.skip + self.period:
+            self.seed_sum += value
+            return NAN
+        if self.count == self.skip + self.period:
+            self.value = (self.seed_sum + value) / self.period
+        else:
+            self.value = (value - self.value) * self.k + self.value
+        return self.value
+
+
+class DEMA:
+    """talib.DEMA / TEMA：对 EMA 的输出再次进行 EMA"""
+
+    def __init__(self, period, order=2):
+        self.ema_list = [EMA(period) for _ in range(order)]
+
+    def update(self, value):
+        ema_value_list = []
+        for ema in self.ema_list:
+            value = ema.update(value)
+            if value != value:
+                return NAN
+            ema_value_list.append(value)
+        if len(ema_value_list) == 2:
+            return 2 * ema_value_list[0] - ema_value_list[1]
+        else:
+            return 3 * ema_value_list[0] - 3 * ema_value_list[1] + ema_value_list[2]
+
+
+class KAMA:
+    """talib.KAMA 考夫曼自适应均线"""
+    CONST_MAX = 2.0 / (30.0 + 1.0)
+    CONST_DIFF = 2.0 / (2.0 + 1.0) - CONST_MAX
+
+    def __init__(self, period):
+        self.period = period
+        self.buffer = deque(maxlen=period + 1)
+        self.sum_roc1 = 0.0
+        self.value = NAN
+
+    def update(self, value):
+        buffer = self.buffer
+        if len(buffer) > 0:
+            self.sum_roc1 += abs(value - buffer[-1])
+        if len(buffer) == self.period + 1:
+            self.sum_roc1 -= abs(buffer[0] - buffer[1])
+        buffer.append(value)
+        if len(buffer) < self.period + 1:
+            return NAN
+        if self.value != self.value:
+            # 种子
+            self.value = buffer[-2]
+        period_roc = value - buffer[0]
+        if self.sum_roc1 <= period_roc or _is_zero(self.sum_roc1):
+            tmp = 1.0
+        else:
+            tmp = abs(period_roc / self.sum_roc1)
+        tmp = tmp * self.CONST_DIFF + self.CONST_MAX
+        tmp *= tmp
+        self.value = (value - self.value) * tmp + self.value
+        return self.value
+
+
+class MACD:
+    """talib.MACD"""
+
+    def __init__(self, fast_period=12, slow_period=24, signal_period=9):
+        self.fast_ema = EMA(fast_period, skip=slow_period - fast_period)
+        self.slow_ema = EMA(slow_period)
+        self.signal_ema = EMA(signal_period)
+
+    def update(self, value):
+        fast, slow = self.fast_ema.update(value), self.slow_ema.update(value)
+        if slow != slow:
+            return NAN, NAN, NAN
+        macd = fast - slow
+        signal = self.signal_ema.update(macd)
+        if signal != signal:
+            return NAN, NAN, NAN
+        return macd, signal, macd - signal
+
+
+class WilderGainLoss:
+    """talib.RSI / CMO 的涨跌幅 Wilder 平滑"""
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_value = NAN
+        self.prev_gain = 0.0
+        self.prev_loss = 0.0
+        self.count = 0
+
+    def update(self, value):
+        """:return: 是否已经可以输出"""
+        self.count += 1
+        prev_value, self.prev_value = self.prev_value, value
+        if self.count == 1:
+            return False
+        diff = value - prev_value
+        n = self.period
+        if self.count <= n + 1:
+            if diff < 0:
+                self.prev_loss -= diff
+            else:
+                self.prev_gain += diff
+            if self.count == n + 1:
+                self.prev_loss /= n
+                self.prev_gain /= n
+                return True
+            return False
+        self.prev_loss *= (n - 1)
+        self.prev_gain *= (n - 1)
+        if diff < 0:
+            self.prev_loss -= diff
+        else:
+            self.prev_gain += diff
+        self.prev_loss /= n
+        self.prev_gain /= n
+        return True
+
+    def rsi(self):
+        total = self.prev_gain + self.prev_loss
+        return 0.0 if _is_zero(total) else 100 * (self.prev_gain / total)
+
+    def cmo(self):
+        total = self.prev_gain + self.prev_loss
+        return 0.0 if _is_zero(total) else 100 * ((self.prev_gain - self.prev_loss) / total)
+
+
+class ATR:
+    """talib.ATR / NATR，输入为 TRANGE"""
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.value = NAN
+        self.seed_sum = 0.0
+
+    def update(self, true_range):
+        self.count += 1
+        if self.count < self.period:
+            self.seed_sum += true_range
+            return NAN
+        if self.count == self.period:
+            self.value = (self.seed_sum + true_range) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + true_range) / self.period
+        return self.value
+
+
+class DirectionalMovement:
+    """
+    talib.PLUS_DM/MINUS_DM/PLUS_DI/MINUS_DI/DX/ADX/ADXR 共用的状态
+    前 n - 1 个 diff 累加作为种子，之后按 Wilder 方式平滑
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.prev_high, self.prev_low, self.prev_close = NAN, NAN, NAN
+        self.plus_dm, self.minus_dm, self.tr = 0.0, 0.0, 0.0
+        self.dx = 0.0
+        self.sum_dx = 0.0
+        self.adx = NAN
+        self.adx_buffer = deque(maxlen=period)
+
+    def update(self, high, low, close):
+        """
+        :return: plus_dm, minus_dm, plus_di, minus_di, dx, adx, adxr
+        """
+        # bar 序号，从 0 开始
+        today = self.count
+        self.count += 1
+        n = self.period
+        if today == 0:
+            self.prev_high, self.prev_low, self.prev_close = high, low, close
+            return (NAN,) * 7
+        diff_p, diff_m = high - self.prev_high, self.prev_low - low
+        true_range = _true_range(high, low, self.prev_close)
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        plus_dm = diff_p if diff_p > 0 and diff_p > diff_m else 0.0
+        minus_dm = diff_m if diff_m > 0 and diff_p < diff_m else 0.0
+        if today < n:
+            self.plus_dm += plus_dm
+            self.minus_dm += minus_dm
+            self.tr += true_range
+        else:
+            self.plus_dm += plus_dm - self.plus_dm / n
+            self.minus_dm += minus_dm - self.minus_dm / n
+            self.tr += true_range - self.tr / n
+        if today < n - 1:
+            return (NAN,) * 7
+        elif today == n - 1:
+            return self.plus_dm, self.minus_dm, NAN, NAN, NAN, NAN, NAN
+
+        # PLUS_DI MINUS_DI DX
+        if _is_zero(self.tr):
+            plus_di, minus_di = 0.0, 0.0
+        else:
+            plus_di = 100 * (self.plus_dm / self.tr)
+            minus_di = 100 * (self.minus_dm / self.tr)
+            total = minus_di + plus_di
+            if not _is_zero(total):
+                dx = 100 * (abs(minus_di - plus_di) / total)
+                self.dx = dx
+                # ADX
+                if today < 2 * n:
+                    self.sum_dx += dx
+                else:
+                    self.adx = (self.adx * (n - 1) + dx) / n
+        if today == 2 * n - 1:
+            self.adx = self.sum_dx / n
+
+        adx, adxr = self.adx, NAN
+        if adx == adx:
+            self.adx_buffer.append(adx)
+            if len(self.adx_buffer) == n:
+                adxr = (adx + self.adx_buffer[0]) / 2
+        return self.plus_dm, self.minus_dm, plus_di, minus_di, self.dx, adx, adxr
+
+
+class ADOSC:
+    """talib.AD / ADOSC"""
+
+    def __init__(self, fast_period=3, slow_period=10):
+        self.fast_k = 2.0 / (fast_period + 1)
+        self.slow_k = 2.0 / (slow_period + 1)
+        self.lookback = slow_period - 1
+        self.ad = 0.0
+        self.fast_ema, self.slow_ema = NAN, NAN
+        self.count = 0
+
+    def update(self, high, low, close, volume):
+        """:return: ad, adosc"""
+        tmp = high - low
+        if tmp > 0.0:
+            self.ad += (((close - low) - (high - close)) / tmp) * volume
+        self.count += 1
+        if self.count == 1:
+            self.fast_ema, self.slow_ema = self.ad, self.ad
+        else:
+            self.fast_ema = self.fast_k * self.ad + (1 - self.fast_k) * self.fast_ema
+            self.slow_ema = self.slow_k * self.ad + (1 - self.slow_k) * self.slow_ema
+        adosc = self.fast_ema - self.slow_ema if self.count > self.lookback else NAN
+        return self.ad, adosc
+
+
+class MonotonicExtreme:
+    """单调队列维护窗口内的最大（最小）值及其位置，相同取值时保留最新的位置"""
+
+    def __init__(self, period, is_max=True):
+        self.period = period
+        self.is_max = is_max
+        self.queue = deque()
+
+    def update(self, idx, value):
+        queue = self.queue
+        if self.is_max:
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] >= value:
+                queue.pop()
+        queue.append((idx, value))
+        while queue[0][0] <= idx - self.period:
+            queue.popleft()
+        return queue[0]
+
+
+class SAR:
+    """talib.SAR 抛物线转向"""
+
+    def __init__(self, acceleration=0.02, maximum=0.2):
+        if acceleration > maximum:
+            acceleration = maximum
+        self.acceleration = acceleration
+        self.maximum = maximum
+        self.af = acceleration
+        self.count = 0
+        self.is_long = True
+        self.ep, self.sar = NAN, NAN
+        self.new_high, self.new_low = NAN, NAN
+
+    def update(self, high, low):
+        self.count += 1
+        if self.count == 1:
+            self.new_high, self.new_low = high, low
+            return NAN
+        if self.count == 2:
+            # 根据 MINUS_DM(1) 判断初始方向
+            diff_p, diff_m = high - self.new_high, self.new_low - low
+            self.is_long = not (diff_m > 0 and diff_p < diff_m)
+            if self.is_long:
+                self.ep, self.sar = high, self.new_low
+            else:
+                self.ep, self.sar = low, self.new_high
+            self.new_high, self.new_low = high, low
+
+        prev_low, prev_high = self.new_low, self.new_high
+        new_low, new_high = self.new_low, self.new_high = low, high
+        sar, ep, af = self.sar, self.ep, self.af
+        if self.is_long:
+            if new_low <= sar:
+                # 转为空头
+                self.is_long = False
+                sar = max(ep, prev_high, new_high)
+                output = sar
+                af = self.acceleration
+                ep = new_low
+                sar = max(sar + af * (ep - sar), prev_high, new_high)
+            else:
+                output = sar
+                if new_high > ep:
+                    ep = new_high
+                    af = min(af + self.acceleration, self.maximum)
+                sar = min(sar + af * (ep - sar), prev_low, new_low)
+        else:
+            if new_high >= sar:
+                # 转为多头
+                self.is_long = True
+                sar = min(ep, prev_low, new_low)
+                output = sar
+                af = self.acceleration
+                ep = new_high
+                sar = min(sar + af * (ep - sar), prev_low, new_low)
+            else:
+                output = sar
+                if new_low < ep:
+                    ep = new_low
+                    af = min(af + self.acceleration, self.maximum)
+                sar = max(sar + af * (ep - sar), prev_high, new_high)
+        self.sar, self.ep, self.af = sar, ep, af
+        return output
+
+
+class SortedBucketList:
+    """
+    分桶有序列表，用于 index_pct 的顺序统计：
+    插入 O(sqrt(N))，查询小于 x 的元素数量 O(sqrt(N))，避免 bisect.insort 在大列表上的整体搬移
+    """
+    BUCKET_SIZE = 1024
+
+    def __init__(self):
+        self.bucket_list = [[]]
+        self.max_list = [math.inf]
+        self.len_list = [0]
+
+    def add(self, value):
+        """插入 value 并返回小于 value 的元素数量"""
+        num = bisect.bisect_left(self.max_list, value)
+        if num == len(self.bucket_list):
+            num -= 1
+        bucket = self.bucket_list[num]
+        pos = bisect.bisect_left(bucket, value)
+        bucket.insert(pos, value)
+        self.len_list[num] += 1
+        if num < len(self.bucket_list) - 1:
+            self.max_list[num] = bucket[-1]
+        rank = sum(self.len_list[:num]) + pos
+        if len(bucket) > self.BUCKET_SIZE * 2:
+            half = len(bucket) // 2
+            self.bucket_list[num:num + 1] = [bucket[:half], bucket[half:]]
+            self.max_list.insert(num, bucket[half - 1])
+            self.len_list[num:num + 1] = [half, len(bucket) - half]
+        return rank
+
+    def remove(self, value):
+        """删除一个 value（value 必须已经存在）"""
+        num = bisect.bisect_left(self.max_list, value)
+        bucket = self.bucket_list[num]
+        del bucket[bisect.bisect_left(bucket, value)]
+        self.len_list[num] -= 1
+        if len(bucket) == 0 and len(self.bucket_list) > 1:
+            del self.bucket_list[num], self.len_list[num]
+            if num < len(self.max_list) - 1:
+                del self.max_list[num]
+            else:
+                # 删除的是最后一个分桶，新的最后一个分桶上限为 inf
+                del self.max_list[num - 1]
+        elif num < len(self.bucket_list) - 1:
+            self.max_list[num] = bucket[-1]
+
+
+class PctChange:
+    """
+    pct_change 或 diff(1)，pct_change 产生的 inf 以历史最小（大）值替代
+    同时记录原序列的标准差（Welford 算法），用于判断 pct_change 的方式是否与 add_factor_of_price 仍然一致
+    """
+
+    def __init__(self, is_pct, min_value=math.inf, max_value=-math.inf):
+        self.is_pct = is_pct
+        self.prev_value = NAN
+        self.min_value = min_value
+        self.max_value = max_value
+        self.has_inf = False
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        if value == value:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        prev_value, self.prev_value = self.prev_value, value
+        if not self.is_pct:
+            return value - prev_value
+        if prev_value == 0:
+            if value == 0 or value != value:
+                return NAN
+            self.has_inf = True
+            return self.max_value if value > 0 else self.min_value
+        result = value / prev_value - 1
+        if result == result:
+            if result < self.min_value:
+                self.min_value = result
+            if result > self.max_value:
+                self.max_value = result
+        return result
+
+    def is_consistent(self):
+        """
+        add_factor_of_price 根据全部数据的标准差决定 pct_change 或 diff(1)，inf 以全部数据的最小（大）值替代，
+        标准差跨越阈值或者出现 inf 时，增量计算结果与重新计算全部数据的结果不再一致
+        """
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else NAN
+        return not self.has_inf and self.is_pct == (not std < 100)
+
+
+class PriceFactorStream:
+    """
+    增量计算 add_factor_of_price 中的全部因子
+    使用方法：
+        factor_stream = PriceFactorStream()
+        factor_df = factor_stream.warm_up(md_df)  # 历史数据，返回值与 add_factor_of_price 相同
+        factor_s = factor_stream.update(bar_s)  # 每个新 bar 只更新各个指标的状态
+    各因子是否进行 pct_change 或 diff(1) 由 warm_up 的历史数据决定（与 add_factor_of_price 的判断规则一致）
+    """
+
+    def __init__(self, ohlcav_col_name_list=DEFAULT_OHLCV_COL_NAME_LIST, log_av=True,
+                 add_pct_change_columns=True, with_diff_n=True, index_pct_window=None):
+        self.ohlcav_col_name_list = ohlcav_col_name_list
+        self.log_av = log_av
+        self.add_pct_change_columns = add_pct_change_columns
+        self.with_diff_n = with_diff_n
+        self.index_pct_window = index_pct_window
+        self.columns = None
+        self.pct_change_dic = {}
+        self.last_index = None
+        # 各个指标的状态
+        self.close_buffer = deque(maxlen=21)
+        self.volume_buffer = deque(maxlen=21)
+        self.prev_close = NAN
+        self.ma_dic = {n: RollingMean(n) for n in [5, 10, 15, 20, 30, 60, 120]}
+        self.volatility_all = ExpandingMeanStd(5)
+        self.rr_std_dic = {n: RollingMean(n) for n in [5, 10, 20, 30, 60]}
+        self.adosc = ADOSC(3, 10)
+        self.dm = DirectionalMovement(14)
+        self.ppo_sma_dic = {n: RollingMean(n) for n in [6, 26]}
+        self.aroon_high = MonotonicExtreme(15, is_max=True)
+        self.aroon_low = MonotonicExtreme(15, is_max=False)
+        self.atr_dic = {n: ATR(n) for n in [6, 14, 21]}
+        self.boll_sum = RollingSum(20)
+        self.cci_buffer = deque(maxlen=5)
+        self.cmo_close = WilderGainLoss(14)
+        self.cmo_open = WilderGainLoss(14)
+        self.dema_dic = {n: DEMA(n, 2) for n in [6, 12, 26]}
+        self.ema_dic = {n: EMA(n) for n in [6, 12, 26, 60]}
+        self.kama_dic = {n: KAMA(n) for n in [5, 10, 20, 30, 60]}
+        self.macd = MACD(12, 24, 9)
+        self.obv = NAN
+        self.rsi_dic = {n: WilderGainLoss(n) for n in [7, 14, 21, 28]}
+        self.sar = SAR(0.02, 0.2)
+        self.tema_dic = {n: DEMA(n, 3) for n in [6, 12, 26]}
+        self.tsf_buffer = deque(maxlen=28)
+        self.ultosc_sum_dic = {n: (RollingSum(n), RollingSum(n)) for n in [7, 14, 28]}
+        self.willr_high = MonotonicExtreme(14, is_max=True)
+        self.willr_low = MonotonicExtreme(14, is_max=False)
+        self.index_pct_list = SortedBucketList()
+        # 仅在 index_pct_window 不为 None 时记录窗口内的数据
+        self.index_pct_buffer = deque()
+        self.index_pct_count = 0
+        self.count = 0
+
+    def warm_up(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        以历史数据初始化各指标的状态
+        :param df: 历史行情数据
+        :return: 与 add_factor_of_price 相同的因子 DataFrame
+        """
+        factor_df = add_factor_of_price(
+            df.copy(), ohlcav_col_name_list=self.ohlcav_col_name_list, log_av=self.log_av,
+            add_pct_change_columns=self.add_pct_change_columns, with_diff_n=self.with_diff_n,
+            index_pct_window=self.index_pct_window)
+        self.columns = list(factor_df.columns)
+        # 各列的 pct_change 方式，以及 inf 的替代值
+        for col_name in self.columns:
+            if col_name.endswith('_diff1') and col_name[:-6] in self.columns:
+                self.pct_change_dic[col_name[:-6]] = (col_name, PctChange(False))
+            elif col_name.endswith('_pct_chg') and col_name[:-8] in self.columns:
+                values = factor_df[col_name]
+                self.pct_change_dic[col_name[:-8]] = (
+                    col_name, PctChange(True, min_value=values.min(), max_value=values.max()))
+
+        for index, row in zip(df.index, df.to_dict('records')):
+            self._update(row)
+            self.last_index = index
+        return factor_df
+
+    def is_consistent(self):
+        """增量计算的结果是否与对全部数据调用 add_factor_of_price 的结果一致"""
+        return all(pct_change.is_consistent() for _, pct_change in self.pct_change_dic.values())
+
+    def update(self, bar) -> pd.Series:
+        """
+        增加一根 bar
+        :param bar: pd.Series，或者 dict（此时没有 name）
+        :return: 因子 Series，与 add_factor_of_price 的一行相同
+        """
+        if self.columns is None:
+            raise ValueError('需要先调用 warm_up 初始化因子的列及 pct_change 的计算方式')
+        name = getattr(bar, 'name', None)
+        values = self._update(dict(bar))
+        self.last_index = name
+        return pd.Series([values.get(_, NAN) for _ in self.columns], index=self.columns, name=name)
+
+    def update_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """依次增加多根 bar"""
+        if self.columns is None:
+            raise ValueError('需要先调用 warm_up 初始化因子的列及 pct_change 的计算方式')
+        data_list = []
+        for index, row in zip(df.index, df.to_dict('records')):
+            values = self._update(row)
+            data_list.append([values.get(_, NAN) for _ in self.columns])
+            self.last_index = index
+        return pd.DataFrame(data_list, index=df.index, columns=self.columns)
+
+    def _update(self, row: dict) -> dict:
+        open_key, high_key, low_key, close_key, amount_key, volume_key = self.ohlcav_col_name_list
+        open_p, high, low, close = row[open_key], row[high_key], row[low_key], row[close_key]
+        amount = row[amount_key] if amount_key is not None else None
+        volume = row[volume_key]
+        self.count += 1
+        values = row.copy()
+        # 平均成交价格
+        if amount is None or volume != volume:
+            values['deal_price'] = (open_p * 2 + high + low + close * 2) / 6
+        else:
+            values['deal_price'] = amount / volume if volume != 0 else (
+                NAN if amount == 0 or amount != amount else math.copysign(math.inf, amount))
+
+        # N 阶价差
+        close_buffer = self.close_buffer
+        close_buffer.append(close)
+        if self.with_diff_n:
+            for n in range(2, 4):
+                values[f'diff{n}'] = close - close_buffer[-1 - n] if len(close_buffer) > n else NAN
+
+        # 均线因子
+        prev_close, self.prev_close = self.prev_close, close
+        rr = close / prev_close - 1
+        values['rr'] = rr
+        for n, ma in self.ma_dic.items():
+            values[f'MA{n}'] = ma_n = ma.update(close)
+            values[f'c-MA{n}'] = (close - ma_n) / close
+            for m in [5, 10, 15, 20, 30, 60]:
+                if m >= n:
+                    continue
+                values[f'MA{m}-MA{n}'] = (values[f'MA{m}'] - ma_n) / close
+
+        # 波动率因子
+        mean, std = self.volatility_all.update(close)
+        values['volatility_all'] = std / mean
+        for n in [10, 20, 30, 60]:
+            ma = self.ma_dic[n]
+            values[f'volatility{n}'] = ma.std() / ma.value
+
+        # 收益率方差
+        for n, rr_std in self.rr_std_dic.items():
+            rr_std.update(rr)
+            values[f'rr_std{n}'] = rr_std.std()
+
+        # AD ADOSC
+        values['AD'], values['ADOSC'] = self.adosc.update(high, low, close, volume)
+
+        # DMI
+        plus_dm, minus_dm, plus_di, minus_di, dx, adx, adxr = self.dm.update(high, low, close)
+        values['ADX'], values['ADXR'] = adx, adxr
+
+        # APO（talib 默认 matype=1 即 EMA）PPO（matype=0 即 SMA）
+        for n, ema in self.ema_dic.items():
+            values[f'EMA{n}'] = ema.update(close)
+        values['APO'] = values['EMA12'] - values['EMA26']
+        for n, sma in self.ppo_sma_dic.items():
+            sma.update(close)
+        fast, slow = self.ppo_sma_dic[6].value, self.ppo_sma_dic[26].value
+        values['PPO'] = NAN if slow != slow else (0.0 if _is_zero(slow) else ((fast - slow) / slow) * 100)
+
+        # AROON
+        count = self.count
+        highest_idx, _ = self.aroon_high.update(count, high)
+        lowest_idx, _ = self.aroon_low.update(count, low)
+        if count > 14:
+            values['AROONDown'] = (100.0 / 14) * (14 - (count - lowest_idx))
+            values['AROONUp'] = (100.0 / 14) * (14 - (count - highest_idx))
+            values['AROONOSC'] = (100.0 / 14) * (highest_idx - lowest_idx)
+        else:
+            values['AROONDown'], values['AROONUp'], values['AROONOSC'] = NAN, NAN, NAN
+
+        # ATR TRANGE NATR
+        true_range = NAN if count == 1 else _true_range(high, low, prev_close)
+        for n, atr in self.atr_dic.items():
+            values[f'ATR{n}'] = NAN if count == 1 else atr.update(true_range)
+        atr = values['ATR14']
+        values['NATR'] = NAN if atr != atr else (0.0 if _is_zero(close) else (atr / close) * 100)
+        values['TRANGE'] = true_range
+
+        # 布林带，与 talib 一致采用总体标准差
+        boll_sum = self.boll_sum
+        boll_sum.update(close)
+        if boll_sum.is_ready:
+            mid = boll_sum.mean()
+            var = boll_sum.total2 / 20 - mid * mid
+            std = math.sqrt(var) if var >= 0.00000001 else 0.0
+            values['Boll_Up'], values['Boll_Mid'], values['Boll_Down'] = mid + 2 * std, mid, mid - 2 * std
+        else:
+            values['Boll_Up'], values['Boll_Mid'], values['Boll_Down'] = NAN, NAN, NAN
+
+        # BOP
+        tmp = high - low
+        values['BOP'] = 0.0 if tmp < 0.00000001 else (close - open_p) / tmp
+
+        # CCI，与 add_factor_of_price 一致，各 CCI 列均为 timeperiod=5
+        typ_price = (high + low + close) / 3
+        self.cci_buffer.append(typ_price)
+        if len(self.cci_buffer) == 5:
+            average = sum(self.cci_buffer) / 5
+            mean_dev = sum(abs(_ - average) for _ in self.cci_buffer)
+            tmp = typ_price - average
+            cci = tmp / (0.015 * (mean_dev / 5)) if tmp != 0 and mean_dev != 0 else 0.0
+        else:
+            cci = NAN
+        for n in [5, 10, 20, 88]:
+            values[f'CCI{n}'] = cci
+
+        # CMO
+        values['CMO_Close'] = self.cmo_close.cmo() if self.cmo_close.update(close) else NAN
+        values['CMO_Open'] = self.cmo_open.cmo() if self.cmo_open.update(open_p) else NAN
+
+        # DEMA KAMA MACD
+        for n, dema in self.dema_dic.items():
+            values[f'DEMA{n}'] = dema.update(close)
+        values['DX'] = dx
+        for n, kama in self.kama_dic.items():
+            values[f'KAMA{n}'] = kama.update(close)
+        values['MACD_DIF'], values['MACD_DEA'], values['MACD_bar'] = self.macd.update(close)
+
+        values['MEDPRICE'] = (high + low) / 2
+        values['MiNUS_DI'], values['MiNUS_DM'] = minus_di, minus_dm
+        values['MOM'] = close - close_buffer[-11] if len(close_buffer) > 10 else NAN
+
+        # OBV
+        if count == 1:
+            self.obv = volume
+        elif close > prev_close:
+            self.obv += volume
+        elif close < prev_close:
+            self.obv -= volume
+        values['OBV'] = self.obv
+        values['PLUS_DI'], values['PLUS_DM'] = plus_di, plus_dm
+
+        # ROC ROCP
+        volume_buffer = self.volume_buffer
+        volume_buffer.append(volume)
+        for n in [6, 20]:
+            if len(close_buffer) > n:
+                prev = close_buffer[-1 - n]
+                values[f'ROC{n}'] = ((close / prev) - 1) * 100 if prev != 0 else 0.0
+                values[f'ROCP{n}'] = (close - prev) / prev if prev != 0 else 0.0
+                prev = volume_buffer[-1 - n]
+                values[f'VROC{n}'] = ((volume / prev) - 1) * 100 if prev != 0 else 0.0
+                values[f'VROCP{n}'] = (volume - prev) / prev if prev != 0 else 0.0
+            else:
+                values[f'ROC{n}'], values[f'ROCP{n}'], values[f'VROC{n}'], values[f'VROCP{n}'] = NAN, NAN, NAN, NAN
+
+        # RSI
+        for n, rsi in self.rsi_dic.items():
+            values[f'RSI{n}'] = rsi.rsi() if rsi.update(close) else NAN
+
+        values['SAR'] = self.sar.update(high, low)
+        for n, tema in self.tema_dic.items():
+            values[f'TEMA{n}'] = tema.update(close)
+        values['TYPPRICE'] = typ_price
+
+        # TSF
+        tsf_buffer = self.tsf_buffer
+        tsf_buffer.append(close)
+        for n in [7, 14, 21, 28]:
+            if len(tsf_buffer) < n:
+                values[f'TSF{n}'] = NAN
+                continue
+            sum_x = n * (n - 1) * 0.5
+            sum_x_sqr = n * (n - 1) * (2 * n - 1) / 6
+            divisor = sum_x * sum_x - n * sum_x_sqr
+            sum_xy, sum_y = 0.0, 0.0
+            for i in range(n - 1, -1, -1):
+                value = tsf_buffer[-1 - i]
+                sum_y += value
+                sum_xy += i * value
+            m = (n * sum_xy - sum_x * sum_y) / divisor
+            b = (sum_y - m * sum_x) / n
+            values[f'TSF{n}'] = b + m * n
+
+        # ULTOSC
+        if count > 1:
+            close_minus_true_low = close - min(low, prev_close)
+            for sum_bp, sum_tr in self.ultosc_sum_dic.values():
+                sum_bp.update(close_minus_true_low)
+                sum_tr.update(true_range)
+        if count > 28:
+            output = 0.0
+            for weight, (sum_bp, sum_tr) in zip([4, 2, 1], self.ultosc_sum_dic.values()):
+                if not _is_zero(sum_tr.total):
+                    output += weight * (sum_bp.total / sum_tr.total)
+            values['ULTOSC'] = 100 * (output / 7)
+        else:
+            values['ULTOSC'] = NAN
+
+        # WILLR
+        _, highest = self.willr_high.update(count, high)
+        _, lowest = self.willr_low.update(count, low)
+        if count >= 14:
+            tmp = (highest - lowest) / -100.0
+            values['WILLR'] = (highest - close) / tmp if tmp != 0 else 0.0
+        else:
+            values['WILLR'] = NAN
+
+        # 价格分位数水平
+        if close == close:
+            if self.index_pct_window is None:
+                self.index_pct_count += 1
+            else:
+                if len(self.index_pct_buffer) >= self.index_pct_window:
+                    self.index_pct_list.remove(self.index_pct_buffer.popleft())
+                self.index_pct_buffer.append(close)
+                self.index_pct_count = len(self.index_pct_buffer)
+            values['index_pct'] = self.index_pct_list.add(close) / self.index_pct_count
+        else:
+            values['index_pct'] = NAN
+
+        # 对 volume amount 取 log
+        if self.log_av:
+            values[volume_key] = math.log((0 if volume != volume else volume) + 1)
+            if amount_key is not None:
+                values[amount_key] = math.log((0 if amount != amount else amount) + 1)
+
+        # pct_change 或 diff(1)
+        for name, (col_name, pct_change) in self.pct_change_dic.items():
+            values[col_name] = pct_change.update(values[name])
+
+        return values
+
+
+def _test_factor_stream():
+    import time
+    from ibats_common.example.data import load_data
+    md_df = load_data('RB.csv').set_index('trade_date').drop('instrument_type', axis=1)
+    md_df.index = pd.DatetimeIndex(md_df.index)
+    warm_up_len = 1000
+    factor_stream = PriceFactorStream()
+    factor_stream.warm_up(md_df.iloc[:warm_up_len])
+    datetime_start = time.time()
+    stream_df = factor_stream.update_df(md_df.iloc[warm_up_len:])
+    logger.info('流式计算 %d 根 bar 耗时 %.3f 秒', stream_df.shape[0], time.time() - datetime_start)
+    factor_df = add_factor_of_price(md_df.copy())
+    factor_df = factor_df.iloc[warm_up_len:][stream_df.columns]
+    logger.info('与 add_factor_of_price 最大绝对误差 %f',
+                np.nanmax(np.abs(factor_df.to_numpy(dtype=float) - stream_df.to_numpy(dtype=float))))
+
+
+if __name__ == "__main__":
+    _test_factor_stream()
@@ -0,0 +1,167 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 6:40
+@File    : idx_allocator.py
+@contact : mmmaaaggg@163.com
+@desc    : OrderDetail、TradeDetail、PosStatusDetail 等以 (stg_run_id, xxx_idx) 为主键的记录 idx 分配服务，
+按 (表名, stg_run_id) 从数据库 idx_block_reserve 表中预留 idx 区间，多线程、多进程以及重启后续跑均不会产生主键冲突
+"""
+import logging
+import threading
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+metadata = MetaData()
+idx_block_reserve_table = Table(
+    'idx_block_reserve', metadata,
+    Column('table_name', String(50), primary_key=True),
+    Column('stg_run_id', Integer, primary_key=True),
+    Column('idx_max', Integer, nullable=False),  # 已预留的最大 idx
+)
+
+
+def get_idx_column(model):
+    """返回 model 主键中除 stg_run_id 以外的 idx 字段"""
+    col_list = [col for col in model.__table__.primary_key.columns if col.name != 'stg_run_id']
+    if len(col_list) != 1:
+        raise ValueError(f'{model.__tablename__} 主键 {[col.name for col in col_list]} 不是 (stg_run_id, idx) 结构')
+    return col_list[0]
+
+
+class IdxAllocator:
+    """
+    idx 分配服务
+    每个 (表名, stg_run_id) 首次分配时以表中已有记录的最大 idx 作为高水位写入 idx_block_reserve，
+    此后每次通过 compare-and-set 方式（UPDATE ... WHERE idx_max = 原值）将 idx_max 增加 block_size，
+    取得 (原值, 原值 + block_size] 区间，区间内的 idx 在本地分配，不再访问数据库。
+    单条 UPDATE 语句是原子的，因此不依赖事务隔离级别，MyISAM 表同样适用。
+    进程退出时未用完的 idx 将被跳过，idx 保证唯一、递增，但不保证连续
+    """
+
+    def __init__(self, engine=None, block_size=None):
+        """
+        :param engine: None 代表使用 engines.engine_ibats
+        :param block_size: 每次预留的 idx 数量，None 代表使用 config.ORM_IDX_BLOCK_SIZE
+        """
+        self._engine = engine
+        self.block_size = config.ORM_IDX_BLOCK_SIZE if block_size is None else block_size
+        if self.block_size <= 0:
+            raise ValueError(f'block_size={self.block_size} 必须大于 0')
+        # (table_name, stg_run_id) -> [下一个可用 idx, 区间最大 idx]
+        self._block_dic = {}
+        self._lock = threading.Lock()
+        self._is_table_checked = False
+        # 统计信息
+        self.reserve_count = 0
+        self.retry_count = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from ibats_common.backend import engines
+            return engines.engine_ibats
+        return self._engine
+
+    def _check_table(self):
+        if not self._is_table_checked:
+            try:
+                idx_block_reserve_table.create(self.engine, checkfirst=True)
+            except SQLAlchemyError:
+                # 其他进程同时建表
+                with self.engine.connect() as conn:
+                    if not self.engine.dialect.has_table(conn, idx_block_reserve_table.name):
+                        raise
+            self._is_table_checked = True
+
+    def next_idx(self, stg_run_id, model) -> int:
+        """
+        分配一个 idx
+        :param stg_run_id:
+        :param model: OrderDetail、TradeDetail 等 ORM 类
+        :return:
+        """
+        key = (model.__tablename__, stg_run_id)
+        with self._lock:
+            block = self._block_dic.get(key, None)
+            if block is None or block[0] > block[1]:
+                block = list(self._reserve(stg_run_id, model, self.block_size))
+                self._block_dic[key] = block
+            idx = block[0]
+            block[0] += 1
+        return idx
+
+    def reserve(self, stg_run_id, model, count) -> range:
+        """
+        直接预留 count 个连续 idx，供批量插入时使用，该区间不会被 next_idx 分配
+        :param stg_run_id:
+        :param model:
+        :param count:
+        :return: idx 区间
+        """
+        if count <= 0:
+            return range(0)
+        with self._lock:
+            idx_from, idx_to = self._reserve(stg_run_id, model, count)
+        return range(idx_from, idx_to + 1)
+
+    def _reserve(self, stg_run_id, model, count):
+        """从数据库预留 count 个 idx，返回 (idx_from, idx_to)"""
+        self._check_table()
+        table = idx_block_reserve_table
+        where_clause = (table.c.table_name == model.__tablename__) & (table.c.stg_run_id == stg_run_id)
+        while True:
+            try:
+                with self.engine.begin() as conn:
+                    idx_max = conn.execute(select([table.c.idx_max]).where(where_clause)).scalar()
+                    if idx_max is None:
+                        # 首次分配，以表中已有记录作为高水位
+                        idx_col = get_idx_column(model)
+                        idx_max = conn.execute(select([func.max(idx_col)]).where(
+                            model.__table__.c.stg_run_id == stg_run_id)).scalar() or 0
+                        conn.execute(table.insert().values(
+                            table_name=model.__tablename__, stg_run_id=stg_run_id, idx_max=idx_max + count))
+                        is_reserved = True
+                    else:
+                        ret = conn.execute(table.update().where(where_clause & (table.c.idx_max == idx_max)).values(
+                            idx_max=idx_max + count))
+                        is_reserved = ret.rowcount == 1
+            except IntegrityError:
+                # 其他进程已经完成首次分配，重试
+                is_reserved = False
+
+            if is_reserved:
+                self.reserve_count += 1
+                logger.debug('%s stg_run_id=%s 预留 idx [%d, %d]',
+                             model.__tablename__, stg_run_id, idx_max + 1, idx_max + count)
+                return idx_max + 1, idx_max + count
+
+            self.retry_count += 1
+
+    def clear(self, stg_run_id=None):
+        """丢弃本地尚未用完的 idx 区间，stg_run_id 为 None 时清除全部"""
+        with self._lock:
+            if stg_run_id is None:
+                self._block_dic.clear()
+            else:
+                for key in [key for key in self._block_dic if key[1] == stg_run_id]:
+                    del self._block_dic[key]
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator() -> IdxAllocator:
+    """返回全局 idx 分配服务"""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = IdxAllocator()
+    return _allocator
@@ -13,6 +13,160 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def to_one_hot(label_arr: np.ndarray, num_classes=3, dtype='float32'):
+    """
+    将 0 1 2 标签转换为 one-hot 编码，与 tensorflow.keras.utils.to_categorical 结果一致
+    :param label_arr:
+    :param num_classes:
+    :param dtype:
+    :return:
+    """
+    return np.eye(num_classes, dtype=dtype)[np.asarray(label_arr).astype(int)]
+
+
+def _calc_label_window(value_arr: np.ndarray, rr_pair_list, pending_mat, label_mat, window_max, window,
+                       chunk_size):
+    """
+    对 pending_mat 中尚未确定标签的时点，每次取 rows × window 的二维矩阵计算未来 window 个时点的收益率，
+    各组参数共用同一个收益率矩阵，window 逐步加倍，直至检测 window_max 个时点
+    """
+    arr_len = value_arr.shape[0]
+    offset = 0
+    while offset < window_max:
+        window = min(window, window_max - offset)
+        row_arr = np.nonzero(pending_mat.any(axis=0))[0]
+        row_arr = row_arr[row_arr + offset + 1 < arr_len]
+        if row_arr.shape[0] == 0:
+            break
+        chunk_rows = max(1, chunk_size // window)
+        for row_from in range(0, row_arr.shape[0], chunk_rows):
+            rows = row_arr[row_from:row_from + chunk_rows]
+            idx_mat = rows[:, None] + (offset + 1) + np.arange(window)
+            is_valid_mat = idx_mat < arr_len
+            rr_mat = value_arr[np.minimum(idx_mat, arr_len - 1)] / value_arr[rows][:, None] - 1
+            for num, (min_rr, max_rr) in enumerate(rr_pair_list):
+                is_pending = pending_mat[num, rows]
+                if not is_pending.any():
+                    continue
+                rows_pending = rows[is_pending]
+                is_low_mat = (rr_mat[is_pending] < min_rr) & is_valid_mat[is_pending]
+                is_hit_mat = is_low_mat | ((rr_mat[is_pending] > max_rr) & is_valid_mat[is_pending])
+                first_idx_arr = is_hit_mat.argmax(axis=1)
+                row_idx_arr = np.arange(rows_pending.shape[0])
+                is_hit = is_hit_mat[row_idx_arr, first_idx_arr]
+                rows_hit = rows_pending[is_hit]
+                # 同一时点同时满足两个条件时，优先标记为 1，与逐点循环一致
+                label_mat[num, rows_hit] = np.where(is_low_mat[row_idx_arr, first_idx_arr][is_hit], 1, 2)
+                pending_mat[num, rows_hit] = False
+
+        offset += window
+        window *= 2
+
+
+def build_sparse_table(value_arr: np.ndarray, max_length=None):
+    """
+    min_table[k][p]、max_table[k][p] 分别为 value_arr[p:p + 2^k] 的最小、最大值
+    :param value_arr: 沿 axis=0 计算，支持多列
+    :param max_length: 需要查询的最大区间长度，仅构建 2^k <= max_length 的部分，None 为全部长度
+    """
+    max_length = value_arr.shape[0] if max_length is None else min(max_length, value_arr.shape[0])
+    min_table, max_table = [value_arr], [value_arr]
+    step = 1
+    while step * 2 <= max_length:
+        min_table.append(np.minimum(min_table[-1][:-step], min_table[-1][step:]))
+        max_table.append(np.maximum(max_table[-1][:-step], max_table[-1][step:]))
+        step *= 2
+    return min_table, max_table
+
+
+def _calc_label_sparse(value_arr: np.ndarray, rr_pair_list, rows, label_mat, min_table, max_table):
+    """
+    不限制 max_future 时，基数 base 为非零有限值的时点，value / base - 1 随 value 单调变化，
+    因此某一区间内是否存在突破，可以由区间最小、最大值直接判断。
+    通过 sparse table 中各长度 2^k 区间的最小、最大值，二分跳跃查找首个突破点，复杂度 O(N log N)
+    """
+    arr_len = value_arr.shape[0]
+    base_arr = value_arr[rows][:, None]
+    is_positive = base_arr > 0
+    min_rr_arr = [min_rr for min_rr, _ in rr_pair_list]
+    max_rr_arr = [max_rr for _, max_rr in rr_pair_list]
+    # 各组参数首个突破下届、上届的位置，arr_len 代表未突破
+    low_pos_mat = np.repeat(rows[:, None] + 1, len(rr_pair_list), axis=1)
+    high_pos_mat = low_pos_mat.copy()
+    for k in range(len(min_table) - 1, -1, -1):
+        step = 2 ** k
+        table_len = min_table[k].shape[0]
+        for pos_mat, is_low in ((low_pos_mat, True), (high_pos_mat, False)):
+            idx_mat = np.minimum(pos_mat, table_len - 1)
+            min_rr_mat = min_table[k][idx_mat] / base_arr - 1
+            max_rr_mat = max_table[k][idx_mat] / base_arr - 1
+            can_jump_mat = pos_mat + step <= arr_len
+            for num in range(len(rr_pair_list)):
+                if is_low:
+                    rr_low_arr = np.where(is_positive[:, 0], min_rr_mat[:, num], max_rr_mat[:, num])
+                    is_hit = rr_low_arr < min_rr_arr[num]
+                else:
+                    rr_high_arr = np.where(is_positive[:, 0], max_rr_mat[:, num], min_rr_mat[:, num])
+                    is_hit = rr_high_arr > max_rr_arr[num]
+                # 区间 [pos, pos + step) 内没有突破则跳过该区间
+                pos_mat[:, num] += np.where(can_jump_mat[:, num] & ~is_hit, step, 0)
+
+    for num, (min_rr, max_rr) in enumerate(rr_pair_list):
+        low_pos_arr, high_pos_arr = low_pos_mat[:, num], high_pos_mat[:, num]
+        rr_low_arr = value_arr[np.minimum(low_pos_arr, arr_len - 1)] / base_arr[:, 0] - 1
+        rr_high_arr = value_arr[np.minimum(high_pos_arr, arr_len - 1)] / base_arr[:, 0] - 1
+        low_pos_arr = np.where((low_pos_arr < arr_len) & (rr_low_arr < min_rr), low_pos_arr, arr_len)
+        high_pos_arr = np.where((high_pos_arr < arr_len) & (rr_high_arr > max_rr), high_pos_arr, arr_len)
+        # 同一时点同时满足两个条件时，优先标记为 1，与逐点循环一致
+        label_mat[num, rows] = np.where(
+            low_pos_arr < arr_len, np.where(low_pos_arr <= high_pos_arr, 1, 2),
+            np.where(high_pos_arr < arr_len, 2, 0))
+
+
+def _calc_label_mat(value_arr: np.ndarray, rr_pair_list, max_future=None, chunk_size=None) -> np.ndarray:
+    """
+    计算每一组 (min_rr, max_rr) 下每一个时点首先突破的边界：0 未突破，1 首先突破下届，2 首先突破上届
+    与逐点循环 value_arr[j] / value_arr[i] - 1 的计算方式完全一致
+    max_future 不为空时，通过 rows × max_future 的二维矩阵一次计算
+    max_future 为空时，基数为非零有限值的时点通过 sparse table 查找，其余时点通过逐步加倍的 window 计算
+    :param value_arr: 已将 nan 替换为 0 的数组
+    :param rr_pair_list: [(min_rr, max_rr), ...]
+    :param max_future: 最多向后检测多少个时点，None 代表不限制
+    :param chunk_size: 每次计算的收益率矩阵最大元素数量，控制内存占用
+    :return: shape (len(rr_pair_list), len(value_arr)) 的 int8 数组
+    """
+    chunk_size = 2 ** 22 if chunk_size is None else chunk_size
+    arr_len = value_arr.shape[0]
+    pair_count = len(rr_pair_list)
+    label_mat = np.zeros((pair_count, arr_len), dtype=np.int8)
+    if arr_len < 2:
+        return label_mat
+    # 尚未确定标签的时点，最后一个时点没有未来数据
+    pending_mat = np.ones((pair_count, arr_len), dtype=bool)
+    pending_mat[:, -1] = False
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        if max_future is None:
+            is_monotonic = np.isfinite(value_arr) & (value_arr != 0)
+            is_monotonic[-1] = False
+            rows = np.nonzero(is_monotonic)[0]
+            if rows.shape[0] > 0:
+                min_table, max_table = build_sparse_table(value_arr)
+                chunk_rows = max(1, chunk_size // 64)
+                for row_from in range(0, rows.shape[0], chunk_rows):
+                    _calc_label_sparse(value_arr, rr_pair_list, rows[row_from:row_from + chunk_rows], label_mat,
+                                       min_table, max_table)
+            pending_mat[:, is_monotonic] = False
+            _calc_label_window(value_arr, rr_pair_list, pending_mat, label_mat, window_max=arr_len - 1,
+                               window=min(64, arr_len - 1), chunk_size=chunk_size)
+        else:
+            # j - i >= max_future 时停止检测，但至少检测下一个时点
+            window_max = max(int(np.ceil(max_future)), 1)
+            _calc_label_window(value_arr, rr_pair_list, pending_mat, label_mat, window_max=window_max,
+                               window=window_max, chunk_size=chunk_size)
+
+    return label_mat
+
+
 def calc_label2(value_arr: np.ndarray, min_rr: float, max_rr: float, one_hot=True, dtype='float32'):
     """
     根据时间序列数据 pct_arr 计算每一个时点目标标示 0 1 2
@@ -26,24 +180,10 @@ def calc_label2(value_arr: np.ndarray, min_rr: float, max_rr: float, one_hot=Tru
     :param dtype:
     :return:
     """
-    from tensorflow.keras.utils import to_categorical
     value_arr[np.isnan(value_arr)] = 0
-    arr_len = value_arr.shape[0]
-    # target_arr = np.zeros((arr_len, 2))
-    label_arr = np.zeros(arr_len, dtype=dtype)
-    for i in range(arr_len):
-        base = value_arr[i]
-        for j in range(i + 1, arr_len):
-            result = value_arr[j] / base - 1
-            if result < min_rr:
-                label_arr[i] = 1
-                break
-            elif result > max_rr:
-                label_arr[i] = 2
-                break
+    label_arr = _calc_label_mat(value_arr, [(min_rr, max_rr)])[0].astype(dtype)
     if one_hot:
-        # target_arr = pd.get_dummies(label_arr)
-        target_arr = to_categorical(label_arr, num_classes=3, dtype=dtype)
+        target_arr = to_one_hot(label_arr, num_classes=3, dtype=dtype)
     else:
         target_arr = label_arr
 
@@ -86,38 +226,42 @@ def calc_label3(value_arr: np.ndarray, min_rr: float, max_rr: float, max_future:
     :param dtype:
     :return:
     """
-    from tensorflow.keras.utils import to_categorical
     value_arr[np.isnan(value_arr)] = 0
     arr_len = value_arr.shape[0]
-    # target_arr = np.zeros((arr_len, 2))
-    label_arr = np.zeros(arr_len, dtype=dtype)
-    for i in range(arr_len):
-        base = value_arr[i]
-        for j in range(i + 1, arr_len):
-            result = value_arr[j] / base - 1
-            if result < min_rr:
-                label_arr[i] = 1
-                break
-            elif result > max_rr:
-                label_arr[i] = 2
-                break
-            elif max_future is not None and j-i >= max_future:
-                # 超过最大检测日期，则被认为是震荡势
-                # label_arr[i] = 0
-        # target_arr = pd.get_dummies(label_arr)
-                break
+    label_arr = _calc_label_mat(value_arr, [(min_rr, max_rr)], max_future=max_future)[0].astype(dtype)
     if all(label_arr == 0):
         logger.warning("当期数组长度 %d, min_rr=%f, max_rr=%f, max_future=%f， 标记结果全部为0",
                        arr_len, min_rr, max_rr, max_future)
 
     if one_hot:
-        target_arr = to_categorical(label_arr, num_classes=3, dtype=dtype)
+        target_arr = to_one_hot(label_arr, num_classes=3, dtype=dtype)
     else:
         target_arr = label_arr
 
     return target_arr
 
 
+def calc_label_batch(value_arr: np.ndarray, rr_pair_list, max_future=None, one_hot=False, dtype='float32') -> dict:
+    """
+    一次计算多组 (min_rr, max_rr) 的标签，各组参数共用同一个收益率矩阵
+    max_future 为空时结果与 calc_label2 一致，否则与 calc_label3 一致
+    :param value_arr: 不会被修改
+    :param rr_pair_list: [(min_rr, max_rr), ...]
+    :param max_future:
+    :param one_hot:
+    :param dtype:
+    :return: {(min_rr, max_rr): target_arr}
+    """
+    value_arr = np.array(value_arr)
+    value_arr[np.isnan(value_arr)] = 0
+    rr_pair_list = list(rr_pair_list)
+    label_mat = _calc_label_mat(value_arr, rr_pair_list, max_future=max_future).astype(dtype)
+    ret_dic = {}
+    for (min_rr, max_rr), label_arr in zip(rr_pair_list, label_mat):
+        ret_dic[(min_rr, max_rr)] = to_one_hot(label_arr, num_classes=3, dtype=dtype) if one_hot else label_arr
+    return ret_dic
+
+
 def _test_calc_label3(show_plt=True):
     import matplotlib.pyplot as plt
     i_s = np.arange(0, 20, 0.1)
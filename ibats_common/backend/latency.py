@@ -0,0 +1,252 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 8:00
+@File    : latency.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情事件处理延迟统计
+每一条行情从到达（md_agent.pull 返回或回测推送）开始作为一个事件，
+事件处理过程中各阶段通过 checkpoint(stage) 记录单调时间戳，阶段耗时（距上一 checkpoint）记入对应阶段的 HDR 风格直方图，
+config.LATENCY_TRACE 为 False 时不创建 LatencyTracer，checkpoint 仅做一次全局变量判断
+"""
+import logging
+import math
+import threading
+import time
+
+import pandas as pd
+
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+# 每个 2 的幂区间划分为 2 ** (SUB_BUCKET_BITS - 1) 个子区间，相对误差小于 1 / 2 ** (SUB_BUCKET_BITS - 1)
+SUB_BUCKET_BITS = 7
+# 阶段名称
+STAGE_DISPATCH = 'dispatch'  # 行情到达 -> 策略 on_period_md_handler 开始处理
+STAGE_MD_DF = 'md_df'  # 构建 md_df
+STAGE_ORDER = 'order'  # 策略计算 -> 订单记录完成
+STAGE_DB_COMMIT = 'db_commit'  # 记录保存至数据库（或放入异步写入队列）
+STAGE_CALLBACK = 'callback'  # 策略回调函数剩余部分
+STAGE_TOTAL = 'total'  # 行情到达 -> 事件处理完成
+# 创建过 LatencyTracer 后才需要检查当前事件，未启用时 checkpoint 仅做一次全局变量判断
+_is_enabled = False
+
+
+class _EventLocal(threading.local):
+    event = None
+
+
+_local = _EventLocal()
+
+
+class LatencyHistogram:
+    """
+    HDR 风格的延迟直方图（单位：纳秒）
+    数值小于 2 ** SUB_BUCKET_BITS 时精确记录，更大的数值按 2 的幂分段，每段再线性划分子区间，
+    因此任意量级的数值均保持相同的相对精度，记录仅需一次整数运算及列表计数
+    """
+
+    def __init__(self, max_value_bits=48):
+        """
+        :param max_value_bits: 可记录的最大值为 2 ** max_value_bits 纳秒（约 3 天），超出部分记入最后一个桶
+        """
+        self.max_index = self.get_index((1 << max_value_bits) - 1)
+        self.count_list = [0] * (self.max_index + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def get_index(value) -> int:
+        exponent = value.bit_length() - SUB_BUCKET_BITS
+        if exponent <= 0:
+            return value
+        return (exponent << (SUB_BUCKET_BITS - 1)) + (value >> exponent)
+
+    @staticmethod
+    def get_value_range(index) -> (int, int):
+        """返回 index 对应桶的 [最小值, 最大值]"""
+        if index < (1 << SUB_BUCKET_BITS):
+            return index, index
+        exponent = (index >> (SUB_BUCKET_BITS - 1)) - 1
+        sub_index = index - (exponent << (SUB_BUCKET_BITS - 1))
+        return sub_index << exponent, ((sub_index + 1) << exponent) - 1
+
+    def record(self, value):
+        """
+        记录一个数值
+        :param value: 纳秒，负数按 0 处理
+        :return:
+        """
+        if value < 0:
+            value = 0
+        index = self.get_index(value)
+        if index > self.max_index:
+            index = self.max_index
+        self.count_list[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.count_list):
+            if count > 0:
+                self.count_list[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def get_value_at_percentile(self, percentile) -> int:
+        """
+        返回分位数对应的数值（所在桶的最大值，不超过实际最大值）
+        :param percentile: 0 ~ 100
+        :return:
+        """
+        if self.count == 0:
+            return 0
+        count_target = max(math.ceil(self.count * percentile / 100), 1)
+        count_cum = 0
+        for index, count in enumerate(self.count_list):
+            count_cum += count
+            if count_cum >= count_target:
+                return min(self.get_value_range(index)[1], self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def to_dict(self, percentile_list=(50, 90, 99, 99.9)) -> dict:
+        """统计结果，单位：微秒"""
+        ret_dic = {
+            'count': self.count,
+            'mean_us': self.mean / 1000,
+            'min_us': (self.min or 0) / 1000,
+        }
+        for percentile in percentile_list:
+            ret_dic[f'p{percentile:g}_us'] = self.get_value_at_percentile(percentile) / 1000
+        ret_dic['max_us'] = (self.max or 0) / 1000
+        return ret_dic
+
+
+class MdEvent:
+    """一条行情的处理过程，记录各阶段的单调时间戳（time.perf_counter_ns）"""
+    __slots__ = ('tracer', 'arrival_ns', 'last_ns', 'timestamp_list')
+
+    def __init__(self, tracer, arrival_ns):
+        self.tracer = tracer
+        self.arrival_ns = self.last_ns = arrival_ns
+        self.timestamp_list = []
+
+    def checkpoint(self, stage):
+        now_ns = time.perf_counter_ns()
+        self.tracer.record(stage, now_ns - self.last_ns)
+        self.last_ns = now_ns
+        self.timestamp_list.append((stage, now_ns))
+
+
+class LatencyTracer:
+    """
+    单个策略的延迟统计
+    begin 开始一个行情事件并设置为当前线程的当前事件，各模块通过 checkpoint(stage) 记录阶段耗时，end 结束事件并记录总耗时，
+    距上一次输出超过 dump_interval 秒时输出一次统计日志
+    """
+
+    def __init__(self, name, dump_interval=None):
+        """
+        :param name: 名称，通常为 stg_run_id
+        :param dump_interval: 定期输出统计日志的间隔（秒），None 代表使用 config.LATENCY_TRACE_DUMP_INTERVAL，0 代表不输出
+        """
+        global _is_enabled
+        _is_enabled = True
+        self.name = name
+        self.dump_interval = config.LATENCY_TRACE_DUMP_INTERVAL if dump_interval is None else dump_interval
+        self.stage_histogram_dic = {}
+        self.last_event = None
+        self._lock = threading.Lock()
+        self._dump_time = time.monotonic()
+
+    def begin(self, arrival_ns=None) -> MdEvent:
+        """
+        开始一个行情事件
+        :param arrival_ns: 行情到达时间 time.perf_counter_ns()，None 代表当前时间
+        :return:
+        """
+        event = MdEvent(self, time.perf_counter_ns() if arrival_ns is None else arrival_ns)
+        _local.event = event
+        return event
+
+    def end(self):
+        """结束当前线程的当前事件"""
+        event = _local.event
+        if event is None or event.tracer is not self:
+            return
+        _local.event = None
+        self.record(STAGE_TOTAL, time.perf_counter_ns() - event.arrival_ns)
+        self.last_event = event
+        if self.dump_interval > 0 and time.monotonic() - self._dump_time > self.dump_interval:
+            self._dump_time = time.monotonic()
+            self.log_summary()
+
+    def record(self, stage, value_ns):
+        with self._lock:
+            histogram = self.stage_histogram_dic.get(stage, None)
+            if histogram is None:
+                histogram = self.stage_histogram_dic[stage] = LatencyHistogram()
+            histogram.record(value_ns)
+
+    def get_summary_df(self) -> pd.DataFrame:
+        """各阶段统计结果汇总表，单位：微秒"""
+        with self._lock:
+            data_dic = {stage: histogram.to_dict() for stage, histogram in self.stage_histogram_dic.items()}
+        return pd.DataFrame(data_dic).T
+
+    def log_summary(self):
+        summary_df = self.get_summary_df()
+        if summary_df.shape[0] > 0:
+            logger.info('%s 延迟统计（微秒）：\n%s', self.name, summary_df.to_string(float_format='%.1f'))
+        return summary_df
+
+
+def checkpoint(stage):
+    """当前线程存在正在处理的行情事件时，记录 stage 阶段耗时"""
+    if not _is_enabled:
+        return
+    event = _local.event
+    if event is not None:
+        event.checkpoint(stage)
+
+
+def create_tracer(name):
+    """config.LATENCY_TRACE 为 True 时返回 LatencyTracer，否则返回 None"""
+    return LatencyTracer(name) if config.LATENCY_TRACE else None
+
+
+def _test_checkpoint_overhead(loop_count=1000000):
+    """未启用时 checkpoint 的调用开销"""
+    datetime_start = time.perf_counter()
+    for _ in range(loop_count):
+        checkpoint(STAGE_ORDER)
+    seconds = time.perf_counter() - datetime_start
+    print(f'未启用时 checkpoint 平均耗时 {seconds / loop_count * 1e9:.1f} 纳秒')
+    tracer = LatencyTracer('test', dump_interval=0)
+    tracer.begin()
+    datetime_start = time.perf_counter()
+    for _ in range(loop_count):
+        checkpoint(STAGE_ORDER)
+    seconds = time.perf_counter() - datetime_start
+    tracer.end()
+    print(f'启用时 checkpoint 平均耗时 {seconds / loop_count * 1e9:.1f} 纳秒')
+    print(tracer.get_summary_df())
+
+
+if __name__ == "__main__":
+    _test_checkpoint_overhead()
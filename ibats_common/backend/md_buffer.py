@@ -0,0 +1,266 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 16:40
+@File    : md_buffer.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情数据缓冲区，按列预分配 numpy 数组，供策略在回测、实盘过程中逐条追加行情数据使用
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+# pandas 3.0 及以后的版本总是启用 Copy-on-Write
+_PANDAS_MAJOR_VERSION = int(pd.__version__.split('.')[0])
+
+
+def _is_copy_on_write() -> bool:
+    """pandas 是否启用了 Copy-on-Write（pandas 2.x 中需设置 pd.options.mode.copy_on_write = True）"""
+    if _PANDAS_MAJOR_VERSION >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:
+        # pandas 1.5 以前的版本没有该选项，OptionError 为 KeyError 的子类
+        return False
+
+
+class MdBuffer:
+    """
+    行情数据缓冲区
+    每一列对应一个预分配的 numpy 数组，容量不足时按倍数扩容，追加一条数据的均摊复杂度 O(1)
+    设置 max_window 后，仅保留最近 max_window 条数据，容量用尽时将最近 max_window 条数据移动到数组头部，
+    内存占用不随数据条数增长
+    get_array、to_df 返回的是缓冲区数组的只读视图，数据移动、扩容时总是分配新的数组，已返回的视图内容保持不变；
+    修改 to_df 返回的 DataFrame 时 pandas 将复制相应列（Copy-on-Write），不会影响缓冲区；
+    pandas 未启用 Copy-on-Write 时 to_df 返回数据副本
+    """
+
+    def __init__(self, col_name_list, dtype_list=None, capacity=1024, max_window=None):
+        """
+        :param col_name_list: 列名称
+        :param dtype_list: 各列数据类型，None 代表全部为 object
+        :param capacity: 初始容量
+        :param max_window: 最多保留最近多少条数据，None 代表不限制
+        """
+        self.col_name_list = list(col_name_list)
+        self._col_idx_dic = {col_name: idx for idx, col_name in enumerate(self.col_name_list)}
+        if dtype_list is None:
+            dtype_list = [np.dtype(object) for _ in self.col_name_list]
+        self.max_window = max_window
+        if max_window is not None:
+            # 容量至少是 max_window 的2倍，保证数据移动的均摊复杂度为 O(1)
+            capacity = max(capacity, max_window * 2)
+        self.capacity = max(capacity, 1)
+        self._array_list = [np.empty(self.capacity, dtype=dtype) for dtype in dtype_list]
+        # 引用各列数组只读视图的 Series，to_df 由此切片，保证 pandas 修改时复制数据，数组更换后置为 None
+        self._series_list = [None for _ in self.col_name_list]
+        # 有效数据区间为 [_start, _end)
+        self._start = 0
+        self._end = 0
+        # 因 max_window 限制被丢弃的数据条数，用于生成连续的 index
+        self._offset = 0
+
+    @staticmethod
+    def _get_dtype(values: np.ndarray):
+        dtype = values.dtype
+        if dtype.kind in 'biufcmM':
+            return dtype
+        return np.dtype(object)
+
+    @staticmethod
+    def _can_hold(dtype, values) -> bool:
+        """整数、布尔类型数组能否无损地保存 values（numpy 写入浮点数时直接截断，不会报错）"""
+        values = np.asarray(values)
+        if values.dtype.kind not in 'biuf':
+            return False
+        if np.can_cast(values.dtype, dtype):
+            return True
+        with np.errstate(invalid='ignore', over='ignore'):
+            return bool(np.all(values.astype(dtype) == values))
+
+    @staticmethod
+    def _get_upcast_dtype(dtype, values):
+        """可以同时保存原有数据及 values 的数据类型，数值类型优先转换为 float64，其他情况为 object"""
+        values = np.asarray(values)
+        if values.dtype.kind in 'biufc':
+            return np.result_type(dtype, values.dtype, np.float64)
+        if values.dtype.kind == 'O' and all(value is None for value in values.flat):
+            # None 记为 NaN
+            return np.dtype(np.float64)
+        return np.dtype(object)
+
+    @staticmethod
+    def create_by_df(md_df: pd.DataFrame, capacity=None, max_window=None):
+        """
+        根据 md_df 创建缓冲区，并加载 md_df 全部数据
+        :param md_df:
+        :param capacity: None 代表根据 md_df 数据长度自动设置
+        :param max_window:
+        :return:
+        """
+        col_name_list = list(md_df.columns)
+        values_list = [md_df[col_name].to_numpy() for col_name in col_name_list]
+        dtype_list = [MdBuffer._get_dtype(values) for values in values_list]
+        data_len = md_df.shape[0]
+        if capacity is None:
+            capacity = max(1024, data_len * 2)
+        buffer = MdBuffer(col_name_list, dtype_list, capacity=capacity, max_window=max_window)
+        buffer.extend(values_list, data_len)
+        return buffer
+
+    @staticmethod
+    def create_by_md(md: dict, capacity=1024, max_window=None):
+        """
+        根据一条 md 数据创建缓冲区，并加载该条数据
+        :param md:
+        :param capacity:
+        :param max_window:
+        :return:
+        """
+        col_name_list = list(md.keys())
+        dtype_list = [MdBuffer._get_dtype(np.asarray([md[col_name]])) for col_name in col_name_list]
+        buffer = MdBuffer(col_name_list, dtype_list, capacity=capacity, max_window=max_window)
+        buffer.append(md)
+        return buffer
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _reserve(self, count):
+        """保证缓冲区尾部至少还有 count 条数据的空间"""
+        if self._end + count <= self.capacity:
+            return
+        data_len = self._end - self._start
+        if self.max_window is not None:
+            # 仅保留最近 max_window 条数据
+            keep_len = min(data_len, self.max_window)
+        else:
+            keep_len = data_len
+
+        start = self._end - keep_len
+        self._offset += start - self._start
+        capacity = self.capacity
+        while keep_len + count > capacity:
+            capacity *= 2
+        # 即使容量足够也分配新的数组，原地移动数据将改写此前 get_array、to_df 已返回的视图
+        array_list = []
+        for array in self._array_list:
+            array_new = np.empty(capacity, dtype=array.dtype)
+            array_new[:keep_len] = array[start:self._end]
+            array_list.append(array_new)
+        self._array_list = array_list
+        self._series_list = [None for _ in self.col_name_list]
+        self.capacity = capacity
+        self._start, self._end = 0, keep_len
+
+    def _upcast(self, col_idx, dtype=object):
+        """当数据无法写入当前类型的数组时，将该列转换为 dtype 类型"""
+        array = self._array_list[col_idx]
+        dtype = np.dtype(dtype)
+        logger.debug('%s 列数据类型 %s 转换为 %s', self.col_name_list[col_idx], array.dtype, dtype)
+        self._array_list[col_idx] = array.astype(dtype)
+        self._series_list[col_idx] = None
+
+    def _prepare_column(self, col_idx, values) -> np.ndarray:
+        """整数、布尔类型的列无法无损保存 values 时转换数据类型，返回写入用的数组"""
+        array = self._array_list[col_idx]
+        if array.dtype.kind in 'iub' and not self._can_hold(array.dtype, values):
+            self._upcast(col_idx, self._get_upcast_dtype(array.dtype, values))
+            array = self._array_list[col_idx]
+        return array
+
+    def _trim(self):
+        if self.max_window is not None and self._end - self._start > self.max_window:
+            start = self._end - self.max_window
+            self._offset += start - self._start
+            self._start = start
+
+    def append(self, md: dict):
+        """
+        追加一条数据，md 中不存在的列记为 None，缓冲区中不存在的列将被忽略
+        :param md:
+        :return:
+        """
+        self._reserve(1)
+        idx = self._end
+        for col_idx, col_name in enumerate(self.col_name_list):
+            value = md.get(col_name, None)
+            try:
+                self._prepare_column(col_idx, value)[idx] = value
+            except (ValueError, TypeError, OverflowError):
+                self._upcast(col_idx)
+                self._array_list[col_idx][idx] = value
+
+        self._end += 1
+        self._trim()
+
+    def extend(self, values_list, data_len):
+        """
+        批量追加数据
+        :param values_list: 与 col_name_list 一一对应的各列数据
+        :param data_len: 数据长度
+        :return:
+        """
+        if self.max_window is not None and data_len > self.max_window:
+            self._offset += data_len - self.max_window
+            values_list = [values[-self.max_window:] for values in values_list]
+            data_len = self.max_window
+        self._reserve(data_len)
+        idx_from, idx_to = self._end, self._end + data_len
+        for col_idx, values in enumerate(values_list):
+            try:
+                self._prepare_column(col_idx, values)[idx_from:idx_to] = values
+            except (ValueError, TypeError, OverflowError):
+                self._upcast(col_idx)
+                self._array_list[col_idx][idx_from:idx_to] = values
+
+        self._end = idx_to
+        self._trim()
+
+    def _get_range(self, n=None):
+        if n is None or n >= self._end - self._start:
+            return self._start, self._end
+        return self._end - n, self._end
+
+    def get_array(self, col_name, n=None) -> np.ndarray:
+        """
+        返回指定列最近 n 条数据（只读视图）
+        :param col_name:
+        :param n: None 代表全部数据
+        :return:
+        """
+        idx_from, idx_to = self._get_range(n)
+        view = self._array_list[self._col_idx_dic[col_name]][idx_from:idx_to]
+        view.flags.writeable = False
+        return view
+
+    def _get_series(self, col_idx) -> pd.Series:
+        series = self._series_list[col_idx]
+        if series is None:
+            view = self._array_list[col_idx][:]
+            view.flags.writeable = False
+            series = self._series_list[col_idx] = pd.Series(view, copy=False)
+        return series
+
+    def to_df(self, n=None) -> pd.DataFrame:
+        """
+        返回最近 n 条数据的 DataFrame，各列数据直接引用缓冲区数组（只读），修改时由 pandas 复制，
+        pandas 未启用 Copy-on-Write 时修改操作将直接写入只读数组，因此返回数据副本
+        :param n: None 代表全部数据
+        :return:
+        """
+        idx_from, idx_to = self._get_range(n)
+        index_offset = self._offset - self._start
+        # 由缓冲区持有的 Series 切片，pandas 记录引用关系，修改 DataFrame 时复制数据而不是写入只读数组
+        md_df = pd.DataFrame(
+            {col_name: self._get_series(col_idx).iloc[idx_from:idx_to]
+             for col_idx, col_name in enumerate(self.col_name_list)},
+            columns=self.col_name_list, copy=False)
+        md_df.index = pd.RangeIndex(idx_from + index_offset, idx_to + index_offset)
+        if not _is_copy_on_write():
+            md_df = md_df.copy()
+        return md_df
@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 23:00
+@File    : md_cache.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情文件缓存，每个 (file_path, columns) 仅解析一次，各列保存为 .npy 文件，
+其他进程通过内存映射（mmap）直接加载，数值、日期列无需复制；文件修改时间、大小变化时自动重建缓存
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+
+
+def get_default_cache_folder_path() -> str:
+    """
+    系统临时目录下当前用户专用的缓存目录 ibats_md_cache_<uid>，权限 0700。
+    缓存中的 object 列通过 pickle 加载，目录不能被其他用户写入
+    """
+    get_uid = getattr(os, 'getuid', None)
+    if get_uid is None:
+        # windows 系统临时目录本身即为当前用户专用
+        return os.path.join(tempfile.gettempdir(), 'ibats_md_cache')
+    uid = get_uid()
+    folder_path = os.path.join(tempfile.gettempdir(), f'ibats_md_cache_{uid}')
+    os.makedirs(folder_path, mode=0o700, exist_ok=True)
+    folder_stat = os.lstat(folder_path)
+    if not stat.S_ISDIR(folder_stat.st_mode) or folder_stat.st_uid != uid or folder_stat.st_mode & 0o077:
+        raise PermissionError(f'缓存目录 {folder_path} 不属于当前用户或可以被其他用户访问，'
+                              f'请删除该目录或设置 config.MD_CACHE_FOLDER_PATH')
+    return folder_path
+
+
+class MdCache:
+    """
+    行情文件缓存
+    第一次加载时解析 csv 文件，各列分别保存为 cache_folder_path/<key>/<num>.npy，同时保存 meta.json 记录源文件 mtime、size
+    之后的加载通过 np.load(mmap_mode='r') 内存映射各列数据，多个进程共享操作系统页缓存，不再重复解析及复制
+    返回的 DataFrame 中数值、日期列为只读内存映射数组，调用方不可修改
+    """
+
+    def __init__(self, cache_folder_path=None):
+        """
+        :param cache_folder_path: 缓存目录，None 代表使用 config.MD_CACHE_FOLDER_PATH，
+        仍为 None 则使用 get_default_cache_folder_path()。缓存目录不应被其他用户写入
+        """
+        if cache_folder_path is None:
+            cache_folder_path = config.MD_CACHE_FOLDER_PATH
+        if cache_folder_path is None:
+            cache_folder_path = get_default_cache_folder_path()
+        self.cache_folder_path = cache_folder_path
+        # 当前进程中已加载的数据 key: (meta_key, mtime_ns, size) value: md_df
+        self._df_dic = {}
+        self._lock = threading.Lock()
+        # 统计信息
+        self.memory_hit_count = 0
+        self.mmap_hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def _get_key(file_path, parse_dates, usecols, ffill) -> str:
+        key_str = json.dumps([file_path, parse_dates, usecols, ffill])
+        return hashlib.md5(key_str.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_file_stat(file_path):
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_mmap(self, folder_path, mtime_ns, size):
+        """加载内存映射数据，缓存不存在、已过期或正在被其他进程重建返回 None"""
+        meta_file_path = os.path.join(folder_path, 'meta.json')
+        if not os.path.exists(meta_file_path):
+            return None
+        try:
+            with open(meta_file_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            if meta['mtime_ns'] != mtime_ns or meta['size'] != size:
+                return None
+            data_dic = {}
+            for num, col_name in enumerate(meta['columns']):
+                is_object = meta['is_object_list'][num]
+                # object 类型数据无法内存映射，直接加载
+                data_dic[col_name] = np.load(os.path.join(folder_path, f'{num}.npy'),
+                                             mmap_mode=None if is_object else 'r', allow_pickle=is_object)
+        except (OSError, ValueError):
+            # 其他进程 _save 时删除了过期的缓存目录
+            logger.debug("缓存 %s 加载失败，视为未命中", folder_path, exc_info=True)
+            return None
+        return pd.DataFrame(data_dic, columns=meta['columns'], copy=False)
+
+    @staticmethod
+    def _save(folder_path, md_df: pd.DataFrame, file_path, mtime_ns, size):
+        """保存缓存，先写入临时目录，完成后重命名，避免其他进程读取到不完整的数据"""
+        folder_path_tmp = f'{folder_path}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(folder_path_tmp)
+        is_object_list = []
+        for num, col_name in enumerate(md_df.columns):
+            values = md_df[col_name].to_numpy()
+            is_object = values.dtype.kind not in 'biufcmM'
+            if is_object and pd.notna(values).all() and all(isinstance(value, str) for value in values):
+                # 字符串列保存为定长 unicode 数组，可以内存映射
+                values = values.astype(str)
+                is_object = False
+            np.save(os.path.join(folder_path_tmp, f'{num}.npy'), values, allow_pickle=is_object)
+            is_object_list.append(is_object)
+
+        meta = {'file_path': file_path, 'mtime_ns': mtime_ns, 'size': size, 'columns': list(md_df.columns),
+                'is_object_list': is_object_list}
+        with open(os.path.join(folder_path_tmp, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+
+        if os.path.exists(folder_path):
+            shutil.rmtree(folder_path, ignore_errors=True)
+        try:
+            os.rename(folder_path_tmp, folder_path)
+        except OSError:
+            # 其他进程已经生成缓存
+            shutil.rmtree(folder_path_tmp, ignore_errors=True)
+
+    def read_csv(self, file_path, parse_dates=None, usecols=None, ffill=False) -> pd.DataFrame:
+        """
+        读取 csv 文件
+        :param file_path:
+        :param parse_dates: 日期列
+        :param usecols: 加载哪些列，None 代表全部
+        :param ffill: 是否对数据进行 ffill
+        :return: 只读的 DataFrame
+        """
+        file_path = os.path.abspath(file_path)
+        parse_dates = None if parse_dates is None else sorted(parse_dates)
+        usecols = None if usecols is None else list(usecols)
+        key = self._get_key(file_path, parse_dates, usecols, ffill)
+        mtime_ns, size = self._get_file_stat(file_path)
+        df_key = (key, mtime_ns, size)
+        with self._lock:
+            if df_key in self._df_dic:
+                self.memory_hit_count += 1
+                return self._df_dic[df_key]
+
+            folder_path = os.path.join(self.cache_folder_path, key)
+            md_df = self._load_mmap(folder_path, mtime_ns, size)
+            if md_df is None:
+                self.miss_count += 1
+                logger.debug("缓存未命中，解析文件 %s", file_path)
+                md_df = pd.read_csv(file_path, parse_dates=parse_dates, usecols=usecols)
+                if ffill:
+                    md_df = md_df.ffill()
+                self._save(folder_path, md_df, file_path, mtime_ns, size)
+                md_df = self._load_mmap(folder_path, mtime_ns, size)
+                if md_df is None:
+                    # 源文件在保存缓存过程中被修改，直接重新解析
+                    md_df = pd.read_csv(file_path, parse_dates=parse_dates, usecols=usecols)
+                    if ffill:
+                        md_df = md_df.ffill()
+                    return md_df
+            else:
+                self.mmap_hit_count += 1
+
+            # 删除当前进程中该文件的过期数据
+            for df_key_old in [_ for _ in self._df_dic.keys() if _[0] == key]:
+                del self._df_dic[df_key_old]
+            self._df_dic[df_key] = md_df
+            return md_df
+
+    def get_stats(self) -> dict:
+        return {
+            'memory_hit_count': self.memory_hit_count,
+            'mmap_hit_count': self.mmap_hit_count,
+            'miss_count': self.miss_count,
+        }
+
+    def clear(self):
+        """清空当前进程中已加载的数据以及缓存目录"""
+        with self._lock:
+            self._df_dic.clear()
+            shutil.rmtree(self.cache_folder_path, ignore_errors=True)
+
+
+_md_cache = None
+
+
+def get_md_cache() -> MdCache:
+    global _md_cache
+    if _md_cache is None:
+        _md_cache = MdCache()
+    return _md_cache
+
+
+def _test_md_cache_benchmark(file_path=None, count=20):
+    """对比 pd.read_csv 与 MdCache 加载耗时"""
+    import time
+    from ibats_common import example
+    if file_path is None:
+        file_path = os.path.join(os.path.dirname(example.__file__), 'data', 'RB.csv')
+    datetime_start = time.time()
+    for _ in range(count):
+        pd.read_csv(file_path, parse_dates=['trade_date']).ffill()
+    logger.info("pd.read_csv %d 次，耗时 %.4f 秒", count, time.time() - datetime_start)
+    md_cache = MdCache()
+    datetime_start = time.time()
+    for _ in range(count):
+        md_cache.read_csv(file_path, parse_dates=['trade_date'], ffill=True)
+    logger.info("MdCache.read_csv %d 次，耗时 %.4f 秒，%s", count, time.time() - datetime_start, md_cache.get_stats())
+    # 模拟新的进程，从内存映射文件中加载
+    md_cache = MdCache()
+    datetime_start = time.time()
+    md_cache.read_csv(file_path, parse_dates=['trade_date'], ffill=True)
+    logger.info("MdCache.read_csv 内存映射加载耗时 %.4f 秒，%s", time.time() - datetime_start, md_cache.get_stats())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    _test_md_cache_benchmark()
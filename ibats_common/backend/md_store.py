@@ -0,0 +1,343 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 23:40
+@File    : md_store.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情数据分区存储，按 symbol、日期（年/月）分区保存为 parquet、feather 或 npy 列文件，
+加载时根据 date_from、date_to 跳过无关分区，分区内通过 searchsorted 或 parquet filters 仅读取所需行，支持指定加载列
+命令行转换 csv 文件：python -m ibats_common.backend.md_store RB.csv RU.csv -o ./md_store -d trade_date -s instrument_type
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+META_FILE_NAME = 'meta.json'
+# 没有 symbol 列时所有数据保存在该分区下
+DEFAULT_SYMBOL = '_all'
+FILE_FORMAT_SET = {'parquet', 'feather', 'npy'}
+
+
+def is_pyarrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def is_md_store(folder_path):
+    return os.path.isdir(folder_path) and os.path.exists(os.path.join(folder_path, META_FILE_NAME))
+
+
+def _load_npy(file_path):
+    """内存映射加载，object 类型数据无法内存映射，直接加载"""
+    try:
+        return np.load(file_path, mmap_mode='r')
+    except ValueError:
+        return np.load(file_path, allow_pickle=True)
+
+
+class MdStore:
+    """
+    行情数据分区存储
+    目录结构：root_folder_path/<symbol>/<period>.parquet|.feather，npy 格式为 root_folder_path/<symbol>/<period>/<num>.npy
+    每个分区内数据按 datetime_key 排序，root_folder_path/meta.json 记录 datetime_key、symbol_key、格式、分区频率、列名
+    parquet、feather 格式需要安装 pyarrow，npy 格式仅依赖 numpy，各列通过内存映射加载，仅读取所需行
+    """
+
+    def __init__(self, root_folder_path, datetime_key=None, symbol_key=None, file_format=None, partition_freq=None):
+        """
+        :param root_folder_path: 存储目录，已存在时从 meta.json 加载各项设置
+        :param datetime_key: 日期列
+        :param symbol_key: symbol 列，None 代表不按 symbol 分区
+        :param file_format: parquet、feather、npy，None 代表安装 pyarrow 时使用 parquet，否则使用 npy
+        :param partition_freq: 日期分区频率，'Y' 按年，'M' 按月，None 代表 'Y'
+        """
+        self.root_folder_path = root_folder_path
+        meta_file_path = os.path.join(root_folder_path, META_FILE_NAME)
+        if os.path.exists(meta_file_path):
+            with open(meta_file_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            for key, value in (('datetime_key', datetime_key), ('symbol_key', symbol_key),
+                               ('file_format', file_format), ('partition_freq', partition_freq)):
+                if value is not None and value != meta[key]:
+                    raise ValueError(f"{key}={value} 与已存在的存储 {root_folder_path} 设置 {meta[key]} 不一致")
+            self.datetime_key = meta['datetime_key']
+            self.symbol_key = meta['symbol_key']
+            self.file_format = meta['file_format']
+            self.partition_freq = meta['partition_freq']
+            self.columns = meta['columns']
+            self.dtypes = meta['dtypes']
+        else:
+            if datetime_key is None:
+                raise ValueError(f"{root_folder_path} 不存在，新建存储需要设置 datetime_key")
+            if file_format is None:
+                file_format = 'parquet' if is_pyarrow_available() else 'npy'
+            if file_format not in FILE_FORMAT_SET:
+                raise ValueError(f"file_format={file_format} 不被支持，仅支持 {FILE_FORMAT_SET}")
+            self.datetime_key = datetime_key
+            self.symbol_key = symbol_key
+            self.file_format = file_format
+            self.partition_freq = 'Y' if partition_freq is None else partition_freq
+            self.columns = None
+            self.dtypes = None
+
+    def _save_meta(self):
+        meta = {'datetime_key': self.datetime_key, 'symbol_key': self.symbol_key, 'file_format': self.file_format,
+                'partition_freq': self.partition_freq, 'columns': self.columns, 'dtypes': self.dtypes}
+        with open(os.path.join(self.root_folder_path, META_FILE_NAME), 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False, indent=2)
+
+    def _get_partition_path(self, symbol, partition):
+        folder_path = os.path.join(self.root_folder_path, str(symbol))
+        if self.file_format == 'npy':
+            return os.path.join(folder_path, partition)
+        return os.path.join(folder_path, f'{partition}.{self.file_format}')
+
+    def get_symbol_list(self) -> list:
+        if not os.path.isdir(self.root_folder_path):
+            return []
+        return sorted([name for name in os.listdir(self.root_folder_path)
+                       if os.path.isdir(os.path.join(self.root_folder_path, name))])
+
+    def get_partition_list(self, symbol) -> list:
+        folder_path = os.path.join(self.root_folder_path, str(symbol))
+        if not os.path.isdir(folder_path):
+            return []
+        suffix = '' if self.file_format == 'npy' else f'.{self.file_format}'
+        partition_list = [name[:len(name) - len(suffix)] for name in os.listdir(folder_path)
+                          if name.endswith(suffix) and not name.endswith('.tmp')]
+        return sorted(partition_list)
+
+    def write(self, md_df: pd.DataFrame):
+        """
+        保存数据，按 symbol、日期分区，与已存在的同名分区合并：
+        按 symbol 分区时，分区中与 md_df 日期相同的记录将被替换；未按 symbol 分区时，同一日期可能对应多条记录，仅去除完全相同的记录
+        :param md_df:
+        :return:
+        """
+        md_df = md_df.reset_index(drop=True)
+        md_df[self.datetime_key] = pd.to_datetime(md_df[self.datetime_key])
+        columns = list(md_df.columns)
+        if self.columns is None:
+            self.columns = columns
+            self.dtypes = [str(dtype) for dtype in md_df.dtypes]
+        elif columns != self.columns:
+            raise ValueError(f"数据列 {columns} 与已存在的存储列 {self.columns} 不一致")
+
+        os.makedirs(self.root_folder_path, exist_ok=True)
+        period_s = md_df[self.datetime_key].dt.to_period(self.partition_freq).astype(str)
+        if self.symbol_key is None:
+            symbol_s = pd.Series(DEFAULT_SYMBOL, index=md_df.index)
+        else:
+            symbol_s = md_df[self.symbol_key].astype(str)
+
+        partition_count = 0
+        for (symbol, partition), sub_df in md_df.groupby([symbol_s, period_s], sort=True):
+            sub_df = self._merge_partition(symbol, partition, sub_df)
+            sub_df = sub_df.sort_values(self.datetime_key, kind='stable').reset_index(drop=True)
+            self._write_partition(symbol, partition, sub_df)
+            partition_count += 1
+
+        self._save_meta()
+        logger.info("%d 条记录保存到 %s，共 %d 个分区", md_df.shape[0], self.root_folder_path, partition_count)
+
+    def _merge_partition(self, symbol, partition, sub_df: pd.DataFrame) -> pd.DataFrame:
+        """合并已存在的分区数据，重复的记录以 sub_df 为准"""
+        if not os.path.exists(self._get_partition_path(symbol, partition)):
+            return sub_df
+        old_df = self._read_partition(symbol, partition, None, None, self.columns)
+        if self.symbol_key is None:
+            merged_df = pd.concat([old_df, sub_df], ignore_index=True)
+            merged_df = merged_df[~merged_df.duplicated(keep='last')]
+        else:
+            old_df = old_df[~old_df[self.datetime_key].isin(sub_df[self.datetime_key])]
+            merged_df = pd.concat([old_df, sub_df], ignore_index=True)
+        logger.debug("%s/%s 分区合并后共 %d 条记录", symbol, partition, merged_df.shape[0])
+        return merged_df
+
+    def _write_partition(self, symbol, partition, sub_df: pd.DataFrame):
+        """先写入临时文件，完成后重命名，避免读取到不完整的分区"""
+        file_path = self._get_partition_path(symbol, partition)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        file_path_tmp = f'{file_path}.{uuid.uuid4().hex}.tmp'
+        if self.file_format == 'parquet':
+            sub_df.to_parquet(file_path_tmp, index=False)
+        elif self.file_format == 'feather':
+            sub_df.to_feather(file_path_tmp)
+        else:
+            os.makedirs(file_path_tmp)
+            for num, col_name in enumerate(self.columns):
+                values = sub_df[col_name].to_numpy()
+                allow_pickle = values.dtype.kind not in 'biufcmM'
+                if allow_pickle and pd.notna(values).all() and all(isinstance(value, str) for value in values):
+                    # 字符串列保存为定长 unicode 数组，可以内存映射
+                    values = values.astype(str)
+                    allow_pickle = False
+                np.save(os.path.join(file_path_tmp, f'{num}.npy'), values, allow_pickle=allow_pickle)
+
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+        os.replace(file_path_tmp, file_path)
+
+    def _is_partition_in_range(self, partition, period_from, period_to):
+        period = pd.Period(partition, freq=self.partition_freq)
+        if period_from is not None and period < period_from:
+            return False
+        if period_to is not None and period > period_to:
+            return False
+        return True
+
+    def read(self, symbol_list=None, date_from=None, date_to=None, columns=None) -> pd.DataFrame:
+        """
+        加载数据，返回 date_from <= datetime_key <= date_to 的记录
+        :param symbol_list: None 代表全部 symbol
+        :param date_from: None 代表不限制
+        :param date_to: None 代表不限制
+        :param columns: 加载哪些列，None 代表全部
+        :return: 按 symbol、datetime_key 排序的 DataFrame
+        """
+        if self.columns is None:
+            raise ValueError(f"{self.root_folder_path} 尚未保存任何数据")
+        date_from = None if date_from is None or pd.isna(date_from) else pd.Timestamp(date_from)
+        date_to = None if date_to is None or pd.isna(date_to) else pd.Timestamp(date_to)
+        period_from = None if date_from is None else date_from.to_period(self.partition_freq)
+        period_to = None if date_to is None else date_to.to_period(self.partition_freq)
+        columns = list(self.columns) if columns is None else list(columns)
+        for col_name in columns:
+            if col_name not in self.columns:
+                raise KeyError(f"{col_name} 不在存储列 {self.columns} 中")
+
+        if symbol_list is None:
+            symbol_list = self.get_symbol_list()
+        elif self.symbol_key is None:
+            logger.warning("%s 未按 symbol 分区，忽略 symbol_list 参数", self.root_folder_path)
+            symbol_list = [DEFAULT_SYMBOL]
+
+        df_list = []
+        for symbol in symbol_list:
+            partition_list = self.get_partition_list(symbol)
+            if len(partition_list) == 0:
+                logger.warning("%s 中没有 %s 数据", self.root_folder_path, symbol)
+                continue
+            for partition in partition_list:
+                if not self._is_partition_in_range(partition, period_from, period_to):
+                    continue
+                sub_df = self._read_partition(symbol, partition, date_from, date_to, columns)
+                if sub_df.shape[0] > 0:
+                    df_list.append(sub_df)
+
+        if len(df_list) == 0:
+            return pd.DataFrame({col_name: pd.Series(dtype=self.dtypes[self.columns.index(col_name)])
+                                 for col_name in columns})
+        return pd.concat(df_list, ignore_index=True)
+
+    def _read_partition(self, symbol, partition, date_from, date_to, columns) -> pd.DataFrame:
+        file_path = self._get_partition_path(symbol, partition)
+        datetime_key = self.datetime_key
+        if self.file_format == 'parquet':
+            filters = []
+            if date_from is not None:
+                filters.append((datetime_key, '>=', date_from))
+            if date_to is not None:
+                filters.append((datetime_key, '<=', date_to))
+            return pd.read_parquet(file_path, columns=columns, filters=filters if len(filters) > 0 else None)
+
+        if self.file_format == 'feather':
+            read_columns = columns if datetime_key in columns else columns + [datetime_key]
+            sub_df = pd.read_feather(file_path, columns=read_columns)
+            start, end = self._search_range(sub_df[datetime_key].to_numpy(), date_from, date_to)
+            return sub_df.iloc[start:end][columns].reset_index(drop=True)
+
+        # npy 格式，内存映射加载日期列定位起止位置，其他列仅复制所需行
+        datetime_arr = _load_npy(os.path.join(file_path, f'{self.columns.index(datetime_key)}.npy'))
+        start, end = self._search_range(datetime_arr, date_from, date_to)
+        data_dic = {}
+        for col_name in columns:
+            arr = _load_npy(os.path.join(file_path, f'{self.columns.index(col_name)}.npy'))
+            data_dic[col_name] = np.array(arr[start:end])
+        return pd.DataFrame(data_dic, columns=columns)
+
+    @staticmethod
+    def _search_range(datetime_arr, date_from, date_to):
+        """datetime_arr 已排序，返回 [start, end) 区间"""
+        start, end = 0, datetime_arr.shape[0]
+        if date_from is not None:
+            start = np.searchsorted(datetime_arr, date_from.to_datetime64().astype(datetime_arr.dtype), side='left')
+        if date_to is not None:
+            end = np.searchsorted(datetime_arr, date_to.to_datetime64().astype(datetime_arr.dtype), side='right')
+        return start, max(start, end)
+
+
+def convert_csv(file_path_list, root_folder_path, datetime_key, symbol_key=None, file_format=None,
+                partition_freq=None, encoding=None) -> MdStore:
+    """
+    将 csv 文件转换为分区存储
+    :param file_path_list: csv 文件路径列表
+    :param root_folder_path: 存储目录
+    :param datetime_key: 日期列
+    :param symbol_key: symbol 列，None 代表不按 symbol 分区
+    :param file_format: parquet、feather、npy
+    :param partition_freq: 'Y' 按年，'M' 按月
+    :param encoding:
+    :return:
+    """
+    if isinstance(file_path_list, str):
+        file_path_list = [file_path_list]
+    md_store = MdStore(root_folder_path, datetime_key=datetime_key, symbol_key=symbol_key,
+                       file_format=file_format, partition_freq=partition_freq)
+    for file_path in file_path_list:
+        md_df = pd.read_csv(file_path, parse_dates=[datetime_key], encoding=encoding)
+        md_store.write(md_df)
+        logger.info("%s 转换完成", file_path)
+    return md_store
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='将 csv 行情文件转换为按 symbol、日期分区的存储')
+    parser.add_argument('file_path', nargs='+', help='csv 文件路径')
+    parser.add_argument('-o', '--output', required=True, help='存储目录')
+    parser.add_argument('-d', '--datetime-key', required=True, help='日期列')
+    parser.add_argument('-s', '--symbol-key', default=None, help='symbol 列，不设置则不按 symbol 分区')
+    parser.add_argument('-f', '--format', default=None, choices=sorted(FILE_FORMAT_SET),
+                        help='文件格式，默认安装 pyarrow 时使用 parquet，否则使用 npy')
+    parser.add_argument('-p', '--partition-freq', default=None, choices=['Y', 'M'], help='日期分区频率，默认按年')
+    parser.add_argument('--encoding', default=None)
+    args = parser.parse_args(args)
+    convert_csv(args.file_path, args.output, args.datetime_key, symbol_key=args.symbol_key, file_format=args.format,
+                partition_freq=args.partition_freq, encoding=args.encoding)
+
+
+def _test_md_store_benchmark(file_format=None):
+    """对比 csv 全量加载后过滤与分区存储加载耗时"""
+    import tempfile
+    import time
+    from ibats_common import example
+    folder_path = os.path.join(os.path.dirname(example.__file__), 'data')
+    file_path_list = [os.path.join(folder_path, 'RB.csv'), os.path.join(folder_path, 'RU.csv')]
+    root_folder_path = tempfile.mkdtemp()
+    try:
+        md_store = convert_csv(file_path_list, root_folder_path, 'trade_date', 'instrument_type',
+                               file_format=file_format)
+        datetime_start = time.time()
+        for _ in range(20):
+            md_df = pd.read_csv(file_path_list[0], parse_dates=['trade_date'])
+            md_df = md_df[(md_df['trade_date'] >= '2015-1-1') & (md_df['trade_date'] <= '2015-3-31')]
+        logger.info("pd.read_csv 加载后过滤 20 次，耗时 %.4f 秒，%d 条", time.time() - datetime_start, md_df.shape[0])
+        datetime_start = time.time()
+        for _ in range(20):
+            md_df = md_store.read(['RB'], '2015-1-1', '2015-3-31', columns=['trade_date', 'close'])
+        logger.info("MdStore[%s].read 20 次，耗时 %.4f 秒，%d 条",
+                    md_store.file_format, time.time() - datetime_start, md_df.shape[0])
+    finally:
+        shutil.rmtree(root_folder_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
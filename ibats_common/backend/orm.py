@@ -4,6 +4,7 @@ Created on 2017/10/9
 @author: MG
 """
 import logging
+import threading
 import warnings
 from collections import defaultdict
 from datetime import datetime, timedelta
@@ -16,7 +17,7 @@ from sqlalchemy import Column, Integer, String, DateTime, SmallInteger, Date, Ti
 from sqlalchemy.dialects.mysql import DOUBLE, TINYINT
 from sqlalchemy.ext.declarative import declarative_base
 
-from ibats_common.backend import engines
+from ibats_common.backend import engines, write_behind, idx_allocator, latency
 from ibats_common.common import Action, Direction, CalcMode, ExchangeName, RunMode
 from ibats_common.common import PositionDateType
 from ibats_common.config import config
@@ -25,17 +26,44 @@ logger = logging.getLogger(__name__)
 engine_ibats = engines.engine_ibats
 BaseModel = declarative_base()
 _key_idx = defaultdict(lambda: defaultdict(int))
+_key_idx_lock = threading.Lock()
 MAX_RATE = 9.99  # 相当于 999%
 _HEART_BEAT_THREAD = None
 
 
 def idx_generator(key1, key2):
-    idx = _key_idx[key1][key2]
-    idx += 1
-    _key_idx[key1][key2] = idx
+    """
+    生成 key1(stg_run_id) 下 key2(ORM 类) 的下一个 idx
+    config.ORM_IDX_BLOCK_SIZE > 0 时通过 idx_allocator 从数据库按块预留，多进程、重启续跑均不会产生主键冲突，
+    否则使用进程内计数器
+    :param key1:
+    :param key2:
+    :return:
+    """
+    if config.ORM_IDX_BLOCK_SIZE > 0:
+        return idx_allocator.get_allocator().next_idx(key1, key2)
+    with _key_idx_lock:
+        idx = _key_idx[key1][key2]
+        idx += 1
+        _key_idx[key1][key2] = idx
     return idx
 
 
+def save_per_action(detail):
+    """
+    保存一条 ORM 记录，config.ORM_WRITE_BEHIND 为 True 时放入异步写入队列，由后台线程批量保存
+    :param detail:
+    :return:
+    """
+    if config.ORM_WRITE_BEHIND:
+        write_behind.get_writer().put(detail)
+    else:
+        with with_db_session(engine_ibats, expire_on_commit=False) as session:
+            session.add(detail)
+            session.commit()
+    latency.checkpoint(latency.STAGE_DB_COMMIT)
+
+
 class StgRunInfo(BaseModel):
     """策略运行信息"""
 
@@ -52,6 +80,21 @@ class StgRunInfo(BaseModel):
     trade_agent_params_list = Column(String(5000))
 
 
+class StgRunSummary(BaseModel):
+    """策略运行结果汇总，参数优化时可以仅保存汇总结果，不保存明细数据"""
+
+    __tablename__ = 'stg_run_summary'
+    stg_run_id = Column(Integer, primary_key=True)
+    stg_params = Column(String(5000))
+    trade_count = Column(Integer)
+    rr = Column(DOUBLE)
+    rr_compound = Column(DOUBLE)
+    cagr = Column(DOUBLE)
+    max_drawdown = Column(DOUBLE)
+    daily_sharpe = Column(DOUBLE)
+    summary = Column(String(5000))  # 其他汇总指标，json 格式
+
+
 class OrderDetail(BaseModel):
     """订单信息"""
 
@@ -210,68 +253,21 @@ class TradeDetail(BaseModel):
                              calc_mode=order_detail.calc_mode,
                              )
         if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(detail)
-                session.commit()
+            save_per_action(detail)
         return detail
 
 
-class PosStatusDetail(BaseModel):
+class PosStatusDetailBase:
     """
-    持仓状态数据
-    当持仓状态从有仓位到清仓时（position>0 --> position==0），计算清仓前的浮动收益，并设置到 floating_pl 字段最为当前状态的浮动收益
-    在调用 create_by_self 时，则需要处理一下，当 position==0 时，floating_pl 直接设置为 0，避免引起后续计算上的混淆
-    2018-11-02 当仓位多空切换时（1根K线内多头反手转空头），则浮动收益继续保持之前数字
+    持仓状态计算逻辑，供 PosStatusDetail（数据库记录）及 PosStatusDetailCompact（回测内存状态）共用
     """
-    __tablename__ = 'pos_status_detail'
-    stg_run_id = Column(Integer, primary_key=True)  # 对应回测了策略 StgRunID 此数据与 AccSumID 对应数据相同
-    pos_status_detail_idx = Column(Integer, primary_key=True)
-    trade_agent_key = Column(String(40))
-    trade_idx = Column(Integer)  # , comment="最新的成交id"
-    trade_dt = Column(DateTime)  # 每个订单变化生成一条记录 此数据与 AccSumID 对应数据相同
-    trade_date = Column(Date)  # 对应行情数据中 ActionDate
-    trade_time = Column(Time)  # 对应行情数据中 ActionTime
-    trade_millisec = Column(SmallInteger)  # 对应行情数据中 ActionMillisec
-    direction = Column(TINYINT)
-    symbol = Column(String(30))
-    position = Column(DOUBLE, default=0.0)
-    position_chg = Column(DOUBLE, default=0.0)
-    position_value = Column(DOUBLE, default=0.0)  # 持仓投资品种的总市值 position * trade_price * multiple
-    avg_price = Column(DOUBLE, default=0.0)  # 所持投资品种上一交易日所有交易的加权平均价
-    cur_price = Column(DOUBLE, default=0.0)
-    # 持仓收益，对于普通账户：
-    # (trade_price - avg_price_last) * position * int(pos_status_detail.direction) - commission
-    # 对于保证金交易：市值增量 - 保证金占比增量
-    # (市场价 - 成本价市值) * 仓位 * 方向 -
-    floating_pl = Column(DOUBLE, default=0.0)
-    # floating_pl_rate 与保证金比例 以及 乘数 变化没有关系
-    # (trade_price - avg_price) / avg_price * multiple * int(pos_status_detail.direction)
-    floating_pl_rate = Column(DOUBLE, default=0.0)
-    floating_pl_chg = Column(DOUBLE, default=0.0)
-    floating_pl_cum = Column(DOUBLE, default=0.0)
-    # 记录当前状态与前一状态之间净现金流变化情况
-    # 例如：
-    # 加仓，将导致净现金流为负，减仓则净现金流为正
-    # 在保证金交易的情况下，价格波动引起的保证金占用变化，也会使得净现金流产生变化
-    cashflow = Column(DOUBLE, default=0.0)
-    # 记录每日现金流变化情况
-    cashflow_daily = Column(DOUBLE, default=0.0)
-    # 累计现金流，整个执行周期内的累计现金净流入量。
-    # 该字段将用于与 TradeAgentStatusDetail.cash_init 相加，计算 cash_available 当前可用现金
-    cashflow_cum = Column(DOUBLE, default=0.0)
-    rr = Column(DOUBLE, default=0.0)  # floating_pl_cum / margin 如果是清仓，则使用前一时刻 margin
-    margin = Column(DOUBLE, default=0.0)
-    margin_chg = Column(DOUBLE, default=0.0)
-    position_date_type = Column(TINYINT, default=0)
-    commission = Column(DOUBLE, default=0)  # 当前bar上如果存在交易，则相应的费用记录在此，其他情况均为0
-    commission_tot = Column(DOUBLE, default=0)  # 累计费用
-    multiple = Column(DOUBLE, server_default='0')  # 合约乘数
-    margin_ratio = Column(DOUBLE, server_default='0')  # 保证金比例
-    calc_mode = Column(TINYINT)  # 计算模式：0 普通模式，1 保证金模式
-    logger = logging.getLogger(f'<Table:{__tablename__}>')
+    __slots__ = ()
+    # 是否记录 last_status、last_date_status 等指向上一状态的引用
+    keep_last_status = True
+    logger = logging.getLogger('<Table:pos_status_detail>')
 
     def __repr__(self):
-        return f"<PosStatusDetail(id='{self.pos_status_detail_idx}', trade_agent_key={self.trade_agent_key}, " \
+        return f"<{self.__class__.__name__}(id='{self.pos_status_detail_idx}', trade_agent_key={self.trade_agent_key}, " \
                f"trade_dt='{datetime_2_str(self.trade_dt)}', trade_idx='{self.trade_idx}', symbol='{self.symbol}', " \
                f"direction='{self.direction}', position='{self.position}', avg_price='{self.avg_price}', " \
                f"floating_pl='{self.floating_pl}', floating_pl_chg='{self.floating_pl_chg}', " \
@@ -315,11 +311,12 @@ class PosStatusDetail(BaseModel):
         self.multiple = multiple
         self.margin_ratio = margin_ratio
         self.calc_mode = calc_mode.value if isinstance(calc_mode, CalcMode) else calc_mode
-        self.last_status = None  # 记录上一个状态实例
-        self.last_date_status = None  # 记录上一日最后一个状态实例
+        if self.keep_last_status:
+            self.last_status = None  # 记录上一个状态实例
+            self.last_date_status = None  # 记录上一日最后一个状态实例
 
-    @staticmethod
-    def create_by_trade_detail(trade_detail: TradeDetail):
+    @classmethod
+    def create_by_trade_detail(cls, trade_detail: TradeDetail):
         direction, action, instrument_id = trade_detail.direction, trade_detail.action, trade_detail.symbol
         if action == int(Action.Close):
             raise ValueError('trade_detail.action 不能为 close')
@@ -335,41 +332,37 @@ class PosStatusDetail(BaseModel):
         floating_pl = -commission
         floating_pl_rate = floating_pl / margin
         cashflow = -margin - commission
-        detail = PosStatusDetail(stg_run_id=trade_detail.stg_run_id,
-                                 trade_agent_key=trade_detail.trade_agent_key,
-                                 trade_idx=trade_detail.trade_idx,
-                                 trade_dt=trade_detail.trade_dt,
-                                 trade_date=trade_detail.trade_date,
-                                 trade_time=trade_detail.trade_time,
-                                 trade_millisec=trade_detail.trade_millisec,
-                                 direction=trade_detail.direction,
-                                 symbol=trade_detail.symbol,
-                                 position=trade_vol,
-                                 position_chg=trade_vol,
-                                 avg_price=avg_price,
-                                 cur_price=trade_price,
-                                 margin=margin,
-                                 margin_chg=margin,
-                                 floating_pl=floating_pl,
-                                 floating_pl_rate=floating_pl_rate,
-                                 floating_pl_chg=floating_pl,
-                                 floating_pl_cum=floating_pl,
-                                 cashflow=cashflow,
-                                 cashflow_daily=cashflow,
-                                 cashflow_cum=cashflow,
-                                 rr=floating_pl_rate,
-                                 commission=commission,
-                                 commission_tot=commission,
-                                 position_date_type=PositionDateType.Today.value,
-                                 multiple=trade_detail.multiple,
-                                 margin_ratio=trade_detail.margin_ratio,
-                                 calc_mode=trade_detail.calc_mode,
-                                 )
-        if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
-            # 更新最新持仓纪录
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(detail)
-                session.commit()
+        detail = cls(stg_run_id=trade_detail.stg_run_id,
+                     trade_agent_key=trade_detail.trade_agent_key,
+                     trade_idx=trade_detail.trade_idx,
+                     trade_dt=trade_detail.trade_dt,
+                     trade_date=trade_detail.trade_date,
+                     trade_time=trade_detail.trade_time,
+                     trade_millisec=trade_detail.trade_millisec,
+                     direction=trade_detail.direction,
+                     symbol=trade_detail.symbol,
+                     position=trade_vol,
+                     position_chg=trade_vol,
+                     avg_price=avg_price,
+                     cur_price=trade_price,
+                     margin=margin,
+                     margin_chg=margin,
+                     floating_pl=floating_pl,
+                     floating_pl_rate=floating_pl_rate,
+                     floating_pl_chg=floating_pl,
+                     floating_pl_cum=floating_pl,
+                     cashflow=cashflow,
+                     cashflow_daily=cashflow,
+                     cashflow_cum=cashflow,
+                     rr=floating_pl_rate,
+                     commission=commission,
+                     commission_tot=commission,
+                     position_date_type=PositionDateType.Today.value,
+                     multiple=trade_detail.multiple,
+                     margin_ratio=trade_detail.margin_ratio,
+                     calc_mode=trade_detail.calc_mode,
+                     )
+        detail._save_per_action()
         return detail
 
     def update_by_trade_detail(self, trade_detail: TradeDetail):
@@ -611,11 +604,7 @@ class PosStatusDetail(BaseModel):
 
         # self.logger.debug("%s", pos_status_detail)
 
-        if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
-            # 更新最新持仓纪录
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(detail)
-                session.commit()
+        detail._save_per_action()
         return detail
 
     def update_by_md(self, trade_price, timestamp_curr: (datetime, pd.Timestamp) = None,
@@ -715,11 +704,7 @@ class PosStatusDetail(BaseModel):
         # sqlalchemy.exc.ProgrammingError: (MySQLdb._exceptions.ProgrammingError) nan can not be used with MySQL
         detail.rr = (detail.floating_pl_cum / detail.margin) if detail.margin > 0 else 0
 
-        if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
-            # 更新最新持仓纪录
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(detail)
-                session.commit()
+        detail._save_per_action()
 
         return detail
 
@@ -738,41 +723,102 @@ class PosStatusDetail(BaseModel):
             cashflow_daily = self.cashflow_daily
             position_date_type = self.position_date_type
 
-        detail = PosStatusDetail(stg_run_id=self.stg_run_id,
-                                 trade_agent_key=self.trade_agent_key,
-                                 trade_idx=self.trade_idx,
-                                 trade_dt=self.trade_dt,
-                                 trade_date=self.trade_date,
-                                 trade_time=self.trade_time,
-                                 trade_millisec=self.trade_millisec,
-                                 direction=self.direction,
-                                 symbol=self.symbol,
-                                 position=position,
-                                 avg_price=self.avg_price,
-                                 cur_price=self.cur_price,
-                                 floating_pl=self.floating_pl if position > 0 else 0,
-                                 floating_pl_rate=0.0,
-                                 floating_pl_cum=self.floating_pl_cum,
-                                 cashflow=0.0,
-                                 cashflow_daily=cashflow_daily,
-                                 cashflow_cum=self.cashflow_cum,
-                                 margin=self.margin,
-                                 margin_chg=0,
-                                 position_date_type=position_date_type,
-                                 commission=0.0,
-                                 commission_tot=self.commission_tot,
-                                 multiple=self.multiple,
-                                 margin_ratio=self.margin_ratio,
-                                 calc_mode=self.calc_mode
-                                 )
-        detail.last_status = self
-        if is_new_day:
-            detail.last_date_status = self
-        else:
-            detail.last_date_status = self.last_date_status
+        detail = self.__class__(stg_run_id=self.stg_run_id,
+                                trade_agent_key=self.trade_agent_key,
+                                trade_idx=self.trade_idx,
+                                trade_dt=self.trade_dt,
+                                trade_date=self.trade_date,
+                                trade_time=self.trade_time,
+                                trade_millisec=self.trade_millisec,
+                                direction=self.direction,
+                                symbol=self.symbol,
+                                position=position,
+                                avg_price=self.avg_price,
+                                cur_price=self.cur_price,
+                                floating_pl=self.floating_pl if position > 0 else 0,
+                                floating_pl_rate=0.0,
+                                floating_pl_cum=self.floating_pl_cum,
+                                cashflow=0.0,
+                                cashflow_daily=cashflow_daily,
+                                cashflow_cum=self.cashflow_cum,
+                                margin=self.margin,
+                                margin_chg=0,
+                                position_date_type=position_date_type,
+                                commission=0.0,
+                                commission_tot=self.commission_tot,
+                                multiple=self.multiple,
+                                margin_ratio=self.margin_ratio,
+                                calc_mode=self.calc_mode
+                                )
+        if self.keep_last_status:
+            detail.last_status = self
+            if is_new_day:
+                detail.last_date_status = self
+            else:
+                detail.last_date_status = self.last_date_status
 
         return detail
 
+    def _save_per_action(self):
+        """config.ORM_UPDATE_OR_INSERT_PER_ACTION 为 True 时，每一次状态变化均保存到数据库"""
+        if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
+            # 更新最新持仓纪录
+            save_per_action(self)
+
+
+class PosStatusDetail(PosStatusDetailBase, BaseModel):
+    """
+    持仓状态数据
+    当持仓状态从有仓位到清仓时（position>0 --> position==0），计算清仓前的浮动收益，并设置到 floating_pl 字段最为当前状态的浮动收益
+    在调用 create_by_self 时，则需要处理一下，当 position==0 时，floating_pl 直接设置为 0，避免引起后续计算上的混淆
+    2018-11-02 当仓位多空切换时（1根K线内多头反手转空头），则浮动收益继续保持之前数字
+    """
+    __tablename__ = 'pos_status_detail'
+    stg_run_id = Column(Integer, primary_key=True)  # 对应回测了策略 StgRunID 此数据与 AccSumID 对应数据相同
+    pos_status_detail_idx = Column(Integer, primary_key=True)
+    trade_agent_key = Column(String(40))
+    trade_idx = Column(Integer)  # , comment="最新的成交id"
+    trade_dt = Column(DateTime)  # 每个订单变化生成一条记录 此数据与 AccSumID 对应数据相同
+    trade_date = Column(Date)  # 对应行情数据中 ActionDate
+    trade_time = Column(Time)  # 对应行情数据中 ActionTime
+    trade_millisec = Column(SmallInteger)  # 对应行情数据中 ActionMillisec
+    direction = Column(TINYINT)
+    symbol = Column(String(30))
+    position = Column(DOUBLE, default=0.0)
+    position_chg = Column(DOUBLE, default=0.0)
+    position_value = Column(DOUBLE, default=0.0)  # 持仓投资品种的总市值 position * trade_price * multiple
+    avg_price = Column(DOUBLE, default=0.0)  # 所持投资品种上一交易日所有交易的加权平均价
+    cur_price = Column(DOUBLE, default=0.0)
+    # 持仓收益，对于普通账户：
+    # (trade_price - avg_price_last) * position * int(pos_status_detail.direction) - commission
+    # 对于保证金交易：市值增量 - 保证金占比增量
+    # (市场价 - 成本价市值) * 仓位 * 方向 -
+    floating_pl = Column(DOUBLE, default=0.0)
+    # floating_pl_rate 与保证金比例 以及 乘数 变化没有关系
+    # (trade_price - avg_price) / avg_price * multiple * int(pos_status_detail.direction)
+    floating_pl_rate = Column(DOUBLE, default=0.0)
+    floating_pl_chg = Column(DOUBLE, default=0.0)
+    floating_pl_cum = Column(DOUBLE, default=0.0)
+    # 记录当前状态与前一状态之间净现金流变化情况
+    # 例如：
+    # 加仓，将导致净现金流为负，减仓则净现金流为正
+    # 在保证金交易的情况下，价格波动引起的保证金占用变化，也会使得净现金流产生变化
+    cashflow = Column(DOUBLE, default=0.0)
+    # 记录每日现金流变化情况
+    cashflow_daily = Column(DOUBLE, default=0.0)
+    # 累计现金流，整个执行周期内的累计现金净流入量。
+    # 该字段将用于与 TradeAgentStatusDetail.cash_init 相加，计算 cash_available 当前可用现金
+    cashflow_cum = Column(DOUBLE, default=0.0)
+    rr = Column(DOUBLE, default=0.0)  # floating_pl_cum / margin 如果是清仓，则使用前一时刻 margin
+    margin = Column(DOUBLE, default=0.0)
+    margin_chg = Column(DOUBLE, default=0.0)
+    position_date_type = Column(TINYINT, default=0)
+    commission = Column(DOUBLE, default=0)  # 当前bar上如果存在交易，则相应的费用记录在此，其他情况均为0
+    commission_tot = Column(DOUBLE, default=0)  # 累计费用
+    multiple = Column(DOUBLE, server_default='0')  # 合约乘数
+    margin_ratio = Column(DOUBLE, server_default='0')  # 保证金比例
+    calc_mode = Column(TINYINT)  # 计算模式：0 普通模式，1 保证金模式
+
     @staticmethod
     def remove(stg_run_id: int):
         """
@@ -788,37 +834,29 @@ class PosStatusDetail(BaseModel):
         # PosStatusInfo.query.filter
 
 
-class TradeAgentStatusDetail(BaseModel):
-    """持仓状态数据"""
-    __tablename__ = 'trade_agent_status_detail'
-    stg_run_id = Column(Integer, primary_key=True)  # 对应回测了策略 StgRunID 此数据与 AccSumID 对应数据相同
-    trade_agent_status_detail_idx = Column(Integer, primary_key=True)
-    trade_agent_key = Column(String(40))
-    trade_dt = Column(DateTime)
-    trade_date = Column(Date)  # 对应行情数据中 ActionDate
-    trade_time = Column(Time)  # 对应行情数据中 ActionTime
-    trade_millisec = Column(Integer)  # 对应行情数据中 ActionMillisec
-    # 可用资金, double
-    # detail.cash_init + close_profit - curr_margin - commission + (position_value - curr_margin)
-    # 对于没有杠杆的产品 position_value == curr_margin 因此 (position_value - curr_margin) == 0
-    cash_available_last_day = Column(DOUBLE, default=0.0)
-    cash_available = Column(DOUBLE, default=0.0)
-    position_value = Column(DOUBLE, default=0.0)
-    curr_margin = Column(DOUBLE, default=0.0)  # 当前保证金总额, double
-    close_profit = Column(DOUBLE, default=0.0)
-    position_profit = Column(DOUBLE, default=0.0)
-    floating_pl_cum = Column(DOUBLE, default=0.0)
-    commission_tot = Column(DOUBLE, default=0.0)
-    cash_init = Column(DOUBLE, default=0.0)
-    cash_and_margin = Column(DOUBLE, default=0.0)
-    cashflow_daily = Column(DOUBLE, default=0.0)
-    cashflow_cum = Column(DOUBLE, default=0.0)
-    rr = Column(DOUBLE, default=0.0)  # Return Rate
-    rr_nc = Column(DOUBLE, default=0.0)  # Return Rate Compound
-    rr_compound = Column(DOUBLE, default=0.0)  # Return Rate No Commission
-    rr_compound_nc = Column(DOUBLE, default=0.0)  # Return Rate Compound No Commission
-    calc_mode = Column(TINYINT)  # 计算模式：0 普通模式，1 保证金模式
-    logger = logging.getLogger(f'<Table:{__tablename__}>')
+class PosStatusDetailCompact(PosStatusDetailBase):
+    """
+    回测过程中使用的轻量级持仓状态，字段与 PosStatusDetail 一致
+    使用 __slots__ 保存数据，不记录上一状态引用，仅在 release 时通过 to_dict 转换为记录批量保存
+    """
+    __slots__ = tuple(PosStatusDetail.__table__.columns.keys())
+    keep_last_status = False
+
+    def _save_per_action(self):
+        pass
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class TradeAgentStatusDetailBase:
+    """
+    账户状态计算逻辑，供 TradeAgentStatusDetail（数据库记录）及 TradeAgentStatusDetailCompact（回测内存状态）共用
+    """
+    __slots__ = ()
+    # 是否记录 last_status 等指向上一状态的引用
+    keep_last_status = True
+    logger = logging.getLogger('<Table:trade_agent_status_detail>')
 
     def __init__(self, stg_run_id=None, trade_agent_key=None,
                  trade_dt=None, trade_date=None, trade_time=None, trade_millisec=None, cash_available_last_day=0.0,
@@ -853,18 +891,19 @@ class TradeAgentStatusDetail(BaseModel):
         self.calc_mode = calc_mode.value if isinstance(calc_mode, CalcMode) else calc_mode
         self.run_mode = run_mode.value if isinstance(run_mode, RunMode) else run_mode
         self.pos_status_detail_dic = {}  # 用于记录当期状态对应的 pos_status_detail_dic
-        self.last_status = None  # 用于记录上一个状态的实力
+        if self.keep_last_status:
+            self.last_status = None  # 用于记录上一个状态的实力
 
     def __repr__(self):
-        return f"<TradeAgentStatusDetail(id='{self.trade_agent_status_detail_idx}', " \
+        return f"<{self.__class__.__name__}(id='{self.trade_agent_status_detail_idx}', " \
                f"trade_agent_key={self.trade_agent_key}, trade_dt='{datetime_2_str(self.trade_dt)}', " \
                f"cash_available='{self.cash_available}', cash_available_last_day='{self.cash_available_last_day}', " \
                f"cashflow_daily='{self.cashflow_daily}', cashflow_cum='{self.cashflow_cum}', " \
                f"cash_and_margin='{self.cashflow_cum}', cash_and_margin='{self.cashflow_cum}', " \
                f"floating_pl_cum='{self.floating_pl_cum}')>"
 
-    @staticmethod
-    def create_t_1(stg_run_id, trade_agent_key, init_cash: int, timestamp_curr: (datetime, pd.Timestamp) = None,
+    @classmethod
+    def create_t_1(cls, stg_run_id, trade_agent_key, init_cash: int, timestamp_curr: (datetime, pd.Timestamp) = None,
                    md: dict = None, timestamp_key=None, date_key=None, time_key=None, milli_sec_key=None,
                    calc_mode: (int, CalcMode) = CalcMode.Normal.value,
                    run_mode: (int, RunMode) = RunMode.Backtest.value):
@@ -901,27 +940,23 @@ class TradeAgentStatusDetail(BaseModel):
             trade_millisec = int(md.setdefault(milli_sec_key, 0)) if milli_sec_key is not None else 0
 
         # calc_mode = calc_mode.value if isinstance(calc_mode, CalcMode) else calc_mode
-        acc_status_detail = TradeAgentStatusDetail(stg_run_id=stg_run_id,
-                                                   trade_agent_key=trade_agent_key,
-                                                   trade_dt=trade_dt,
-                                                   trade_date=trade_date,
-                                                   trade_time=trade_time,
-                                                   trade_millisec=trade_millisec,
-                                                   cash_available_last_day=init_cash,
-                                                   cash_available=init_cash,
-                                                   position_value=0,
-                                                   curr_margin=0,
-                                                   close_profit=0,
-                                                   position_profit=0,
-                                                   cash_init=init_cash,
-                                                   calc_mode=calc_mode,
-                                                   run_mode=run_mode,
-                                                   )
-        if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
-            # 更新最新持仓纪录
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(acc_status_detail)
-                session.commit()
+        acc_status_detail = cls(stg_run_id=stg_run_id,
+                                trade_agent_key=trade_agent_key,
+                                trade_dt=trade_dt,
+                                trade_date=trade_date,
+                                trade_time=trade_time,
+                                trade_millisec=trade_millisec,
+                                cash_available_last_day=init_cash,
+                                cash_available=init_cash,
+                                position_value=0,
+                                curr_margin=0,
+                                close_profit=0,
+                                position_profit=0,
+                                cash_init=init_cash,
+                                calc_mode=calc_mode,
+                                run_mode=run_mode,
+                                )
+        acc_status_detail._save_per_action()
         return acc_status_detail
 
     def create_by_self(self, is_new_day=False):
@@ -930,25 +965,26 @@ class TradeAgentStatusDetail(BaseModel):
         :return: 
         """
         cash_available_last_day = self.cash_available if is_new_day else self.cash_available_last_day
-        detail = TradeAgentStatusDetail(stg_run_id=self.stg_run_id,
-                                        trade_agent_key=self.trade_agent_key,
-                                        trade_date=self.trade_date,
-                                        trade_time=self.trade_time,
-                                        trade_millisec=self.trade_millisec,
-                                        cash_available_last_day=cash_available_last_day,
-                                        cash_available=self.cash_available,
-                                        curr_margin=self.curr_margin,
-                                        close_profit=self.close_profit,
-                                        position_profit=self.position_profit,
-                                        floating_pl_cum=self.floating_pl_cum,
-                                        cashflow_daily=self.cashflow_daily,
-                                        cashflow_cum=self.cashflow_cum,
-                                        commission_tot=self.commission_tot,
-                                        cash_init=self.cash_init,
-                                        calc_mode=self.calc_mode,
-                                        run_mode=self.run_mode,
-                                        )
-        detail.last_status = self
+        detail = self.__class__(stg_run_id=self.stg_run_id,
+                                trade_agent_key=self.trade_agent_key,
+                                trade_date=self.trade_date,
+                                trade_time=self.trade_time,
+                                trade_millisec=self.trade_millisec,
+                                cash_available_last_day=cash_available_last_day,
+                                cash_available=self.cash_available,
+                                curr_margin=self.curr_margin,
+                                close_profit=self.close_profit,
+                                position_profit=self.position_profit,
+                                floating_pl_cum=self.floating_pl_cum,
+                                cashflow_daily=self.cashflow_daily,
+                                cashflow_cum=self.cashflow_cum,
+                                commission_tot=self.commission_tot,
+                                cash_init=self.cash_init,
+                                calc_mode=self.calc_mode,
+                                run_mode=self.run_mode,
+                                )
+        if self.keep_last_status:
+            detail.last_status = self
         return detail
 
     def update_by_pos_status_detail(
@@ -972,7 +1008,9 @@ class TradeAgentStatusDetail(BaseModel):
             detail = self._update_by_pos_status_detail_fix_percent(
                 pos_status_detail_dic, timestamp_curr, md, timestamp_key, date_key, time_key, milli_sec_key)
 
-        detail.pos_status_detail_dic = pos_status_detail_dic.copy()
+        if self.keep_last_status or self.run_mode == RunMode.Backtest_FixPercent.value:
+            # 固定比例仓位模式下，需要根据上一状态的 pos_status_detail_dic 计算
+            detail.pos_status_detail_dic = pos_status_detail_dic.copy()
         return detail
 
     def _update_by_pos_status_detail(self, pos_status_detail_dic, timestamp_curr: (datetime, pd.Timestamp) = None,
@@ -1065,11 +1103,7 @@ class TradeAgentStatusDetail(BaseModel):
         detail.rr_compound = (detail.rr - self.rr + 1) * (self.rr + 1) - 1
         detail.rr_compound_nc = (detail.rr_nc - self.rr_nc + 1) * (self.rr_nc + 1) - 1
 
-        if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
-            # 更新最新持仓纪录
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(detail)
-                session.commit()
+        detail._save_per_action()
         return detail
 
     def _update_by_pos_status_detail_fix_percent(self, pos_status_detail_dic,
@@ -1205,12 +1239,61 @@ class TradeAgentStatusDetail(BaseModel):
         detail.rr_compound = (detail.rr - self.rr + 1) * (self.rr + 1) - 1
         detail.rr_compound_nc = (detail.rr_nc - self.rr_nc + 1) * (self.rr_nc + 1) - 1
 
+        detail._save_per_action()
+        return detail
+
+    def _save_per_action(self):
+        """config.ORM_UPDATE_OR_INSERT_PER_ACTION 为 True 时，每一次状态变化均保存到数据库"""
         if config.ORM_UPDATE_OR_INSERT_PER_ACTION:
             # 更新最新持仓纪录
-            with with_db_session(engine_ibats, expire_on_commit=False) as session:
-                session.add(detail)
-                session.commit()
-        return detail
+            save_per_action(self)
+
+
+class TradeAgentStatusDetail(TradeAgentStatusDetailBase, BaseModel):
+    """持仓状态数据"""
+    __tablename__ = 'trade_agent_status_detail'
+    stg_run_id = Column(Integer, primary_key=True)  # 对应回测了策略 StgRunID 此数据与 AccSumID 对应数据相同
+    trade_agent_status_detail_idx = Column(Integer, primary_key=True)
+    trade_agent_key = Column(String(40))
+    trade_dt = Column(DateTime)
+    trade_date = Column(Date)  # 对应行情数据中 ActionDate
+    trade_time = Column(Time)  # 对应行情数据中 ActionTime
+    trade_millisec = Column(Integer)  # 对应行情数据中 ActionMillisec
+    # 可用资金, double
+    # detail.cash_init + close_profit - curr_margin - commission + (position_value - curr_margin)
+    # 对于没有杠杆的产品 position_value == curr_margin 因此 (position_value - curr_margin) == 0
+    cash_available_last_day = Column(DOUBLE, default=0.0)
+    cash_available = Column(DOUBLE, default=0.0)
+    position_value = Column(DOUBLE, default=0.0)
+    curr_margin = Column(DOUBLE, default=0.0)  # 当前保证金总额, double
+    close_profit = Column(DOUBLE, default=0.0)
+    position_profit = Column(DOUBLE, default=0.0)
+    floating_pl_cum = Column(DOUBLE, default=0.0)
+    commission_tot = Column(DOUBLE, default=0.0)
+    cash_init = Column(DOUBLE, default=0.0)
+    cash_and_margin = Column(DOUBLE, default=0.0)
+    cashflow_daily = Column(DOUBLE, default=0.0)
+    cashflow_cum = Column(DOUBLE, default=0.0)
+    rr = Column(DOUBLE, default=0.0)  # Return Rate
+    rr_nc = Column(DOUBLE, default=0.0)  # Return Rate Compound
+    rr_compound = Column(DOUBLE, default=0.0)  # Return Rate No Commission
+    rr_compound_nc = Column(DOUBLE, default=0.0)  # Return Rate Compound No Commission
+    calc_mode = Column(TINYINT)  # 计算模式：0 普通模式，1 保证金模式
+
+
+class TradeAgentStatusDetailCompact(TradeAgentStatusDetailBase):
+    """
+    回测过程中使用的轻量级账户状态，字段与 TradeAgentStatusDetail 一致
+    使用 __slots__ 保存数据，不记录上一状态引用，仅在 release 时通过 to_dict 转换为记录批量保存
+    """
+    __slots__ = tuple(TradeAgentStatusDetail.__table__.columns.keys()) + ('run_mode', 'pos_status_detail_dic')
+    keep_last_status = False
+
+    def _save_per_action(self):
+        pass
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in TradeAgentStatusDetail.__table__.columns.keys()}
 
 
 class StgRunStatusDetail(BaseModel):
@@ -1444,6 +1527,7 @@ def init():
     global engine_ibats
     engine_ibats = engines.engine_ibats
     BaseModel.metadata.create_all(engine_ibats)
+    idx_allocator.metadata.create_all(engine_ibats)
     alter_table_2_myisam(engine_ibats)
     logger.info("所有表结构建立完成")
     init_data()
@@ -1453,7 +1537,55 @@ def init():
 # start_heart_beat_thread()
 
 
+def _test_status_detail_memory_benchmark(bar_count=20000):
+    """
+    对比回测过程中 PosStatusDetail、TradeAgentStatusDetail 与对应的 Compact 轻量级状态对象的内存占用情况
+    模拟一个持仓品种逐根K线更新持仓状态及账户状态，全部状态对象保存在列表中（与 BacktestTraderAgentBase 一致）
+    :param bar_count: K线数量
+    :return:
+    """
+    import tracemalloc
+    orm_update_or_insert_per_action = config.ORM_UPDATE_OR_INSERT_PER_ACTION
+    config.ORM_UPDATE_OR_INSERT_PER_ACTION = False
+    timestamp_from = datetime(2010, 1, 1, 9, 0, 0)
+    result_dic = {}
+    try:
+        for pos_class, trade_agent_class in [
+            (PosStatusDetail, TradeAgentStatusDetail), (PosStatusDetailCompact, TradeAgentStatusDetailCompact)]:
+            tracemalloc.start()
+            pos_status_detail = pos_class(
+                stg_run_id=0, trade_agent_key='benchmark', trade_dt=timestamp_from, trade_date=timestamp_from.date(),
+                trade_time=timestamp_from.time(), direction=int(Direction.Long), symbol='RB', position=100,
+                avg_price=3000, cur_price=3000, margin=300000, multiple=1, margin_ratio=1)
+            trade_agent_status_detail = trade_agent_class.create_t_1(
+                0, trade_agent_key='benchmark', init_cash=1000000, timestamp_curr=timestamp_from)
+            pos_status_detail_list, trade_agent_status_detail_list = [], []
+            blocks_start = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+            for num in range(bar_count):
+                timestamp_curr = timestamp_from + timedelta(minutes=num + 1)
+                pos_status_detail = pos_status_detail.update_by_md(
+                    trade_price=3000 + num % 100, timestamp_curr=timestamp_curr)
+                pos_status_detail_list.append(pos_status_detail)
+                trade_agent_status_detail = trade_agent_status_detail.update_by_pos_status_detail(
+                    {'RB': pos_status_detail}, timestamp_curr)
+                trade_agent_status_detail_list.append(trade_agent_status_detail)
+
+            blocks_end = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result_dic[pos_class.__name__] = (peak, (blocks_end - blocks_start) / bar_count)
+            del pos_status_detail_list, trade_agent_status_detail_list
+    finally:
+        config.ORM_UPDATE_OR_INSERT_PER_ACTION = orm_update_or_insert_per_action
+
+    for name, (peak, blocks_per_bar) in result_dic.items():
+        logger.info("%s %d 根K线 内存峰值 %.2f MB，每根K线存活内存块 %.1f 个",
+                    name, bar_count, peak / 1024 / 1024, blocks_per_bar)
+    return result_dic
+
+
 if __name__ == "__main__":
+    # _test_status_detail_memory_benchmark()
     init()
     # 创建user表，继承metadata类
     # Engine使用Schama Type创建一个特定的结构对象
@@ -7,15 +7,36 @@
 @contact : mmmaaaggg@163.com
 @desc    : 
 """
+import logging
+
 import numpy as np
 import pandas as pd
 
+logger = logging.getLogger(__name__)
 VERSION_V1 = 'v1'
 VERSION_V2 = 'v2'
+# Account 每一步记录的数据项
+BUFFER_COLUMNS = ['value', 'reward', 'cash', 'action', 'fee_tot', 'value_fee0', 'action_count', 'nav', 'nav_fee0']
+BUFFER_COLUMNS_FEE0 = ['value', 'reward', 'reward_fee0', 'cash', 'action', 'fee_tot', 'value_fee0', 'action_count',
+                       'nav', 'nav_fee0']
+# generate_reward_df 返回的列
+REWARD_DF_COLUMNS = ['value', 'reward', 'reward_fee0', 'cash', 'action', 'open', 'close', 'fee_tot', 'value_fee0',
+                     'action_count', 'nav', 'nav_fee0']
 
 
 class Account(object):
-    def __init__(self, md_df, data_factors, expand_dims=True, state_with_flag=False, version=VERSION_V1, **kwargs):
+    def __init__(self, md_df, data_factors, expand_dims=True, state_with_flag=False, version=VERSION_V1,
+                 summary_only=False, **kwargs):
+        """
+        :param md_df: 行情数据
+        :param data_factors: 因子数据
+        :param expand_dims: 返回的 state 是否增加第一维
+        :param state_with_flag: observation 是否包含多空标识
+        :param version: QuotesMarket 版本
+        :param summary_only: 仅记录最新的 nav、费用合计、交易次数（见 get_summary），不记录每一步的数据，
+            此时 generate_reward_df 不可用，用于大规模训练
+        :param kwargs: QuotesMarket 的其他参数
+        """
         if version == VERSION_V1:
             from ibats_common.backend.rl.emulator.market import QuotesMarket, ACTION_CLOSE
         elif version == VERSION_V2:
@@ -23,20 +44,70 @@ class Account(object):
         else:
             raise ValueError(f'param version can only be one of {(VERSION_V1, VERSION_V2)}')
         self.A = QuotesMarket(md_df, data_factors, state_with_flag=state_with_flag, **kwargs)
-        self.buffer_reward = [0.0]
-        self.buffer_value = [self.A.total_value]
-        self.buffer_action = [ACTION_CLOSE]
-        self.buffer_cash = [self.A.init_cash]
-        self.buffer_fee = [0.0]
-        self.buffer_value_fee0 = [self.A.total_value]
-        self.buffer_fee_tot = [0.0]
-        self.buffer_action_count = [0]
+        self.action_close = ACTION_CLOSE
+        self.summary_only = summary_only
+        # 每一步的记录，按 max_step_count 一次性分配，reset 时不重新分配
+        self.buffer_columns = BUFFER_COLUMNS_FEE0 if self.A.reward_with_fee0 else BUFFER_COLUMNS
+        self._buffer = None if summary_only else np.zeros(self.A.max_step_count + 1, dtype=[
+            (_, np.int64 if _ in ('action', 'action_count') else np.float64) for _ in self.buffer_columns])
+        self._buffer_len = 0
+        # summary_only 模式下逐步计算 nav
+        self._nav, self._nav_fee0 = 1.0, 1.0
+        self._cum_rr, self._cum_rr_fee0 = 0.0, 0.0
+        # 记录最新一步数据的方法
+        if summary_only:
+            self._record = self._record_summary
+        elif self.A.reward_with_fee0:
+            self._record = self._record_buffer_fee0
+        else:
+            self._record = self._record_buffer
+        self._reset_buffer()
         self.expand_dims = expand_dims
         self.actions = self.A.get_action_operations()
         self.action_size = len(self.actions)
         self.state_with_flag = state_with_flag
         self.version = version
 
+    def _reset_buffer(self):
+        self._buffer_len = 0
+        self._nav, self._nav_fee0 = 1.0, 1.0
+        self._cum_rr, self._cum_rr_fee0 = 0.0, 0.0
+        self._record(self.action_close, (0.0, 0.0) if self.A.reward_with_fee0 else 0.0)
+
+    def _record_summary(self, action, reward):
+        # nav 的计算方法与 cum_linear_rr_2_cum_exp_rr 一致
+        market = self.A
+        cum_rr = market.total_value / market.init_cash - 1
+        cum_rr_fee0 = market.total_value_fee0 / market.init_cash - 1
+        self._nav *= (cum_rr - self._cum_rr) + 1
+        self._nav_fee0 *= (cum_rr_fee0 - self._cum_rr_fee0) + 1
+        self._cum_rr, self._cum_rr_fee0 = cum_rr, cum_rr_fee0
+        self._buffer_len += 1
+
+    def _record_buffer(self, action, reward):
+        market = self.A
+        self._buffer[self._buffer_len] = (
+            market.total_value, reward, market.cash, action, market.fee_tot, market.total_value_fee0,
+            market.action_count, 0.0, 0.0)
+        self._buffer_len += 1
+
+    def _record_buffer_fee0(self, action, reward):
+        market = self.A
+        self._buffer[self._buffer_len] = (
+            market.total_value, reward[0], reward[1], market.cash, action, market.fee_tot, market.total_value_fee0,
+            market.action_count, 0.0, 0.0)
+        self._buffer_len += 1
+
+    def _calc_nav(self):
+        """根据缓冲区中的 value、value_fee0 计算 nav、nav_fee0 并写入缓冲区"""
+        data_len = self._buffer_len
+        for value_name, nav_name in (('value', 'nav'), ('value_fee0', 'nav_fee0')):
+            cum_rr_arr = self._buffer[value_name][:data_len] / self.A.init_cash - 1
+            rr_arr = cum_rr_arr.copy()
+            rr_arr[1:] -= cum_rr_arr[:-1]
+            rr_arr += 1
+            np.cumprod(rr_arr, out=self._buffer[nav_name][:data_len])
+
     def reset(self):
         if self.expand_dims:
             # return np.expand_dims(self.A.reset(), 0)
@@ -48,21 +119,7 @@ class Account(object):
         else:
             init_state = self.A.reset()
 
-        if self.version == VERSION_V1:
-            from ibats_common.backend.rl.emulator.market import ACTION_CLOSE
-        elif self.version == VERSION_V2:
-            from ibats_common.backend.rl.emulator.market2 import ACTION_CLOSE
-        else:
-            raise ValueError(f'param version can only be one of {(VERSION_V1, VERSION_V2)}')
-
-        self.buffer_reward = [0.0]
-        self.buffer_value = [self.A.total_value]
-        self.buffer_action = [ACTION_CLOSE]
-        self.buffer_cash = [self.A.init_cash]
-        self.buffer_fee = [0.0]
-        self.buffer_value_fee0 = [self.A.total_value]
-        self.buffer_fee_tot = [0.0]
-        self.buffer_action_count = [0]
+        self._reset_buffer()
         return init_state
 
     def latest_state(self):
@@ -78,14 +135,7 @@ class Account(object):
 
     def step(self, action):
         next_state, reward, done = self.A.step(action)
-
-        self.buffer_action.append(action)
-        self.buffer_reward.append(reward)
-        self.buffer_value.append(self.A.total_value)
-        self.buffer_cash.append(self.A.cash)
-        self.buffer_fee_tot.append(self.A.fee_tot)
-        self.buffer_value_fee0.append(self.A.total_value_fee0)
-        self.buffer_action_count.append(self.A.action_count)
+        self._record(action, reward)
         if self.expand_dims:
             if self.state_with_flag:
                 return (np.expand_dims(next_state[0], 0), next_state[1]), reward, done
@@ -94,25 +144,54 @@ class Account(object):
         else:
             return next_state, reward, done
 
+    def get_summary(self) -> dict:
+        """最新的 nav、费用合计、交易次数等汇总数据，summary_only 模式下同样可用"""
+        if self._buffer is None:
+            nav, nav_fee0 = self._nav, self._nav_fee0
+        else:
+            self._calc_nav()
+            nav, nav_fee0 = self._buffer['nav'][self._buffer_len - 1], self._buffer['nav_fee0'][self._buffer_len - 1]
+        return {
+            "step_count": self._buffer_len - 1,
+            "value": self.A.total_value,
+            "nav": nav,
+            "nav_fee0": nav_fee0,
+            "fee_tot": self.A.fee_tot,
+            "action_count": self.A.action_count,
+        }
+
+    def get_buffer(self, name) -> np.ndarray:
+        """
+        获取某一项每一步的记录（与缓冲区共享内存的视图）
+        :param name: BUFFER_COLUMNS 中的一项
+        """
+        if self._buffer is None:
+            raise ValueError('summary_only 模式下没有记录每一步的数据')
+        return self._buffer[name][:self._buffer_len]
+
     def plot_data(self) -> pd.DataFrame:
         return self.generate_reward_df()
 
-    def generate_reward_df(self) -> pd.DataFrame:
-        reward_df = pd.DataFrame(
-            {"value": self.buffer_value,
-             "reward": self.buffer_reward,
-             "cash": self.buffer_cash,
-             "action": self.buffer_action,
-             "open": self.A.data_open.iloc[:len(self.buffer_action)],
-             "close": self.A.data_close.iloc[:len(self.buffer_action)],
-             "fee_tot": self.buffer_fee_tot,
-             "value_fee0": self.buffer_value_fee0,
-             "action_count": self.buffer_action_count,
-             }, index=self.A.data_close.index[:len(self.buffer_action)])
-        cum_rr_s = reward_df['value'] / self.A.init_cash - 1
-        reward_df['nav'] = cum_linear_rr_2_cum_exp_rr(cum_rr_s)
-        cum_rr_s = reward_df['value_fee0'] / self.A.init_cash - 1
-        reward_df['nav_fee0'] = cum_linear_rr_2_cum_exp_rr(cum_rr_s)
+    def generate_reward_df(self, copy=True) -> pd.DataFrame:
+        """
+        每一步的记录
+        reward_with_fee0 时，reward 列为含费用的 reward，另增加 reward_fee0 列
+        :param copy: 默认复制数据；False 时各列为缓冲区（及行情数据）的只读视图，不复制数据，
+            reset 或继续 step 后缓冲区中的数据会被覆盖，仅适用于立即使用、不保留结果的场景
+        :return:
+        """
+        if self._buffer is None:
+            raise ValueError('summary_only 模式下没有记录每一步的数据')
+        self._calc_nav()
+        data_len = self._buffer_len
+        data_dic = {name: self._buffer[name][:data_len] for name in self.buffer_columns}
+        data_dic['open'] = self.A.data_open.to_numpy()[:data_len]
+        data_dic['close'] = self.A.data_close.to_numpy()[:data_len]
+        if not copy:
+            for view in data_dic.values():
+                view.flags.writeable = False
+        columns = [_ for _ in REWARD_DF_COLUMNS if _ in data_dic]
+        reward_df = pd.DataFrame(data_dic, columns=columns, index=self.A.data_close.index[:data_len], copy=copy)
         return reward_df
 
 
@@ -186,6 +265,27 @@ def _test_account2():
     plot_twin(value_s, md_df["close"], name=title)
 
 
+def _test_account_step_benchmark(step_count=20000):
+    """测试 Account.step 每秒执行次数，v1、v2 两个版本"""
+    import time
+    ohlcav_col_name_list = ["open", "high", "low", "close", "amount", "volume"]
+    from ibats_common.example.data import load_data
+    md_df = load_data('RB.csv').set_index('trade_date')[ohlcav_col_name_list]
+    md_df.index = pd.DatetimeIndex(md_df.index)
+    data_factors = np.random.randn(md_df.shape[0], 60, 30).astype(np.float32)
+    action_arr = np.random.randint(4, size=step_count)
+    for version in [VERSION_V1, VERSION_V2]:
+        env = Account(md_df, data_factors, state_with_flag=True, version=version)
+        env.reset()
+        datetime_start = time.time()
+        for action in action_arr:
+            _, _, done = env.step(int(action))
+            if done:
+                env.reset()
+
+        logger.info('Account.step version=%s %.0f steps/s', version, step_count / (time.time() - datetime_start))
+
+
 if __name__ == "__main__":
     _test_account()
     _test_account2()
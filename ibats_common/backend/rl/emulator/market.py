@@ -19,7 +19,10 @@ class QuotesMarket(object):
                  state_with_flag=False, reward_with_fee0=False):
         self.data_close = md_df['close']
         self.data_open = md_df['open']
-        self.data_observation = data_factors
+        # 价格预先转换为 ndarray，交易时按位置直接取值，不再访问 Series
+        self._close_arr = self.data_close.to_numpy(dtype=np.float64)
+        self._quotes_arr = self.data_open.to_numpy(dtype=np.float64) * 10
+        self.data_observation = data_factors.to_numpy() if isinstance(data_factors, pd.DataFrame) else data_factors
         self.action_space = [ACTION_OP_CLOSE, ACTION_OP_LONG, ACTION_OP_SHORT, ACTION_OP_KEEP]
         self.fee_rate = fee_rate  # 千三手续费
         self.fee_curr_step = 0
@@ -63,7 +66,7 @@ class QuotesMarket(object):
 
     def long(self):
         self.flags = 1
-        quotes = self.data_open[self.step_counter] * 10
+        quotes = self._quotes_arr[self.step_counter]
         self.cash -= quotes * (1 + self.fee_rate)
         self.position = quotes
         self.fee_curr_step += quotes * self.fee_rate
@@ -71,19 +74,19 @@ class QuotesMarket(object):
 
     def short(self):
         self.flags = -1
-        quotes = self.data_open[self.step_counter] * 10
+        quotes = self._quotes_arr[self.step_counter]
         self.cash += quotes * (1 - self.fee_rate)
         self.position = - quotes
         self.fee_curr_step += quotes * self.fee_rate
         self.action_count += 1
 
     def keep(self):
-        quotes = self.data_open[self.step_counter] * 10
+        quotes = self._quotes_arr[self.step_counter]
         self.position = quotes * self.flags
 
     def close_long(self):
         self.flags = 0
-        quotes = self.data_open[self.step_counter] * 10
+        quotes = self._quotes_arr[self.step_counter]
         self.cash += quotes * (1 - self.fee_rate)
         self.position = 0
         self.fee_curr_step += quotes * self.fee_rate
@@ -91,7 +94,7 @@ class QuotesMarket(object):
 
     def close_short(self):
         self.flags = 0
-        quotes = self.data_open[self.step_counter] * 10
+        quotes = self._quotes_arr[self.step_counter]
         self.cash -= quotes * (1 + self.fee_rate)
         self.position = 0
         self.fee_curr_step += quotes * self.fee_rate
@@ -134,7 +137,7 @@ class QuotesMarket(object):
         self.total_value_fee0 = self.total_value + self.fee_tot
 
         # 计算价值
-        price = self.data_close[self.step_counter]
+        price = self._close_arr[self.step_counter]
         position = price * 10 * self.flags
         reward_cur_period = self.cash + position - self.total_value
         self.step_counter += 1
@@ -10,6 +10,8 @@
 2020-09-05
 调整属性名称
 增加了 position_unit, long_holding_punish, punish_value, reward_multiplier 等参数化配置的地方
+2026-10-19
+增加 VectorQuotesMarket，多个环境基于 numpy 数组同步运行
 """
 from enum import IntEnum
 import numpy as np
@@ -41,6 +43,25 @@ class DealPriceScheme(IntEnum):
     NEXT_BAR_CENTER = 3  # 重心价格： ((开盘价 + 收盘价) * 2 + 最高价 + 最低价) / 6
 
 
+def get_deal_price_arr(deal_price_scheme: DealPriceScheme, close_arr, open_arr, high_arr=None, low_arr=None):
+    """
+    根据成交价格方案计算每一个 step 对应的成交价格
+    CURRENT_CLOSE 为上一根K线的收盘价，第一根K线取最后一根K线的收盘价（与按位置取 close[-1] 一致）
+    """
+    if deal_price_scheme == DealPriceScheme.NEXT_OPEN:
+        deal_price_arr = open_arr
+    elif deal_price_scheme == DealPriceScheme.NEXT_OC_MIDDLE:
+        deal_price_arr = (close_arr + open_arr) / 2
+    elif deal_price_scheme == DealPriceScheme.NEXT_BAR_CENTER:
+        deal_price_arr = ((close_arr + open_arr) * 2 + high_arr + low_arr) / 6
+    elif deal_price_scheme == DealPriceScheme.CURRENT_CLOSE:
+        deal_price_arr = np.roll(close_arr, 1)
+    else:
+        raise ValueError(f'当前价格成交机制 {deal_price_scheme} 不支持')
+
+    return deal_price_arr
+
+
 class QuotesMarket(object):
     def __init__(self, md_df: pd.DataFrame, data_factors, init_cash=2e5,
                  fee_rate=3e-3, position_unit=10, state_with_flag=False, reward_with_fee0=False,
@@ -75,8 +96,14 @@ class QuotesMarket(object):
         self.data_low = md_df[md_ohlcva_labels[LOW_INDEX]] if md_ohlcva_labels[LOW_INDEX] is not None else None
         self.data_volume = md_df[md_ohlcva_labels[VOLUME_INDEX]] if md_ohlcva_labels[VOLUME_INDEX] is not None else None
         self.data_amount = md_df[md_ohlcva_labels[AMOUNT_INDEX]] if md_ohlcva_labels[AMOUNT_INDEX] is not None else None
+        # 价格预先转换为 ndarray，并根据成交价格方案计算各时点的成交价格，交易时按位置直接取值
+        self._close_arr = self.data_close.to_numpy(dtype=np.float64)
+        self._deal_price_arr = get_deal_price_arr(
+            deal_price_scheme, self._close_arr, self.data_open.to_numpy(dtype=np.float64),
+            None if self.data_high is None else self.data_high.to_numpy(dtype=np.float64),
+            None if self.data_low is None else self.data_low.to_numpy(dtype=np.float64))
         # 因子序列
-        self.data_factor = data_factors
+        self.data_factor = data_factors.to_numpy() if isinstance(data_factors, pd.DataFrame) else data_factors
         self.action_operations = ACTION_OPS
         self.position_unit = position_unit
         self.fee_rate = fee_rate  # 千三手续费
@@ -160,19 +187,7 @@ class QuotesMarket(object):
         """
         获取当前成交价格
         """
-        if self.deal_price_scheme == DealPriceScheme.NEXT_OPEN:
-            price = self.data_open[self.step_counter]
-        elif self.deal_price_scheme == DealPriceScheme.NEXT_OC_MIDDLE:
-            price = (self.data_close[self.step_counter] + self.data_open[self.step_counter]) / 2
-        elif self.deal_price_scheme == DealPriceScheme.NEXT_BAR_CENTER:
-            price = ((self.data_close[self.step_counter] + self.data_open[self.step_counter]) * 2 +
-                     self.data_high[self.step_counter] + self.data_low[self.step_counter]) / 6
-        elif self.deal_price_scheme == DealPriceScheme.CURRENT_CLOSE:
-            price = self.data_close[self.step_counter - 1]
-        else:
-            raise ValueError(f'当前价格成交机制 {self.deal_price_scheme} 不支持')
-
-        return price
+        return self._deal_price_arr[self.step_counter]
 
     def long(self):
         self._flag = _FLAG_LONG
@@ -259,7 +274,7 @@ class QuotesMarket(object):
         self.total_value_fee0 = self.total_value + self.fee_tot
 
         # 计算价值
-        price = self.data_close[self.step_counter]
+        price = self._close_arr[self.step_counter]
         position_value = price * self.position_unit * self._flag
         # self.total_value 此时记录的是上一轮操作结果时的总资产.
         # 当前现金流+持仓价值 - 上一轮的总资产 = 当期资产净增长
@@ -297,6 +312,245 @@ class QuotesMarket(object):
         return self._step_ret_latest
 
 
+class VectorQuotesMarket(object):
+    """
+    B 个 QuotesMarket 同步运行，全部状态保存为长度为 B 的 numpy 数组，每次 step 接收 action 向量，
+    返回批量的 observation, reward, done，计算规则与 QuotesMarket 一致
+    各环境的行情、因子数据拼接在同一组数组中，通过 start_index、end_index 区分，
+    因此同一品种不同起点的多个环境共用同一份因子数据（无需复制）
+    已经 done 的环境不再变化，reward 为 0，直到调用 reset
+    """
+
+    def __init__(self, md_df: pd.DataFrame, data_factors, start_index_list=None, end_index_list=None,
+                 init_cash=2e5, fee_rate=3e-3, position_unit=10, state_with_flag=False, reward_with_fee0=False,
+                 md_ohlcva_labels=DEFAULT_MD_OHLCVA_LABELS_MINIMAL,
+                 long_holding_punish=0, punish_value=0.01, reward_multiplier=1,
+                 deal_price_scheme: DealPriceScheme = DealPriceScheme.NEXT_OPEN):
+        """
+        :param md_df: 行情数据
+        :param data_factors: 因子数据，与 md_df 行数一致，data_factors[n] 将作为 observation 返回
+        :param start_index_list: 各环境在 md_df 中的起始位置，None 为 [0]
+        :param end_index_list: 各环境在 md_df 中的结束位置（不含），None 为数据长度
+        :param reward_with_fee0: 默认False, 为 True 时 reward 为 [B, 2] 数组，分别为含费用、不含费用的 reward，
+            reward_multiplier 对两列分别相乘
+        其他参数与 QuotesMarket 相同
+        """
+        # 参数有效性检查
+        if deal_price_scheme == DealPriceScheme.NEXT_BAR_CENTER:
+            assert md_ohlcva_labels[HIGH_INDEX] is not None
+            assert md_ohlcva_labels[LOW_INDEX] is not None
+        data_len = data_factors.shape[0]
+        if md_df.shape[0] != data_len:
+            raise ValueError(f'md_df 长度 {md_df.shape[0]} 与 data_factors 长度 {data_len} 不一致')
+        self.start_index_arr = np.array([0] if start_index_list is None else start_index_list, dtype=np.int64)
+        self.end_index_arr = np.full(self.start_index_arr.shape, data_len, dtype=np.int64) \
+            if end_index_list is None else np.array(end_index_list, dtype=np.int64)
+        if self.start_index_arr.shape != self.end_index_arr.shape:
+            raise ValueError('start_index_list 与 end_index_list 长度不一致')
+        if np.any(self.start_index_arr < 0) or np.any(self.end_index_arr > data_len) \
+                or np.any(self.end_index_arr - self.start_index_arr < 2):
+            raise ValueError('各环境的数据区间需在 md_df 范围内，且长度不少于 2')
+        self.env_count = self.start_index_arr.shape[0]
+        self.max_step_count_arr = self.end_index_arr - self.start_index_arr - 1
+        # 开高低收序列
+        self.data_close = md_df[md_ohlcva_labels[CLOSE_INDEX]].to_numpy(dtype=np.float64)
+        data_open = md_df[md_ohlcva_labels[OPEN_INDEX]].to_numpy(dtype=np.float64)
+        # 预先计算各时点的成交价格，CURRENT_CLOSE 的第一步与各环境的结束位置有关，在 step 中计算
+        self.data_deal_price = None if deal_price_scheme == DealPriceScheme.CURRENT_CLOSE else get_deal_price_arr(
+            deal_price_scheme, self.data_close, data_open,
+            None if md_ohlcva_labels[HIGH_INDEX] is None else md_df[md_ohlcva_labels[HIGH_INDEX]].to_numpy(
+                dtype=np.float64),
+            None if md_ohlcva_labels[LOW_INDEX] is None else md_df[md_ohlcva_labels[LOW_INDEX]].to_numpy(
+                dtype=np.float64))
+        # 因子序列
+        self.data_factor = data_factors
+        self.action_operations = ACTION_OPS
+        self.position_unit = position_unit
+        self.fee_rate = fee_rate
+        self.init_cash = init_cash
+        self.state_with_flag = state_with_flag
+        self.reward_with_fee0 = reward_with_fee0
+        self.long_holding_punish = np.float32(long_holding_punish)
+        self.punish_value = punish_value
+        self.reward_multiplier = reward_multiplier
+        self.deal_price_scheme = deal_price_scheme
+        # reset use
+        self.step_counter = np.zeros(self.env_count, dtype=np.int64)
+        self.cash = np.full(self.env_count, self.init_cash, dtype=np.float64)
+        self.position_value = np.zeros(self.env_count)
+        self.total_value = self.cash + self.position_value
+        self.total_value_fee0 = self.cash + self.position_value
+        self._flag = np.full(self.env_count, _FLAG_EMPTY)
+        self.fee_curr_step = np.zeros(self.env_count)
+        self.fee_tot = np.zeros(self.env_count)
+        self.action_count = np.zeros(self.env_count, dtype=np.int64)
+        self._keep_holding_periods_len = np.zeros(self.env_count)
+        self._done = np.zeros(self.env_count, dtype=bool)
+        self._observation_latest = None
+        self._step_ret_latest = None
+
+    @classmethod
+    def from_list(cls, md_df_list, data_factors_list, **kwargs):
+        """
+        多个品种（或多段行情）各自作为一个环境，拼接后建立 VectorQuotesMarket
+        :param md_df_list: 行情数据列表
+        :param data_factors_list: 因子数据列表
+        :param kwargs: 其他参数与 QuotesMarket 相同
+        :return:
+        """
+        len_arr = np.array([_.shape[0] for _ in data_factors_list], dtype=np.int64)
+        end_index_arr = np.cumsum(len_arr)
+        md_df = pd.concat([_.reset_index(drop=True) for _ in md_df_list], ignore_index=True)
+        return cls(md_df, np.concatenate(data_factors_list), start_index_list=end_index_arr - len_arr,
+                   end_index_list=end_index_arr, **kwargs)
+
+    @property
+    def flag(self):
+        """外部访问 flag 标志位，为了方便 one_hot 模式，因此做 + 1 处理"""
+        return self._flag + 1
+
+    @property
+    def done(self):
+        return self._done
+
+    def reset(self, env_index=None):
+        """
+        重置全部（或部分）环境
+        :param env_index: 需要重置的环境，None 代表全部，可以是序号数组或 bool 数组
+        :return: 全部环境的 observation
+        """
+        env_index = slice(None) if env_index is None else env_index
+        self.step_counter[env_index] = 0
+        self.cash[env_index] = self.init_cash
+        self.position_value[env_index] = 0
+        self.total_value[env_index] = self.cash[env_index] + self.position_value[env_index]
+        self.total_value_fee0[env_index] = self.cash[env_index] + self.position_value[env_index]
+        self._flag[env_index] = _FLAG_EMPTY
+        self.fee_curr_step[env_index] = 0
+        self.fee_tot[env_index] = 0
+        self.action_count[env_index] = 0
+        self._keep_holding_periods_len[env_index] = 0.0
+        self._done[env_index] = False
+        self._observation_latest = self._get_observation_latest()
+        reward_latest = np.zeros((self.env_count, 2) if self.reward_with_fee0 else self.env_count)
+        self._step_ret_latest = self._observation_latest, reward_latest, self._done.copy()
+        return self._observation_latest
+
+    def _get_observation_latest(self):
+        """
+        生成各环境最新的 observation，形式与 QuotesMarket 相同，各项增加第一维 B
+        """
+        observation_latest = [self.data_factor[self.start_index_arr + self.step_counter]]
+        if self.state_with_flag:
+            rr = self.total_value / self.init_cash - 1
+            observation_latest.append(self.flag.astype(np.float32)[:, None])
+            observation_latest.append(rr.astype(np.float32)[:, None])
+
+        if self.long_holding_punish > 0.0:
+            observation_latest.append(self._keep_holding_periods_len.astype(np.float32)[:, None])
+
+        if len(observation_latest) == 1:
+            return observation_latest[0]
+        else:
+            return tuple(observation_latest)
+
+    def observation_latest(self):
+        return self._observation_latest
+
+    def get_action_operations(self):
+        return self.action_operations
+
+    @property
+    def step_ret_latest(self):
+        return self._step_ret_latest
+
+    def step(self, actions):
+        """
+        各环境同时执行一步
+        :param actions: 长度为 B 的 action 数组，已经 done 的环境对应的 action 将被忽略
+        :return: observation, reward, done
+        """
+        actions = np.asarray(actions)
+        if actions.shape != (self.env_count,):
+            raise ValueError(f"actions.shape={actions.shape} should be ({self.env_count},)")
+        if np.all(self._done):
+            raise ValueError(f"It's Done state. max_step_count={self.max_step_count_arr}, "
+                             f"current step={self.step_counter}, total_value={self.total_value}")
+        is_active = ~self._done
+        if not np.all(np.isin(actions[is_active], ACTIONS)):
+            raise ValueError(f"actions={actions} should be one of keys {ACTIONS}")
+
+        index_arr = self.start_index_arr + self.step_counter
+        if self.data_deal_price is None:
+            # CURRENT_CLOSE 上一根K线的收盘价，与 QuotesMarket 一致，第一步取最后一根K线的收盘价
+            quotes = self.data_close[np.where(
+                self.step_counter > 0, index_arr - 1, self.end_index_arr - 1)] * self.position_unit
+        else:
+            quotes = self.data_deal_price[index_arr] * self.position_unit
+        flag = self._flag
+        is_long, is_short = actions == ACTION_LONG, actions == ACTION_SHORT
+        # 先平仓，再开仓，与 QuotesMarket 中 close_short + long 的计算顺序一致
+        is_close = is_active & (
+                (is_long & (flag == _FLAG_SHORT)) | (is_short & (flag == _FLAG_LONG)) |
+                ((actions == ACTION_CLOSE) & (flag != _FLAG_EMPTY)))
+        is_open_long = is_active & is_long & (flag != _FLAG_LONG)
+        is_open_short = is_active & is_short & (flag != _FLAG_SHORT)
+        is_keep = is_active & (
+                (is_long & (flag == _FLAG_LONG)) | (is_short & (flag == _FLAG_SHORT)) | (actions == ACTION_KEEP))
+        self.fee_curr_step[is_active] = 0
+        fee_arr = quotes * self.fee_rate
+        # 平仓
+        is_close_long = is_close & (flag == _FLAG_LONG)
+        is_close_short = is_close & (flag == _FLAG_SHORT)
+        self.cash[is_close_long] += quotes[is_close_long] * (1 - self.fee_rate)
+        self.cash[is_close_short] -= quotes[is_close_short] * (1 + self.fee_rate)
+        # 开仓
+        self.cash[is_open_long] -= quotes[is_open_long] * (1 + self.fee_rate)
+        self.cash[is_open_short] += quotes[is_open_short] * (1 - self.fee_rate)
+        for is_trade in (is_close, is_open_long | is_open_short):
+            self.fee_curr_step[is_trade] += fee_arr[is_trade]
+            self.action_count[is_trade] += 1
+            self._keep_holding_periods_len[is_trade] = 0.0
+        self._flag[is_close] = _FLAG_EMPTY
+        self.position_value[is_close] = 0
+        self._flag[is_open_long] = _FLAG_LONG
+        self.position_value[is_open_long] = quotes[is_open_long]
+        self._flag[is_open_short] = _FLAG_SHORT
+        self.position_value[is_open_short] = - quotes[is_open_short]
+        # 持仓不变
+        self.position_value[is_keep] = quotes[is_keep] * self._flag[is_keep]
+        self._keep_holding_periods_len[is_keep] += 1.0
+
+        # 计算费用
+        self.fee_tot[is_active] += self.fee_curr_step[is_active]
+        self.total_value_fee0[is_active] = self.total_value[is_active] + self.fee_tot[is_active]
+
+        # 计算价值
+        price = self.data_close[index_arr]
+        position_value = price * self.position_unit * self._flag
+        net_reward = self.cash + position_value - self.total_value
+        self.step_counter[is_active] += 1
+        self.total_value[is_active] = position_value[is_active] + self.cash[is_active]
+        self._done[is_active] = (self.total_value[is_active] < price[is_active]) | (
+                self.step_counter[is_active] >= self.max_step_count_arr[is_active])
+
+        self._observation_latest = self._get_observation_latest()
+        is_punish = (0.0 < self.long_holding_punish) & (self.long_holding_punish < self._keep_holding_periods_len)
+        if self.reward_with_fee0:
+            reward_latest = np.stack([net_reward / price / self.position_unit,
+                                      (net_reward + self.fee_curr_step) / price / self.position_unit], axis=1)
+            reward_latest[is_punish, :] = - self.punish_value
+            reward_latest[~is_active, :] = 0.0
+        else:
+            reward_latest = net_reward / price / self.position_unit
+            reward_latest[is_punish] = - self.punish_value
+            reward_latest[~is_active] = 0.0
+
+        reward_latest *= self.reward_multiplier
+        self._step_ret_latest = self._observation_latest, reward_latest, self._done.copy()
+        return self._step_ret_latest
+
+
 def _test_quote_market():
     import os
     n_step = 60
@@ -341,5 +595,35 @@ def _test_quote_market():
         print('is ok for not supporting action>3')
 
 
+def _test_vector_quote_market(env_count=64):
+    import os
+    import time
+    n_step = 60
+    from ibats_common.example.data import load_data
+    md_df = load_data(
+        'RB.csv',
+        folder_path=os.path.join(os.pardir, os.pardir, os.pardir, 'example', 'data')  # r'..\..\..\example\data'
+    ).set_index('trade_date')[DEFAULT_MD_OHLCVA_LABELS]
+    md_df.index = pd.DatetimeIndex(md_df.index)
+    from ibats_common.backend.factor import get_factor, transfer_2_batch
+    factors_df = get_factor(md_df, dropna=True)
+    df_index, df_columns, data_arr_batch = transfer_2_batch(factors_df, n_step=n_step)
+    md_df = md_df.loc[df_index, :]
+    # 建立 env_count 个不同起点的环境
+    start_index_list = np.random.randint(md_df.shape[0] - 500, size=env_count)
+    vqm = VectorQuotesMarket(md_df=md_df[['close', 'open']], data_factors=data_arr_batch,
+                             start_index_list=start_index_list, end_index_list=start_index_list + 500,
+                             state_with_flag=True)
+    next_observation = vqm.reset()
+    assert next_observation[0].shape == (env_count, n_step, data_arr_batch.shape[2])
+    assert np.all(next_observation[1] == FLAG_EMPTY)
+    datetime_start, step_count = time.time(), 0
+    while not np.all(vqm.done):
+        next_observation, reward, done = vqm.step(np.random.randint(len(ACTIONS), size=env_count))
+        step_count += 1
+
+    print(f'{env_count} 个环境运行 {step_count} 步，耗时 {time.time() - datetime_start:.3f} 秒')
+
+
 if __name__ == "__main__":
     _test_quote_market()
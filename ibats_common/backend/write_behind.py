@@ -0,0 +1,221 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 21:20
+@File    : write_behind.py
+@contact : mmmaaaggg@163.com
+@desc    : ORM 记录异步写入服务，config.ORM_WRITE_BEHIND 启用时，
+ORM_UPDATE_OR_INSERT_PER_ACTION 产生的记录放入有界队列，由后台线程按表分批保存，策略回调中不再等待数据库
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from queue import Queue, Empty, Full
+
+from ibats_utils.db import with_db_session
+from sqlalchemy.exc import SQLAlchemyError
+
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    异步写入服务
+    put 将 ORM 对象放入有界队列，队列满时阻塞调用方（背压），直到后台线程处理出空间
+    后台线程累计 batch_size 条记录或者距本批第一条记录超过 flush_interval 秒后，按表分组 add_all 并提交
+    flush 将阻塞直到队列中全部记录保存完毕
+    """
+
+    def __init__(self, engine=None, max_queue_size=None, batch_size=None, flush_interval=None):
+        """
+        :param engine: None 代表使用 engines.engine_ibats
+        :param max_queue_size: 队列最大长度，None 代表使用 config.ORM_WRITE_BEHIND_QUEUE_SIZE
+        :param batch_size: 每批最多保存记录数，None 代表使用 config.ORM_WRITE_BEHIND_BATCH_SIZE
+        :param flush_interval: 每批最长等待时间（秒），None 代表使用 config.ORM_WRITE_BEHIND_FLUSH_INTERVAL
+        """
+        self._engine = engine
+        self.max_queue_size = config.ORM_WRITE_BEHIND_QUEUE_SIZE if max_queue_size is None else max_queue_size
+        self.batch_size = config.ORM_WRITE_BEHIND_BATCH_SIZE if batch_size is None else batch_size
+        self.flush_interval = config.ORM_WRITE_BEHIND_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._queue = Queue(maxsize=self.max_queue_size)
+        self._flush_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        # 统计信息
+        self.put_count = 0
+        self.saved_count = 0
+        self.error_count = 0
+        self.batch_count = 0
+        self.blocked_count = 0
+        self.blocked_seconds = 0.0
+        self.queue_size_max = 0
+        self.write_seconds = 0.0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from ibats_common.backend import engines
+            return engines.engine_ibats
+        return self._engine
+
+    @property
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.is_alive:
+                return
+            self._thread = threading.Thread(target=self._run, name='WriteBehindWriter', daemon=True)
+            self._thread.start()
+
+    def put(self, detail):
+        """
+        放入一条待保存的 ORM 对象，队列满时阻塞
+        :param detail:
+        :return:
+        """
+        if not self.is_alive:
+            self.start()
+        try:
+            self._queue.put_nowait(detail)
+        except Full:
+            self.blocked_count += 1
+            datetime_start = time.time()
+            self._queue.put(detail)
+            self.blocked_seconds += time.time() - datetime_start
+        self.put_count += 1
+        queue_size = self._queue.qsize()
+        if queue_size > self.queue_size_max:
+            self.queue_size_max = queue_size
+
+    def flush(self):
+        """阻塞直到队列中全部记录保存完毕"""
+        if not self.is_alive:
+            return
+        self._flush_event.set()
+        try:
+            self._queue.join()
+        finally:
+            self._flush_event.clear()
+
+    def close(self):
+        """保存队列中全部记录并结束后台线程"""
+        if not self.is_alive:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def get_metrics(self) -> dict:
+        return {
+            'put_count': self.put_count,
+            'saved_count': self.saved_count,
+            'error_count': self.error_count,
+            'batch_count': self.batch_count,
+            'queue_size': self._queue.qsize(),
+            'queue_size_max': self.queue_size_max,
+            'blocked_count': self.blocked_count,
+            'blocked_seconds': self.blocked_seconds,
+            'write_seconds': self.write_seconds,
+        }
+
+    def _get_batch(self):
+        """获取一批记录，返回 (batch, is_stop)"""
+        batch = []
+        try:
+            detail = self._queue.get(timeout=self.flush_interval)
+        except Empty:
+            return batch, False
+        if detail is _STOP:
+            self._queue.task_done()
+            return batch, True
+        batch.append(detail)
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._flush_event.is_set():
+                    detail = self._queue.get_nowait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    detail = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            if detail is _STOP:
+                self._queue.task_done()
+                return batch, True
+            batch.append(detail)
+        return batch, False
+
+    def _run(self):
+        is_stop = False
+        while not is_stop:
+            batch, is_stop = self._get_batch()
+            if len(batch) == 0:
+                continue
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        """按表分组保存，保存失败时逐条保存"""
+        datetime_start = time.time()
+        model_detail_list_dic = OrderedDict()
+        for detail in batch:
+            model_detail_list_dic.setdefault(detail.__class__, []).append(detail)
+
+        with with_db_session(self.engine, expire_on_commit=False) as session:
+            for model, detail_list in model_detail_list_dic.items():
+                try:
+                    session.add_all(detail_list)
+                    session.commit()
+                    self.saved_count += len(detail_list)
+                except SQLAlchemyError:
+                    logger.warning("%d 条 %s 批量保存失败，改为逐条保存", len(detail_list), model.__tablename__,
+                                   exc_info=True)
+                    session.rollback()
+                    for detail in detail_list:
+                        try:
+                            session.add(detail)
+                            session.commit()
+                            self.saved_count += 1
+                        except SQLAlchemyError:
+                            logger.exception("%s 记录保存失败：%s", model.__tablename__, detail)
+                            session.rollback()
+                            self.error_count += 1
+
+        self.batch_count += 1
+        self.write_seconds += time.time() - datetime_start
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehindWriter:
+    """返回全局异步写入服务，进程退出时自动保存队列中剩余记录"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+
+def flush():
+    """全局异步写入服务已启动时，阻塞直到队列中全部记录保存完毕，并输出统计信息"""
+    if _writer is None or not _writer.is_alive:
+        return
+    _writer.flush()
+    logger.info("异步写入统计：%s", _writer.get_metrics())
@@ -19,7 +19,27 @@ class ConfigBase:
 
     BACKTEST_UPDATE_OR_INSERT_PER_ACTION = False
     ORM_UPDATE_OR_INSERT_PER_ACTION = True
+    # 回测过程中使用 __slots__ 轻量级持仓、账户状态对象，不保存上一状态引用，
+    # 启用后 ORM_UPDATE_OR_INSERT_PER_ACTION 对持仓、账户状态不再生效，全部状态在 release 时批量保存
+    BACKTEST_COMPACT_STATUS_DETAIL = False
+    # ORM_UPDATE_OR_INSERT_PER_ACTION 产生的记录放入队列，由后台线程批量异步保存，release 时等待全部记录保存完毕
+    ORM_WRITE_BEHIND = False
+    ORM_WRITE_BEHIND_QUEUE_SIZE = 10000  # 队列最大长度，队列满时阻塞调用方
+    ORM_WRITE_BEHIND_BATCH_SIZE = 500  # 每批最多保存记录数
+    ORM_WRITE_BEHIND_FLUSH_INTERVAL = 0.5  # 每批最长等待时间（秒）
+    # 明细记录 idx 每次从数据库 idx_block_reserve 表预留的数量，多进程回测写同一数据库时避免主键冲突，0 代表使用进程内计数器
+    ORM_IDX_BLOCK_SIZE = 0
+    # 统计每条行情从到达到订单记录、数据库保存各阶段的延迟，策略结束时输出汇总表
+    LATENCY_TRACE = False
+    LATENCY_TRACE_DUMP_INTERVAL = 60  # 定期输出延迟统计日志的间隔（秒），0 代表仅在策略结束时输出
+    BACKTEST_SAVE_DETAIL = True  # 回测结束时是否保存 order、trade、持仓、账户等明细数据，参数优化时可仅保存汇总结果
+    BULK_INSERT_CHUNK_SIZE = 10000  # 回测结果批量保存时，每次 executemany 的记录数
+    MD_CACHE_FOLDER_PATH = None  # 行情文件缓存目录，None 代表系统临时目录下当前用户专用的 ibats_md_cache_<uid> 目录
+    FACTOR_CACHE_FOLDER_PATH = None  # 因子缓存目录，None 代表 get_cache_folder_path() 下的 factor_cache 目录
+    FACTOR_CACHE_MAX_MEMORY_SIZE = 512 * 1024 * 1024  # 因子内存缓存最大字节数
+    FACTOR_CACHE_MAX_DISK_SIZE = 2 * 1024 * 1024 * 1024  # 因子磁盘缓存最大字节数，0 代表不使用磁盘缓存
     UPDATE_STG_RUN_STATUS_DETAIL_PERIOD = 1  # 1 每一个最小行情周期，2 每天
+    STG_MD_DF_MAX_WINDOW = None  # 推送给策略的 md_df 最多包含最近多少条数据，None 代表全部历史数据
 
     # evn configuration
     LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s %(filename)s.%(funcName)s:%(lineno)d|%(message)s'
@@ -21,7 +21,9 @@ from sklearn.model_selection import train_test_split
 from ibats_common.backend.mess import get_report_folder_path
 from ibats_common.analysis.plot import show_dl_accuracy
 from ibats_common.analysis.summary import summary_release_2_docx
-from ibats_common.backend.factor import get_factor
+from ibats_common.backend.factor import get_factor, get_sliding_window
+from ibats_common.backend.factor_cache import get_factor_cache
+from ibats_common.backend.factor_stream import PriceFactorStream
 from ibats_common.backend.label import calc_label3
 from ibats_common.common import ContextKey, Direction
 from ibats_common.example.data import get_trade_date_series, get_delivery_date_series
@@ -90,6 +92,10 @@ class AIStgBase(StgBase):
         self.do_nothing_on_min_bar = False  # 仅供调试使用
         # 用于记录 open,high,low,close,amount 的 column 位置
         self.ohlcav_col_name_list = ["open", "high", "low", "close", "amount", "volume"]
+        # 增量计算最新的价格因子，避免每根 bar 对全部历史数据重新计算 get_factor
+        self.enable_factor_stream = True
+        self.factor_stream = None
+        self._factor_tail_df = None
 
     @property
     def session(self):
@@ -154,10 +160,8 @@ class AIStgBase(StgBase):
         range_from = self.n_step
         range_to = factors.shape[0]
 
-        xs = np.zeros((range_to - range_from, self.n_step, self.input_size))
-        for num, index in enumerate(range(range_from, range_to)):
-            xs[num, :, :] = factors[(index - self.n_step):index, :]
-
+        # xs[num] = factors[num:num + n_step]，float32 只读视图，不复制数据
+        xs = get_sliding_window(factors[:-1], self.n_step)
         ys = ys_all[range_from:range_to, :]
 
         return xs, ys, trade_date_index[range_from:range_to]
@@ -172,8 +176,7 @@ class AIStgBase(StgBase):
         if index is None:
             index = factors.shape[0] - 1
 
-        batch_xs = np.zeros((1, self.n_step, self.input_size))
-        batch_xs[0, :, :] = factors[(index - self.n_step + 1):(index + 1), :]
+        batch_xs = get_sliding_window(factors[(index - self.n_step + 1):(index + 1), :], self.n_step)
 
         return batch_xs
 
@@ -399,6 +402,39 @@ class AIStgBase(StgBase):
         # return is_buy, is_sell
         return pred_y
 
+    def get_factor_latest(self, indexed_df):
+        """
+        计算最新 n_step 个 bar 的因子，用于 predict_latest
+        factor_stream 已经更新到上一根 bar 时，仅对最新 bar 进行增量计算，否则重新 warm_up
+        :param indexed_df:
+        :return:
+        """
+        if not self.enable_factor_stream:
+            return get_factor_cache().get_factor(
+                indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
+                trade_date_series=self.trade_date_series, delivery_date_series=self.delivery_date_series)
+
+        factor_stream = self.factor_stream
+        if factor_stream is not None and indexed_df.shape[0] >= 2 \
+                and factor_stream.last_index == indexed_df.index[-2]:
+            # 交易日、交割日相关因子只与当日日期有关，仅计算最新 bar
+            date_df = get_factor(indexed_df.iloc[-1:], trade_date_series=self.trade_date_series,
+                                 delivery_date_series=self.delivery_date_series,
+                                 dropna=False, ohlcav_col_name_list=None)
+            factor_s = factor_stream.update(date_df.iloc[-1])
+            if not factor_s.isnull().any():
+                self._factor_tail_df = pd.concat(
+                    [self._factor_tail_df, factor_s.to_frame().T]).iloc[-self.n_step:]
+        else:
+            date_df = get_factor(indexed_df, trade_date_series=self.trade_date_series,
+                                 delivery_date_series=self.delivery_date_series,
+                                 dropna=False, ohlcav_col_name_list=None)
+            self.factor_stream = factor_stream = PriceFactorStream(self.ohlcav_col_name_list)
+            factor_df = factor_stream.warm_up(date_df).dropna()
+            self._factor_tail_df = factor_df.iloc[-self.n_step:]
+
+        return self._factor_tail_df
+
     def on_prepare_min1(self, md_df, context):
         if md_df is None:
             return
@@ -419,9 +455,10 @@ class AIStgBase(StgBase):
             is_load = False
 
         if enable_train_even_load_succ or (enable_train_if_load_not_suss and not is_load):
-            factor_df_dic = get_factor(indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
-                                       trade_date_series=self.trade_date_series,
-                                       delivery_date_series=self.delivery_date_series, do_multiple_factors=True)
+            factor_df_dic = get_factor_cache().get_factor(
+                indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
+                trade_date_series=self.trade_date_series, delivery_date_series=self.delivery_date_series,
+                do_multiple_factors=True)
             factor_df = factor_df_dic[1]
             num = 0
             while True:
@@ -450,9 +487,9 @@ class AIStgBase(StgBase):
             self.save_model(trade_date)
             self.trade_date_last_train = trade_date
         else:
-            factor_df = get_factor(indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
-                                   trade_date_series=self.trade_date_series,
-                                   delivery_date_series=self.delivery_date_series)
+            factor_df = get_factor_cache().get_factor(
+                indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
+                trade_date_series=self.trade_date_series, delivery_date_series=self.delivery_date_series)
             train_acc, val_acc = self.valid_model_acc(factor_df)
 
         self.trade_date_acc_list[trade_date] = [train_acc, val_acc]
@@ -481,10 +518,9 @@ class AIStgBase(StgBase):
                              trade_date, self.trade_date_last_train, days_after_last_train)
             factor_df = self.load_train_test(indexed_df, rebuild_model=True,
                                              enable_load_model=self.enable_load_model_if_exist)
+            self.factor_stream = None
         else:
-            factor_df = get_factor(indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
-                                   trade_date_series=self.trade_date_series,
-                                   delivery_date_series=self.delivery_date_series)
+            factor_df = self.get_factor_latest(indexed_df)
 
         # 预测
         pred_mark = self.predict_latest(factor_df)
@@ -546,9 +582,9 @@ class AIStgBase(StgBase):
         # 建立数据集
         indexed_df = md_df.set_index('trade_date').drop('instrument_type', axis=1)
         trade_date_end = indexed_df.index[-1]
-        factor_df = get_factor(indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
-                               trade_date_series=self.trade_date_series,
-                               delivery_date_series=self.delivery_date_series)
+        factor_df = get_factor_cache().get_factor(
+            indexed_df, ohlcav_col_name_list=self.ohlcav_col_name_list,
+            trade_date_series=self.trade_date_series, delivery_date_series=self.delivery_date_series)
         xs, ys_onehot, trade_date_index = self.get_x_y(factor_df)
         ys = np.argmax(ys_onehot, axis=1)
         data_len = len(trade_date_index)
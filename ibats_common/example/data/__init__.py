@@ -11,6 +11,7 @@ import os
 
 import pandas as pd
 
+from ibats_common.backend.md_store import MdStore, is_md_store
 from ibats_common.backend.mess import get_folder_path
 
 OHLCAV_COL_NAME_LIST = ["open", "high", "low", "close", "amount", "volume"]
@@ -24,6 +25,13 @@ def load_data(file_name, encoding=None, folder_path=None, index_col=None, range_
             raise ValueError(
                 "folder_path is None, or you have to had a ./example/data folder on current or parent folder")
     file_path = os.path.join(folder_path, file_name)
+    if is_md_store(file_path):
+        # MdStore 分区存储，日期区间过滤在加载时完成，仅读取相关分区
+        df = MdStore(file_path).read(date_from=range_from, date_to=range_to)
+        if index_col is not None:
+            df = df.set_index(index_col)
+        return df
+
     df = pd.read_csv(file_path, encoding=encoding, index_col=index_col)
     if parse_index_to_datetime:
         df.index = pd.to_datetime(df.index)
@@ -7,6 +7,8 @@
 @contact : mmmaaaggg@163.com
 @desc    : 简单的 MA5、MA10金叉、死叉多空策略，仅供测试及演示使用
 """
+import numpy as np
+import pandas as pd
 from ibats_common.common import BacktestTradeMode, ContextKey, Direction, CalcMode
 from ibats_common.strategy import StgBase
 from ibats_common.strategy_handler import strategy_handler_factory
@@ -63,6 +65,22 @@ class MACrossStg(StgBase):
             if no_holding_target_position:
                 self.open_short(instrument_id, close, self.unit)
 
+    def calc_target_position(self, md_df, his_md_df=None):
+        """
+        向量化计算每根K线收盘时的目标持仓，交易逻辑与 on_min1 一致，供 vector_backtest 使用
+        :param md_df: 回测区间行情数据
+        :param his_md_df: 预加载的历史行情数据，仅用于计算回测起始阶段的均线
+        :return:
+        """
+        close_s = md_df['close'] if his_md_df is None else pd.concat([his_md_df['close'], md_df['close']])
+        close_s = close_s.reset_index(drop=True)
+        ma5, ma10 = close_s.rolling(5, 5).mean(), close_s.rolling(10, 10).mean()
+        is_cross_up = (ma5.shift(1) < ma10.shift(1)) & (ma5 > ma10)
+        is_cross_down = (ma5.shift(1) > ma10.shift(1)) & (ma5 < ma10)
+        signal_s = pd.Series(np.where(is_cross_up, self.unit, np.where(is_cross_down, -self.unit, np.nan)))
+        # 回测开始时没有持仓，仅使用回测区间内的信号
+        return signal_s.iloc[-md_df.shape[0]:].ffill().fillna(0).to_numpy()
+
 
 def _test_use(is_plot):
     from ibats_common.backend.mess import get_folder_path
@@ -145,6 +163,50 @@ def _test_use(is_plot):
     return stg_run_id
 
 
+def _test_use_vector(is_plot, run_mode=RunMode.Backtest):
+    """使用 vector_backtest 进行向量化回测"""
+    from ibats_common.backend.mess import get_folder_path
+    from ibats_common.md import md_agent_factory
+    from ibats_common.vector_backtest import vector_backtest
+    import os
+    md_agent_params_list = [{
+        'md_period': PeriodType.Min1,
+        'instrument_id_list': ['RB'],
+        'datetime_key': 'trade_date',
+        'init_md_date_from': '1995-1-1',  # 行情初始化加载历史数据，供策略分析预加载使用
+        'init_md_date_to': '2010-1-1',
+        'file_path': os.path.abspath(os.path.join(
+            get_folder_path('example', create_if_not_found=False), 'data', 'RB.csv')),
+        'symbol_key': 'instrument_type',
+        'exchange_name': ExchangeName.LocalFile,
+    }]
+    strategy_params = {'unit': 100 if run_mode == RunMode.Backtest else 1}
+    strategy_handler_param = {
+        'date_from': '2010-1-1',  # 策略回测历史数据，回测指定时间段的历史行情
+        'date_to': '2018-10-18',
+    }
+    md_agent = md_agent_factory(run_mode=RunMode.Backtest, **md_agent_params_list[0])
+    his_md_df = md_agent.load_history()['md_df']
+    md_df = md_agent.load_history(strategy_handler_param['date_from'], strategy_handler_param['date_to'])['md_df']
+    stg = MACrossStg(**strategy_params)
+    ret_dic = vector_backtest(
+        md_df, stg.calc_target_position(md_df, his_md_df), run_mode=run_mode, init_cash=1000000,
+        timestamp_key='trade_date', symbol_key='instrument_type', close_key='close',
+        trade_agent_key=ExchangeName.LocalFile, stg_class=MACrossStg, strategy_params=strategy_params,
+        md_agent_params_list=md_agent_params_list, strategy_handler_param=strategy_handler_param)
+    stg_run_id = ret_dic['stg_run_id']
+    logging.info("执行结束 stg_run_id = %d", stg_run_id)
+
+    if is_plot:
+        from ibats_common.analysis.summary import summary_stg_2_docx
+        from ibats_utils.mess import open_file_with_system_app
+        file_path = summary_stg_2_docx(stg_run_id)
+        if file_path is not None:
+            open_file_with_system_app(file_path)
+
+    return stg_run_id
+
+
 if __name__ == '__main__':
     # logging.basicConfig(level=logging.DEBUG, format=config.LOG_FORMAT)
     is_plot = True
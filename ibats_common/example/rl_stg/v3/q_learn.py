@@ -63,74 +63,175 @@ class QLearningTable:
     Q-Learn 的实现类，完成获取state、reward、learn 等各种操作
     QLearningTable 采用的是带参数单利模式，
     因此，通过创建同样参数的实例，即可获取的在Env环境下训练后的 QLearningTable 结果
+    Q 值保存在连续的 float64 数组中，state 通过 dict 映射为行号，新增 state 时数组按倍数扩容，
+    避免 DataFrame.append 每次全量复制以及 .loc 的索引开销
     """
 
-    def __init__(self, actions, key=None, learning_rate=0.01, reward_decay=0.9, e_greedy=0.9):
+    def __init__(self, actions, key=None, learning_rate=0.01, reward_decay=0.9, e_greedy=0.9, init_capacity=1024):
         self.actions = actions  # a list
         self.key = key  # 对于每一个Q table 的标识同样参数的情况下，区别不同q table使用
         self.lr = learning_rate
         self.gamma = reward_decay
         self.epsilon = e_greedy
-        self.q_table = pd.DataFrame(columns=self.actions, dtype=np.float64)
+        self.init_capacity = max(int(init_capacity), 1)
+        self.action_id_dic = {action: num for num, action in enumerate(self.actions)}
+        self._action_arr = np.array(self.actions)
+        self.state_id_dic = {}
+        self.state_list = []
+        self._q_arr = np.zeros((self.init_capacity, len(self.actions)), dtype=np.float64)
+
+    @property
+    def state_count(self):
+        return len(self.state_list)
+
+    @property
+    def q_arr(self):
+        """当前全部 state 的 Q 值，[state_count, action_count] 的视图"""
+        return self._q_arr[:self.state_count]
+
+    @property
+    def q_table(self) -> pd.DataFrame:
+        """以 DataFrame 形式返回 Q table 快照，index 为 state，columns 为 actions"""
+        return pd.DataFrame(self.q_arr.copy(), index=pd.Index(self.state_list, dtype=object), columns=self.actions)
 
     def choose_action(self, observation):
-        self.check_state_exist(observation)
+        state_id = self.check_state_exist(observation)
         # action selection
         if np.random.uniform() < self.epsilon:
             # choose best action
-            state_action = self.q_table.loc[observation, :]
+            state_action = self._q_arr[state_id]
             # some actions may have the same value, randomly choose on in these actions
-            action = np.random.choice(state_action[state_action == np.max(state_action)].index)
+            action = self.actions[np.random.choice(np.flatnonzero(state_action == np.max(state_action)))]
         else:
             # choose random action
             action = np.random.choice(self.actions)
         return action
 
+    def choose_action_batch(self, observations, epsilon=None):
+        """
+        批量选择 action，epsilon-greedy 策略，相同最大 Q 值的 action 之间随机选择
+        :param observations: state 列表
+        :param epsilon: 默认 self.epsilon，1 为完全 greedy
+        :return: action 数组
+        """
+        state_ids = self.get_state_ids(observations)
+        state_action_arr = self._q_arr[state_ids]
+        # 对最大值位置赋随机权重，取 argmax 即等概率选中其中之一
+        is_max_arr = state_action_arr == state_action_arr.max(axis=1, keepdims=True)
+        action_ids = np.argmax(np.random.uniform(size=state_action_arr.shape) * is_max_arr, axis=1)
+        if epsilon is None:
+            epsilon = self.epsilon
+        is_random_arr = np.random.uniform(size=state_ids.shape[0]) >= epsilon
+        action_ids[is_random_arr] = np.random.randint(len(self.actions), size=np.count_nonzero(is_random_arr))
+        return self._action_arr[action_ids]
+
     def learn(self, s, a, r, s_):
-        self.check_state_exist(s)
-        self.check_state_exist(s_)
-        q_predict = self.q_table.loc[s, a]
+        state_id = self.check_state_exist(s)
+        state_id_next = self.check_state_exist(s_)
+        action_id = self.action_id_dic[a]
+        q_predict = self._q_arr[state_id, action_id]
         if s_ != 'terminal':
-            q_target = r + self.gamma * self.q_table.loc[s_, :].max()  # next state is not terminal
+            q_target = r + self.gamma * self._q_arr[state_id_next].max()  # next state is not terminal
         else:
             q_target = r  # next state is terminal
-        self.q_table.loc[s, a] += self.lr * (q_target - q_predict)  # update
+        self._q_arr[state_id, action_id] += self.lr * (q_target - q_predict)  # update
+
+    def learn_batch(self, s_list, a_list, r_list, s_next_list):
+        """
+        批量 TD 更新
+        所有 q_target 均基于更新前的 Q table 计算（同步更新），
+        同一批次中重复出现的 (s, a) 其更新量累加，
+        因此仅当批次内 state 互不影响时与逐条调用 learn 结果一致
+        :param s_list: state 列表
+        :param a_list: action 列表
+        :param r_list: reward 列表
+        :param s_next_list: 下一 state 列表，'terminal' 代表终止状态
+        :return:
+        """
+        state_ids = self.get_state_ids(s_list)
+        state_ids_next = self.get_state_ids(s_next_list)
+        action_id_dic = self.action_id_dic
+        action_ids = np.fromiter((action_id_dic[_] for _ in a_list), dtype=np.int64, count=state_ids.shape[0])
+        q_target = np.asarray(r_list, dtype=np.float64) + self.gamma * self._q_arr[state_ids_next].max(axis=1)
+        terminal_id = self.state_id_dic.get('terminal', None)
+        if terminal_id is not None:
+            is_terminal = state_ids_next == terminal_id
+            q_target[is_terminal] = np.asarray(r_list, dtype=np.float64)[is_terminal]
+
+        q_predict = self._q_arr[state_ids, action_ids]
+        np.add.at(self._q_arr, (state_ids, action_ids), self.lr * (q_target - q_predict))
 
     def check_state_exist(self, state):
-        if state not in self.q_table.index:
+        """
+        state 不存在时追加新行
+        :param state:
+        :return: state 对应的行号
+        """
+        state_id = self.state_id_dic.get(state, None)
+        if state_id is None:
+            state_id = self.state_count
+            if state_id >= self._q_arr.shape[0]:
+                self._reserve(state_id + 1)
             # append new state to q table
-            self.q_table = self.q_table.append(
-                pd.Series(
-                    [0] * len(self.actions),
-                    index=self.q_table.columns,
-                    name=state,
-                )
-            )
+            self.state_id_dic[state] = state_id
+            self.state_list.append(state)
+
+        return state_id
+
+    def get_state_ids(self, states) -> np.ndarray:
+        """批量获取 state 对应的行号，不存在的 state 将被追加"""
+        check_state_exist = self.check_state_exist
+        return np.fromiter((check_state_exist(_) for _ in states), dtype=np.int64)
+
+    def _reserve(self, capacity):
+        """扩容至不小于 capacity，容量按倍数增长"""
+        new_capacity = max(self._q_arr.shape[0], 1)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        q_arr = np.zeros((new_capacity, len(self.actions)), dtype=np.float64)
+        q_arr[:self.state_count] = self.q_arr
+        self._q_arr = q_arr
 
     def _get_file_path(self, key):
         from ibats_common.backend.mess import get_folder_path
         folder_path = os.path.join(get_folder_path('example', create_if_not_found=False), 'module_data', module_version)
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
-        file_name = f"q_table_{key}_{len(self.actions)}.csv"
+        file_name = f"q_table_{key}_{len(self.actions)}.npz"
         file_path = os.path.join(folder_path, file_name)
         return file_path
 
-    def save(self):
-        file_path = self._get_file_path(self.key)
-        self.q_table.to_csv(file_path, index=False)
-
-    def load(self):
-        file_path = self._get_file_path(self.key)
+    def save(self, file_path=None):
+        if file_path is None:
+            file_path = self._get_file_path(self.key)
+        state_arr = np.array(self.state_list)
+        if state_arr.dtype.kind not in ('i', 'u', 'f', 'U') or state_arr.tolist() != self.state_list:
+            # 混合类型的 state，如：int 与 'terminal'
+            state_arr = np.empty(self.state_count, dtype=object)
+            state_arr[:] = self.state_list
+        np.savez(file_path, q_arr=self.q_arr, state_arr=state_arr, action_arr=self._action_arr)
+
+    def load(self, file_path=None):
+        if file_path is None:
+            file_path = self._get_file_path(self.key)
         if os.path.exists(file_path):
-            self.q_table = pd.read_csv(file_path)
-            self.q_table.columns = self.q_table.columns.astype(np.int)
+            with np.load(file_path, allow_pickle=True) as npz:
+                q_arr, state_list, action_list = npz['q_arr'], npz['state_arr'].tolist(), npz['action_arr'].tolist()
+            if action_list != list(self.actions):
+                raise ValueError(f'{file_path} actions={action_list} 与当前 actions={self.actions} 不一致')
+            self.reset()
+            self._reserve(len(state_list))
+            self._q_arr[:len(state_list)] = q_arr
+            self.state_list = state_list
+            self.state_id_dic = {state: num for num, state in enumerate(state_list)}
             return True
         else:
             return False
 
     def reset(self):
-        self.q_table = pd.DataFrame(columns=self.actions, dtype=np.float64)
+        self.state_id_dic = {}
+        self.state_list = []
+        self._q_arr = np.zeros((self.init_capacity, len(self.actions)), dtype=np.float64)
 
 
 class Env:
@@ -182,6 +283,81 @@ class Env:
         self.set_stop()
 
 
+class EpisodeRunner:
+    """
+    EpisodeRunner 用于在当前进程内同步回放行情，对 QLearningTable 进行循环训练，
+    与 Env 不同，行情数据仅在构造时准备一次，每个 episode 不再构建 stg_handler，
+    因此不会产生新的 StgRunInfo 记录，不启动线程，也不保存任何交易明细。
+    训练过程中 state、reward 仅依赖于行情数据，与策略的实际下单成交无关，因此两者训练结果一致
+    """
+
+    def __init__(self, md_df: pd.DataFrame, date_from, date_to, get_rl_handler, q_table_key=None,
+                 md_df_max_window=None):
+        """
+        :param md_df: 行情数据，需包含 trade_date 列并按 trade_date 升序排列
+        :param date_from: 训练起始日期，此前的数据作为 init_state 的历史数据
+        :param date_to: 训练截止日期
+        :param get_rl_handler: 用于构建 rl_handler 的函数
+        :param q_table_key:
+        :param md_df_max_window: 每一步推送给 rl_handler 的 md_df 最多包含最近多少条数据，None 代表全部历史数据
+        """
+        self.q_table_key = q_table_key
+        self.get_rl_handler = get_rl_handler
+        self.md_df_max_window = md_df_max_window
+        self.rl_handler = None
+        self.train_date_from, self.train_date_to = date_2_str(date_from), date_2_str(date_to)
+        trade_date_s = pd.to_datetime(md_df['trade_date'])
+        self.prepare_count = trade_date_s.searchsorted(pd.to_datetime(self.train_date_from), side='left')
+        end = trade_date_s.searchsorted(pd.to_datetime(self.train_date_to), side='right')
+        if self.prepare_count == 0:
+            raise ValueError(f'{self.train_date_from} 之前没有可供 init_state 使用的历史数据')
+        # 仅保留所需数据，此后每一步仅做切片，不再复制
+        self.md_df = md_df.iloc[:max(end, self.prepare_count)].reset_index(drop=True)
+        self.trade_date_s = trade_date_s.iloc[self.prepare_count:end].reset_index(drop=True)
+
+    @property
+    def step_count(self):
+        return self.trade_date_s.shape[0]
+
+    def _build(self):
+        self.rl_handler = rl_handler = self.get_rl_handler(q_table_key=self.q_table_key)
+        return rl_handler
+
+    def run_episode(self) -> pd.DataFrame:
+        """
+        执行一个 episode
+        :return: 每一步的 action、reward，index 为 trade_date
+        """
+        rl_handler = self._build()
+        md_df, max_window = self.md_df, self.md_df_max_window
+        prepare_count = self.prepare_count
+        rl_handler.init_state(md_df.iloc[:prepare_count])
+        step_count = self.step_count
+        action_arr, reward_arr = np.zeros(step_count, dtype=np.int64), np.zeros(step_count, dtype=np.float64)
+        for num, end in enumerate(range(prepare_count + 1, prepare_count + step_count + 1)):
+            start = 0 if max_window is None else max(end - max_window, 0)
+            action_arr[num] = rl_handler.choose_action(md_df.iloc[start:end])
+            reward_arr[num] = rl_handler.last_reward
+
+        return pd.DataFrame({'action': action_arr, 'reward': reward_arr},
+                            index=pd.DatetimeIndex(self.trade_date_s, name='trade_date'))
+
+    def run(self, episode_count=1) -> list:
+        """
+        循环执行 episode_count 个 episode
+        :param episode_count:
+        :return: 每一个 episode 的 action、reward DataFrame 列表
+        """
+        episode_df_list = []
+        for episode in range(episode_count):
+            episode_df = self.run_episode()
+            logger.debug('episode %d [%s, %s] 共 %d 步，累计 reward %.0f', episode, self.train_date_from,
+                         self.train_date_to, episode_df.shape[0], episode_df['reward'].sum())
+            episode_df_list.append(episode_df)
+
+        return episode_df_list
+
+
 def _test_env(trade_date_from='2010-1-1', trade_date_to='2018-10-18'):
     from ibats_common.example.rl_stg.v3.rl_stg import get_stg_handler
     env = Env(trade_date_from, trade_date_to, get_stg_handler, q_table_key=trade_date_to)
@@ -202,5 +378,22 @@ def _test_env(trade_date_from='2010-1-1', trade_date_to='2018-10-18'):
     logger.info('RL Over')
 
 
+def _test_episode_runner(trade_date_from='2010-1-1', trade_date_to='2018-10-18'):
+    import time
+    from ibats_common.example.data import load_data
+    from ibats_common.example.rl_stg.v3.rl_stg import get_rl_handler
+    md_df = load_data('RB.csv')
+    runner = EpisodeRunner(md_df, trade_date_from, trade_date_to, get_rl_handler, q_table_key=trade_date_to)
+    datetime_start = time.time()
+    episode_df_list = runner.run(episode_count=3)
+    logger.info('%d 个 episode 共 %d 步，耗时 %.2f 秒', len(episode_df_list), runner.step_count * len(episode_df_list),
+                time.time() - datetime_start)
+    for episode_df in episode_df_list:
+        print('reward sum:', episode_df['reward'].sum())
+
+    print('q_learn.q_table.shape', runner.rl_handler.ql_table.q_table.shape)
+
+
 if __name__ == "__main__":
     _test_env()
+    # _test_episode_runner()
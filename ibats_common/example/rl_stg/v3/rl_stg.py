@@ -10,7 +10,7 @@
 from ibats_utils.mess import load_class, date_2_str
 import numpy as np
 from ibats_common.common import BacktestTradeMode, ContextKey, Direction, CalcMode
-from ibats_common.example.rl_stg.v3.q_learn import QLearningTable, Env
+from ibats_common.example.rl_stg.v3.q_learn import QLearningTable, Env, EpisodeRunner
 from ibats_common.example.rl_stg.v3 import module_version
 from ibats_common.strategy import StgBase
 from ibats_common.strategy_handler import strategy_handler_factory
@@ -193,6 +193,7 @@ class RLHandler:
         self.ql_table = None
         self.last_state = None
         self.last_action = None
+        self.last_reward = None
         self.enable_load_if_exist = True
 
     def init_state(self, md_df: pd.DataFrame):
@@ -234,6 +235,8 @@ class RLHandler:
         if self.last_state is not None:
             self.ql_table.learn(self.last_state, self.last_action, reward, state)
 
+        self.last_reward = reward
+
         self.last_action = self.ql_table.choose_action(state)
         self.last_state = state
         return self.last_action
@@ -273,14 +276,16 @@ class RLHandler4Train(RLHandler):
             trade_date_s = md_df['trade_date']
             self.train_date_from = pd.to_datetime(trade_date_s.iloc[0]) + self.retrain_period
             trade_date_to = trade_date_s.iloc[-1]
-            self.train(date_2_str(trade_date_to))
+            self.train(date_2_str(trade_date_to), md_df)
 
         _ = self.choose_action(md_df)
 
-    def train(self, trade_date_to):
+    def train(self, trade_date_to, md_df: pd.DataFrame = None):
         """
         具体功能参见 ibats_common.example.rl_stg.q_learn import main
         :param trade_date_to:
+        :param md_df: 截止 trade_date_to 的历史行情，不为空时使用 EpisodeRunner 在当前进程内直接回放训练，
+        否则通过 Env 启动 stg_handler 进行训练
         :return:
         """
         if self.enable_load_if_exist:
@@ -294,14 +299,19 @@ class RLHandler4Train(RLHandler):
 
         if not is_loaded:
             logger.info('开始训练：[%s, %s]', self.train_date_from, trade_date_to)
-            env = Env(self.train_date_from, trade_date_to, self.get_stg_handler, q_table_key=self.ql_table.key)
-            for episode in range(self.episode_count):
-                # fresh env
-                env.reset_and_start()
-                # logger.info("\n%s", self.q_table.q_table)
-
-            # end of game
-            env.destroy()
+            if md_df is not None:
+                runner = EpisodeRunner(md_df, self.train_date_from, trade_date_to, get_rl_handler,
+                                       q_table_key=self.ql_table.key)
+                runner.run(self.episode_count)
+            else:
+                env = Env(self.train_date_from, trade_date_to, self.get_stg_handler, q_table_key=self.ql_table.key)
+                for episode in range(self.episode_count):
+                    # fresh env
+                    env.reset_and_start()
+                    # logger.info("\n%s", self.q_table.q_table)
+
+                # end of game
+                env.destroy()
             logger.info('RL Over')
             self.ql_table.save()
         # 设置最新训练日期
@@ -311,7 +321,7 @@ class RLHandler4Train(RLHandler):
         trade_date_to = pd.to_datetime(md_df['trade_date'].iloc[-1])
         if self.do_train and trade_date_to > (self.train_date_latest + self.retrain_period):
             # for_train == False 当期为策略运行使用，在 on_prepare 阶段以及 on_period 定期进行重新训练
-            self.train(date_2_str(trade_date_to))
+            self.train(date_2_str(trade_date_to), md_df)
         elif self.ql_table is None:
             self.init_ql_table(trade_date_to)
 
@@ -319,11 +329,18 @@ class RLHandler4Train(RLHandler):
         if self.last_state is not None:
             self.ql_table.learn(self.last_state, self.last_action, reward, state)
 
+        self.last_reward = reward
+
         self.last_action = self.ql_table.choose_action(state)
         self.last_state = state
         return self.last_action
 
 
+def get_rl_handler(q_table_key=None):
+    """供 EpisodeRunner 构建不进行训练的 RLHandler"""
+    return RLHandler(q_table_key=q_table_key)
+
+
 def _test_rl_handler(trade_date_from='2010-1-1', trade_date_to='2018-10-18'):
     from ibats_common.example.data import load_data
     trade_date_from_ = str_2_date(trade_date_from)
@@ -41,6 +41,8 @@ class MdAgentBase(Thread, ABC):
         self.timestamp_key = kwargs['timestamp_key'] if 'timestamp_key' in kwargs else None
         self.symbol_key = kwargs['symbol_key'] if 'symbol_key' in kwargs else None
         self.close_key = kwargs['close_key'] if 'close_key' in kwargs else None
+        # 回测推送历史数据时是否使用按列推送模式，推送 dict 记录，详见 load_history_record
+        self.columnar_replay = False
 
     def check_key(self):
         """检查 关键 key 信息 是否设置齐全"""
@@ -69,6 +71,7 @@ class MdAgentBase(Thread, ABC):
     def load_history_record(self, date_from=None, date_to=None, load_md_count=None):
         """
         加载历史数据，以协程方式逐条推送出去（生成器方法）
+        columnar_replay == True 时，按列一次性取出数据，逐条推送 dict 记录，避免 iterrows 逐行构建 Series
         :param date_from: None代表沿用类的 init_md_date_from 属性
         :param date_to: None代表沿用类的 init_md_date_from 属性
         :param load_md_count: 0 代表不限制，None代表沿用类的 init_load_md_count 属性，其他数字代表相应的最大加载条数
@@ -88,6 +91,11 @@ class MdAgentBase(Thread, ABC):
         if datetime_key is None and date_key is None and time_key is None:
             raise KeyError('load_history 方法返回的 key 无效 %s' % his_df_dic.keys())
 
+        if self.columnar_replay:
+            num = yield from self._load_history_record_columnar(
+                md_df, datetime_key, date_key, time_key, microseconds_key)
+            return num
+
         num = 0
         for num, md_s in md_df.iterrows():
             if datetime_key is not None:
@@ -96,11 +104,40 @@ class MdAgentBase(Thread, ABC):
                 datetime_tag = datetime.combine(md_s[date_key], md_s[time_key])
 
             if microseconds_key is not None:
-                datetime_tag += timedelta(microseconds=int(md_df[microseconds_key]))
+                datetime_tag += timedelta(microseconds=int(md_s[microseconds_key]))
             yield num, datetime_tag, md_s
 
         return num
 
+    @staticmethod
+    def _load_history_record_columnar(md_df: pd.DataFrame, datetime_key=None, date_key=None, time_key=None,
+                                      microseconds_key=None):
+        """
+        按列推送历史数据：各列一次性转换为 list，时间标签向量化计算，逐条推送 (num, datetime_tag, md_dic)
+        md_dic 每条记录均为新建的 dict 对象，因为策略及 trade_agent 可能会保留对 md 的引用（例如 curr_md）
+        :param md_df:
+        :param datetime_key:
+        :param date_key:
+        :param time_key:
+        :param microseconds_key:
+        :return: 加载记录数
+        """
+        if datetime_key is not None:
+            datetime_s = pd.to_datetime(md_df[datetime_key])
+        else:
+            datetime_s = pd.to_datetime(md_df[date_key]) + pd.to_timedelta(md_df[time_key].astype(str))
+
+        if microseconds_key is not None:
+            datetime_s = datetime_s + pd.to_timedelta(md_df[microseconds_key].astype('int64'), unit='us')
+
+        col_name_list = list(md_df.columns)
+        col_value_list = [md_df[col_name].tolist() for col_name in col_name_list]
+        num = 0
+        for num, datetime_tag, values in zip(md_df.index.tolist(), datetime_s.tolist(), zip(*col_value_list)):
+            yield num, datetime_tag, dict(zip(col_name_list, values))
+
+        return num
+
     @active_coroutine
     def cor_load_history_record(self, date_from=None, date_to=None, load_md_count=None):
         """
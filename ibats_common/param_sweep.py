@@ -0,0 +1,244 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 22:10
+@File    : param_sweep.py
+@contact : mmmaaaggg@163.com
+@desc    : 策略参数优化，基于 strategy_handler_factory_multi_exchange 在进程池中并行执行多组参数回测，
+返回各组参数回测结果汇总 DataFrame
+"""
+import copy
+import itertools
+import json
+import logging
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from ibats_utils.db import with_db_session
+
+from ibats_common.backend import engines
+from ibats_common.backend.orm import StgRunSummary
+from ibats_common.common import RunMode
+from ibats_common.config import config
+from ibats_common.strategy_handler import strategy_handler_factory_multi_exchange
+
+logger = logging.getLogger(__name__)
+# 汇总结果中保存的 ffn 统计指标
+PERF_STAT_KEY_LIST = ['total_return', 'cagr', 'max_drawdown', 'calmar', 'daily_sharpe', 'daily_sortino',
+                      'daily_vol', 'best_day', 'worst_day']
+
+
+def get_param_grid(param_space: dict) -> list:
+    """
+    网格搜索，返回全部参数组合
+    :param param_space: {参数名称: 取值列表}
+    :return: [{参数名称: 取值}, ...]
+    """
+    key_list = list(param_space.keys())
+    return [dict(zip(key_list, values)) for values in itertools.product(*[param_space[key] for key in key_list])]
+
+
+def get_param_random(param_space: dict, n, random_state=None) -> list:
+    """
+    随机搜索，返回 n 组随机参数
+    :param param_space: {参数名称: 取值}，取值可以是
+        list 从中随机选择一个
+        tuple (low, high) 整数则在 [low, high] 中随机选择整数，否则在 [low, high) 中均匀分布随机取值
+        callable func(rng) 返回取值
+    :param n: 参数组数
+    :param random_state: 随机数种子
+    :return: [{参数名称: 取值}, ...]
+    """
+    rng = np.random.RandomState(random_state)
+    param_list = []
+    for _ in range(n):
+        params = {}
+        for key, space in param_space.items():
+            if callable(space):
+                value = space(rng)
+            elif isinstance(space, tuple):
+                low, high = space
+                if isinstance(low, int) and isinstance(high, int):
+                    value = int(rng.randint(low, high + 1))
+                else:
+                    value = float(rng.uniform(low, high))
+            else:
+                value = space[rng.randint(len(space))]
+                if isinstance(value, np.generic):
+                    value = value.item()
+            params[key] = value
+        param_list.append(params)
+    return param_list
+
+
+def calc_summary(stg_handler) -> dict:
+    """
+    根据 stg_handler 内存中的 stg_run_status_detail_list 计算回测结果汇总指标
+    :param stg_handler:
+    :return:
+    """
+    import ffn
+    stg_base = stg_handler.stg_base
+    # trade_agent_dic 中 ExchangeName.Default 与默认 trade_agent 指向同一对象，需要去重
+    trade_agent_dic = {id(trade_agent): trade_agent for trade_agent in stg_base.trade_agent_dic.values()}
+    trade_agent_list = list(trade_agent_dic.values())
+    trade_count = sum([len(getattr(trade_agent, 'trade_detail_list', [])) for trade_agent in trade_agent_list])
+    summary_dic = {'trade_count': trade_count}
+    detail_list = stg_handler.stg_run_status_detail_list
+    if len(detail_list) == 0:
+        return summary_dic
+    detail_last = detail_list[-1]
+    summary_dic['rr'] = float(detail_last.rr)
+    summary_dic['rr_compound'] = float(detail_last.rr_compound)
+    nav_s = pd.Series([1 + float(detail.rr_compound) for detail in detail_list],
+                      index=pd.to_datetime([detail.trade_dt for detail in detail_list]))
+    nav_s = nav_s[~nav_s.index.duplicated(keep='last')].sort_index()
+    if nav_s.shape[0] < 2:
+        return summary_dic
+    stats = ffn.PerformanceStats(nav_s).stats
+    for key in PERF_STAT_KEY_LIST:
+        value = stats.get(key, np.nan)
+        summary_dic[key] = float(value) if pd.notna(value) else None
+    return summary_dic
+
+
+def _save_summary(stg_run_id, strategy_params, summary_dic):
+    summary = StgRunSummary(
+        stg_run_id=stg_run_id, stg_params=json.dumps(strategy_params),
+        trade_count=summary_dic.get('trade_count', None), rr=summary_dic.get('rr', None),
+        rr_compound=summary_dic.get('rr_compound', None), cagr=summary_dic.get('cagr', None),
+        max_drawdown=summary_dic.get('max_drawdown', None), daily_sharpe=summary_dic.get('daily_sharpe', None),
+        summary=json.dumps(summary_dic))
+    with with_db_session(engines.engine_ibats) as session:
+        session.add(summary)
+        session.commit()
+
+
+def _init_worker(summary_only):
+    """进程初始化，fork 方式创建的子进程不能复用父进程的数据库连接"""
+    engines.engine_ibats.dispose()
+    if summary_only:
+        config.ORM_UPDATE_OR_INSERT_PER_ACTION = False
+        config.BACKTEST_SAVE_DETAIL = False
+
+
+def run_backtest(stg_class, strategy_params, md_agent_params_list, run_mode: RunMode, trade_agent_params_list,
+                 strategy_handler_param, save_summary=True) -> dict:
+    """
+    执行一次回测，返回参数及回测结果汇总
+    :param stg_class:
+    :param strategy_params:
+    :param md_agent_params_list:
+    :param run_mode:
+    :param trade_agent_params_list:
+    :param strategy_handler_param:
+    :param save_summary: 保存汇总结果到 stg_run_summary 表
+    :return:
+    """
+    datetime_start = time.time()
+    ret_dic = dict(strategy_params)
+    try:
+        # 各个参数在 strategy_handler_factory_multi_exchange 中可能被修改，因此每次回测使用独立副本
+        md_agent_params_list = copy.deepcopy(md_agent_params_list)
+        for params in md_agent_params_list:
+            # 通过 MdCache 加载行情文件，各进程共享同一份解析结果
+            params.setdefault('cache_file', True)
+        stg_handler = strategy_handler_factory_multi_exchange(
+            stg_class, copy.deepcopy(strategy_params), md_agent_params_list, run_mode,
+            copy.deepcopy(trade_agent_params_list), copy.deepcopy(strategy_handler_param))
+        stg_handler.run()
+        summary_dic = calc_summary(stg_handler)
+        if save_summary:
+            _save_summary(stg_handler.stg_run_id, strategy_params, summary_dic)
+        ret_dic['stg_run_id'] = stg_handler.stg_run_id
+        ret_dic.update(summary_dic)
+    except Exception as exp:
+        logger.exception("参数 %s 回测失败", strategy_params)
+        ret_dic['error'] = repr(exp)
+    ret_dic['elapsed'] = time.time() - datetime_start
+    return ret_dic
+
+
+def _run_backtest(args):
+    return run_backtest(*args)
+
+
+def run_param_sweep(stg_class, param_list, md_agent_params_list, trade_agent_params_list, date_from, date_to,
+                    run_mode=RunMode.Backtest, strategy_handler_param=None, processes=None, summary_only=False,
+                    save_summary=True) -> pd.DataFrame:
+    """
+    参数优化，在进程池中并行执行多组参数回测
+    :param stg_class: 策略类型 StgBase 的子类
+    :param param_list: 策略参数列表，可通过 get_param_grid、get_param_random 生成
+    :param md_agent_params_list: 行情代理参数，与 strategy_handler_factory_multi_exchange 一致
+    :param trade_agent_params_list: 交易代理参数，与 strategy_handler_factory_multi_exchange 一致
+    :param date_from: 回测起始日期
+    :param date_to: 回测截止日期
+    :param run_mode: RunMode.Backtest 或 RunMode.Backtest_FixPercent
+    :param strategy_handler_param: strategy_handler 其他运行参数
+    :param processes: 进程数，None 代表 CPU 核数，1 代表在当前进程中顺序执行
+    :param summary_only: 仅保存汇总结果，不保存 order、trade、持仓、账户等明细数据
+    :param save_summary: 保存汇总结果到 stg_run_summary 表
+    :return: 每组参数一行，包含参数、stg_run_id、汇总指标、耗时
+    """
+    strategy_handler_param = {} if strategy_handler_param is None else dict(strategy_handler_param)
+    strategy_handler_param['date_from'] = date_from
+    strategy_handler_param['date_to'] = date_to
+    args_list = [(stg_class, strategy_params, md_agent_params_list, run_mode, trade_agent_params_list,
+                  strategy_handler_param, save_summary) for strategy_params in param_list]
+    datetime_start = time.time()
+    if processes == 1:
+        orm_update_or_insert_per_action = config.ORM_UPDATE_OR_INSERT_PER_ACTION
+        backtest_save_detail = config.BACKTEST_SAVE_DETAIL
+        if summary_only:
+            config.ORM_UPDATE_OR_INSERT_PER_ACTION = False
+            config.BACKTEST_SAVE_DETAIL = False
+        try:
+            result_list = [_run_backtest(args) for args in args_list]
+        finally:
+            config.ORM_UPDATE_OR_INSERT_PER_ACTION = orm_update_or_insert_per_action
+            config.BACKTEST_SAVE_DETAIL = backtest_save_detail
+    else:
+        # 子进程创建前释放数据库连接，避免子进程复用父进程的连接
+        engines.engine_ibats.dispose()
+        with Pool(processes=processes, initializer=_init_worker, initargs=(summary_only,)) as pool:
+            result_list = pool.map(_run_backtest, args_list, chunksize=1)
+
+    logger.info("%d 组参数回测完成，耗时 %.2f 秒", len(param_list), time.time() - datetime_start)
+    return pd.DataFrame(result_list)
+
+
+def _test_run_param_sweep(processes=None):
+    import os
+    from ibats_common import example
+    from ibats_common.common import PeriodType, ExchangeName, BacktestTradeMode, CalcMode
+    from ibats_common.example.ma_cross_stg import MACrossStg
+    md_agent_params_list = [{
+        'md_period': PeriodType.Min1,
+        'instrument_id_list': ['RB'],
+        'datetime_key': 'trade_date',
+        'init_md_date_from': '1995-1-1',  # 行情初始化加载历史数据，供策略分析预加载使用
+        'init_md_date_to': '2010-1-1',
+        'file_path': os.path.join(os.path.dirname(example.__file__), 'data', 'RB.csv'),
+        'symbol_key': 'instrument_type',
+        'exchange_name': ExchangeName.LocalFile,
+    }]
+    trade_agent_params_list = [{
+        'exchange_name': ExchangeName.LocalFile,
+        'is_default': True,
+        'trade_mode': BacktestTradeMode.Order_2_Deal,
+        'init_cash': 1000000,
+        'calc_mode': CalcMode.Normal,
+    }]
+    result_df = run_param_sweep(
+        MACrossStg, get_param_grid({'unit': [10, 50, 100, 200]}), md_agent_params_list, trade_agent_params_list,
+        date_from='2010-1-1', date_to='2018-10-18', processes=processes, summary_only=True)
+    logger.info("\n%s", result_df)
+    return result_df
+
+
+if __name__ == "__main__":
+    _test_run_param_sweep()
@@ -10,7 +10,10 @@ from collections import defaultdict
 
 import pandas as pd
 
+from ibats_common.backend import latency
+from ibats_common.backend.md_buffer import MdBuffer
 from ibats_common.common import PeriodType, ExchangeName, ContextKey, Direction
+from ibats_common.config import config
 
 logger_stg_base = logging.getLogger(__name__)
 
@@ -19,10 +22,10 @@ class StgBase:
 
     def __init__(self, *args, **kwargs):
         self.stg_run_id = None
-        # 记录各个md_agent_key、各个周期 md 数据
-        self._md_agent_key_period_df_dic = defaultdict(dict)
-        # 记录各个md_agent_key、各个周期 md 列信息
-        self._md_agent_key_period_df_col_name_list_dic = defaultdict(dict)
+        # 记录各个md_agent_key、各个周期 md 数据，数据保存在 MdBuffer 中
+        self._md_agent_key_period_buffer_dic = defaultdict(dict)
+        # 推送给策略的 md_df 最多包含最近多少条数据，None 代表全部历史数据
+        self.md_df_max_window = config.STG_MD_DF_MAX_WINDOW
         # 记录各个md_agent_key、各个周期 context 信息
         self._md_agent_key_period_context_dic = defaultdict(dict)
         # 记录各个md_agent_key对应的 td_agent_key list
@@ -72,14 +75,21 @@ class StgBase:
     def load_md_period_df(self, period, md_df: pd.DataFrame, context):
         """初始化加载 md 数据"""
         md_agent_key = context[ContextKey.md_agent_key]
-        self._md_agent_key_period_df_dic[md_agent_key][period] = md_df
-        self._md_agent_key_period_df_col_name_list_dic[md_agent_key][period] = list(md_df.columns) if isinstance(
-            md_df, pd.DataFrame) else None
+        if isinstance(md_df, pd.DataFrame):
+            self._md_agent_key_period_buffer_dic[md_agent_key][period] = MdBuffer.create_by_df(
+                md_df, max_window=self.md_df_max_window)
         self._md_agent_key_period_context_dic[md_agent_key][period] = context
         # prepare_event_handler = self._on_period_prepare_event_dic[period]
         prepare_event_handler = self._on_period_event_dic[period].prepare_event
         prepare_event_handler(md_df, context)
 
+    def get_md_buffer(self, md_agent_key, period) -> MdBuffer:
+        """
+        返回 md_agent_key、period 对应的行情数据缓冲区，
+        策略可以通过 md_buffer.get_array(col_name, n) 直接获取最近 n 条数据的 numpy 数组（只读视图）
+        """
+        return self._md_agent_key_period_buffer_dic[md_agent_key].get(period, None)
+
     def init(self):
         """
         加载历史数据后，启动周期策略执行函数之前
@@ -103,12 +113,12 @@ class StgBase:
         """
         # 行情信息处理函数调用结束
         # 调用各个 md_agent_key 的各个 period 的 汇总函数
-        # self._md_agent_key_period_df_dic[md_agent_key][period]
-        for md_agent_key, _ in self._md_agent_key_period_df_dic.items():
-            for period, md_df in _.items():
+        # self._md_agent_key_period_buffer_dic[md_agent_key][period]
+        for md_agent_key, _ in self._md_agent_key_period_buffer_dic.items():
+            for period, md_buffer in _.items():
                 event_handler = self._on_period_event_dic[period].md_release_event
                 try:
-                    event_handler(md_df)
+                    event_handler(md_buffer.to_df())
                 except:
                     self.logger.exception('period=%s %s invoked exception', period, event_handler)
 
@@ -123,6 +133,8 @@ class StgBase:
     def on_period_md_handler(self, period, md, md_agent_key):
         """响应 period 数据"""
         # 本机测试，延时0.155秒，从分钟K线合成到交易策略端收到数据
+        # 启用 config.LATENCY_TRACE 后，各阶段耗时由 latency.checkpoint 记录
+        latency.checkpoint(latency.STAGE_DISPATCH)
         period_event_relation = self._on_period_event_dic[period]
         event_handler = period_event_relation.md_event
         param_type = period_event_relation.param_type
@@ -134,22 +146,21 @@ class StgBase:
             # 2019-06-05
             # 移除 self._on_period_md_append 该函数调用，将函数内部代码复制到下面直接使用
             # param = self._on_period_md_append(period, md, md_agent_key)
-
-            md_df = pd.DataFrame([md])
-            # self.logger.debug('%s -> %s', period, md)
-            if period in self._md_agent_key_period_df_dic[md_agent_key]:
-                col_name_list = self._md_agent_key_period_df_col_name_list_dic[md_agent_key][period]
-                md_df_his = self._md_agent_key_period_df_dic[md_agent_key][period].append(md_df[col_name_list])
-                self._md_agent_key_period_df_dic[md_agent_key][period] = md_df_his
+            # 2026-10-18
+            # 使用 MdBuffer 替代 DataFrame.append，避免每一次追加数据均复制全部历史数据
+            period_buffer_dic = self._md_agent_key_period_buffer_dic[md_agent_key]
+            if period in period_buffer_dic:
+                md_buffer = period_buffer_dic[period]
+                md_buffer.append(md)
             else:
-                md_df_his = md_df
-                self._md_agent_key_period_df_dic[md_agent_key][period] = md_df_his
-                self._md_agent_key_period_df_col_name_list_dic[md_agent_key][period] = \
-                    list(md_df.columns) if isinstance(md_df, pd.DataFrame) else None
-            param = md_df_his
+                md_buffer = MdBuffer.create_by_md(md, max_window=self.md_df_max_window)
+                period_buffer_dic[period] = md_buffer
+            param = md_buffer.to_df()
+            latency.checkpoint(latency.STAGE_MD_DF)
         else:
             raise ValueError("不支持 %s 类型作为 %s 的事件参数" % (param_type, period))
         event_handler(param, context)
+        latency.checkpoint(latency.STAGE_CALLBACK)
 
     def on_prepare_tick(self, md_df, context):
         """Tick 历史数据加载执行语句"""
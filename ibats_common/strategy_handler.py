@@ -7,22 +7,26 @@
 @contact : mmmaaaggg@163.com
 @desc    : 策略处理句柄，用于处理策略进行回测或实盘交易
 """
+import asyncio
+import heapq
 import json
 import logging
 import time
 import warnings
 from abc import ABC
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from functools import lru_cache
 from queue import Empty
 from threading import Thread
 
+import pandas as pd
 from ibats_utils.db import with_db_session
 from ibats_utils.mess import try_2_date, load_class, get_module_path
-from sqlalchemy.exc import SQLAlchemyError
 
-from ibats_common.backend import engines
+from ibats_common.backend import engines, write_behind, latency
+from ibats_common.backend.bulk_insert import bulk_insert
 from ibats_common.backend.orm import StgRunInfo, StgRunStatusDetail
 from ibats_common.common import ExchangeName, RunMode, ContextKey, CalcMode
 from ibats_common.config import config
@@ -50,6 +54,9 @@ class StgHandlerBase(Thread, ABC):
         # 对不同周期设置相应的md_agent
         self.md_key_period_agent_dic = md_key_period_agent_dic
         self.stg_run_status_detail_list = []
+        # 延迟统计，config.LATENCY_TRACE 为 False 时为 None
+        self.latency_tracer = latency.create_tracer(stg_run_id)
+        self.latency_summary_df = None
 
     def stg_run_ending(self):
         """
@@ -59,20 +66,18 @@ class StgHandlerBase(Thread, ABC):
         :return:
         """
         self.stg_base.release()
+        # 等待异步写入队列中的记录全部保存
+        write_behind.flush()
+        if self.latency_tracer is not None:
+            self.latency_summary_df = self.latency_tracer.log_summary()
         # 更新数据库 td_to 字段
         with with_db_session(engine_ibats) as session:
             session.query(StgRunInfo).filter(StgRunInfo.stg_run_id == self.stg_run_id).update(
                 {StgRunInfo.dt_to: datetime.now()})
-            try:
-                session.bulk_save_objects(self.stg_run_status_detail_list)
-                # sql_str = StgRunInfo.update().where(
-                # StgRunInfo.c.stg_run_id == self.stg_run_id).values(dt_to=datetime.now())
-                # session.execute(sql_str)
-                session.commit()
-                self.logger.debug("%d 条 stg_run_status_detail 被保存", len(self.stg_run_status_detail_list))
-            except SQLAlchemyError:
-                logger.exception("%d 条 stg_run_status_detail 被保存时发生异常", len(self.stg_run_status_detail_list))
-                session.rollback()
+            session.commit()
+
+        if config.BACKTEST_SAVE_DETAIL or self.run_mode == RunMode.Realtime:
+            bulk_insert(StgRunStatusDetail, self.stg_run_status_detail_list)
 
         self.is_working = False
         self.is_done = True
@@ -160,13 +165,18 @@ class StgHandlerRealtime(StgHandlerBase):
         md_agent.subscribe()  # 参数为空相当于 md_agent.subscribe(md_agent.instrument_id_list)
         md_agent.start()
         md_dic = None
+        latency_tracer = self.latency_tracer
         while self.is_working:
             try:
                 if not self.is_working:
                     break
                 # 加载数据，是设置超时时间，防止长时间阻塞
                 md_dic = md_agent.pull(self.timeout_pull)
+                if latency_tracer is not None:
+                    latency_tracer.begin()
                 handler(period, md_dic)
+                if latency_tracer is not None:
+                    latency_tracer.end()
             except Empty:
                 # 工作状态检查
                 pass
@@ -178,6 +188,268 @@ class StgHandlerRealtime(StgHandlerBase):
         self.logger.info('period:%s finished', period)
 
 
+class StgHandlerRealtimeAsync(StgHandlerBase):
+    """
+    基于 asyncio 的实时行情处理句柄
+    全部 md_agent 共用一个事件循环，各 md_agent 的阻塞 pull 在有限大小的线程池中执行（md_agent 提供 pull_async 协程时直接 await），
+    行情放入各自的 asyncio.Queue，由唯一的分发任务按时间戳排序后依次调用 stg_base.on_period_md_handler，
+    on_timer 作为定时任务运行，策略的全部回调均在事件循环线程中串行执行
+    """
+
+    def __init__(self, stg_run_id, stg_base: StgBase, md_key_period_agent_dic, **kwargs):
+        super().__init__(stg_run_id=stg_run_id, stg_base=stg_base, run_mode=RunMode.Realtime,
+                         md_key_period_agent_dic=md_key_period_agent_dic)
+        # 设置推送超时时间，线程池小于 md_agent 数量时，各 md_agent 轮流占用线程，因此超时时间不宜过长
+        self.timeout_pull = kwargs.setdefault('timeout_pull', 1)
+        # pull 线程池最大线程数
+        self.max_pull_workers = kwargs.setdefault('max_pull_workers', 8)
+        # 每个 md_agent 行情队列最大长度，队列满时暂停 pull
+        self.md_queue_size = kwargs.setdefault('md_queue_size', 10000)
+        # 收到行情后等待 reorder_seconds 秒，以便其他 md_agent 同一时刻的行情到达后一起排序，0 代表不等待
+        self.reorder_seconds = kwargs.setdefault('reorder_seconds', 0)
+        # 设置定时任务
+        self.enable_timer_thread = kwargs.setdefault('enable_timer_thread', False)
+        self.seconds_of_timer_interval = kwargs.setdefault('seconds_of_timer_interval', 9999)
+        self._loop = None
+        self._md_event = None
+        self._is_pull_done = False
+        self._is_dispatch_done = False
+        # 统计信息
+        self.dispatch_count = 0
+        self.error_count = 0
+        self.queue_seconds = 0.0
+        self.queue_seconds_max = 0.0
+        self.handler_seconds = 0.0
+        self.handler_seconds_max = 0.0
+
+    def run(self):
+        if self.is_working:
+            return
+        else:
+            self.is_working = True
+
+        try:
+            # 策略初始化
+            self.stg_base.init()
+            asyncio.run(self._run_async())
+        finally:
+            self.is_working = False
+            self.logger.info('行情分发统计：%s', self.get_metrics())
+            self.stg_run_ending()
+
+    def stop(self):
+        """通知各 md_agent 停止 pull，已收到的行情分发完毕后结束"""
+        self.is_working = False
+        loop, md_event = self._loop, self._md_event
+        if loop is not None and md_event is not None:
+            try:
+                loop.call_soon_threadsafe(md_event.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def get_metrics(self) -> dict:
+        dispatch_count = self.dispatch_count
+        return {
+            'dispatch_count': dispatch_count,
+            'error_count': self.error_count,
+            'queue_seconds_avg': self.queue_seconds / dispatch_count if dispatch_count > 0 else 0.0,
+            'queue_seconds_max': self.queue_seconds_max,
+            'handler_seconds_avg': self.handler_seconds / dispatch_count if dispatch_count > 0 else 0.0,
+            'handler_seconds_max': self.handler_seconds_max,
+        }
+
+    async def _run_async(self):
+        self._loop = asyncio.get_running_loop()
+        self._md_event = asyncio.Event()
+        self._is_pull_done = False
+        self._is_dispatch_done = False
+        key_md_agent_list = [((md_agent_key, period), md_agent)
+                             for md_agent_key, period_agent_dic in self.md_key_period_agent_dic.items()
+                             for period, md_agent in period_agent_dic.items()]
+        key_queue_dic = {key: asyncio.Queue(maxsize=self.md_queue_size) for key, _ in key_md_agent_list}
+        max_workers = max(min(self.max_pull_workers, len(key_md_agent_list)), 1)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='md_pull') as executor:
+            pull_task_list = [asyncio.create_task(self._run_md_agent(key, md_agent, key_queue_dic[key], executor))
+                              for key, md_agent in key_md_agent_list]
+            timestamp_key_dic = {key: md_agent.timestamp_key for key, md_agent in key_md_agent_list}
+            dispatch_task = asyncio.create_task(self._dispatch(key_queue_dic, timestamp_key_dic))
+            timer_task = asyncio.create_task(self._run_timer()) if self.enable_timer_thread else None
+            try:
+                await asyncio.gather(*pull_task_list)
+            finally:
+                self._is_pull_done = True
+                self._md_event.set()
+                await dispatch_task
+                if timer_task is not None:
+                    timer_task.cancel()
+
+    async def _run_timer(self):
+        """定时运行策略对象的 on_timer 方法"""
+        while self.is_working:
+            try:
+                self.stg_base.on_timer()
+            except Exception:
+                self.logger.exception('on_timer 函数运行异常')
+            await asyncio.sleep(self.seconds_of_timer_interval)
+
+    async def _run_md_agent(self, key, md_agent, queue: asyncio.Queue, executor):
+        """
+        pull md_agent 行情，连同到达时间放入 queue
+        :param key: (md_agent_key, period)
+        :param md_agent:
+        :param queue:
+        :param executor: 执行阻塞 pull 的线程池
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        self.logger.info('启动 %s 行情监听', key)
+        try:
+            await loop.run_in_executor(executor, self._start_md_agent, md_agent)
+        except Exception:
+            self.logger.exception('%s 行情启动异常', key)
+            return
+
+        pull_async = getattr(md_agent, 'pull_async', None)
+        md_event = self._md_event
+        while self.is_working:
+            try:
+                if pull_async is not None:
+                    md_dic = await pull_async(self.timeout_pull)
+                else:
+                    md_dic = await loop.run_in_executor(executor, md_agent.pull, self.timeout_pull)
+            except (Empty, asyncio.TimeoutError):
+                # 工作状态检查
+                continue
+            except Exception:
+                self.logger.exception('%s 行情 pull 异常', key)
+                continue
+            if await self._put(queue, (time.perf_counter_ns(), datetime.now(), md_dic)):
+                md_event.set()
+            else:
+                self.logger.error('%s 行情分发任务已结束，丢弃行情并停止 pull', key)
+
+        try:
+            await loop.run_in_executor(executor, md_agent.release)
+        except Exception:
+            self.logger.exception('%s 行情释放异常', key)
+        self.logger.info('%s finished', key)
+
+    async def _put(self, queue: asyncio.Queue, item) -> bool:
+        """
+        将行情放入 queue，队列满时等待分发任务处理，分发任务已结束时返回 False，避免 pull 任务永久阻塞
+        :param queue:
+        :param item:
+        :return:
+        """
+        try:
+            queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+        while not self._is_dispatch_done:
+            try:
+                await asyncio.wait_for(queue.put(item), self.timeout_pull)
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+
+    def _get_timestamp(self, key, md_dic, timestamp_key, arrival_datetime) -> datetime:
+        """
+        取得行情时间戳，统一转换为本地时区的 naive datetime 以便排序，无法取得时使用到达时间
+        :param key: (md_agent_key, period)
+        :param md_dic:
+        :param timestamp_key: None 代表使用到达时间
+        :param arrival_datetime: 到达时间
+        :return:
+        """
+        if timestamp_key is None:
+            return arrival_datetime
+        try:
+            timestamp = md_dic[timestamp_key]
+            if not isinstance(timestamp, datetime):
+                timestamp = pd.Timestamp(timestamp)
+            if isinstance(timestamp, pd.Timestamp):
+                if pd.isna(timestamp):
+                    raise ValueError(f'{timestamp_key} 为空')
+                timestamp = timestamp.to_pydatetime()
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone().replace(tzinfo=None)
+            return timestamp
+        except Exception:
+            self.logger.exception('%s 行情时间戳 %s 解析异常，使用到达时间，对应行情数据md_dic:\n%s',
+                                  key, timestamp_key, md_dic)
+            return arrival_datetime
+
+    @staticmethod
+    def _start_md_agent(md_agent):
+        md_agent.connect()
+        md_agent.subscribe()  # 参数为空相当于 md_agent.subscribe(md_agent.instrument_id_list)
+        md_agent.start()
+
+    async def _dispatch(self, key_queue_dic, timestamp_key_dic):
+        """
+        取出各队列中已到达的全部行情，按时间戳排序后依次推送给策略
+        :param key_queue_dic: (md_agent_key, period) -> 行情队列
+        :param timestamp_key_dic: (md_agent_key, period) -> timestamp_key，为 None 时使用到达时间
+        :return:
+        """
+        try:
+            await self._dispatch_loop(key_queue_dic, timestamp_key_dic)
+        finally:
+            # 分发任务异常退出时通知 pull 任务停止，避免队列满后 pull 任务阻塞，run 无法结束
+            self._is_dispatch_done = True
+            self.is_working = False
+
+    async def _dispatch_loop(self, key_queue_dic, timestamp_key_dic):
+        handler = self.stg_base.on_period_md_handler
+        latency_tracer = self.latency_tracer
+        md_event = self._md_event
+        while True:
+            await md_event.wait()
+            md_event.clear()
+            if self.reorder_seconds > 0 and self.is_working:
+                await asyncio.sleep(self.reorder_seconds)
+
+            record_list = []
+            for key, queue in key_queue_dic.items():
+                timestamp_key = timestamp_key_dic[key]
+                while not queue.empty():
+                    arrival_ns, arrival_datetime, md_dic = queue.get_nowait()
+                    timestamp = self._get_timestamp(key, md_dic, timestamp_key, arrival_datetime)
+                    record_list.append((timestamp, len(record_list), key, arrival_ns, md_dic))
+
+            try:
+                record_list.sort(key=lambda x: x[:2])
+            except TypeError:
+                self.logger.exception('行情时间戳无法比较，按到达时间排序')
+                record_list.sort(key=lambda x: x[3])
+            for timestamp, _, (md_agent_key, period), arrival_ns, md_dic in record_list:
+                start_ns = time.perf_counter_ns()
+                if latency_tracer is not None:
+                    latency_tracer.begin(arrival_ns)
+                try:
+                    handler(period, md_dic, md_agent_key)
+                except Exception:
+                    self.error_count += 1
+                    self.logger.exception('%s 事件处理句柄执行异常，对应行情数据md_dic:\n%s', period, md_dic)
+                if latency_tracer is not None:
+                    latency_tracer.end()
+                end_ns = time.perf_counter_ns()
+                self.dispatch_count += 1
+                queue_seconds, handler_seconds = (start_ns - arrival_ns) / 1e9, (end_ns - start_ns) / 1e9
+                self.queue_seconds += queue_seconds
+                self.handler_seconds += handler_seconds
+                if queue_seconds > self.queue_seconds_max:
+                    self.queue_seconds_max = queue_seconds
+                if handler_seconds > self.handler_seconds_max:
+                    self.handler_seconds_max = handler_seconds
+
+            if self._is_pull_done and all(queue.empty() for queue in key_queue_dic.values()):
+                break
+
+
 class StgHandlerBacktest(StgHandlerBase):
 
     def __init__(self, stg_run_id, stg_base: StgBase, run_mode, md_key_period_agent_dic, date_from, date_to,
@@ -241,44 +513,16 @@ class StgHandlerBacktest(StgHandlerBase):
     def load_history_record(self):
         """
         迭代器方法，用于产生行情数据
+        各个 md_agent 各个周期的历史数据通过 merge_history_record 按时间顺序归并推送
         :return:
         """
-        md_list_sorted_by_datetime_tag = []
-        # 每一个 md_agent 抓取第一条记录，放入 md_list_sorted_by_datetime_tag 并按 datetime_tag 排序
+        key_cor_func_list = []
         for md_agent_key, period_agent_dic in self.md_key_period_agent_dic.items():
             for period, md_agent in period_agent_dic.items():
                 cor_func = md_agent.cor_load_history_record(self.date_from, self.date_to, load_md_count=0)
-                try:
-                    num, datetime_tag, md_s = cor_func.send(None)
-                except StopIteration as exp:
-                    self.logger.info('%s %s 没有数据', md_agent_key, period)
-                    continue
-
-                md_list_sorted_by_datetime_tag.append((datetime_tag, md_agent_key, period, num, md_s, cor_func))
-
-        # 开始循环，每一次循环：
-        # 1）读取发送 datetime_tag 最小的一条记录
-        # 2）从相应的 md_agent 再读取一条记录，补充到 md_list_sorted_by_datetime_tag
-        # 3）按 datetime_tag 排序
-        # 如此循环，知道全部数据被发送完
-        md_list_sorted_by_datetime_tag.sort(key=lambda x: x[0])
-        list_count = len(md_list_sorted_by_datetime_tag)
-        data_count = 0
-        while list_count > 0:
-            datetime_tag, md_agent_key, period, num, md_s, cor_func = md_list_sorted_by_datetime_tag[0]
-            yield datetime_tag, md_agent_key, period, num, md_s
-            try:
-                num, datetime_tag, md_s = cor_func.send(None)
-                md_list_sorted_by_datetime_tag[0] = (datetime_tag, md_agent_key, period, num, md_s, cor_func)
-            except StopIteration as exp:
-                data_count += exp.value
-                self.logger.info('%s %s 推送 %d 条数据完成', md_agent_key, period, exp.value)
-                md_list_sorted_by_datetime_tag.pop(0)
-                list_count = len(md_list_sorted_by_datetime_tag)
-
-            # 重新按 datetime_tag 排序
-            md_list_sorted_by_datetime_tag.sort(key=lambda x: x[0])
+                key_cor_func_list.append(((md_agent_key, period), cor_func))
 
+        data_count = yield from merge_history_record(key_cor_func_list, logger=self.logger)
         self.logger.info('全部数据推送完成， 累计推送 %d 条数据', data_count)
 
     def _update_stg_run_status_detail(self, trade_agent_status_detail_list):
@@ -315,9 +559,13 @@ class StgHandlerBacktest(StgHandlerBase):
             # 按照时间顺序将各个周期数据依次推入对应 handler
             data_count = 0
             datetime_tag_last = None
+            latency_tracer = self.latency_tracer
             for data_count, (datetime_tag, md_agent_key, period, num, md_s) in enumerate(
                     self.load_history_record(), start=1):
-                md = md_s.to_dict()
+                if latency_tracer is not None:
+                    latency_tracer.begin()
+                # columnar_replay 模式下 md_agent 直接推送 dict 记录
+                md = md_s if isinstance(md_s, dict) else md_s.to_dict()
                 # self.logger.debug("md: %s", md)
                 # 在回测阶段，需要对 trade_agent 设置最新的md数据，一遍交易接口确认相应的k线日期
                 for trade_agent_key in self.md_td_agent_key_list_map[md_agent_key]:
@@ -355,6 +603,8 @@ class StgHandlerBacktest(StgHandlerBase):
                     trade_agent_status_detail_list = None
 
                 self._update_stg_run_status_detail(trade_agent_status_detail_list)
+                if latency_tracer is not None:
+                    latency_tracer.end()
 
                 datetime_tag_last = datetime_tag
 
@@ -371,6 +621,52 @@ class StgHandlerBacktest(StgHandlerBase):
             self.is_working = False
 
 
+def merge_history_record(key_cor_func_list, logger=logger):
+    """
+    多路归并：将多个 md_agent 各个周期的历史数据（均已按时间排序）归并为一个按时间排序的数据流
+    使用堆（heapq）维护每一路当前的第一条记录，每推送一条记录的复杂度为 O(log K)，K 为数据流数量
+    datetime_tag 相同时，按 (md_agent_key, period) 顺序推送，保证每次执行顺序一致
+    :param key_cor_func_list: [((md_agent_key, period), cor_func), ...]
+     cor_func 为 md_agent.cor_load_history_record 返回的协程，每次 send(None) 返回 (num, datetime_tag, md_s)
+    :param logger:
+    :return: 累计推送数据条数
+    """
+    # 预先对 (md_agent_key, period) 排序，以序号作为 datetime_tag 相同时的排序依据，
+    # 避免不同类型的 md_agent_key 之间直接比较，同时避免比较 cor_func 对象
+    key_cor_func_list = sorted(key_cor_func_list, key=lambda x: (str(x[0][0]), int(x[0][1])))
+    heap = []
+    # 每一个 md_agent 抓取第一条记录，放入 heap
+    for rank, ((md_agent_key, period), cor_func) in enumerate(key_cor_func_list):
+        try:
+            num, datetime_tag, md_s = cor_func.send(None)
+        except StopIteration:
+            logger.info('%s %s 没有数据', md_agent_key, period)
+            continue
+
+        heap.append((datetime_tag, rank, md_agent_key, period, num, md_s, cor_func))
+
+    # 开始循环，每一次循环：
+    # 1）推送 datetime_tag 最小的一条记录（堆顶）
+    # 2）从相应的 md_agent 再读取一条记录，替换堆顶，重新调整堆
+    # 3）如果该 md_agent 数据已经推送完成，则将其从堆中移除
+    # 如此循环，直到全部数据被发送完
+    heapq.heapify(heap)
+    data_count = 0
+    while heap:
+        datetime_tag, rank, md_agent_key, period, num, md_s, cor_func = heap[0]
+        yield datetime_tag, md_agent_key, period, num, md_s
+        try:
+            num, datetime_tag, md_s = cor_func.send(None)
+            heapq.heapreplace(heap, (datetime_tag, rank, md_agent_key, period, num, md_s, cor_func))
+        except StopIteration as exp:
+            count = exp.value if exp.value is not None else 0
+            data_count += count
+            logger.info('%s %s 推送 %d 条数据完成', md_agent_key, period, count)
+            heapq.heappop(heap)
+
+    return data_count
+
+
 def strategy_handler_factory(
         stg_class: type(StgBase), strategy_params, md_agent_params_list, run_mode: RunMode, exchange_name: ExchangeName,
         trade_agent_params: dict, strategy_handler_param: dict) -> StgHandlerBase:
@@ -522,7 +818,11 @@ def strategy_handler_factory_multi_exchange(
 
     # 初始化 StgHandlerBase 实例
     logger.debug("stg_run_id=%d,\n\tstrategy_handler_param: %s", stg_run_id, strategy_handler_param)
-    if run_mode == RunMode.Realtime:
+    if run_mode == RunMode.Realtime and strategy_handler_param.get('enable_asyncio', False):
+        stg_handler = StgHandlerRealtimeAsync(
+            stg_run_id=stg_run_id, stg_base=stg_base, md_key_period_agent_dic=md_key_period_agent_dic,
+            **strategy_handler_param)
+    elif run_mode == RunMode.Realtime:
         stg_handler = StgHandlerRealtime(
             stg_run_id=stg_run_id, stg_base=stg_base, md_key_period_agent_dic=md_key_period_agent_dic,
             **strategy_handler_param)
@@ -575,3 +875,79 @@ def strategy_handler_loader(stg_run_id, is_4_shown=True) -> StgHandlerBase:
         is_4_shown=is_4_shown,
     )
     return stg_handler
+
+
+def _sort_merge_history_record(key_cor_func_list):
+    """
+    原 StgHandlerBacktest.load_history_record 中的归并方法：每推送一条记录重新排序一次，并 pop(0)
+    仅供 _test_merge_benchmark 对比使用
+    """
+    md_list_sorted_by_datetime_tag = []
+    for (md_agent_key, period), cor_func in key_cor_func_list:
+        try:
+            num, datetime_tag, md_s = cor_func.send(None)
+        except StopIteration:
+            continue
+
+        md_list_sorted_by_datetime_tag.append((datetime_tag, md_agent_key, period, num, md_s, cor_func))
+
+    md_list_sorted_by_datetime_tag.sort(key=lambda x: x[0])
+    data_count = 0
+    while len(md_list_sorted_by_datetime_tag) > 0:
+        datetime_tag, md_agent_key, period, num, md_s, cor_func = md_list_sorted_by_datetime_tag[0]
+        yield datetime_tag, md_agent_key, period, num, md_s
+        try:
+            num, datetime_tag, md_s = cor_func.send(None)
+            md_list_sorted_by_datetime_tag[0] = (datetime_tag, md_agent_key, period, num, md_s, cor_func)
+        except StopIteration as exp:
+            data_count += exp.value
+            md_list_sorted_by_datetime_tag.pop(0)
+
+        md_list_sorted_by_datetime_tag.sort(key=lambda x: x[0])
+
+    return data_count
+
+
+def _test_merge_benchmark(stream_count_list=(1, 2, 5, 10, 20, 50, 100, 200, 500), record_count_per_stream=1000):
+    """
+    对比 merge_history_record（堆归并）与原排序归并方法在 K 路数据流下的耗时
+    :param stream_count_list: 数据流数量 K 的列表
+    :param record_count_per_stream: 每一路数据流的记录数
+    :return:
+    """
+    from datetime import timedelta
+    from ibats_common.common import PeriodType
+
+    def cor_record(offset):
+        datetime_start = datetime(2018, 1, 1) + timedelta(seconds=offset)
+        num = 0
+        for num in range(record_count_per_stream):
+            yield num, datetime_start + timedelta(minutes=num), None
+        return num + 1
+
+    def create_key_cor_func_list(stream_count):
+        return [((f'md_agent_{_}', PeriodType.Min1), cor_record(_ % 60)) for _ in range(stream_count)]
+
+    result_list = []
+    for stream_count in stream_count_list:
+        record_count = stream_count * record_count_per_stream
+        datetime_start = datetime.now()
+        for _ in merge_history_record(create_key_cor_func_list(stream_count)):
+            pass
+        heap_seconds = (datetime.now() - datetime_start).total_seconds()
+
+        datetime_start = datetime.now()
+        for _ in _sort_merge_history_record(create_key_cor_func_list(stream_count)):
+            pass
+        sort_seconds = (datetime.now() - datetime_start).total_seconds()
+        logger.info('K=%3d N=%7d heap: %8.3fs  sort: %8.3fs  %6.1fx',
+                    stream_count, record_count, heap_seconds, sort_seconds,
+                    sort_seconds / heap_seconds if heap_seconds > 0 else float('nan'))
+        result_list.append({'stream_count': stream_count, 'record_count': record_count,
+                            'heap_seconds': heap_seconds, 'sort_seconds': sort_seconds})
+
+    return result_list
+
+
+if __name__ == "__main__":
+    _test_merge_benchmark()
@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 4:50
+@File    : account_test.py
+@contact : mmmaaaggg@163.com
+@desc    : Account 测试
+"""
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.rl.emulator.account import Account, VERSION_V1, VERSION_V2, cum_linear_rr_2_cum_exp_rr
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class AccountTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv'), parse_dates=['trade_date'])
+        self.md_df = md_df.set_index('trade_date')[["open", "high", "low", "close", "amount", "volume"]].iloc[:300]
+        self.data_factors = np.random.RandomState(0).randn(self.md_df.shape[0], 5).astype(np.float32)
+        self.action_arr = np.random.RandomState(1).randint(4, size=self.md_df.shape[0])
+
+    def run_account(self, env: Account, step_count):
+        env.reset()
+        reward_list, value_list, value_fee0_list = [0.0], [env.A.total_value], [env.A.total_value]
+        for action in self.action_arr[:step_count]:
+            _, reward, done = env.step(int(action))
+            reward_list.append(reward)
+            value_list.append(env.A.total_value)
+            value_fee0_list.append(env.A.total_value_fee0)
+        return reward_list, value_list, value_fee0_list
+
+    def test_generate_reward_df(self):
+        for version in [VERSION_V1, VERSION_V2]:
+            env = Account(self.md_df, self.data_factors, version=version)
+            buffer = env._buffer
+            for step_count in [200, 50]:
+                reward_list, value_list, value_fee0_list = self.run_account(env, step_count)
+                # reset 不重新分配
+                self.assertIs(env._buffer, buffer)
+                reward_df = env.generate_reward_df()
+                self.assertEqual(reward_df.shape[0], step_count + 1)
+                self.assertTrue(reward_df.index.equals(self.md_df.index[:step_count + 1]))
+                np.testing.assert_array_equal(reward_df['reward'], reward_list)
+                np.testing.assert_array_equal(reward_df['value'], value_list)
+                np.testing.assert_array_equal(reward_df['open'], self.md_df['open'].iloc[:step_count + 1])
+                np.testing.assert_array_equal(reward_df['action'].iloc[1:], self.action_arr[:step_count])
+                nav_s = cum_linear_rr_2_cum_exp_rr(pd.Series(value_list) / env.A.init_cash - 1)
+                np.testing.assert_array_equal(reward_df['nav'], nav_s)
+                nav_s = cum_linear_rr_2_cum_exp_rr(pd.Series(value_fee0_list) / env.A.init_cash - 1)
+                np.testing.assert_array_equal(reward_df['nav_fee0'], nav_s)
+                # 默认复制数据，copy=False 时为与缓冲区共享内存的只读视图
+                self.assertFalse(np.shares_memory(reward_df['value'].to_numpy(), buffer))
+                reward_view_df = env.generate_reward_df(copy=False)
+                self.assertTrue(np.shares_memory(reward_view_df['value'].to_numpy(), buffer))
+
+            # reset 后此前返回的数据保持不变
+            value_s = reward_df['value'].copy()
+            self.run_account(env, 30)
+            pd.testing.assert_series_equal(reward_df['value'], value_s)
+
+    def test_reward_with_fee0(self):
+        env = Account(self.md_df, self.data_factors, version=VERSION_V2, reward_with_fee0=True)
+        reward_list, _, _ = self.run_account(env, 100)
+        reward_df = env.generate_reward_df()
+        np.testing.assert_array_equal(reward_df['reward'].iloc[1:], [_[0] for _ in reward_list[1:]])
+        np.testing.assert_array_equal(reward_df['reward_fee0'].iloc[1:], [_[1] for _ in reward_list[1:]])
+
+    def test_summary_only(self):
+        for version in [VERSION_V1, VERSION_V2]:
+            env = Account(self.md_df, self.data_factors, version=version)
+            env_summary = Account(self.md_df, self.data_factors, version=version, summary_only=True)
+            for step_count in [200, 80]:
+                self.run_account(env, step_count)
+                self.run_account(env_summary, step_count)
+                summary_dic = env_summary.get_summary()
+                self.assertEqual(summary_dic, env.get_summary())
+                self.assertEqual(summary_dic['step_count'], step_count)
+                self.assertEqual(summary_dic['nav'], env.generate_reward_df()['nav'].iloc[-1])
+            with self.assertRaises(ValueError):
+                env_summary.generate_reward_df()
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
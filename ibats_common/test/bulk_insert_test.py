@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 20:55
+@File    : bulk_insert_test.py
+@contact : mmmaaaggg@163.com
+@desc    : bulk_insert 分块批量保存测试
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from ibats_utils.db import with_db_session
+
+from ibats_common.backend.bulk_insert import bulk_insert, get_record_list
+from ibats_common.backend.orm import OrderDetail, StgRunStatusDetail, engine_ibats
+from ibats_common.common import Direction, Action
+
+STG_RUN_ID = 999999999
+
+
+def create_order_detail_dic(order_idx):
+    order_dt = datetime(2010, 1, 4, 9, 0, 0) + timedelta(minutes=order_idx)
+    return {'stg_run_id': STG_RUN_ID, 'order_idx': order_idx, 'trade_agent_key': 'test', 'order_dt': order_dt,
+            'order_date': order_dt.date(), 'order_time': order_dt.time(), 'order_millisec': 0,
+            'direction': int(Direction.Long), 'action': int(Action.Open), 'symbol': 'RB', 'order_price': 3000,
+            'order_vol': 1, 'calc_mode': 0}
+
+
+class BulkInsertTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def delete_test_data(self):
+        with with_db_session(engine_ibats) as session:
+            session.query(OrderDetail).filter(OrderDetail.stg_run_id == STG_RUN_ID).delete()
+            session.commit()
+
+    def setUp(self):
+        self.delete_test_data()
+
+    def tearDown(self):
+        self.delete_test_data()
+
+    def test_get_record_list(self):
+        detail = StgRunStatusDetail(stg_run_id=STG_RUN_ID, trade_dt=datetime(2010, 1, 4), cash_available=100,
+                                    curr_margin=0, cash_init=100)
+        record_list = get_record_list(StgRunStatusDetail, [detail, {'stg_run_id': STG_RUN_ID, 'position_value': 5}])
+        self.assertEqual(len(record_list), 2)
+        # 各条记录字段一致，缺少的字段使用字段默认值补齐
+        self.assertEqual(set(record_list[0].keys()), set(record_list[1].keys()))
+        self.assertEqual(record_list[0]['position_value'], 0.0)
+        self.assertEqual(record_list[0]['cash_init'], 100)
+        self.assertEqual(record_list[1]['position_value'], 5)
+        self.assertEqual(record_list[1]['cash_init'], 0.0)
+
+    def test_chunk_fallback(self):
+        record_list = [create_order_detail_dic(order_idx) for order_idx in range(25)]
+        # 第二块中存在主键重复的记录，该块改为逐条保存，仅丢弃重复的记录
+        record_list.insert(12, create_order_detail_dic(11))
+        saved_count = bulk_insert(OrderDetail, record_list, chunk_size=10)
+        self.assertEqual(saved_count, 25)
+        with with_db_session(engine_ibats) as session:
+            count = session.query(OrderDetail).filter(OrderDetail.stg_run_id == STG_RUN_ID).count()
+        self.assertEqual(count, 25)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
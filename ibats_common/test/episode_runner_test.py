@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 6:10
+@File    : episode_runner_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 进程内 episode 回放训练测试
+"""
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.example.rl_stg.v3.q_learn import EpisodeRunner
+from ibats_common.example.rl_stg.v3.rl_stg import get_rl_handler
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class EpisodeRunnerTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        self.md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv')).iloc[:400]
+        self.q_table_key = self.id()
+
+    def test_run(self):
+        date_from, date_to = self.md_df['trade_date'].iloc[100], self.md_df['trade_date'].iloc[299]
+        runner = EpisodeRunner(self.md_df, date_from, date_to, get_rl_handler, q_table_key=self.q_table_key)
+        self.assertEqual(runner.step_count, 200)
+        episode_df_list = runner.run(episode_count=2)
+        self.assertEqual(len(episode_df_list), 2)
+        ql_table = runner.rl_handler.ql_table
+        self.assertGreater(ql_table.q_table.shape[0], 0)
+        log_close_arr = np.log(self.md_df['close'].to_numpy())
+        for episode_df in episode_df_list:
+            self.assertEqual(list(episode_df.index), list(pd.to_datetime(self.md_df['trade_date'].iloc[100:300])))
+            # reward 由上一步的 action 与当日收益决定
+            diff_arr = (log_close_arr[100:300] - log_close_arr[99:299]) * 1000
+            action_last_arr = episode_df['action'].to_numpy()[:-1]
+            reward_arr = np.select([action_last_arr == 1, action_last_arr == 2],
+                                   [diff_arr[1:].astype(int), -diff_arr[1:].astype(int)], 0)
+            np.testing.assert_array_equal(episode_df['reward'].to_numpy()[1:], reward_arr)
+
+    def test_md_df_max_window(self):
+        date_from, date_to = self.md_df['trade_date'].iloc[300], self.md_df['trade_date'].iloc[-1]
+        runner = EpisodeRunner(self.md_df, date_from, date_to, get_rl_handler, q_table_key=self.q_table_key,
+                               md_df_max_window=10)
+        episode_df = runner.run_episode()
+        self.assertEqual(episode_df.shape, (100, 2))
+        with self.assertRaises(ValueError):
+            EpisodeRunner(self.md_df, '1990-1-1', date_to, get_rl_handler, q_table_key=self.q_table_key)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
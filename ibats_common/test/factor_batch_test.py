@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 1:10
+@File    : factor_batch_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 因子滑动窗口测试
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common.backend.factor import transfer_2_batch, get_sliding_window, iter_batch
+
+
+class FactorBatchTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        data_len = 30
+        date_index = pd.date_range('2018-01-01', periods=data_len, freq='2D')
+        self.df = pd.DataFrame(
+            {'a': np.arange(data_len, dtype=float),
+             'b': np.arange(data_len * 2, data_len * 3, dtype=float),
+             'c': np.random.RandomState(0).randn(data_len)},
+            index=date_index,
+        )
+        self.labels = np.arange(data_len)
+        self.n_step = 5
+
+    def get_batch_loop(self, df):
+        factor_arr = df.to_numpy(dtype=np.float32)
+        return np.array([factor_arr[num:num + self.n_step] for num in range(df.shape[0] - self.n_step + 1)])
+
+    def test_get_sliding_window(self):
+        window_arr = get_sliding_window(self.df.to_numpy(), self.n_step)
+        self.assertEqual(window_arr.dtype, np.float32)
+        self.assertEqual(window_arr.shape, (self.df.shape[0] - self.n_step + 1, self.n_step, self.df.shape[1]))
+        self.assertFalse(window_arr.flags.writeable)
+        np.testing.assert_array_equal(window_arr, self.get_batch_loop(self.df))
+        # C 连续的 float32 数据直接返回视图，不复制数据
+        src_arr = np.ascontiguousarray(self.df.to_numpy(dtype=np.float32))
+        self.assertTrue(np.shares_memory(get_sliding_window(src_arr, self.n_step), src_arr))
+        self.assertEqual(get_sliding_window(self.df.to_numpy()[:3], self.n_step).shape, (0, self.n_step, 3))
+
+    def test_transfer_2_batch(self):
+        df_index, df_columns, data_arr_batch, new_labels = transfer_2_batch(self.df, self.n_step, self.labels)
+        np.testing.assert_array_equal(data_arr_batch, self.get_batch_loop(self.df))
+        self.assertTrue(df_index.equals(self.df.index[self.n_step - 1:]))
+        np.testing.assert_array_equal(new_labels, self.labels[self.n_step - 1:])
+
+        date_from, date_to = self.df.index[10], self.df.index[20]
+        df_index, df_columns, data_arr_batch, new_labels = transfer_2_batch(
+            self.df, self.n_step, self.labels, date_from=date_from, date_to=date_to)
+        df = self.df.iloc[10 - self.n_step:21]
+        np.testing.assert_array_equal(data_arr_batch, self.get_batch_loop(df))
+        self.assertEqual(df_index[0], self.df.index[9])
+        self.assertEqual(df_index[-1], date_to)
+        np.testing.assert_array_equal(new_labels, self.labels[9:21])
+
+        # date_to 晚于全部数据
+        df_index, df_columns, data_arr_batch = transfer_2_batch(self.df, self.n_step, date_to='2030-01-01')
+        self.assertEqual(data_arr_batch.shape[0], self.df.shape[0] - self.n_step + 1)
+        self.assertIsNone(transfer_2_batch(self.df, self.n_step, date_from='2030-01-01')[0])
+
+    def test_iter_batch(self):
+        data_arr = self.df.to_numpy()
+        batch_list = list(iter_batch(data_arr, self.n_step, batch_size=4, labels=self.labels))
+        self.assertEqual(len(batch_list), 7)
+        np.testing.assert_array_equal(np.vstack([_[0] for _ in batch_list]), self.get_batch_loop(self.df))
+        np.testing.assert_array_equal(np.hstack([_[1] for _ in batch_list]), self.labels[self.n_step - 1:])
+        # 打乱顺序
+        window_arr = get_sliding_window(data_arr, self.n_step)
+        for batch_xs, batch_ys in iter_batch(data_arr, self.n_step, batch_size=4, labels=self.labels,
+                                             shuffle=True, random_state=1):
+            np.testing.assert_array_equal(batch_xs, window_arr[batch_ys - self.n_step + 1])
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
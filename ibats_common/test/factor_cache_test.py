@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 2:40
+@File    : factor_cache_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 因子计算缓存测试
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.factor import get_factor
+from ibats_common.backend.factor_cache import FactorCache
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class FactorCacheTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv'), parse_dates=['trade_date'])
+        self.md_df = md_df.set_index('trade_date').drop('instrument_type', axis=1).iloc[:400]
+        self.cache_folder_path = os.path.join(tempfile.mkdtemp(), 'factor_cache')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.cache_folder_path), ignore_errors=True)
+
+    def check_result(self, result, result_target):
+        if isinstance(result_target, dict):
+            self.assertEqual(list(result.keys()), list(result_target.keys()))
+            for adj_factor, factor_df in result_target.items():
+                self.check_result(result[adj_factor], factor_df)
+            return
+        self.assertEqual(list(result.columns), list(result_target.columns))
+        self.assertTrue(result.index.equals(result_target.index))
+        pd.testing.assert_series_equal(result.dtypes, result_target.dtypes)
+        np.testing.assert_allclose(result.to_numpy(dtype=float), result_target.to_numpy(dtype=float),
+                                   rtol=1e-6, atol=1e-6)
+
+    def test_memory_and_disk(self):
+        factor_cache = FactorCache(self.cache_folder_path, file_format='npz')
+        result_target = get_factor(self.md_df, do_multiple_factors=True)
+        self.check_result(factor_cache.get_factor(self.md_df, do_multiple_factors=True), result_target)
+        result = factor_cache.get_factor(self.md_df, do_multiple_factors=True)
+        self.check_result(result, result_target)
+        # 返回的是副本
+        result[1].iloc[:, :] = 0
+        self.check_result(factor_cache.get_factor(self.md_df, do_multiple_factors=True), result_target)
+        # 参数不同
+        self.check_result(factor_cache.get_factor(self.md_df, dropna=False), get_factor(self.md_df, dropna=False))
+        self.assertEqual(factor_cache.get_stats()['memory_hit_count'], 2)
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 2)
+        # 新的进程从磁盘加载
+        factor_cache = FactorCache(self.cache_folder_path, file_format='npz')
+        self.check_result(factor_cache.get_factor(self.md_df, do_multiple_factors=True), result_target)
+        self.assertEqual(factor_cache.get_stats()['disk_hit_count'], 1)
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 0)
+
+    def test_append(self):
+        factor_cache = FactorCache(self.cache_folder_path, max_disk_size=0)
+        factor_cache.get_factor(self.md_df.iloc[:300])
+        for num in [301, 302, 310, 400]:
+            md_df = self.md_df.iloc[:num]
+            self.check_result(factor_cache.get_factor(md_df), get_factor(md_df))
+        self.assertEqual(factor_cache.get_stats()['append_hit_count'], 4)
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 1)
+        self.assertFalse(os.path.exists(self.cache_folder_path))
+        # 数据被修改，不能复用
+        md_df = self.md_df.copy()
+        md_df.iloc[10, 0] += 1
+        self.check_result(factor_cache.get_factor(md_df.iloc[:320]), get_factor(md_df.iloc[:320]))
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 2)
+
+    def test_append_prefix_lookup(self):
+        factor_cache = FactorCache(self.cache_folder_path, file_format='npz')
+        factor_cache.get_factor(self.md_df.iloc[:300])
+        # 内存中存在前缀缓存时不扫描磁盘缓存
+        with mock.patch.object(factor_cache, '_iter_disk_meta', side_effect=AssertionError('disk scanned')):
+            for num in [301, 302]:
+                md_df = self.md_df.iloc[:num]
+                self.check_result(factor_cache.get_factor(md_df), get_factor(md_df))
+        self.assertEqual(factor_cache.get_stats()['append_hit_count'], 2)
+        # 内存中没有时从磁盘缓存查找前缀
+        factor_cache = FactorCache(self.cache_folder_path, file_format='npz')
+        self.check_result(factor_cache.get_factor(self.md_df.iloc[:310]), get_factor(self.md_df.iloc[:310]))
+        self.assertEqual(factor_cache.get_stats()['append_hit_count'], 1)
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 0)
+
+    def test_append_inconsistent(self):
+        # 新增数据导致 add_factor_of_price 的 pct_change 方式发生变化，需要重新全部计算
+        factor_cache = FactorCache(self.cache_folder_path, max_disk_size=0)
+        md_df = self.md_df.copy()
+        md_df.iloc[:, :4] /= 1000
+        factor_cache.get_factor(md_df.iloc[:300])
+        factor_cache.get_factor(md_df.iloc[:301])
+        self.assertEqual(factor_cache.get_stats()['append_hit_count'], 1)
+        md_df.iloc[301:, :4] *= 1000
+        self.check_result(factor_cache.get_factor(md_df), get_factor(md_df))
+        self.assertEqual(factor_cache.get_stats()['append_hit_count'], 1)
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 2)
+
+    def test_size_limit(self):
+        factor_cache = FactorCache(self.cache_folder_path, max_memory_size=1, max_disk_size=1, file_format='npz')
+        factor_cache.get_factor(self.md_df.iloc[:100])
+        factor_cache.get_factor(self.md_df.iloc[50:])
+        self.assertEqual(len(os.listdir(self.cache_folder_path)), 1)
+        self.assertEqual(len(factor_cache._entry_dic), 1)
+        factor_cache.get_factor(self.md_df.iloc[:100])
+        self.assertEqual(factor_cache.get_stats()['miss_count'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
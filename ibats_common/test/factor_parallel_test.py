@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 3:10
+@File    : factor_parallel_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 多进程因子计算测试
+"""
+import os
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.factor import get_factor
+from ibats_common.backend import factor_parallel
+from ibats_common.backend.factor_parallel import get_factor_parallel
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class FactorParallelTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        self.df_dic = {}
+        for instrument_type in ['RB', 'RU']:
+            md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, f'{instrument_type}.csv'), parse_dates=['trade_date'])
+            self.df_dic[instrument_type] = md_df.set_index('trade_date').drop('instrument_type', axis=1).iloc[:500]
+
+    def check_result(self, result, result_target):
+        if isinstance(result_target, dict):
+            self.assertEqual(list(result.keys()), list(result_target.keys()))
+            for key, value in result_target.items():
+                self.check_result(result[key], value)
+            return
+        pd.testing.assert_frame_equal(result, result_target, check_exact=True)
+
+    def test_get_factor(self):
+        md_df = self.df_dic['RB']
+        self.check_result(get_factor(md_df, do_multiple_factors=True, processes=2),
+                          get_factor(md_df, do_multiple_factors=True))
+        self.check_result(get_factor_parallel(md_df, dropna=False, processes=2),
+                          get_factor(md_df, dropna=False))
+
+    def test_df_dic(self):
+        result_target = {key: get_factor(md_df, do_multiple_factors=True) for key, md_df in self.df_dic.items()}
+        self.check_result(get_factor_parallel(self.df_dic, do_multiple_factors=True, processes=2), result_target)
+        self.check_result(get_factor_parallel(self.df_dic, do_multiple_factors=True, processes=1), result_target)
+
+    def test_price_factor_kwargs(self):
+        md_df = self.df_dic['RU']
+        price_factor_kwargs = {'drop': True, 'with_diff_n': False}
+        self.check_result(
+            get_factor_parallel(md_df, dropna=False, price_factor_kwargs=price_factor_kwargs, processes=2),
+            get_factor(md_df, dropna=False, price_factor_kwargs=price_factor_kwargs))
+
+    def test_without_shared_memory(self):
+        # python 3.8 以前的版本没有 shared_memory，改为顺序计算
+        md_df = self.df_dic['RB']
+        with mock.patch.object(factor_parallel, 'shared_memory', None), \
+                mock.patch.object(factor_parallel, 'Pool', side_effect=AssertionError('Pool should not be used')):
+            result = get_factor(md_df, do_multiple_factors=True, processes=2)
+        self.check_result(result, get_factor(md_df, do_multiple_factors=True))
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
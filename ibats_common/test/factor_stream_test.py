@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 1:50
+@File    : factor_stream_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 增量因子计算测试
+"""
+import bisect
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.factor import add_factor_of_price
+from ibats_common.backend.factor_stream import PriceFactorStream, SortedBucketList
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class FactorStreamTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv'), parse_dates=['trade_date'])
+        self.md_df = md_df.set_index('trade_date').drop('instrument_type', axis=1)
+        self.factor_df = add_factor_of_price(self.md_df.copy())
+
+    def check_stream(self, warm_up_len):
+        factor_stream = PriceFactorStream()
+        warm_up_df = factor_stream.warm_up(self.md_df.iloc[:warm_up_len])
+        self.assertEqual(list(warm_up_df.columns), factor_stream.columns)
+        stream_df = factor_stream.update_df(self.md_df.iloc[warm_up_len:])
+        self.assertEqual(factor_stream.last_index, self.md_df.index[-1])
+        return stream_df
+
+    def test_update_df(self):
+        stream_df = self.check_stream(1000)
+        factor_df = self.factor_df.iloc[1000:]
+        self.assertEqual(list(stream_df.columns), list(factor_df.columns))
+        self.assertTrue(stream_df.index.equals(factor_df.index))
+        np.testing.assert_allclose(stream_df.to_numpy(dtype=float), factor_df.to_numpy(dtype=float),
+                                   rtol=1e-6, atol=1e-6)
+
+    def test_seed(self):
+        # warm_up 数据短于各指标的初始化周期，各指标的种子均在增量计算中产生
+        stream_df = self.check_stream(3)
+        factor_df = self.factor_df.iloc[3:]
+        # pct_change 方式由 warm_up 数据决定，此处仅比较相同的列
+        columns = [_ for _ in stream_df.columns if _ in factor_df.columns]
+        self.assertGreater(len(columns), 130)
+        np.testing.assert_allclose(stream_df[columns].to_numpy(dtype=float), factor_df[columns].to_numpy(dtype=float),
+                                   rtol=1e-6, atol=1e-6)
+
+    def test_update(self):
+        factor_stream = PriceFactorStream()
+        with self.assertRaises(ValueError):
+            factor_stream.update(self.md_df.iloc[0])
+        factor_stream.warm_up(self.md_df.iloc[:-1])
+        factor_s = factor_stream.update(self.md_df.iloc[-1])
+        self.assertEqual(factor_s.name, self.md_df.index[-1])
+        pd.testing.assert_series_equal(factor_s, self.factor_df.iloc[-1], rtol=1e-6, atol=1e-6)
+
+    def test_sorted_bucket_list(self):
+        sorted_list, data_list = SortedBucketList(), []
+        sorted_list.BUCKET_SIZE = 4
+        for value in np.random.RandomState(0).randint(50, size=500):
+            bisect.insort(data_list, value)
+            self.assertEqual(sorted_list.add(value), bisect.bisect_left(data_list, value))
+        self.assertGreater(len(sorted_list.bucket_list), 10)
+        # 删除
+        for value in np.random.RandomState(1).permutation(data_list)[:450]:
+            data_list.remove(value)
+            sorted_list.remove(value)
+            self.assertEqual([_ for bucket in sorted_list.bucket_list for _ in bucket], data_list)
+            self.assertEqual(sum(sorted_list.len_list), len(data_list))
+        self.assertEqual(sorted_list.max_list[-1], np.inf)
+        for value in [-1, 25, 60]:
+            bisect.insort(data_list, value)
+            self.assertEqual(sorted_list.add(value), bisect.bisect_left(data_list, value))
+
+    def test_index_pct_window(self):
+        factor_stream = PriceFactorStream(index_pct_window=50)
+        factor_stream.warm_up(self.md_df.iloc[:300])
+        stream_df = factor_stream.update_df(self.md_df.iloc[300:])
+        factor_df = add_factor_of_price(self.md_df.copy(), index_pct_window=50).iloc[300:]
+        np.testing.assert_allclose(stream_df.to_numpy(dtype=float), factor_df.to_numpy(dtype=float),
+                                   rtol=1e-6, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 3:30
+@File    : future_rr_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 未来N日最大、最小收益率计算测试
+"""
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.analysis.plot import calc_future_max_min_rr, hist_n_rr
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class FutureRRTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv'), parse_dates=['trade_date'])
+        self.md_df = md_df.set_index('trade_date').drop('instrument_type', axis=1).iloc[:600]
+
+    def test_calc_future_max_min_rr(self):
+        data_df = self.md_df.copy()
+        rng = np.random.RandomState(0)
+        # 基数为负数、包含 nan 的情况
+        data_df['rand'] = rng.randn(data_df.shape[0])
+        data_df.iloc[rng.randint(data_df.shape[0], size=5), 0] = np.nan
+        n_days = [1, 3, 5, 8, 30, 1000]
+        future_max_min_rr_dic = calc_future_max_min_rr(data_df, n_days)
+        for n_day in n_days:
+            max_df = data_df.rename(columns={_: _ + ' max rr' for _ in data_df.columns}).rolling(n_day).apply(
+                lambda x: max(x / x[0]) - 1, raw=True).shift(-(n_day - 1))
+            min_df = data_df.rename(columns={_: _ + ' min rr' for _ in data_df.columns}).rolling(n_day).apply(
+                lambda x: min(x / x[0]) - 1, raw=True).shift(-(n_day - 1))
+            pd.testing.assert_frame_equal(future_max_min_rr_dic[n_day][0], max_df, check_exact=True)
+            pd.testing.assert_frame_equal(future_max_min_rr_dic[n_day][1], min_df, check_exact=True)
+
+    def test_numpy_n_days(self):
+        data_df = self.md_df[['close']]
+        future_max_min_rr_dic = calc_future_max_min_rr(data_df, np.arange(3, 6))
+        future_max_min_rr_target_dic = calc_future_max_min_rr(data_df, [3, 4, 5])
+        for n_day in [3, 4, 5]:
+            pd.testing.assert_frame_equal(future_max_min_rr_dic[n_day][0], future_max_min_rr_target_dic[n_day][0])
+            pd.testing.assert_frame_equal(future_max_min_rr_dic[n_day][1], future_max_min_rr_target_dic[n_day][1])
+        ret_dic, _ = hist_n_rr(self.md_df, n_days=np.arange(3, 5), columns=['close'], enable_show_plot=False)
+        self.assertEqual(list(ret_dic['quantile_dic'].keys()), [(3, 'close'), (4, 'close')])
+        for n_days in [[0], [-1], [2.5]]:
+            with self.assertRaises(ValueError):
+                calc_future_max_min_rr(data_df, n_days)
+
+    def test_hist_n_rr(self):
+        ret_dic, file_path_dic = hist_n_rr(self.md_df, n_days=[3, 5], columns=['close'], enable_show_plot=False)
+        self.assertEqual(list(ret_dic['quantile_dic'].keys()), [(3, 'close'), (5, 'close')])
+        new_df = ret_dic['df_dic'][(3, 'close')][0]
+        self.assertEqual(list(new_df.columns), ['close max rr', 'close min rr'])
+        self.assertEqual(new_df.shape[0], self.md_df.shape[0] - 2)
+        self.assertTrue((new_df['close max rr'] >= 0).all())
+        self.assertTrue((new_df['close min rr'] <= 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
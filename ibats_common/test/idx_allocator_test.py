@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 7:00
+@File    : idx_allocator_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 明细记录 idx 分配服务测试
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import Column, Integer, create_engine
+from sqlalchemy.ext.declarative import declarative_base
+
+from ibats_common.backend.idx_allocator import IdxAllocator
+
+BaseModel = declarative_base()
+
+
+class DemoDetail(BaseModel):
+    __tablename__ = 'demo_detail'
+    stg_run_id = Column(Integer, primary_key=True)
+    demo_idx = Column(Integer, primary_key=True)
+
+
+def _allocate(db_url, count, result_queue):
+    """模拟独立进程中的回测任务"""
+    allocator = IdxAllocator(create_engine(db_url), block_size=7)
+    result_queue.put([allocator.next_idx(1, DemoDetail) for _ in range(count)])
+
+
+class IdxAllocatorTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.db_url = 'sqlite:///' + os.path.join(self.folder.name, 'test.db')
+        self.engine = create_engine(self.db_url)
+        BaseModel.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def test_next_idx(self):
+        allocator = IdxAllocator(self.engine, block_size=3)
+        self.assertEqual([allocator.next_idx(1, DemoDetail) for _ in range(5)], [1, 2, 3, 4, 5])
+        self.assertEqual(allocator.reserve_count, 2)
+        # 不同 stg_run_id 互不影响
+        self.assertEqual(allocator.next_idx(2, DemoDetail), 1)
+        # 批量预留的区间不会与 next_idx 重复
+        self.assertEqual(list(allocator.reserve(1, DemoDetail, 4)), [7, 8, 9, 10])
+        self.assertEqual(allocator.next_idx(1, DemoDetail), 6)
+        self.assertEqual(allocator.next_idx(1, DemoDetail), 11)
+        with self.assertRaises(ValueError):
+            IdxAllocator(self.engine, block_size=0)
+
+    def test_high_water_mark(self):
+        """已有记录（如重启续跑）时，从已有最大 idx 之后开始分配"""
+        with self.engine.begin() as conn:
+            conn.execute(DemoDetail.__table__.insert(), [{'stg_run_id': 3, 'demo_idx': _} for _ in (1, 2, 50)])
+        allocator = IdxAllocator(self.engine, block_size=10)
+        self.assertEqual(allocator.next_idx(3, DemoDetail), 51)
+        # 新的分配服务（如重启后）不会重复分配
+        self.assertEqual(IdxAllocator(self.engine, block_size=10).next_idx(3, DemoDetail), 61)
+        allocator.clear(3)
+        self.assertEqual(allocator.next_idx(3, DemoDetail), 71)
+
+    def test_threads(self):
+        allocator = IdxAllocator(self.engine, block_size=5)
+        idx_list_list = [[] for _ in range(4)]
+
+        def allocate(idx_list):
+            for _ in range(200):
+                idx_list.append(allocator.next_idx(1, DemoDetail))
+
+        thread_list = [threading.Thread(target=allocate, args=(_,)) for _ in idx_list_list]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+
+        idx_list = [idx for idx_list in idx_list_list for idx in idx_list]
+        self.assertEqual(sorted(idx_list), list(range(1, 801)))
+
+    def test_processes(self):
+        result_queue = multiprocessing.Queue()
+        process_list = [multiprocessing.Process(target=_allocate, args=(self.db_url, 100, result_queue))
+                        for _ in range(3)]
+        for process in process_list:
+            process.start()
+        idx_list = [idx for _ in process_list for idx in result_queue.get(timeout=60)]
+        for process in process_list:
+            process.join()
+
+        self.assertEqual(len(set(idx_list)), 300)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
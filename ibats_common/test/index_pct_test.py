@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 3:50
+@File    : index_pct_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 价格分位数水平测试
+"""
+import bisect
+import unittest
+
+import numpy as np
+
+from ibats_common.backend.factor import calc_index_pct
+
+
+def calc_index_pct_loop(value_arr, window=None):
+    """逐个计算，作为对照"""
+    data_list, window_list, result_list = [], [], []
+    for value in value_arr:
+        if np.isnan(value):
+            result_list.append(np.nan)
+            continue
+        if window is None:
+            bisect.insort(data_list, value)
+            result_list.append(bisect.bisect_left(data_list, value) / len(data_list))
+        else:
+            window_list = (window_list + [value])[-window:]
+            result_list.append(sum(_ < value for _ in window_list) / len(window_list))
+    return np.array(result_list)
+
+
+class IndexPctTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.value_arr_list = [np.zeros(0), np.ones(1), np.cumsum(rng.randn(500))]
+        for num in [31, 32, 33, 300]:
+            # 大量重复数值
+            value_arr = rng.randint(5, size=num).astype(float)
+            value_arr[rng.randint(num, size=3)] = np.nan
+            self.value_arr_list.append(value_arr)
+
+    def test_expanding(self):
+        for value_arr in self.value_arr_list:
+            np.testing.assert_array_equal(calc_index_pct(value_arr), calc_index_pct_loop(value_arr))
+
+    def test_rolling(self):
+        for value_arr in self.value_arr_list:
+            for window in [1, 2, 7, 32, 100, 1000]:
+                np.testing.assert_allclose(calc_index_pct(value_arr, window=window),
+                                           calc_index_pct_loop(value_arr, window=window), rtol=0, atol=1e-12)
+        with self.assertRaises(ValueError):
+            calc_index_pct(self.value_arr_list[2], window=0)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 0:40
+@File    : label_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 标签计算测试
+"""
+import unittest
+
+import numpy as np
+
+from ibats_common.backend.label import calc_label2, calc_label3, calc_label_batch, to_one_hot
+
+
+def calc_label_loop(value_arr: np.ndarray, min_rr, max_rr, max_future=None, dtype='float32'):
+    """逐点循环计算标签，作为对照"""
+    value_arr[np.isnan(value_arr)] = 0
+    arr_len = value_arr.shape[0]
+    label_arr = np.zeros(arr_len, dtype=dtype)
+    for i in range(arr_len):
+        base = value_arr[i]
+        for j in range(i + 1, arr_len):
+            result = value_arr[j] / base - 1
+            if result < min_rr:
+                label_arr[i] = 1
+                break
+            elif result > max_rr:
+                label_arr[i] = 2
+                break
+            elif max_future is not None and j - i >= max_future:
+                break
+    return label_arr
+
+
+class LabelTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.value_arr_list = [np.cos(np.arange(0, 20, 0.1)) + 3]
+        for num in range(6):
+            value_arr = np.cumsum(rng.randn(300) * 0.01) + [3, 1, 0, -1, 3, 1][num]
+            if num % 2 == 0:
+                value_arr[rng.randint(300, size=5)] = np.nan
+                value_arr[rng.randint(300, size=3)] = 0
+            if num >= 4:
+                value_arr = value_arr.astype('float32')
+            self.value_arr_list.append(value_arr)
+        self.rr_pair_list = [(-0.1, 0.1), (-0.01, 0.01), (-0.05, 0.02), (0.01, -0.01)]
+
+    def test_calc_label2(self):
+        for value_arr in self.value_arr_list:
+            for min_rr, max_rr in self.rr_pair_list:
+                label_arr = calc_label_loop(value_arr.copy(), min_rr, max_rr)
+                np.testing.assert_array_equal(
+                    calc_label2(value_arr.copy(), min_rr, max_rr, one_hot=False), label_arr)
+                target_arr = calc_label2(value_arr.copy(), min_rr, max_rr)
+                self.assertEqual(target_arr.dtype, np.float32)
+                np.testing.assert_array_equal(target_arr, to_one_hot(label_arr))
+
+    def test_calc_label3(self):
+        for value_arr in self.value_arr_list:
+            for min_rr, max_rr in self.rr_pair_list:
+                for max_future in [0, 1, 3, 5, 20]:
+                    label_arr = calc_label_loop(value_arr.copy(), min_rr, max_rr, max_future=max_future)
+                    np.testing.assert_array_equal(
+                        calc_label3(value_arr.copy(), min_rr, max_rr, max_future=max_future, one_hot=False),
+                        label_arr)
+
+    def test_calc_label_batch(self):
+        for value_arr in self.value_arr_list:
+            for max_future in [None, 5]:
+                value_arr_org = value_arr.copy()
+                target_arr_dic = calc_label_batch(value_arr, self.rr_pair_list, max_future=max_future, dtype='int')
+                np.testing.assert_array_equal(value_arr, value_arr_org)
+                for (min_rr, max_rr), target_arr in target_arr_dic.items():
+                    np.testing.assert_array_equal(
+                        target_arr, calc_label_loop(value_arr.copy(), min_rr, max_rr, max_future, dtype='int'))
+
+    def test_to_one_hot(self):
+        target_arr = to_one_hot(np.array([0, 2, 1, 0], dtype='float32'))
+        np.testing.assert_array_equal(target_arr, [[1, 0, 0], [0, 0, 1], [0, 1, 0], [1, 0, 0]])
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
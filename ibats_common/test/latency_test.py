@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 8:20
+@File    : latency_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情事件处理延迟统计测试
+"""
+import math
+import threading
+import unittest
+
+import numpy as np
+
+from ibats_common.backend import latency
+from ibats_common.backend.latency import LatencyHistogram, LatencyTracer
+from ibats_common.config import config
+
+
+class LatencyHistogramTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def test_index(self):
+        # 索引连续、单调，且数值落在对应桶的区间内
+        index_last = -1
+        for value in list(range(5000)) + [2 ** 20 - 1, 2 ** 20, 2 ** 40 + 12345]:
+            index = LatencyHistogram.get_index(value)
+            self.assertIn(index - index_last, (0, 1) if value < 5000 else (index - index_last,))
+            value_min, value_max = LatencyHistogram.get_value_range(index)
+            self.assertTrue(value_min <= value <= value_max)
+            self.assertLessEqual(value_max - value_min, value / 64)
+            index_last = index
+
+    def test_percentile(self):
+        rng = np.random.RandomState(0)
+        value_arr = rng.lognormal(mean=11, sigma=1.5, size=20000).astype(np.int64)
+        histogram = LatencyHistogram()
+        for value in value_arr.tolist():
+            histogram.record(value)
+        self.assertEqual(histogram.count, value_arr.shape[0])
+        self.assertEqual(histogram.max, value_arr.max())
+        self.assertEqual(histogram.min, value_arr.min())
+        self.assertAlmostEqual(histogram.mean, value_arr.mean())
+        value_sorted_arr = np.sort(value_arr)
+        for percentile in (50, 90, 99, 99.9, 100):
+            value_target = value_sorted_arr[math.ceil(value_arr.shape[0] * percentile / 100) - 1]
+            self.assertAlmostEqual(histogram.get_value_at_percentile(percentile) / value_target, 1, delta=1 / 64)
+
+        # 合并
+        histogram2 = LatencyHistogram()
+        histogram2.record(-5)
+        histogram2.record(2 ** 60)
+        histogram2.merge(histogram)
+        self.assertEqual(histogram2.count, histogram.count + 2)
+        self.assertEqual(histogram2.min, 0)
+        self.assertEqual(histogram2.get_value_at_percentile(50), histogram.get_value_at_percentile(50))
+        self.assertEqual(LatencyHistogram().get_value_at_percentile(50), 0)
+
+
+class LatencyTracerTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def test_checkpoint(self):
+        tracer = LatencyTracer('test', dump_interval=0)
+        # 没有当前事件时，checkpoint 不做任何记录
+        latency.checkpoint(latency.STAGE_ORDER)
+        self.assertEqual(len(tracer.stage_histogram_dic), 0)
+        for _ in range(10):
+            tracer.begin()
+            latency.checkpoint(latency.STAGE_DISPATCH)
+            latency.checkpoint(latency.STAGE_ORDER)
+            latency.checkpoint(latency.STAGE_ORDER)
+            tracer.end()
+        latency.checkpoint(latency.STAGE_ORDER)
+        summary_df = tracer.log_summary()
+        self.assertEqual(list(summary_df.index), [latency.STAGE_DISPATCH, latency.STAGE_ORDER, latency.STAGE_TOTAL])
+        self.assertEqual(summary_df.loc[latency.STAGE_ORDER, 'count'], 20)
+        self.assertEqual(summary_df.loc[latency.STAGE_TOTAL, 'count'], 10)
+        self.assertEqual([_[0] for _ in tracer.last_event.timestamp_list],
+                         [latency.STAGE_DISPATCH, latency.STAGE_ORDER, latency.STAGE_ORDER])
+        # 各阶段时间戳单调递增
+        timestamp_list = [tracer.last_event.arrival_ns] + [_[1] for _ in tracer.last_event.timestamp_list]
+        self.assertEqual(timestamp_list, sorted(timestamp_list))
+
+    def test_thread_local(self):
+        """不同线程的事件互不影响"""
+        tracer = LatencyTracer('test', dump_interval=0)
+        tracer.begin()
+
+        def run():
+            latency.checkpoint(latency.STAGE_MD_DF)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        tracer.end()
+        self.assertNotIn(latency.STAGE_MD_DF, tracer.stage_histogram_dic)
+
+    def test_create_tracer(self):
+        latency_trace = config.LATENCY_TRACE
+        try:
+            config.LATENCY_TRACE = False
+            self.assertIsNone(latency.create_tracer(1))
+            config.LATENCY_TRACE = True
+            self.assertIsInstance(latency.create_tracer(1), LatencyTracer)
+        finally:
+            config.LATENCY_TRACE = latency_trace
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
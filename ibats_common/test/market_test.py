@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 4:30
+@File    : market_test.py
+@contact : mmmaaaggg@163.com
+@desc    : QuotesMarket 测试
+"""
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.rl.emulator import market, market2
+from ibats_common.backend.rl.emulator.account import Account, VERSION_V1, VERSION_V2
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class QuotesMarketTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv'), parse_dates=['trade_date'])
+        # 以日期为索引，成交价格按位置获取
+        self.md_df = md_df.set_index('trade_date')[market2.DEFAULT_MD_OHLCVA_LABELS].iloc[:200]
+        self.data_factors = np.random.RandomState(0).randn(self.md_df.shape[0], 5).astype(np.float32)
+
+    def test_deal_price(self):
+        open_arr, close_arr = self.md_df['open'].to_numpy(), self.md_df['close'].to_numpy()
+        high_arr, low_arr = self.md_df['high'].to_numpy(), self.md_df['low'].to_numpy()
+        deal_price_dic = {
+            market2.DealPriceScheme.NEXT_OPEN: open_arr,
+            market2.DealPriceScheme.NEXT_OC_MIDDLE: (close_arr + open_arr) / 2,
+            market2.DealPriceScheme.NEXT_BAR_CENTER: ((close_arr + open_arr) * 2 + high_arr + low_arr) / 6,
+            market2.DealPriceScheme.CURRENT_CLOSE: np.append(close_arr[-1:], close_arr[:-1]),
+        }
+        for deal_price_scheme, deal_price_arr in deal_price_dic.items():
+            qm = market2.QuotesMarket(self.md_df, self.data_factors, deal_price_scheme=deal_price_scheme,
+                                      md_ohlcva_labels=market2.DEFAULT_MD_OHLCVA_LABELS)
+            qm.reset()
+            for num in range(5):
+                self.assertEqual(qm.get_deal_price, deal_price_arr[num])
+                qm.step(market2.ACTION_LONG)
+            self.assertEqual(qm.cash, qm.init_cash - deal_price_arr[0] * qm.position_unit * (1 + qm.fee_rate))
+
+    def test_step(self):
+        qm = market.QuotesMarket(self.md_df, self.data_factors)
+        qm.reset()
+        observation, reward, done = qm.step(1)
+        np.testing.assert_array_equal(observation, self.data_factors[1])
+        quotes = self.md_df['open'].iloc[0] * 10
+        self.assertEqual(qm.cash, qm.init_cash - quotes * (1 + qm.fee_rate))
+        self.assertEqual(reward, (qm.cash + self.md_df['close'].iloc[0] * 10 - qm.init_cash) / self.md_df['close'].iloc[0])
+
+    def test_account(self):
+        for version in [VERSION_V1, VERSION_V2]:
+            env = Account(self.md_df, self.data_factors, version=version)
+            env.reset()
+            done, count = False, 0
+            while not done:
+                _, _, done = env.step(count % 4)
+                count += 1
+            reward_df = env.generate_reward_df()
+            # 初始状态 + max_step_count 步
+            self.assertEqual(reward_df.shape[0], self.md_df.shape[0])
+            self.assertTrue(reward_df.index.equals(self.md_df.index[:reward_df.shape[0]]))
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 17:05
+@File    : md_buffer_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 
+"""
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from ibats_common.backend import md_buffer as md_buffer_module
+from ibats_common.backend.md_buffer import MdBuffer
+
+
+class MdBufferTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    @staticmethod
+    def create_md_df(data_len):
+        return pd.DataFrame({
+            'trade_date': pd.date_range('2018-1-1', periods=data_len),
+            'instrument_type': 'RB',
+            'close': np.arange(data_len, dtype=float),
+        })
+
+    def test_append(self):
+        md_df = self.create_md_df(10)
+        md_buffer = MdBuffer.create_by_df(md_df, capacity=4)
+        md_new_df = self.create_md_df(20).iloc[10:]
+        for md in md_new_df.to_dict('records'):
+            md_buffer.append(md)
+
+        self.assertEqual(len(md_buffer), 20)
+        df = md_buffer.to_df()
+        self.assertEqual(list(df.columns), list(md_df.columns))
+        self.assertListEqual(df['close'].tolist(), list(range(20)))
+        self.assertListEqual(list(md_buffer.get_array('close', 3)), [17, 18, 19])
+        self.assertEqual(df['trade_date'].iloc[-1], pd.Timestamp('2018-1-20'))
+
+    def test_max_window(self):
+        md_buffer = MdBuffer.create_by_df(self.create_md_df(10), max_window=5)
+        self.assertEqual(len(md_buffer), 5)
+        for num in range(10, 100):
+            md_buffer.append({'trade_date': pd.Timestamp('2018-1-1'), 'instrument_type': 'RB', 'close': num})
+
+        df = md_buffer.to_df()
+        self.assertEqual(df.shape[0], 5)
+        self.assertListEqual(df['close'].tolist(), list(range(95, 100)))
+        self.assertListEqual(list(df.index), list(range(95, 100)))
+        self.assertLessEqual(md_buffer.capacity, 1024)
+
+    def test_create_by_md(self):
+        md_buffer = MdBuffer.create_by_md({'close': 1.0, 'instrument_type': 'RB'})
+        md_buffer.append({'close': 2.0, 'instrument_type': 'RB'})
+        self.assertListEqual(md_buffer.to_df()['close'].tolist(), [1.0, 2.0])
+        array = md_buffer.get_array('close')
+        self.assertFalse(array.flags.writeable)
+
+    def test_upcast(self):
+        # 整数列写入浮点数时转换为 float64，不能截断
+        md_buffer = MdBuffer.create_by_df(pd.DataFrame({'close': [3000, 3001]}))
+        md_buffer.append({'close': 3001.5})
+        close_s = md_buffer.to_df()['close']
+        self.assertEqual(close_s.dtype, np.float64)
+        self.assertListEqual(close_s.tolist(), [3000, 3001, 3001.5])
+        md_buffer = MdBuffer.create_by_md({'close': 1, 'volume': 10})
+        md_buffer.extend([np.array([2.5, 3.0]), np.array([20, 30])], 2)
+        md_buffer.append({'close': 4})
+        df = md_buffer.to_df()
+        self.assertListEqual(df['close'].tolist(), [1, 2.5, 3.0, 4])
+        self.assertEqual(df['volume'].dtype, np.float64)
+        self.assertTrue(np.isnan(df['volume'].iloc[-1]))
+        # 无法转换为数值的数据转换为 object
+        md_buffer.append({'close': 'N/A', 'volume': 40})
+        self.assertEqual(md_buffer.to_df()['close'].iloc[-1], 'N/A')
+
+    def test_to_df_isolation(self):
+        md_buffer = MdBuffer(['close'], [np.dtype(float)], capacity=4, max_window=3)
+        for num in range(3):
+            md_buffer.append({'close': num})
+        df = md_buffer.to_df()
+        array = md_buffer.get_array('close')
+        # 触发数据移动后，已返回的数据保持不变
+        for num in range(3, 40):
+            md_buffer.append({'close': num})
+        self.assertListEqual(df['close'].tolist(), [0, 1, 2])
+        self.assertListEqual(list(array), [0, 1, 2])
+        # 修改返回的 DataFrame 不影响缓冲区
+        df = md_buffer.to_df()
+        df.iloc[0, 0] = -1
+        df.loc[df.index[-1], 'close'] = -1
+        self.assertListEqual(md_buffer.to_df()['close'].tolist(), [37, 38, 39])
+        self.assertListEqual(df['close'].tolist(), [-1, 38, -1])
+
+    def test_to_df_without_copy_on_write(self):
+        # pandas 未启用 Copy-on-Write 时返回数据副本，可以直接修改
+        md_buffer = MdBuffer.create_by_df(self.create_md_df(5))
+        with mock.patch.object(md_buffer_module, '_is_copy_on_write', return_value=False):
+            df = md_buffer.to_df()
+        self.assertFalse(np.shares_memory(df['close'].to_numpy(), md_buffer.get_array('close')))
+        df.iloc[0, df.columns.get_loc('close')] = -1
+        self.assertEqual(md_buffer.get_array('close')[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 23:20
+@File    : md_cache_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情文件缓存测试
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.md_cache import MdCache, get_default_cache_folder_path
+
+RB_FILE_PATH = os.path.join(os.path.dirname(example.__file__), 'data', 'RB.csv')
+
+
+class MdCacheTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.cache_folder_path = os.path.join(self.folder_path, 'cache')
+        self.file_path = os.path.join(self.folder_path, 'RB.csv')
+        shutil.copy(RB_FILE_PATH, self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path, ignore_errors=True)
+
+    def test_read_csv(self):
+        md_cache = MdCache(self.cache_folder_path)
+        md_df = md_cache.read_csv(self.file_path, parse_dates=['trade_date'], ffill=True)
+        pd.testing.assert_frame_equal(
+            md_df, pd.read_csv(self.file_path, parse_dates=['trade_date']).ffill(), check_dtype=False)
+        self.assertEqual(md_cache.get_stats(), {'memory_hit_count': 0, 'mmap_hit_count': 0, 'miss_count': 1})
+        self.assertIs(md_cache.read_csv(self.file_path, parse_dates=['trade_date'], ffill=True), md_df)
+        self.assertEqual(md_cache.memory_hit_count, 1)
+        # 不同的列将重新解析
+        md_df_cols = md_cache.read_csv(self.file_path, usecols=['trade_date', 'close'])
+        self.assertEqual(list(md_df_cols.columns), ['trade_date', 'close'])
+        self.assertEqual(md_cache.miss_count, 2)
+
+        # 模拟其他进程，通过内存映射加载
+        md_cache_other = MdCache(self.cache_folder_path)
+        md_df_other = md_cache_other.read_csv(self.file_path, parse_dates=['trade_date'], ffill=True)
+        self.assertEqual(md_cache_other.get_stats(), {'memory_hit_count': 0, 'mmap_hit_count': 1, 'miss_count': 0})
+        pd.testing.assert_frame_equal(md_df, md_df_other)
+        close_arr = md_df_other['close'].to_numpy()
+        self.assertFalse(close_arr.flags.writeable)
+        # 数据直接引用内存映射文件
+        base = close_arr.base
+        while base is not None and not isinstance(base, np.memmap):
+            base = getattr(base, 'base', None)
+        self.assertIsInstance(base, np.memmap)
+
+    def test_invalidate(self):
+        md_cache = MdCache(self.cache_folder_path)
+        md_df = md_cache.read_csv(self.file_path, parse_dates=['trade_date'])
+        data_len = md_df.shape[0]
+        # 修改文件，缓存失效
+        time.sleep(0.01)
+        pd.read_csv(self.file_path).iloc[:100].to_csv(self.file_path, index=False)
+        md_df = md_cache.read_csv(self.file_path, parse_dates=['trade_date'])
+        self.assertEqual(md_df.shape[0], 100)
+        self.assertNotEqual(data_len, 100)
+        self.assertEqual(md_cache.miss_count, 2)
+        md_df_other = MdCache(self.cache_folder_path).read_csv(self.file_path, parse_dates=['trade_date'])
+        self.assertEqual(md_df_other.shape[0], 100)
+
+    def test_broken_cache(self):
+        md_cache = MdCache(self.cache_folder_path)
+        md_df = md_cache.read_csv(self.file_path, parse_dates=['trade_date'])
+        # 模拟其他进程重建缓存时删除了数据文件，视为未命中
+        folder_path = os.path.join(self.cache_folder_path, os.listdir(self.cache_folder_path)[0])
+        os.remove(os.path.join(folder_path, '0.npy'))
+        md_cache_other = MdCache(self.cache_folder_path)
+        md_df_other = md_cache_other.read_csv(self.file_path, parse_dates=['trade_date'])
+        self.assertEqual(md_cache_other.miss_count, 1)
+        pd.testing.assert_frame_equal(md_df, md_df_other)
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'posix only')
+    def test_default_cache_folder_path(self):
+        tempdir = tempfile.tempdir
+        tempfile.tempdir = self.folder_path
+        try:
+            folder_path = get_default_cache_folder_path()
+            self.assertEqual(os.path.dirname(folder_path), self.folder_path)
+            self.assertEqual(os.stat(folder_path).st_mode & 0o777, 0o700)
+            # 其他用户可以写入的目录不能使用
+            os.chmod(folder_path, 0o777)
+            with self.assertRaises(PermissionError):
+                get_default_cache_folder_path()
+        finally:
+            tempfile.tempdir = tempdir
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 0:10
+@File    : md_store_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 行情数据分区存储测试
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.md_store import MdStore, convert_csv, main, is_pyarrow_available
+from ibats_common.common import PeriodType, ExchangeName
+from ibats_local_trader.agent.md_agent import MdAgentBacktest
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+FILE_PATH_LIST = [os.path.join(DATA_FOLDER_PATH, 'RB.csv'), os.path.join(DATA_FOLDER_PATH, 'RU.csv')]
+
+
+class MdStoreTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        self.root_folder_path = os.path.join(tempfile.mkdtemp(), 'md_store')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.root_folder_path), ignore_errors=True)
+
+    def check_read(self, md_store: MdStore):
+        md_df = pd.read_csv(FILE_PATH_LIST[0], parse_dates=['trade_date'])
+        # 日期过滤
+        df = md_store.read(['RB'], date_from='2015-1-1', date_to='2015-3-31')
+        df_csv = md_df[(md_df['trade_date'] >= '2015-1-1') & (md_df['trade_date'] <= '2015-3-31')]
+        pd.testing.assert_frame_equal(df, df_csv.reset_index(drop=True), check_dtype=False)
+        # 跨越多个分区，指定加载列
+        df = md_store.read(['RB'], date_from='2012-6-1', date_to='2014-6-30', columns=['close', 'trade_date'])
+        df_csv = md_df[(md_df['trade_date'] >= '2012-6-1') & (md_df['trade_date'] <= '2014-6-30')]
+        pd.testing.assert_frame_equal(df, df_csv[['close', 'trade_date']].reset_index(drop=True), check_dtype=False)
+        # 全部数据
+        df = md_store.read()
+        self.assertEqual(set(df['instrument_type']), {'RB', 'RU'})
+        self.assertEqual(df.shape[0], md_df.shape[0] + pd.read_csv(FILE_PATH_LIST[1]).shape[0])
+        # 没有数据
+        df = md_store.read(['RB'], date_from='2030-1-1', columns=['trade_date', 'close'])
+        self.assertEqual(df.shape, (0, 2))
+
+    def test_npy(self):
+        md_store = convert_csv(FILE_PATH_LIST, self.root_folder_path, 'trade_date', 'instrument_type',
+                               file_format='npy')
+        self.assertEqual(md_store.get_symbol_list(), ['RB', 'RU'])
+        self.assertEqual(md_store.get_partition_list('RB')[0], '2009')
+        self.check_read(md_store)
+        # 重新打开存储
+        self.check_read(MdStore(self.root_folder_path))
+        with self.assertRaises(ValueError):
+            MdStore(self.root_folder_path, file_format='feather')
+
+    def test_cli_partition_by_month(self):
+        main([FILE_PATH_LIST[0], '-o', self.root_folder_path, '-d', 'trade_date', '-f', 'npy', '-p', 'M'])
+        md_store = MdStore(self.root_folder_path)
+        self.assertIsNone(md_store.symbol_key)
+        self.assertEqual(md_store.get_partition_list('_all')[0], '2009-03')
+        df = md_store.read(date_from='2015-1-1', date_to='2015-3-31')
+        self.assertEqual(df['trade_date'].min(), pd.Timestamp('2015-01-05'))
+        self.assertEqual(df['trade_date'].max(), pd.Timestamp('2015-03-31'))
+
+    def check_merge(self, file_format):
+        md_df = pd.read_csv(FILE_PATH_LIST[0], parse_dates=['trade_date'])
+        md_df = md_df[md_df['trade_date'].dt.year == 2015]
+        jan_df = md_df[md_df['trade_date'].dt.month == 1].reset_index(drop=True)
+        jun_df = md_df[md_df['trade_date'].dt.month == 6].reset_index(drop=True)
+        md_store = MdStore(self.root_folder_path, 'trade_date', 'instrument_type', file_format=file_format)
+        # 两次写入同一分区，数据合并
+        md_store.write(jun_df)
+        md_store.write(jan_df)
+        df = md_store.read(['RB'])
+        df_target = pd.concat([jan_df, jun_df], ignore_index=True)
+        pd.testing.assert_frame_equal(df, df_target, check_dtype=False)
+        # 重复写入的日期以新数据为准
+        rewrite_df = jan_df.iloc[-3:].copy()
+        rewrite_df['close'] = -1
+        md_store.write(rewrite_df)
+        df = md_store.read(['RB'])
+        self.assertEqual(df.shape[0], df_target.shape[0])
+        self.assertListEqual(df['close'].tolist()[jan_df.shape[0] - 3:jan_df.shape[0]], [-1, -1, -1])
+        self.assertTrue(df['trade_date'].is_monotonic_increasing)
+
+    def test_merge(self):
+        self.check_merge('npy')
+        # 未按 symbol 分区时，多个 csv 文件的数据全部保留
+        shutil.rmtree(self.root_folder_path)
+        main(FILE_PATH_LIST + ['-o', self.root_folder_path, '-d', 'trade_date', '-f', 'npy'])
+        df = MdStore(self.root_folder_path).read()
+        self.assertEqual(df.shape[0], sum(pd.read_csv(file_path).shape[0] for file_path in FILE_PATH_LIST))
+        self.assertTrue(df['trade_date'].is_monotonic_increasing)
+
+    def test_md_agent_ffill(self):
+        # date_from 起始的数据为空，store 与 csv 两种加载方式均使用此前的数据 ffill
+        md_df = pd.read_csv(FILE_PATH_LIST[0], parse_dates=['trade_date'])
+        md_df.loc[(md_df['trade_date'] >= '2014-12-20') & (md_df['trade_date'] <= '2015-1-10'), 'close'] = None
+        file_path = os.path.join(os.path.dirname(self.root_folder_path), 'RB.csv')
+        md_df.to_csv(file_path, index=False)
+        convert_csv(file_path, self.root_folder_path, 'trade_date', 'instrument_type', file_format='npy')
+        df_list = []
+        for store_folder_path in [None, self.root_folder_path]:
+            md_agent = MdAgentBacktest(
+                instrument_id_list=['RB'], md_period=PeriodType.Day1, exchange_name=ExchangeName.LocalFile,
+                file_path=file_path, datetime_key='trade_date', symbol_key='instrument_type',
+                init_md_date_from='2015-1-1', init_md_date_to='2015-3-31', store_folder_path=store_folder_path)
+            df_list.append(md_agent.load_history()['md_df'].reset_index(drop=True))
+        df_csv, df_store = df_list
+        self.assertEqual(df_store['trade_date'].min(), pd.Timestamp('2015-01-05'))
+        self.assertFalse(df_store['close'].isna().any())
+        pd.testing.assert_frame_equal(df_store, df_csv, check_dtype=False)
+
+    @unittest.skipUnless(is_pyarrow_available(), 'pyarrow is not installed')
+    def test_merge_parquet(self):
+        self.check_merge('parquet')
+
+    @unittest.skipUnless(is_pyarrow_available(), 'pyarrow is not installed')
+    def test_parquet(self):
+        md_store = convert_csv(FILE_PATH_LIST, self.root_folder_path, 'trade_date', 'instrument_type',
+                               file_format='parquet')
+        self.check_read(md_store)
+
+    @unittest.skipUnless(is_pyarrow_available(), 'pyarrow is not installed')
+    def test_feather(self):
+        md_store = convert_csv(FILE_PATH_LIST, self.root_folder_path, 'trade_date', 'instrument_type',
+                               file_format='feather')
+        self.check_read(md_store)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 9:10
+@File    : md_test.py
+@contact : mmmaaaggg@163.com
+@desc    : MdAgentBase 历史数据推送测试
+"""
+import unittest
+from datetime import date, datetime, time
+
+import pandas as pd
+
+from ibats_common.common import PeriodType, ExchangeName
+from ibats_common.md import MdAgentBase
+
+
+class DfMdAgent(MdAgentBase):
+    """load_history 返回指定数据的 md_agent"""
+
+    def __init__(self, his_df_dic):
+        super().__init__(instrument_id_list=['RB'], md_period=PeriodType.Tick, exchange_name=ExchangeName.Default)
+        self.his_df_dic = his_df_dic
+
+    def load_history(self, date_from=None, date_to=None, load_md_count=None):
+        return self.his_df_dic
+
+    def connect(self):
+        pass
+
+    def release(self):
+        pass
+
+
+class MdAgentTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    @staticmethod
+    def load_record_list(his_df_dic, columnar_replay):
+        md_agent = DfMdAgent(his_df_dic)
+        md_agent.columnar_replay = columnar_replay
+        return [(num, datetime_tag, dict(md)) for num, datetime_tag, md in md_agent.load_history_record()]
+
+    def check_columnar_replay(self, his_df_dic):
+        record_list = self.load_record_list(his_df_dic, columnar_replay=False)
+        record_list_columnar = self.load_record_list(his_df_dic, columnar_replay=True)
+        self.assertEqual(len(record_list), his_df_dic['md_df'].shape[0])
+        self.assertEqual(record_list_columnar, record_list)
+        return record_list_columnar
+
+    def test_columnar_replay(self):
+        md_df = pd.DataFrame({
+            'trade_date': [date(2018, 1, 2), date(2018, 1, 2), date(2018, 1, 3)],
+            'trade_time': [time(9, 0, 0), time(9, 0, 1), time(21, 30, 0)],
+            'microseconds': [0, 500000, 250],
+            'instrument_id': ['RB1805', 'RB1805', 'RB1810'],
+            'close': [3800.0, 3801.5, 3790.0],
+            'volume': [10, 20, 30],
+        })
+        md_df['trade_datetime'] = [datetime(2018, 1, 2, 9, 0, 0), datetime(2018, 1, 2, 9, 0, 1),
+                                   datetime(2018, 1, 3, 21, 30, 0)]
+        self.check_columnar_replay({'md_df': md_df, 'datetime_key': 'trade_datetime'})
+        record_list = self.check_columnar_replay({
+            'md_df': md_df, 'date_key': 'trade_date', 'time_key': 'trade_time', 'microseconds_key': 'microseconds'})
+        self.assertEqual(record_list[1][1], datetime(2018, 1, 2, 9, 0, 1, 500000))
+        self.assertEqual(record_list[2][1], datetime(2018, 1, 3, 21, 30, 0, 250))
+        self.check_columnar_replay({
+            'md_df': md_df, 'datetime_key': 'trade_datetime', 'microseconds_key': 'microseconds'})
+        # 没有数据
+        self.assertEqual(self.load_record_list({'md_df': md_df.iloc[:0], 'datetime_key': 'trade_datetime'}, True), [])
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
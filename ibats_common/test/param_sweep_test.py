@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 22:40
+@File    : param_sweep_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 策略参数优化测试
+"""
+import os
+import unittest
+
+import pandas as pd
+from ibats_utils.db import with_db_session
+
+from ibats_common import example
+from ibats_common.backend.orm import TradeAgentStatusDetail, StgRunSummary, engine_ibats
+from ibats_common.common import PeriodType, ExchangeName, BacktestTradeMode, CalcMode
+from ibats_common.config import config
+from ibats_common.example.ma_cross_stg import MACrossStg
+from ibats_common.param_sweep import get_param_grid, get_param_random, run_param_sweep
+
+
+class ParamSweepTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def test_get_param_grid(self):
+        param_list = get_param_grid({'a': [1, 2], 'b': ['x', 'y', 'z']})
+        self.assertEqual(len(param_list), 6)
+        self.assertEqual(param_list[0], {'a': 1, 'b': 'x'})
+        self.assertEqual(param_list[-1], {'a': 2, 'b': 'z'})
+
+    def test_get_param_random(self):
+        param_space = {'a': [1, 2, 3], 'b': (5, 10), 'c': (0.1, 0.2), 'd': lambda rng: rng.randint(3)}
+        param_list = get_param_random(param_space, 20, random_state=1)
+        self.assertEqual(len(param_list), 20)
+        self.assertEqual(param_list, get_param_random(param_space, 20, random_state=1))
+        for params in param_list:
+            self.assertIn(params['a'], [1, 2, 3])
+            self.assertTrue(5 <= params['b'] <= 10)
+            self.assertIsInstance(params['b'], int)
+            self.assertTrue(0.1 <= params['c'] < 0.2)
+            self.assertIn(params['d'], [0, 1, 2])
+
+    @staticmethod
+    def run_param_sweep(processes):
+        md_agent_params_list = [{
+            'md_period': PeriodType.Min1,
+            'instrument_id_list': ['RB'],
+            'datetime_key': 'trade_date',
+            'init_md_date_from': '1995-1-1',
+            'init_md_date_to': '2010-1-1',
+            'file_path': os.path.join(os.path.dirname(example.__file__), 'data', 'RB.csv'),
+            'symbol_key': 'instrument_type',
+            'exchange_name': ExchangeName.LocalFile,
+        }]
+        trade_agent_params_list = [{
+            'exchange_name': ExchangeName.LocalFile,
+            'is_default': True,
+            'trade_mode': BacktestTradeMode.Order_2_Deal,
+            'init_cash': 1000000,
+            'calc_mode': CalcMode.Normal,
+        }]
+        return run_param_sweep(
+            MACrossStg, get_param_grid({'unit': [10, 100]}), md_agent_params_list, trade_agent_params_list,
+            date_from='2010-1-1', date_to='2010-12-31', processes=processes, summary_only=True)
+
+    def test_run_param_sweep_summary_only(self):
+        backtest_save_detail = config.BACKTEST_SAVE_DETAIL
+        result_df = self.run_param_sweep(processes=1)
+        self.assertEqual(config.BACKTEST_SAVE_DETAIL, backtest_save_detail)
+        self.assertEqual(result_df.shape[0], 2)
+        self.assertNotIn('error', result_df.columns)
+        # 仓位扩大10倍，收益率扩大约10倍
+        rr_10, rr_100 = result_df['rr']
+        self.assertAlmostEqual(rr_10 * 10, rr_100, places=6)
+        with with_db_session(engine_ibats) as session:
+            for stg_run_id in result_df['stg_run_id']:
+                stg_run_id = int(stg_run_id)
+                count = session.query(TradeAgentStatusDetail).filter(
+                    TradeAgentStatusDetail.stg_run_id == stg_run_id).count()
+                self.assertEqual(count, 0)
+                summary = session.query(StgRunSummary).filter(StgRunSummary.stg_run_id == stg_run_id).first()
+                self.assertIsNotNone(summary)
+
+    def test_run_param_sweep_multiprocess(self):
+        result_df = self.run_param_sweep(processes=1)
+        result_mp_df = self.run_param_sweep(processes=2)
+        self.assertNotIn('error', result_mp_df.columns)
+        # 多进程与顺序执行的汇总结果一致
+        self.assertEqual(len(set(result_mp_df['stg_run_id']) & set(result_df['stg_run_id'])), 0)
+        pd.testing.assert_frame_equal(result_mp_df.drop(columns=['stg_run_id', 'elapsed']),
+                                      result_df.drop(columns=['stg_run_id', 'elapsed']))
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 5:40
+@File    : q_learn_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 数组实现的 QLearningTable 测试
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ibats_common.example.rl_stg.v3.q_learn import QLearningTable
+
+
+class QLearningTableTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        self.actions = [0, 1, 2]
+        self.ql_table = QLearningTable(actions=self.actions, key=self.id(), init_capacity=2)
+        self.ql_table.reset()
+
+    def test_learn(self):
+        """与逐个 state 字典实现的原逻辑对照"""
+        ql_table, lr, gamma = self.ql_table, self.ql_table.lr, self.ql_table.gamma
+        q_dic = {}
+        rng = np.random.RandomState(0)
+        for _ in range(2000):
+            s, a, r = int(rng.randint(50)), int(rng.randint(3)), rng.randn()
+            s_ = 'terminal' if rng.uniform() < 0.05 else int(rng.randint(50))
+            for state in (s, s_):
+                q_dic.setdefault(state, np.zeros(len(self.actions)))
+            q_target = r if s_ == 'terminal' else r + gamma * q_dic[s_].max()
+            q_dic[s][a] += lr * (q_target - q_dic[s][a])
+            ql_table.learn(s, a, r, s_)
+
+        q_table = ql_table.q_table
+        self.assertEqual(set(q_table.index), set(q_dic.keys()))
+        for state, q_arr in q_dic.items():
+            np.testing.assert_array_equal(q_table.loc[state].to_numpy(), q_arr)
+
+    def test_learn_batch(self):
+        ql_table = self.ql_table
+        # 同一批次内 state 不重复时，与逐条更新一致
+        s_list, a_list, r_list, s_next_list = [1, 2, 3], [0, 2, 1], [1.0, -1.0, 0.5], [4, 'terminal', 5]
+        for _ in range(3):
+            ql_table.learn_batch(s_list, a_list, r_list, s_next_list)
+        q_arr_batch = ql_table.q_table.loc[s_list].to_numpy()
+        ql_table.reset()
+        for _ in range(3):
+            for s, a, r, s_ in zip(s_list, a_list, r_list, s_next_list):
+                ql_table.learn(s, a, r, s_)
+        np.testing.assert_array_equal(ql_table.q_table.loc[s_list].to_numpy(), q_arr_batch)
+        # 重复的 (s, a) 更新量累加
+        ql_table.reset()
+        ql_table.learn_batch([7, 7], [1, 1], [1.0, 2.0], ['terminal', 'terminal'])
+        self.assertAlmostEqual(ql_table.q_table.loc[7, 1], ql_table.lr * 3.0)
+
+    def test_choose_action(self):
+        ql_table = self.ql_table
+        ql_table.learn(1, 2, 1.0, 'terminal')
+        ql_table.learn(2, 0, -1.0, 'terminal')
+        np.random.seed(0)
+        action_arr = ql_table.choose_action_batch([1, 1, 2, 3] * 50, epsilon=1)
+        self.assertTrue(np.all(action_arr[0::4] == 2))
+        self.assertTrue(np.all(action_arr[1::4] == 2))
+        self.assertTrue(np.all(action_arr[2::4] != 0))
+        # 相同 Q 值时随机选择
+        self.assertEqual(set(action_arr[3::4]), set(self.actions))
+        self.assertTrue(np.all(np.isin(ql_table.choose_action_batch([1] * 100, epsilon=0), self.actions)))
+        self.assertEqual(ql_table.choose_action_batch([]).shape, (0,))
+        ql_table.epsilon = 1
+        self.assertEqual(ql_table.choose_action(1), 2)
+
+    def test_save_load(self):
+        ql_table = self.ql_table
+        rng = np.random.RandomState(0)
+        ql_table.learn_batch(rng.randint(20, size=100), rng.randint(3, size=100), rng.randn(100),
+                             ['terminal'] * 50 + list(rng.randint(20, size=50)))
+        q_table = ql_table.q_table
+        with tempfile.TemporaryDirectory() as folder_path:
+            file_path = os.path.join(folder_path, 'q_table.npz')
+            ql_table.save(file_path)
+            ql_table.reset()
+            self.assertEqual(ql_table.q_table.shape, (0, 3))
+            self.assertTrue(ql_table.load(file_path))
+            self.assertFalse(ql_table.load(os.path.join(folder_path, 'not_exist.npz')))
+
+        self.assertTrue(q_table.equals(ql_table.q_table))
+        self.assertEqual(ql_table.check_state_exist('terminal'), q_table.index.get_loc('terminal'))
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 20:10
+@File    : status_detail_compact_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 轻量级持仓、账户状态对象（PosStatusDetailCompact、TradeAgentStatusDetailCompact）回测结果一致性测试
+"""
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from ibats_common.backend.orm import PosStatusDetail, PosStatusDetailCompact, TradeAgentStatusDetailCompact
+from ibats_common.common import RunMode
+from ibats_common.config import config
+from ibats_common.test.vector_backtest_test import TABLE_COL_NAME_LIST, run_event_driven, query_table
+
+POS_COL_NAME_LIST = ['trade_dt', 'direction', 'symbol', 'position', 'avg_price', 'cur_price', 'floating_pl',
+                     'floating_pl_cum', 'cashflow', 'cashflow_cum', 'margin', 'commission_tot', 'rr']
+
+
+class StatusDetailCompactTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    @classmethod
+    def setUpClass(cls):
+        # 必须使用@classmethod 装饰器,所有test运行前运行一次
+        cls.orm_update_or_insert_per_action = config.ORM_UPDATE_OR_INSERT_PER_ACTION
+        cls.backtest_compact_status_detail = config.BACKTEST_COMPACT_STATUS_DETAIL
+        config.ORM_UPDATE_OR_INSERT_PER_ACTION = False
+
+    @classmethod
+    def tearDownClass(cls):
+        # 必须使用 @ classmethod装饰器, 所有test运行完后运行一次
+        config.ORM_UPDATE_OR_INSERT_PER_ACTION = cls.orm_update_or_insert_per_action
+        config.BACKTEST_COMPACT_STATUS_DETAIL = cls.backtest_compact_status_detail
+
+    def test_slots(self):
+        timestamp = datetime(2010, 1, 4, 9, 0, 0)
+        detail = PosStatusDetailCompact(stg_run_id=None, trade_dt=timestamp, symbol='RB', position=1, cur_price=3000)
+        self.assertFalse(hasattr(detail, '__dict__'))
+        self.assertEqual(set(detail.to_dict().keys()), set(PosStatusDetail.__table__.columns.keys()))
+        with self.assertRaises(AttributeError):
+            detail.last_status = None
+
+        detail = TradeAgentStatusDetailCompact.create_t_1(
+            None, trade_agent_key='test', init_cash=1000000, timestamp_curr=timestamp)
+        self.assertFalse(hasattr(detail, '__dict__'))
+        self.assertEqual(detail.cash_available, 1000000)
+
+    def check_same_as_orm(self, run_mode: RunMode):
+        config.BACKTEST_COMPACT_STATUS_DETAIL = False
+        stg_run_id_orm = run_event_driven(run_mode).stg_run_id
+        config.BACKTEST_COMPACT_STATUS_DETAIL = True
+        stg_run_id_compact = run_event_driven(run_mode).stg_run_id
+        table_col_name_list = TABLE_COL_NAME_LIST + [
+            (PosStatusDetail, PosStatusDetail.pos_status_detail_idx, POS_COL_NAME_LIST)]
+        for model, idx_col, col_name_list in table_col_name_list:
+            orm_list = query_table(stg_run_id_orm, model, idx_col, col_name_list)
+            compact_list = query_table(stg_run_id_compact, model, idx_col, col_name_list)
+            self.assertGreater(len(orm_list), 0)
+            self.assertEqual(len(orm_list), len(compact_list), model.__tablename__)
+            for num, (orm_values, compact_values) in enumerate(zip(orm_list, compact_list)):
+                for col_name, orm_value, compact_value in zip(col_name_list, orm_values, compact_values):
+                    msg = f'{model.__tablename__}[{num}].{col_name}'
+                    if isinstance(orm_value, (float, Decimal)):
+                        self.assertAlmostEqual(float(orm_value), float(compact_value), places=6, msg=msg)
+                    else:
+                        self.assertEqual(orm_value, compact_value, msg=msg)
+
+    def test_backtest(self):
+        self.check_same_as_orm(RunMode.Backtest)
+
+    def test_backtest_fix_percent(self):
+        self.check_same_as_orm(RunMode.Backtest_FixPercent)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
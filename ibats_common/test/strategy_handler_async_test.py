@@ -0,0 +1,178 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 7:30
+@File    : strategy_handler_async_test.py
+@contact : mmmaaaggg@163.com
+@desc    : asyncio 实时行情处理句柄测试
+"""
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from queue import Queue
+
+from ibats_common.backend import latency
+from ibats_common.common import PeriodType, ExchangeName
+from ibats_common.config import config
+from ibats_common.md import MdAgentBase
+from ibats_common.strategy import StgBase
+from ibats_common.strategy_handler import StgHandlerRealtimeAsync
+
+STG_RUN_ID = 999999997
+
+
+class QueueMdAgent(MdAgentBase):
+    """从 Queue 中 pull 行情的 md_agent"""
+
+    def __init__(self, md_period, agent_name):
+        super().__init__(instrument_id_list=['RB'], md_period=md_period, exchange_name=ExchangeName.Default,
+                         agent_name=agent_name, timestamp_key='trade_dt')
+        self.md_queue = Queue()
+        self.is_connected = False
+        self.is_released = False
+
+    def load_history(self, date_from=None, date_to=None, load_md_count=None):
+        return None
+
+    def connect(self):
+        self.is_connected = True
+
+    def release(self):
+        self.is_released = True
+
+    def start(self):
+        pass
+
+    def pull(self, timeout=None):
+        return self.md_queue.get(timeout=timeout)
+
+
+class RecordStg(StgBase):
+
+    def __init__(self):
+        super().__init__()
+        self.md_list = []
+        self.thread_set = set()
+        self.timer_count = 0
+
+    def on_period_md_handler(self, period, md, md_agent_key):
+        self.thread_set.add(threading.current_thread().name)
+        if md['trade_dt'] is None:
+            raise ValueError('trade_dt is None')
+        self.md_list.append((md['trade_dt'], md_agent_key, period))
+        latency.checkpoint(latency.STAGE_CALLBACK)
+
+    def on_timer(self):
+        self.thread_set.add(threading.current_thread().name)
+        self.timer_count += 1
+
+
+class StgHandlerRealtimeAsyncTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def create_stg_handler(self, **kwargs):
+        self.md_agent_dic = {
+            ('md_a', PeriodType.Min1): QueueMdAgent(PeriodType.Min1, 'md_a'),
+            ('md_a', PeriodType.Day1): QueueMdAgent(PeriodType.Day1, 'md_a_day'),
+            ('md_b', PeriodType.Min1): QueueMdAgent(PeriodType.Min1, 'md_b'),
+        }
+        md_key_period_agent_dic = {}
+        for (md_agent_key, period), md_agent in self.md_agent_dic.items():
+            md_key_period_agent_dic.setdefault(md_agent_key, {})[period] = md_agent
+        self.stg = RecordStg()
+        return StgHandlerRealtimeAsync(STG_RUN_ID, self.stg, md_key_period_agent_dic, timeout_pull=0.05, **kwargs)
+
+    def test_dispatch_order(self):
+        stg_handler = self.create_stg_handler(max_pull_workers=2, reorder_seconds=0.2)
+        datetime_start = datetime(2018, 1, 1)
+        # 启动前放入行情，各 md_agent 之间时间交错
+        for num, key in enumerate(self.md_agent_dic.keys()):
+            for minutes in range(num, 30, 3):
+                self.md_agent_dic[key].md_queue.put({'trade_dt': datetime_start + timedelta(minutes=minutes)})
+        stg_handler.start()
+        time.sleep(1)
+        stg_handler.stop()
+        stg_handler.join(10)
+        self.assertFalse(stg_handler.is_alive())
+        self.assertEqual(len(self.stg.md_list), 30)
+        self.assertEqual(self.stg.md_list, sorted(self.stg.md_list, key=lambda x: x[0]))
+        # 策略回调全部在同一个事件循环线程中执行
+        self.assertEqual(self.stg.thread_set, {stg_handler.name})
+        for md_agent in self.md_agent_dic.values():
+            self.assertTrue(md_agent.is_connected)
+            self.assertTrue(md_agent.is_released)
+        metrics = stg_handler.get_metrics()
+        self.assertEqual(metrics['dispatch_count'], 30)
+        self.assertEqual(metrics['error_count'], 0)
+
+    def test_timer_and_error(self):
+        stg_handler = self.create_stg_handler(enable_timer_thread=True, seconds_of_timer_interval=0.05)
+        stg_handler.start()
+        md_agent = self.md_agent_dic[('md_b', PeriodType.Min1)]
+        md_agent.md_queue.put({'trade_dt': None})
+        md_agent.md_queue.put({'trade_dt': '2018-01-01 09:00:00'})
+        time.sleep(0.5)
+        stg_handler.stop()
+        stg_handler.join(10)
+        self.assertGreater(self.stg.timer_count, 1)
+        self.assertEqual(self.stg.thread_set, {stg_handler.name})
+        self.assertEqual(len(self.stg.md_list), 1)
+        self.assertEqual(stg_handler.get_metrics()['error_count'], 1)
+
+    def test_invalid_timestamp(self):
+        stg_handler = self.create_stg_handler(reorder_seconds=0.2)
+        # tz-aware 与 naive 时间戳混合、缺少时间戳字段时，使用到达时间，不影响行情分发
+        md_a = self.md_agent_dic[('md_a', PeriodType.Min1)]
+        md_a.md_queue.put({'trade_dt': datetime(2018, 1, 1, 9, 1, tzinfo=timezone.utc)})
+        md_a.md_queue.put({'close': 1.0})
+        md_a.md_queue.put({'trade_dt': 'abc'})
+        self.md_agent_dic[('md_b', PeriodType.Min1)].md_queue.put({'trade_dt': datetime(2018, 1, 1, 9, 0)})
+        stg_handler.start()
+        time.sleep(0.5)
+        stg_handler.stop()
+        stg_handler.join(10)
+        self.assertFalse(stg_handler.is_alive())
+        metrics = stg_handler.get_metrics()
+        self.assertEqual(metrics['dispatch_count'], 4)
+        # 缺少 trade_dt 的行情在策略中抛出 KeyError
+        self.assertEqual(metrics['error_count'], 1)
+        self.assertEqual(len(self.stg.md_list), 3)
+
+    def test_dispatch_exit(self):
+        stg_handler = self.create_stg_handler(md_queue_size=1)
+
+        async def dispatch_loop(key_queue_dic, timestamp_key_dic):
+            raise RuntimeError('dispatch error')
+
+        # 分发任务异常退出后，pull 任务不再阻塞在队列上，run 可以结束
+        stg_handler._dispatch_loop = dispatch_loop
+        for md_agent in self.md_agent_dic.values():
+            for num in range(5):
+                md_agent.md_queue.put({'trade_dt': datetime(2018, 1, 1, 9, num)})
+        stg_handler.start()
+        stg_handler.join(10)
+        self.assertFalse(stg_handler.is_alive())
+        for md_agent in self.md_agent_dic.values():
+            self.assertTrue(md_agent.is_released)
+
+    def test_latency_trace(self):
+        latency_trace = config.LATENCY_TRACE
+        config.LATENCY_TRACE = True
+        try:
+            stg_handler = self.create_stg_handler()
+        finally:
+            config.LATENCY_TRACE = latency_trace
+        for num in range(5):
+            self.md_agent_dic[('md_a', PeriodType.Min1)].md_queue.put({'trade_dt': datetime(2018, 1, 1, 9, num)})
+        stg_handler.start()
+        time.sleep(0.5)
+        stg_handler.stop()
+        stg_handler.join(10)
+        summary_df = stg_handler.latency_summary_df
+        self.assertEqual(summary_df.loc[latency.STAGE_TOTAL, 'count'], 5)
+        self.assertEqual(summary_df.loc[latency.STAGE_CALLBACK, 'count'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
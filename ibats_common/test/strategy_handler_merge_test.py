@@ -0,0 +1,66 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 16:30
+@File    : strategy_handler_merge_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from ibats_common.common import PeriodType
+from ibats_common.strategy_handler import merge_history_record, _sort_merge_history_record
+
+
+def cor_record(datetime_list):
+    num = 0
+    for num, datetime_tag in enumerate(datetime_list):
+        yield num, datetime_tag, {'datetime_tag': datetime_tag}
+    return len(datetime_list)
+
+
+class MergeHistoryRecordTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    @staticmethod
+    def create_key_datetime_list_dic():
+        datetime_start = datetime(2018, 1, 1)
+        return {
+            ('md_b', PeriodType.Min1): [datetime_start + timedelta(minutes=_) for _ in range(0, 100, 2)],
+            ('md_a', PeriodType.Min1): [datetime_start + timedelta(minutes=_) for _ in range(0, 100, 3)],
+            ('md_a', PeriodType.Day1): [datetime_start + timedelta(days=_) for _ in range(0, 3)],
+            ('md_c', PeriodType.Min1): [],
+        }
+
+    def test_merge_order(self):
+        key_datetime_list_dic = self.create_key_datetime_list_dic()
+        key_cor_func_list = [(key, cor_record(datetime_list)) for key, datetime_list in key_datetime_list_dic.items()]
+        result_list = []
+        gen = merge_history_record(key_cor_func_list)
+        while True:
+            try:
+                datetime_tag, md_agent_key, period, num, md_s = next(gen)
+            except StopIteration as exp:
+                data_count = exp.value
+                break
+            result_list.append((datetime_tag, md_agent_key, period))
+
+        # 按时间排序，时间相同时按 (md_agent_key, period) 排序
+        expected_list = sorted([(datetime_tag, md_agent_key, period)
+                                for (md_agent_key, period), datetime_list in key_datetime_list_dic.items()
+                                for datetime_tag in datetime_list])
+        self.assertEqual(result_list, expected_list)
+        self.assertEqual(data_count, len(expected_list))
+
+    def test_same_as_sort_merge(self):
+        key_datetime_list_dic = self.create_key_datetime_list_dic()
+        heap_list = [_[0] for _ in merge_history_record(
+            [(key, cor_record(datetime_list)) for key, datetime_list in key_datetime_list_dic.items()])]
+        sort_list = [_[0] for _ in _sort_merge_history_record(
+            [(key, cor_record(datetime_list)) for key, datetime_list in key_datetime_list_dic.items()])]
+        self.assertEqual(heap_list, sort_list)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
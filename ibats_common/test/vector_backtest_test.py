@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 18:50
+@File    : vector_backtest_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 向量化回测与 BacktestTraderAgentBase 事件驱动回测结果一致性测试
+"""
+import os
+import unittest
+from decimal import Decimal
+
+import numpy as np
+from ibats_utils.db import with_db_session
+
+from ibats_common import example
+from ibats_common.backend.orm import OrderDetail, TradeDetail, TradeAgentStatusDetail, StgRunStatusDetail, \
+    engine_ibats
+from ibats_common.common import RunMode, CalcMode, ExchangeName, PeriodType, BacktestTradeMode, Action
+from ibats_common.config import config
+from ibats_common.example.ma_cross_stg import MACrossStg
+from ibats_common.strategy_handler import strategy_handler_factory
+from ibats_common.vector_backtest import vector_backtest, calc_order_df
+
+DATE_FROM, DATE_TO = '2010-1-1', '2011-12-31'
+TABLE_COL_NAME_LIST = [
+    (OrderDetail, OrderDetail.order_idx,
+     ['order_dt', 'direction', 'action', 'symbol', 'order_price', 'order_vol']),
+    (TradeDetail, TradeDetail.trade_idx,
+     ['trade_dt', 'direction', 'action', 'trade_price', 'trade_vol', 'margin', 'commission']),
+    (TradeAgentStatusDetail, TradeAgentStatusDetail.trade_agent_status_detail_idx,
+     ['trade_dt', 'cash_available_last_day', 'cash_available', 'position_value', 'curr_margin', 'close_profit',
+      'position_profit', 'floating_pl_cum', 'commission_tot', 'cash_init', 'cash_and_margin', 'cashflow_daily',
+      'cashflow_cum', 'rr', 'rr_nc', 'rr_compound', 'rr_compound_nc']),
+    (StgRunStatusDetail, StgRunStatusDetail.stg_run_status_detail_idx,
+     ['trade_dt', 'cash_available_last_day', 'cash_available', 'curr_margin', 'close_profit',
+      'position_profit', 'floating_pl_cum', 'commission_tot', 'cash_init', 'cash_and_margin', 'cashflow_daily',
+      'cashflow_cum', 'rr', 'rr_nc', 'rr_compound', 'rr_compound_nc']),
+]
+
+
+def run_event_driven(run_mode: RunMode):
+    md_agent_params_list = [{
+        'md_period': PeriodType.Min1,
+        'instrument_id_list': ['RB'],
+        'datetime_key': 'trade_date',
+        'init_md_date_from': '1995-1-1',
+        'init_md_date_to': '2010-1-1',
+        'file_path': os.path.join(os.path.dirname(example.__file__), 'data', 'RB.csv'),
+        'symbol_key': 'instrument_type',
+    }]
+    trade_agent_params = {'trade_mode': BacktestTradeMode.Order_2_Deal, 'calc_mode': CalcMode.Normal}
+    if run_mode == RunMode.Backtest:
+        trade_agent_params['init_cash'] = 1000000
+    strategy_params = {'unit': 100 if run_mode == RunMode.Backtest else 1}
+    stg_handler = strategy_handler_factory(
+        stg_class=MACrossStg,
+        strategy_params=strategy_params,
+        md_agent_params_list=md_agent_params_list,
+        exchange_name=ExchangeName.LocalFile,
+        run_mode=run_mode,
+        trade_agent_params=trade_agent_params,
+        strategy_handler_param={'date_from': DATE_FROM, 'date_to': DATE_TO},
+    )
+    stg_handler.run()
+    return stg_handler
+
+
+def run_vector(stg_handler):
+    md_agent = list(stg_handler.md_key_period_agent_dic.values())[0][PeriodType.Min1]
+    his_md_df = md_agent.load_history()['md_df']
+    # 回测过程中 cor_load_history_record 激活协程时第一条记录并不推送，因此这里同样略过第一条记录
+    md_df = md_agent.load_history(DATE_FROM, DATE_TO)['md_df'].iloc[1:]
+    target_position = stg_handler.stg_base.calc_target_position(md_df, his_md_df)
+    return vector_backtest(md_df, target_position, run_mode=stg_handler.run_mode, init_cash=1000000,
+                           timestamp_key='trade_date', symbol_key='instrument_type', close_key='close',
+                           trade_agent_key=ExchangeName.LocalFile)
+
+
+def query_table(stg_run_id, model, idx_col, col_name_list):
+    with with_db_session(engine_ibats) as session:
+        detail_list = session.query(model).filter(model.stg_run_id == stg_run_id).order_by(idx_col).all()
+        return [[getattr(detail, col_name) for col_name in col_name_list] for detail in detail_list]
+
+
+class VectorBacktestTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    @classmethod
+    def setUpClass(cls):
+        # 必须使用@classmethod 装饰器,所有test运行前运行一次
+        cls.orm_update_or_insert_per_action = config.ORM_UPDATE_OR_INSERT_PER_ACTION
+        config.ORM_UPDATE_OR_INSERT_PER_ACTION = False
+
+    @classmethod
+    def tearDownClass(cls):
+        # 必须使用 @ classmethod装饰器, 所有test运行完后运行一次
+        config.ORM_UPDATE_OR_INSERT_PER_ACTION = cls.orm_update_or_insert_per_action
+
+    def test_calc_order_df(self):
+        order_df = calc_order_df(np.array([0, 1, 1, -1, -1, 2, 1, 0, 0.0]))
+        self.assertEqual(order_df['bar_idx'].tolist(), [1, 3, 3, 5, 5, 6, 7])
+        self.assertEqual(order_df['direction'].tolist(), [1, 1, -1, -1, 1, 1, 1])
+        self.assertEqual(order_df['action'].tolist(), [
+            int(Action.Open), int(Action.Close), int(Action.Open), int(Action.Close), int(Action.Open),
+            int(Action.Close), int(Action.Close)])
+        self.assertEqual(order_df['vol'].tolist(), [1, 1, 1, 1, 2, 1, 1])
+
+    def check_same_as_event_driven(self, run_mode: RunMode):
+        stg_handler = run_event_driven(run_mode)
+        ret_dic = run_vector(stg_handler)
+        for model, idx_col, col_name_list in TABLE_COL_NAME_LIST:
+            event_list = query_table(stg_handler.stg_run_id, model, idx_col, col_name_list)
+            vector_list = query_table(ret_dic['stg_run_id'], model, idx_col, col_name_list)
+            self.assertGreater(len(event_list), 0)
+            self.assertEqual(len(event_list), len(vector_list), model.__tablename__)
+            for num, (event_values, vector_values) in enumerate(zip(event_list, vector_list)):
+                for col_name, event_value, vector_value in zip(col_name_list, event_values, vector_values):
+                    msg = f'{model.__tablename__}[{num}].{col_name}'
+                    if isinstance(event_value, (float, Decimal)):
+                        self.assertAlmostEqual(float(event_value), float(vector_value), places=6, msg=msg)
+                    else:
+                        self.assertEqual(event_value, vector_value, msg=msg)
+
+    def test_backtest(self):
+        self.check_same_as_event_driven(RunMode.Backtest)
+
+    def test_backtest_fix_percent(self):
+        self.check_same_as_event_driven(RunMode.Backtest_FixPercent)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -0,0 +1,102 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/19 4:10
+@File    : vector_market_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 批量 QuotesMarket 测试
+"""
+import itertools
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ibats_common import example
+from ibats_common.backend.rl.emulator.market2 import QuotesMarket, VectorQuotesMarket, DealPriceScheme, \
+    DEFAULT_MD_OHLCVA_LABELS, ACTION_CLOSE, FLAG_EMPTY
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(example.__file__), 'data')
+
+
+class VectorQuotesMarketTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def setUp(self):
+        md_df = pd.read_csv(os.path.join(DATA_FOLDER_PATH, 'RB.csv'))
+        self.md_df = md_df[DEFAULT_MD_OHLCVA_LABELS].iloc[:600]
+        self.rng = np.random.RandomState(0)
+        self.data_factors = self.rng.randn(self.md_df.shape[0], 3, 2).astype(np.float32)
+        self.start_index_list, self.end_index_list = [0, 10, 10, 500], [120, 60, 400, 530]
+
+    def check_observation(self, observation, observation_target, num):
+        if isinstance(observation_target, tuple):
+            self.assertEqual(len(observation), len(observation_target))
+            for data, data_target in zip(observation, observation_target):
+                np.testing.assert_array_equal(data[num], data_target)
+        else:
+            np.testing.assert_array_equal(observation[num], observation_target)
+
+    def check_market(self, **kwargs):
+        vqm = VectorQuotesMarket(self.md_df, self.data_factors, self.start_index_list, self.end_index_list, **kwargs)
+        qm_list = [QuotesMarket(self.md_df.iloc[start:end].reset_index(drop=True), self.data_factors[start:end],
+                                **kwargs) for start, end in zip(self.start_index_list, self.end_index_list)]
+        observation = vqm.reset()
+        for num, qm in enumerate(qm_list):
+            self.check_observation(observation, qm.reset(), num)
+
+        # 第一步不交易（QuotesMarket 在 CURRENT_CLOSE 机制下第一步没有上一根K线的收盘价）
+        actions = np.full(len(qm_list), ACTION_CLOSE)
+        done_list = [False] * len(qm_list)
+        while not all(done_list):
+            observation, reward, done = vqm.step(actions)
+            for num, qm in enumerate(qm_list):
+                if done_list[num]:
+                    self.assertTrue(done[num])
+                    self.assertTrue(np.all(reward[num] == 0))
+                    continue
+                observation_target, reward_target, done_target = qm.step(int(actions[num]))
+                self.check_observation(observation, observation_target, num)
+                if kwargs.get('reward_with_fee0', False):
+                    self.assertEqual(tuple(reward[num]), reward_target)
+                else:
+                    self.assertEqual(reward[num], reward_target)
+                self.assertEqual(done[num], done_target)
+                self.assertEqual(vqm.total_value[num], qm.total_value)
+                self.assertEqual(vqm.total_value_fee0[num], qm.total_value_fee0)
+                self.assertEqual(vqm.action_count[num], qm.action_count)
+                done_list[num] = done_target
+            actions = self.rng.randint(4, size=len(qm_list))
+
+        with self.assertRaises(ValueError):
+            vqm.step(actions)
+        return vqm
+
+    def test_step(self):
+        for deal_price_scheme, state_with_flag, reward_with_fee0, long_holding_punish in itertools.product(
+                list(DealPriceScheme), [False, True], [False, True], [0, 3]):
+            self.check_market(deal_price_scheme=deal_price_scheme, state_with_flag=state_with_flag,
+                              reward_with_fee0=reward_with_fee0, long_holding_punish=long_holding_punish,
+                              md_ohlcva_labels=DEFAULT_MD_OHLCVA_LABELS)
+
+    def test_reset(self):
+        vqm = self.check_market(state_with_flag=True)
+        observation = vqm.reset([1])
+        self.assertEqual(list(vqm.done), [True, False, True, True])
+        self.assertEqual(vqm.step_counter[1], 0)
+        self.assertEqual(observation[1][1, 0], FLAG_EMPTY)
+        np.testing.assert_array_equal(observation[0][1], self.data_factors[10])
+        with self.assertRaises(ValueError):
+            vqm.step([0, 4, 0, 0])
+
+    def test_from_list(self):
+        md_df_list = [self.md_df.iloc[:100], self.md_df.iloc[100:300]]
+        data_factors_list = [self.data_factors[:100], self.data_factors[100:300]]
+        vqm = VectorQuotesMarket.from_list(md_df_list, data_factors_list)
+        self.assertEqual(list(vqm.max_step_count_arr), [99, 199])
+        np.testing.assert_array_equal(vqm.reset()[1], self.data_factors[100])
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
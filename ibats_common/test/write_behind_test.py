@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 21:45
+@File    : write_behind_test.py
+@contact : mmmaaaggg@163.com
+@desc    : 异步写入服务测试
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from ibats_utils.db import with_db_session
+from sqlalchemy import inspect
+
+from ibats_common.backend.orm import OrderDetail, engine_ibats
+from ibats_common.backend.write_behind import WriteBehindWriter
+from ibats_common.common import Direction, Action
+
+STG_RUN_ID = 999999998
+
+
+class WriteBehindTest(unittest.TestCase):  # 继承unittest.TestCase
+
+    def delete_test_data(self):
+        with with_db_session(engine_ibats) as session:
+            session.query(OrderDetail).filter(OrderDetail.stg_run_id == STG_RUN_ID).delete()
+            session.commit()
+
+    def setUp(self):
+        self.delete_test_data()
+
+    def tearDown(self):
+        self.delete_test_data()
+
+    def test_put_flush(self):
+        # 队列长度小于记录数，将触发背压
+        writer = WriteBehindWriter(engine=engine_ibats, max_queue_size=10, batch_size=7, flush_interval=0.05)
+        detail_list = []
+        for num in range(50):
+            order_dt = datetime(2010, 1, 4, 9, 0, 0) + timedelta(minutes=num)
+            detail = OrderDetail(stg_run_id=STG_RUN_ID, trade_agent_key='test', order_date=order_dt.date(),
+                                 order_time=order_dt.time(), order_millisec=0, direction=int(Direction.Long),
+                                 action=int(Action.Open), symbol='RB', order_price=3000, order_vol=1, calc_mode=0)
+            writer.put(detail)
+            detail_list.append(detail)
+
+        writer.flush()
+        metrics = writer.get_metrics()
+        self.assertEqual(metrics['put_count'], 50)
+        self.assertEqual(metrics['saved_count'], 50)
+        self.assertEqual(metrics['error_count'], 0)
+        self.assertEqual(metrics['queue_size'], 0)
+        self.assertLessEqual(metrics['queue_size_max'], 10)
+        self.assertTrue(all(inspect(detail).has_identity for detail in detail_list))
+        with with_db_session(engine_ibats) as session:
+            count = session.query(OrderDetail).filter(OrderDetail.stg_run_id == STG_RUN_ID).count()
+        self.assertEqual(count, 50)
+
+        writer.close()
+        self.assertFalse(writer.is_alive)
+
+
+if __name__ == '__main__':
+    unittest.main()  # 运行所有的测试用例
@@ -13,11 +13,13 @@ from collections import OrderedDict
 from datetime import datetime
 from functools import partial
 from ibats_common.config import config
-from ibats_common.backend.orm import OrderDetail, engine_ibats, TradeDetail, PosStatusDetail, TradeAgentStatusDetail
+from ibats_common.backend import write_behind, latency
+from ibats_common.backend.bulk_insert import bulk_insert
+from ibats_common.backend.orm import OrderDetail, engine_ibats, TradeDetail, PosStatusDetail, TradeAgentStatusDetail, \
+    PosStatusDetailCompact, TradeAgentStatusDetailCompact
 from ibats_common.common import RunMode, ExchangeName, BacktestTradeMode, Action, Direction, PositionDateType
 from ibats_utils.db import with_db_session
 from ibats_utils.mess import date_time_2_str, str_2_datetime
-from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__package__)
 
@@ -133,6 +135,13 @@ class BacktestTraderAgentBase(TraderAgentBase):
         self.close_key = None
         # 未成交的订单列表
         self.un_finished_order_list = []
+        # 持仓、账户状态类型，使用轻量级状态对象时，仅在 release 时批量保存
+        if config.BACKTEST_COMPACT_STATUS_DETAIL:
+            self.pos_status_detail_class = PosStatusDetailCompact
+            self.trade_agent_status_detail_class = TradeAgentStatusDetailCompact
+        else:
+            self.pos_status_detail_class = PosStatusDetail
+            self.trade_agent_status_detail_class = TradeAgentStatusDetail
 
     def set_curr_md(self, period_type, md):
         self.curr_md_period_type = period_type
@@ -208,10 +217,12 @@ class BacktestTraderAgentBase(TraderAgentBase):
                                    order_vol=int(vol),
                                    calc_mode=self.calc_mode,
                                    )
+        latency.checkpoint(latency.STAGE_ORDER)
         if config.BACKTEST_UPDATE_OR_INSERT_PER_ACTION:
             with with_db_session(engine_ibats, expire_on_commit=False) as session:
                 session.add(order_detail)
                 session.commit()
+            latency.checkpoint(latency.STAGE_DB_COMMIT)
         self.order_detail_list.append(order_detail)
         self._order_detail_dic.setdefault(symbol, []).append(order_detail)
         # 更新成交信息
@@ -243,7 +254,7 @@ class BacktestTraderAgentBase(TraderAgentBase):
             pos_status_detail_last = self._pos_status_detail_dic[symbol]
             pos_status_detail = pos_status_detail_last.update_by_trade_detail(trade_detail)
         else:
-            pos_status_detail = PosStatusDetail.create_by_trade_detail(trade_detail)
+            pos_status_detail = self.pos_status_detail_class.create_by_trade_detail(trade_detail)
         # 更新
         trade_date, trade_time, trade_millisec = \
             pos_status_detail.trade_date, pos_status_detail.trade_time, pos_status_detail.trade_millisec
@@ -279,7 +290,7 @@ class BacktestTraderAgentBase(TraderAgentBase):
             stg_run_id, init_cash = self.stg_run_id, self.init_cash
             timestamp_curr = self.curr_timestamp
             # 首次创建 TradeAgentStatusDetail 需要创建当期交易日 - 1 的 TradeAgentStatusDetail 记录
-            trade_agent_status_detail = TradeAgentStatusDetail.create_t_1(
+            trade_agent_status_detail = self.trade_agent_status_detail_class.create_t_1(
                 stg_run_id, trade_agent_key=self.agent_name, init_cash=init_cash, timestamp_curr=timestamp_curr,
                 calc_mode=self.calc_mode, run_mode=self.run_mode)
             self.trade_agent_status_detail_latest = trade_agent_status_detail
@@ -349,38 +360,15 @@ class BacktestTraderAgentBase(TraderAgentBase):
         raise NotImplementedError()
 
     def release(self):
-        with with_db_session(engine_ibats) as session:
-            try:
-                session.add_all(self.order_detail_list)
-                self.logger.debug("%d 条 order_detail 被保存", len(self.order_detail_list))
-                session.commit()
-            except SQLAlchemyError:
-                logger.exception("%d 条 order_detail 被保存时发生异常", len(self.order_detail_list))
-                session.rollback()
-
-            try:
-                session.add_all(self.trade_detail_list)
-                self.logger.debug("%d 条 trade_detail 被保存", len(self.trade_detail_list))
-                session.commit()
-            except SQLAlchemyError:
-                logger.exception("%d 条 trade_detail 被保存时发生异常", len(self.order_detail_list))
-                session.rollback()
-
-            try:
-                session.add_all(self.pos_status_detail_dic.values())
-                self.logger.debug("%d 条 pos_status_detail 被保存", len(self.pos_status_detail_dic))
-                session.commit()
-            except SQLAlchemyError:
-                logger.exception("%d 条 pos_status_detail 被保存时发生异常", len(self.order_detail_list))
-                session.rollback()
-
-            try:
-                session.add_all(self.trade_agent_detail_list)
-                self.logger.debug("%d 条 trade_agent_detail 被保存", len(self.trade_agent_detail_list))
-                session.commit()
-            except SQLAlchemyError:
-                logger.exception("%d 条 trade_agent_detail 被保存时发生异常", len(self.order_detail_list))
-                session.rollback()
+        # 等待异步写入队列中的记录全部保存，已保存的记录将不会被重复插入
+        write_behind.flush()
+        if not config.BACKTEST_SAVE_DETAIL:
+            return
+        # 各表分块批量保存，某块保存失败时仅丢弃出错的记录
+        bulk_insert(OrderDetail, self.order_detail_list)
+        bulk_insert(TradeDetail, self.trade_detail_list)
+        bulk_insert(PosStatusDetail, self.pos_status_detail_dic.values())
+        bulk_insert(TradeAgentStatusDetail, self.trade_agent_detail_list)
 
     def get_order(self, symbol) -> (OrderDetail, None):
         if symbol in self._order_detail_dic:
@@ -0,0 +1,465 @@
+#! /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author  : MG
+@Time    : 2026/10/18 18:20
+@File    : vector_backtest.py
+@contact : mmmaaaggg@163.com
+@desc    : 向量化信号回测
+根据每根K线收盘时的目标持仓序列一次性计算全部订单、成交、账户状态，
+计算逻辑与 BacktestTraderAgentBase（RunMode.Backtest、RunMode.Backtest_FixPercent，CalcMode.Normal，
+BacktestTradeMode.Order_2_Deal）逐条事件驱动的计算结果一致，结果写入
+order_detail、trade_detail、trade_agent_status_detail、stg_run_status_detail 表，
+analysis.plot_db、analysis.summary 中的分析方法可直接使用
+仅成交所在K线需要逐条计算持仓状态，其余K线的浮动盈亏、保证金、收益率等均按列计算
+pos_status_detail 为逐K线的中间状态，报表中并不使用，因此不再保存
+"""
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from ibats_utils.db import with_db_session
+from ibats_utils.mess import get_module_path
+
+from ibats_common.backend.bulk_insert import bulk_insert
+from ibats_common.backend.orm import StgRunInfo, OrderDetail, TradeDetail, TradeAgentStatusDetail, \
+    StgRunStatusDetail, engine_ibats
+from ibats_common.common import RunMode, CalcMode, ExchangeName, Action, BacktestTradeMode
+from ibats_common.config import config
+
+logger = logging.getLogger(__name__)
+# 与 TradeDetail.create_by_order_detail 中的参数保持一致
+MULTIPLE, MARGIN_RATIO, COMMISSION_RATE = 1, 1, 0.0005
+
+
+def calc_order_df(target_position: np.ndarray) -> pd.DataFrame:
+    """
+    根据目标持仓计算订单，目标持仓为带符号的持仓量，正数为多头，负数为空头
+    每根K线上先平仓后开仓：多空切换时先全部平仓再反向开仓；同方向变化时加仓或减仓
+    :param target_position:
+    :return: DataFrame[bar_idx, direction, action, vol]，按 bar_idx 及 平仓、开仓 顺序排列
+    """
+    position_last = np.concatenate([[0.0], target_position[:-1]])
+    sign_curr, sign_last = np.sign(target_position), np.sign(position_last)
+    abs_curr, abs_last = np.abs(target_position), np.abs(position_last)
+    is_same_direction = (sign_curr == sign_last) & (sign_last != 0)
+    close_vol = np.where(is_same_direction, np.maximum(abs_last - abs_curr, 0), abs_last)
+    open_vol = np.where(is_same_direction, np.maximum(abs_curr - abs_last, 0), abs_curr)
+    close_idx, open_idx = np.flatnonzero(close_vol > 0), np.flatnonzero(open_vol > 0)
+    order_df = pd.DataFrame({
+        'bar_idx': np.concatenate([close_idx, open_idx]),
+        'direction': np.concatenate([sign_last[close_idx], sign_curr[open_idx]]).astype(int),
+        'action': np.concatenate([np.full(close_idx.shape[0], int(Action.Close)),
+                                  np.full(open_idx.shape[0], int(Action.Open))]),
+        'vol': np.concatenate([close_vol[close_idx], open_vol[open_idx]]),
+    })
+    # Action.Open < Action.Close，因此按 -action 排序，保证同一根K线先平仓后开仓
+    order_df = order_df.iloc[np.lexsort((-order_df['action'].to_numpy(), order_df['bar_idx'].to_numpy()))]
+    return order_df.reset_index(drop=True)
+
+
+def _update_pos_by_trade(pos: (dict, None), direction, action, price, vol, commission, trade_date) -> dict:
+    """
+    根据成交更新持仓状态，与 PosStatusDetail.create_by_trade_detail、update_by_trade_detail（CalcMode.Normal）一致
+    :param pos: 上一持仓状态，None 代表首次成交
+    :return: 新的持仓状态
+    """
+    if pos is None:
+        if action == int(Action.Close):
+            raise ValueError('首次成交 action 不能为 close')
+        margin = vol * price * MULTIPLE * MARGIN_RATIO
+        cashflow = -margin - commission
+        return dict(position=vol, direction=direction, avg_price=(vol * price + commission * direction) / vol,
+                    floating_pl=-commission, floating_pl_cum=-commission, margin=margin,
+                    cashflow_daily=cashflow, cashflow_cum=cashflow, commission_tot=commission,
+                    position_value=vol * price, trade_date=trade_date)
+
+    position_last, avg_price_last = pos['position'], pos['avg_price']
+    direction_int = direction if position_last == 0 else pos['direction']
+    if position_last != 0 and direction_int != direction:
+        raise ValueError("当前仓位：%d %f手，目标操作：%d %f手，请先平仓在开仓" % (
+            direction_int, position_last, direction, vol))
+    if action == int(Action.Open):
+        position_cur = position_last + vol
+        avg_price = (position_last * avg_price_last + price * vol + commission * direction_int) / position_cur
+        floating_pl = (price - avg_price) * position_cur * direction_int
+    elif vol > position_last:
+        raise ValueError("当前持仓%f，平仓%f，错误" % (position_last, vol))
+    elif vol == position_last:
+        position_cur, avg_price = 0, 0
+        floating_pl = (price - avg_price_last) * position_last * direction_int - commission
+    else:
+        position_cur = position_last - vol
+        avg_price = (position_last * avg_price_last - price * vol + commission) / position_cur
+        floating_pl = (price - avg_price) * position_cur * direction_int
+
+    floating_pl_chg = (floating_pl - pos['floating_pl']) if position_last != 0 else floating_pl
+    margin = position_cur * price
+    cashflow = - (margin - position_last * price) - commission
+    cashflow_daily = cashflow if pos['trade_date'] != trade_date else pos['cashflow_daily'] + cashflow
+    return dict(position=position_cur, direction=direction_int, avg_price=avg_price,
+                floating_pl=floating_pl, floating_pl_cum=pos['floating_pl_cum'] + floating_pl_chg, margin=margin,
+                cashflow_daily=cashflow_daily, cashflow_cum=pos['cashflow_cum'] + cashflow,
+                commission_tot=pos['commission_tot'] + commission, position_value=position_cur * price,
+                trade_date=trade_date)
+
+
+def _update_pos_by_md(pos: dict, price, trade_date) -> dict:
+    """根据行情更新持仓状态，与 PosStatusDetail.update_by_md（CalcMode.Normal）一致"""
+    position = pos['position']
+    floating_pl = (price - pos['avg_price']) * position * MULTIPLE * pos['direction']
+    return dict(pos, floating_pl=floating_pl,
+                floating_pl_cum=pos['floating_pl_cum'] + floating_pl - pos['floating_pl'],
+                margin=position * price, position_value=position * price * MULTIPLE,
+                cashflow_daily=0 if pos['trade_date'] != trade_date else pos['cashflow_daily'],
+                trade_date=trade_date)
+
+
+def calc_pos_status(close_arr: np.ndarray, date_arr: np.ndarray, order_df: pd.DataFrame):
+    """
+    计算每根K线收盘后的持仓状态（即 update_by_md 之后的状态）
+    仅逐条计算存在成交的K线，两次成交之间的K线持仓、均价不变，浮动盈亏等按列计算：
+    floating_pl_cum 在两次成交之间满足 floating_pl_cum[i] = floating_pl_cum[j] - floating_pl[j] + floating_pl[i]
+    :param close_arr: 收盘价
+    :param date_arr: 交易日（datetime64[D]）
+    :param order_df: calc_order_df 返回的订单，增加 price、commission 列
+    :return: 每根K线收盘后的持仓状态 DataFrame（is_valid == False 代表尚未产生持仓），首根K线的成交后状态（无成交为 None）
+    """
+    data_len = close_arr.shape[0]
+    trade_bar_idx_list, pos_after_trade_list = [], []
+    pos, pos_first_bar = None, None
+    for bar_idx, sub_df in order_df.groupby('bar_idx', sort=True):
+        if pos is not None:
+            # 成交前的状态为前一根K线收盘后的状态
+            pos = _update_pos_by_md(pos, close_arr[bar_idx - 1], date_arr[bar_idx - 1])
+        for direction, action, vol, price, commission in zip(
+                sub_df['direction'].tolist(), sub_df['action'].tolist(), sub_df['vol'].tolist(),
+                sub_df['price'].tolist(), sub_df['commission'].tolist()):
+            pos = _update_pos_by_trade(pos, direction, action, price, vol, commission, date_arr[bar_idx])
+        if bar_idx == 0:
+            pos_first_bar = pos
+        # 本K线收盘后的状态
+        pos = _update_pos_by_md(pos, close_arr[bar_idx], date_arr[bar_idx])
+        trade_bar_idx_list.append(bar_idx)
+        pos_after_trade_list.append(pos)
+
+    trade_bar_idx_arr = np.array(trade_bar_idx_list, dtype=int)
+    seg_idx = np.searchsorted(trade_bar_idx_arr, np.arange(data_len), side='right') - 1
+    is_valid = seg_idx >= 0
+    seg_idx = np.where(is_valid, seg_idx, 0)
+    if len(pos_after_trade_list) == 0:
+        seg_df = pd.DataFrame({key: [0.0] for key in (
+            'position', 'direction', 'avg_price', 'floating_pl', 'floating_pl_cum', 'cashflow_daily', 'cashflow_cum',
+            'commission_tot')})
+        seg_df['trade_date'] = date_arr[:1]
+    else:
+        seg_df = pd.DataFrame(pos_after_trade_list)
+
+    def get_seg_arr(key):
+        return seg_df[key].to_numpy()[seg_idx]
+
+    position, avg_price, direction = get_seg_arr('position'), get_seg_arr('avg_price'), get_seg_arr('direction')
+    floating_pl = (close_arr - avg_price) * position * MULTIPLE * direction
+    floating_pl_cum = get_seg_arr('floating_pl_cum') - get_seg_arr('floating_pl') + floating_pl
+    margin = position * close_arr
+    cashflow_daily = np.where(date_arr == get_seg_arr('trade_date'), get_seg_arr('cashflow_daily'), 0.0)
+    pos_df = pd.DataFrame({
+        'is_valid': is_valid,
+        'position': position,
+        'position_value': position * close_arr * MULTIPLE,
+        'margin': margin,
+        'floating_pl': floating_pl,
+        'floating_pl_cum': floating_pl_cum,
+        'cashflow_daily': cashflow_daily,
+        'cashflow_cum': get_seg_arr('cashflow_cum'),
+        'commission_tot': get_seg_arr('commission_tot'),
+    })
+    # 尚未产生持仓的K线全部记为 0
+    pos_df.loc[~is_valid, pos_df.columns[1:]] = 0.0
+    return pos_df, pos_first_bar
+
+
+def _calc_trade_agent_status(pos_df: pd.DataFrame, run_mode: RunMode, init_cash):
+    """
+    根据持仓状态计算 trade_agent_status_detail 各字段，
+    与 BacktestTraderAgentBase.update_trade_agent_status_detail 一致：首根K线前生成一条 T-1 记录，
+    首根K线上额外生成一条根据成交后（行情更新前）持仓计算的记录，此后每根K线生成一条记录
+    :param pos_df: 每条记录对应的持仓状态，第一条对应 T-1 记录
+    :param run_mode:
+    :param init_cash:
+    :return:
+    """
+    is_valid = pos_df['is_valid'].to_numpy()
+    position = pos_df['position'].to_numpy()
+    margin = pos_df['margin'].to_numpy()
+    floating_pl = pos_df['floating_pl'].to_numpy()
+    floating_pl_cum = pos_df['floating_pl_cum'].to_numpy()
+    cashflow_cum = pos_df['cashflow_cum'].to_numpy()
+    commission_tot = pos_df['commission_tot'].to_numpy()
+    if run_mode == RunMode.Backtest:
+        status_df = pd.DataFrame({
+            'cash_available': init_cash + cashflow_cum,
+            'position_value': pos_df['position_value'].to_numpy(),
+            'curr_margin': margin,
+            'close_profit': floating_pl_cum - floating_pl,
+            'position_profit': floating_pl,
+            'floating_pl_cum': floating_pl_cum,
+            'cashflow_daily': pos_df['cashflow_daily'].to_numpy(),
+            'cashflow_cum': cashflow_cum,
+            'commission_tot': commission_tot,
+        })
+        status_df['cash_and_margin'] = status_df['cash_available'] + margin
+    elif run_mode == RunMode.Backtest_FixPercent:
+        # 与 TradeAgentStatusDetail._update_by_pos_status_detail_fix_percent 一致，
+        # 累计类字段按照 上一状态 到 当前状态 的增量 * margin_2_pos_rate 进行累加
+        is_valid_last = np.concatenate([[False], is_valid[:-1]])
+        margin_last = np.concatenate([[0.0], margin[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margin_2_pos_rate = np.where(
+                margin > 0, position / margin,
+                np.where(is_valid_last & (margin == 0) & (margin_last > 0), position / margin_last, 0.0))
+        margin_2_pos_rate = np.where(is_valid, margin_2_pos_rate, 0.0)
+
+        def calc_cum(values):
+            values_last = np.where(is_valid_last, np.concatenate([[0.0], values[:-1]]), 0.0)
+            return np.cumsum((values - values_last) * margin_2_pos_rate)
+
+        position_rate = np.where(is_valid, position, 0.0)
+        status_df = pd.DataFrame({
+            'cash_available': init_cash - position_rate,
+            'position_value': pos_df['position_value'].to_numpy() * margin_2_pos_rate,
+            'curr_margin': position_rate,
+            'close_profit': calc_cum(floating_pl_cum - floating_pl),
+            'position_profit': floating_pl * margin_2_pos_rate,
+            'floating_pl_cum': calc_cum(floating_pl_cum),
+            'cashflow_daily': pos_df['cashflow_daily'].to_numpy() * margin_2_pos_rate,
+            'cashflow_cum': calc_cum(cashflow_cum),
+            'commission_tot': calc_cum(commission_tot),
+        })
+        status_df['cash_and_margin'] = init_cash + status_df['cashflow_cum'] + position_rate
+    else:
+        raise ValueError(f'run_mode={run_mode} 不支持向量化回测')
+
+    # T-1 记录
+    status_df.iloc[0] = 0.0
+    status_df.loc[0, ['cash_available', 'cash_and_margin']] = init_cash
+    return status_df
+
+
+def _calc_rr(status_df: pd.DataFrame, cash_init):
+    """
+    计算 rr rr_nc rr_compound rr_compound_nc，rr_compound 按照 ORM 中的公式由上一状态的 rr 计算，
+    第一条为 T-1 记录，收益率均为 0
+    """
+    rr = status_df['floating_pl_cum'] / cash_init
+    rr_nc = (status_df['floating_pl_cum'] + status_df['commission_tot']) / cash_init
+    rr.iloc[0], rr_nc.iloc[0] = 0.0, 0.0
+    rr_last, rr_nc_last = rr.shift(1, fill_value=0.0), rr_nc.shift(1, fill_value=0.0)
+    status_df['rr'] = rr
+    status_df['rr_nc'] = rr_nc
+    status_df['rr_compound'] = (rr - rr_last + 1) * (rr_last + 1) - 1
+    status_df['rr_compound_nc'] = (rr_nc - rr_nc_last + 1) * (rr_nc_last + 1) - 1
+    status_df.loc[status_df.index[0], ['rr_compound', 'rr_compound_nc']] = 0.0
+
+
+def _calc_cash_available_last_day(cash_available: np.ndarray, date_arr: np.ndarray, cash_init):
+    """新的一天 cash_available_last_day 为上一状态的 cash_available，否则沿用上一状态的 cash_available_last_day"""
+    data_len = cash_available.shape[0]
+    is_new_day = np.concatenate([[False], date_arr[1:] != date_arr[:-1]])
+    day_start_idx = np.maximum.accumulate(np.where(is_new_day, np.arange(data_len), 0))
+    return np.where(day_start_idx > 0, cash_available[np.maximum(day_start_idx - 1, 0)], cash_init)
+
+
+def _to_record_list(df: pd.DataFrame) -> list:
+    """DataFrame 转换为 dict 列表，numpy 类型转换为 python 原生类型，供 insert executemany 使用"""
+    col_value_list = []
+    for col_name in df.columns:
+        values = df[col_name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            col_value_list.append(list(values.dt.to_pydatetime()))
+        else:
+            col_value_list.append(values.tolist())
+    return [dict(zip(df.columns, values)) for values in zip(*col_value_list)]
+
+
+def _save_df(df: pd.DataFrame, model, chunk_size=None):
+    bulk_insert(model, _to_record_list(df), chunk_size=chunk_size)
+
+
+def vector_backtest(md_df: pd.DataFrame, target_position, run_mode=RunMode.Backtest,
+                    calc_mode=CalcMode.Normal, init_cash=1000000,
+                    timestamp_key='trade_date', symbol_key='instrument_type', close_key='close',
+                    trade_agent_key=ExchangeName.LocalFile,
+                    stg_class=None, strategy_params=None, md_agent_params_list=None, strategy_handler_param=None,
+                    add_2_db=True, stg_run_id=None) -> dict:
+    """
+    向量化信号回测，适用于单一合约、以K线收盘价成交（BacktestTradeMode.Order_2_Deal）的策略
+    :param md_df: 回测行情数据，需按时间排序
+    :param target_position: 每根K线收盘时的目标持仓，正数为多头，负数为空头，nan 代表维持前一目标持仓，
+    可以是与 md_df 等长的数组，也可以是 func(md_df) -> 数组。
+    RunMode.Backtest_FixPercent 模式下代表持仓比例，例如 1 满仓；0 空仓
+    :param run_mode: RunMode.Backtest 或 RunMode.Backtest_FixPercent
+    :param calc_mode: 仅支持 CalcMode.Normal
+    :param init_cash: 初始资金，RunMode.Backtest_FixPercent 模式下固定为 1.0
+    :param timestamp_key:
+    :param symbol_key:
+    :param close_key:
+    :param trade_agent_key: 记录到 trade_agent_key 字段
+    :param stg_class: 仅用于记录 stg_run_info，None 代表不记录策略类
+    :param strategy_params: 仅用于记录 stg_run_info
+    :param md_agent_params_list: 仅用于记录 stg_run_info，plot_db 等需要加载行情的方法需要该参数
+    :param strategy_handler_param: 仅用于记录 stg_run_info
+    :param add_2_db: 是否将 stg_run_info 及回测结果保存到数据库
+    :param stg_run_id: 仅在 add_2_db == False 时使用
+    :return: dict(stg_run_id, order_df, trade_df, trade_agent_status_detail_df, stg_run_status_detail_df)
+    """
+    if calc_mode != CalcMode.Normal:
+        raise ValueError(f'向量化回测仅支持 {CalcMode.Normal.name} 模式')
+    if run_mode == RunMode.Backtest_FixPercent:
+        # 与 FixPercentBacktestTraderAgentBase 一致
+        init_cash = 1.0
+    elif run_mode != RunMode.Backtest:
+        raise ValueError(f'run_mode={run_mode} 不支持向量化回测')
+    if config.UPDATE_STG_RUN_STATUS_DETAIL_PERIOD != 1:
+        logger.warning('向量化回测 stg_run_status_detail 按照 UPDATE_STG_RUN_STATUS_DETAIL_PERIOD == 1 计算')
+
+    symbol_list = md_df[symbol_key].unique()
+    if symbol_list.shape[0] != 1:
+        raise ValueError(f'向量化回测仅支持单一合约，当前合约 {symbol_list}')
+    symbol = symbol_list[0]
+    data_len = md_df.shape[0]
+    if data_len == 0:
+        raise ValueError('md_df 不能为空')
+
+    if callable(target_position):
+        target_position = target_position(md_df)
+    target_position = pd.Series(np.asarray(target_position, dtype=float)).ffill().fillna(0).to_numpy()
+    if target_position.shape[0] != data_len:
+        raise ValueError(f'target_position 长度 {target_position.shape[0]} 与 md_df 长度 {data_len} 不一致')
+
+    if add_2_db:
+        trade_agent_params_list = [{
+            'exchange_name': trade_agent_key, 'trade_mode': BacktestTradeMode.Order_2_Deal,
+            'init_cash': init_cash, 'calc_mode': calc_mode, 'is_default': True, 'agent_name': trade_agent_key}]
+        stg_run_info = StgRunInfo(
+            stg_name=stg_class.__name__ if stg_class is not None else 'vector_backtest',
+            stg_module=get_module_path(stg_class) if stg_class is not None else __name__,
+            dt_from=datetime.now(),
+            stg_params=json.dumps({} if strategy_params is None else strategy_params),
+            md_agent_params_list=json.dumps([] if md_agent_params_list is None else md_agent_params_list),
+            run_mode=int(run_mode),
+            trade_agent_params_list=json.dumps(trade_agent_params_list),
+            strategy_handler_param=json.dumps({} if strategy_handler_param is None else strategy_handler_param),
+        )
+        with with_db_session(engine_ibats) as session:
+            session.add(stg_run_info)
+            session.commit()
+            stg_run_id = stg_run_info.stg_run_id
+
+    trade_agent_key = trade_agent_key.name if isinstance(trade_agent_key, ExchangeName) else trade_agent_key
+    timestamp_s = pd.to_datetime(md_df[timestamp_key]).reset_index(drop=True)
+    date_arr = timestamp_s.to_numpy().astype('datetime64[D]')
+    close_arr = md_df[close_key].to_numpy(dtype=float)
+
+    # 订单、成交
+    order_df = calc_order_df(target_position)
+    order_bar_idx = order_df['bar_idx'].to_numpy()
+    order_df['price'] = close_arr[order_bar_idx]
+    order_df['commission'] = order_df['vol'] * order_df['price'] * MULTIPLE * COMMISSION_RATE
+    order_timestamp_s = timestamp_s.iloc[order_bar_idx].reset_index(drop=True)
+    order_count = order_df.shape[0]
+    order_idx = np.arange(1, order_count + 1)
+    order_detail_df = pd.DataFrame({
+        'stg_run_id': stg_run_id,
+        'order_idx': order_idx,
+        'trade_agent_key': trade_agent_key,
+        'order_dt': order_timestamp_s,
+        'order_date': order_timestamp_s.dt.date,
+        'order_time': order_timestamp_s.dt.time,
+        'order_millisec': 0,
+        'direction': order_df['direction'],
+        'action': order_df['action'],
+        'symbol': symbol,
+        'order_price': order_df['price'],
+        'order_vol': order_df['vol'],
+        'calc_mode': int(calc_mode),
+    })
+    trade_detail_df = pd.DataFrame({
+        'stg_run_id': stg_run_id,
+        'trade_idx': order_idx,
+        'trade_agent_key': trade_agent_key,
+        'order_idx': order_idx,
+        'order_price': order_df['price'],
+        'order_vol': order_df['vol'],
+        'trade_dt': order_timestamp_s,
+        'trade_date': order_timestamp_s.dt.date,
+        'trade_time': order_timestamp_s.dt.time,
+        'trade_millisec': 0,
+        'direction': order_df['direction'],
+        'action': order_df['action'],
+        'symbol': symbol,
+        'trade_price': order_df['price'],
+        'trade_vol': order_df['vol'],
+        'margin': order_df['vol'] * order_df['price'] * MULTIPLE * MARGIN_RATIO,
+        'commission': order_df['commission'],
+        'multiple': MULTIPLE,
+        'margin_ratio': MARGIN_RATIO,
+        'calc_mode': int(calc_mode),
+    })
+
+    # 持仓状态
+    pos_df, pos_first_bar = calc_pos_status(close_arr, date_arr, order_df)
+    # trade_agent_status_detail 记录依次为：T-1 记录、首根K线成交后（行情更新前）记录、每根K线收盘后记录
+    pos_col_list = list(pos_df.columns[1:])
+    pos_t_1_dic = dict(is_valid=False, **{key: 0.0 for key in pos_col_list})
+    if pos_first_bar is None:
+        pos_first_bar_dic = pos_t_1_dic
+    else:
+        pos_first_bar_dic = dict(is_valid=True, **{key: float(pos_first_bar[key]) for key in pos_col_list})
+    status_pos_df = pd.concat([pd.DataFrame([pos_t_1_dic, pos_first_bar_dic]), pos_df], ignore_index=True)
+    trade_agent_status_df = _calc_trade_agent_status(status_pos_df, run_mode, init_cash)
+    status_timestamp_s = pd.concat([timestamp_s.iloc[:1] - pd.Timedelta(days=1), timestamp_s.iloc[:1], timestamp_s],
+                                   ignore_index=True)
+    status_date_arr = status_timestamp_s.to_numpy().astype('datetime64[D]')
+    trade_agent_status_df['cash_init'] = init_cash
+    trade_agent_status_df['cash_available_last_day'] = _calc_cash_available_last_day(
+        trade_agent_status_df['cash_available'].to_numpy(), status_date_arr, init_cash)
+    _calc_rr(trade_agent_status_df, init_cash)
+    trade_agent_status_df.insert(0, 'trade_millisec', 0)
+    trade_agent_status_df.insert(0, 'trade_time', status_timestamp_s.dt.time)
+    trade_agent_status_df.insert(0, 'trade_date', status_timestamp_s.dt.date)
+    trade_agent_status_df.insert(0, 'trade_dt', status_timestamp_s)
+    trade_agent_status_detail_df = trade_agent_status_df.copy()
+    trade_agent_status_detail_df.insert(0, 'trade_agent_key', trade_agent_key)
+    trade_agent_status_detail_df.insert(0, 'trade_agent_status_detail_idx', np.arange(1, data_len + 3))
+    trade_agent_status_detail_df.insert(0, 'stg_run_id', stg_run_id)
+    trade_agent_status_detail_df['calc_mode'] = int(calc_mode)
+
+    # stg_run_status_detail 与 StgHandlerBacktest._update_stg_run_status_detail 一致：
+    # 首根K线收盘后的 trade_agent_status_detail 生成一条 T-1 记录，此后每根K线生成一条记录
+    stg_run_status_df = pd.concat([trade_agent_status_df.iloc[2:3], trade_agent_status_df.iloc[2:]],
+                                  ignore_index=True).drop(columns=['position_value'])
+    stg_run_status_df['cash_and_margin'] = stg_run_status_df['cash_available'] + stg_run_status_df['curr_margin']
+    _calc_rr(stg_run_status_df, init_cash)
+    stg_run_status_df.insert(0, 'stg_run_status_detail_idx', np.arange(1, data_len + 2))
+    stg_run_status_df.insert(0, 'stg_run_id', stg_run_id)
+
+    if add_2_db:
+        _save_df(order_detail_df, OrderDetail)
+        _save_df(trade_detail_df, TradeDetail)
+        _save_df(trade_agent_status_detail_df, TradeAgentStatusDetail)
+        _save_df(stg_run_status_df, StgRunStatusDetail)
+        with with_db_session(engine_ibats) as session:
+            session.query(StgRunInfo).filter(StgRunInfo.stg_run_id == stg_run_id).update(
+                {StgRunInfo.dt_to: datetime.now()})
+            session.commit()
+
+    return {
+        'stg_run_id': stg_run_id,
+        'order_df': order_detail_df,
+        'trade_df': trade_detail_df,
+        'trade_agent_status_detail_df': trade_agent_status_detail_df,
+        'stg_run_status_detail_df': stg_run_status_df,
+    }
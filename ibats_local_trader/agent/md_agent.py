@@ -11,6 +11,8 @@ import time
 
 from ibats_utils.mess import str_2_date
 
+from ibats_common.backend.md_cache import get_md_cache
+from ibats_common.backend.md_store import MdStore
 from ibats_common.md import MdAgentBase, md_agent
 from ibats_common.common import PeriodType, RunMode, ExchangeName
 import pandas as pd
@@ -20,7 +22,7 @@ class MdAgentPub(MdAgentBase):
 
     def __init__(self, instrument_id_list, md_period: PeriodType, exchange_name, file_path, agent_name=None,
                  init_load_md_count=None, init_md_date_from=None, init_md_date_to=None, ffill_on_load_history=True,
-                 **kwargs):
+                 columnar_replay=False, cache_file=False, store_folder_path=None, **kwargs):
         MdAgentBase.__init__(
             self, instrument_id_list, md_period, exchange_name, agent_name=agent_name,
             init_load_md_count=init_load_md_count, init_md_date_from=init_md_date_from,
@@ -41,6 +43,12 @@ class MdAgentPub(MdAgentBase):
 
         self.factors = kwargs['factors'] if 'factors' in kwargs else None
         self.ffill_on_load_history = ffill_on_load_history
+        # 按列推送历史数据，推送 dict 记录，替代 iterrows 逐行构建 Series
+        self.columnar_replay = columnar_replay
+        # 通过 MdCache 加载文件数据，多次回测、多个进程间不再重复解析文件，返回的 md_df 为只读数据
+        self.cache_file = cache_file
+        # 通过 MdStore 分区存储加载数据（替代 file_path 指定的 csv 文件），仅读取日期区间内相关分区的数据
+        self.store_folder_path = store_folder_path
 
     def load_history(self, date_from=None, date_to=None, load_md_count=None) -> (pd.DataFrame, dict):
         """
@@ -60,14 +68,6 @@ class MdAgentPub(MdAgentBase):
                         'time_key': self.time_key, 'microseconds_key': self.microseconds_key}
             return ret_data
 
-        # 加载历史数据
-        self.logger.debug("加载历史数据 %s", self.file_path)
-        date_col_name_set = {self.datetime_key, self.date_key, self.timestamp_key}
-        if None in date_col_name_set:
-            date_col_name_set.remove(None)
-        md_df = pd.read_csv(self.file_path, parse_dates=list(date_col_name_set))
-        if self.ffill_on_load_history:
-            md_df = md_df.ffill()
         if self.timestamp_key is not None:
             timestamp_key = self.timestamp_key
         elif self.datetime_key is not None:
@@ -78,22 +78,61 @@ class MdAgentPub(MdAgentBase):
             timestamp_key = None
             self.logger.warning('没有设置 timestamp_key、datetime_key、date_key 中的任何一个，无法进行日期过滤')
 
-        # 对日期区间进行过滤
-        filter_mark = None
         if timestamp_key is not None:
             if date_from is None:
                 date_from = pd.Timestamp(str_2_date(self.init_md_date_from))
             else:
                 date_from = pd.Timestamp(str_2_date(date_from))
 
-            if date_from is not None:
-                filter_mark = md_df[timestamp_key] >= date_from
-
             if date_to is None:
                 date_to = pd.Timestamp(str_2_date(self.init_md_date_to))
             else:
                 date_to = pd.Timestamp(str_2_date(date_to))
 
+        if self.store_folder_path is not None:
+            # 加载历史数据，日期过滤在 MdStore 中完成
+            self.logger.debug("加载历史数据 %s", self.store_folder_path)
+            md_store = MdStore(self.store_folder_path)
+            symbol_list = None if md_store.symbol_key is None else self.instrument_id_list
+            if timestamp_key is not None:
+                # 与 csv 文件的加载方式一致，先 ffill 再过滤，date_from 之前的数据参与 ffill
+                ret_df = md_store.read(symbol_list, date_from=None if self.ffill_on_load_history else date_from,
+                                       date_to=date_to)
+            else:
+                ret_df = md_store.read(symbol_list)
+            if self.ffill_on_load_history:
+                ret_df = ret_df.ffill()
+                if timestamp_key is not None and date_from is not None:
+                    ret_df = ret_df[ret_df[timestamp_key] >= date_from].reset_index(drop=True)
+        else:
+            ret_df = self._load_file(timestamp_key, date_from, date_to)
+
+        # 返回数据
+        ret_data = {'md_df': ret_df, 'datetime_key': self.datetime_key, 'date_key': self.date_key,
+                    'time_key': self.time_key, 'microseconds_key': self.microseconds_key,
+                    'symbol_key': self.symbol_key, 'close_key': 'close'}
+        return ret_data
+
+    def _load_file(self, timestamp_key, date_from, date_to) -> pd.DataFrame:
+        """从 csv 文件中加载历史数据，并对日期区间进行过滤"""
+        self.logger.debug("加载历史数据 %s", self.file_path)
+        date_col_name_set = {self.datetime_key, self.date_key, self.timestamp_key}
+        if None in date_col_name_set:
+            date_col_name_set.remove(None)
+        if self.cache_file:
+            md_df = get_md_cache().read_csv(
+                self.file_path, parse_dates=list(date_col_name_set), ffill=self.ffill_on_load_history)
+        else:
+            md_df = pd.read_csv(self.file_path, parse_dates=list(date_col_name_set))
+            if self.ffill_on_load_history:
+                md_df = md_df.ffill()
+
+        # 对日期区间进行过滤
+        filter_mark = None
+        if timestamp_key is not None:
+            if date_from is not None:
+                filter_mark = md_df[timestamp_key] >= date_from
+
             if date_to is not None:
                 if filter_mark is None:
                     filter_mark = md_df[timestamp_key] <= date_to
@@ -105,11 +144,7 @@ class MdAgentPub(MdAgentBase):
         else:
             ret_df = md_df
 
-        # 返回数据
-        ret_data = {'md_df': ret_df, 'datetime_key': self.datetime_key, 'date_key': self.date_key,
-                    'time_key': self.time_key, 'microseconds_key': self.microseconds_key,
-                    'symbol_key': self.symbol_key, 'close_key': 'close'}
-        return ret_data
+        return ret_df
 
 
 @md_agent(RunMode.Backtest, ExchangeName.LocalFile, is_default=False)
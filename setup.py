@@ -21,10 +21,9 @@ setup(name='IBATS_Common',
       author_email='mmmaaaggg@163.com',
       url='https://github.com/IBATS/IBATS_Common',
       packages=find_packages(),
-      python_requires='>=3.6',
+      python_requires='>=3.7',
       classifiers=(
           "Programming Language :: Python :: 3 :: Only",
-          "Programming Language :: Python :: 3.6",
           "Programming Language :: Python :: 3.7",
           "Programming Language :: Python :: 3.8",
           "Operating System :: Microsoft :: Windows",